@@ -1,19 +1,45 @@
 
 import requests
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, jsonify, send_from_directory
 import pymysql
 from pymysql.cursors import DictCursor
 import os
 import json
+import time
 from dotenv import load_dotenv
 from src.calculate_esg import calculate_esg_scores
 from config import PATHS
+from src.artifact_format import load_artifact, resolve_artifact_path
+from src.gemini_api import analyze_esg_report
+from src.run_prompt2_gemini import verify_esg_with_news
+from src.llm_telemetry import summarize_llm_usage, get_llm_usage_totals, get_recent_llm_calls
+from src.tracing import bind_context, set_attributes, span, traced
+from src.log import get_logger
+from src.metrics import ANALYSES_IN_PROGRESS, CONTENT_TYPE, observe_request, render_metrics
+from src.profiling import start_profiling
+from src.rankings import DEFAULT_TOP, get_rankings
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # ==============Flask 部分========================
 app = Flask(__name__)
 
+# --- 路由延遲統計（/metrics）---
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request_latency(response):
+    start = g.get('request_start')
+    if start is not None:
+        # 以路由規則（而非實際路徑）作為標籤，避免標籤數量隨網址無限增加
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
 # --- 資料庫連線設定 ---
 def get_db_connection():
     return pymysql.connect(
@@ -65,12 +91,13 @@ def verify_urls_batch(urls):
             if res.status_code in [200, 403]:
                 valid_list.append({"url": url, "title": "Verified"})
             else:
-                print(f"  ❌ 網址失效 ({res.status_code}): {url}")
+                logger.warning(f"網址失效 ({res.status_code}): {url}")
         except Exception as e:
-            print(f"  ❌ 請求錯誤 ({type(e).__name__}): {url}")
+            logger.warning(f"請求錯誤 ({type(e).__name__}): {url}")
     return valid_list
 
 @app.route('/')
+@traced('dashboard.render')
 def index():
     """
     主頁路由：渲染儀表板首頁
@@ -84,8 +111,10 @@ def index():
             # 資料表名稱變更: companies -> company
             # 欄位對應: id -> ESG_id (或忽略), name -> company_name, stock_id -> company_code
             sql_companies = "SELECT * FROM company"
-            cursor.execute(sql_companies)
-            companies_basic = cursor.fetchall()
+            with span('db.query', table='company') as query_span:
+                cursor.execute(sql_companies)
+                companies_basic = cursor.fetchall()
+                query_span.set(rows=len(companies_basic))
             
             for comp in companies_basic:
                 # 取得關聯用的 Key
@@ -104,8 +133,10 @@ def index():
                     FROM company_report 
                     WHERE company_id = %s AND year = %s
                 """
-                cursor.execute(sql_details, (stock_code, report_year))
-                details = cursor.fetchall()
+                with span('db.query', table='company_report') as query_span:
+                    cursor.execute(sql_details, (stock_code, report_year))
+                    details = cursor.fetchall()
+                    query_span.set(rows=len(details))
                 
                 # --- Python 運算段落 (呼叫計算引擎) ---
                 # 計算邏輯不變，但 details 內的 key 變了，需由 calculate_esg.py 處理或在此轉換
@@ -131,10 +162,12 @@ def index():
     finally:
         conn.close()
 
+    set_attributes(companies=len(companies_data))
     return render_template('index.html', companies=companies_data)
 
 # 新增：查詢公司 ESG 資料的 API
 @app.route('/api/query_company', methods=['POST'])
+@traced('query_company')
 def query_company():
     """
     查詢公司 ESG 資料並處理自動抓取
@@ -143,7 +176,8 @@ def query_company():
         {
             "year": 2024,
             "company_code": "2330",
-            "auto_fetch": false  # 是否同意自動抓取
+            "auto_fetch": false,  # 是否同意自動抓取
+            "profile": false      # 選填：剖析本次自動抓取流程（結果寫入 temp_data/profiles/）
         }
     
     回應格式：
@@ -157,14 +191,14 @@ def query_company():
     try:
         # 延遲導入以避免循環依賴或初始化錯誤，並確保能被 try-except 捕獲
         from src.db_service import query_company_data, insert_company_basic, update_analysis_status, insert_analysis_results
-        from src.crawler_esgReport import validate_report_exists, download_esg_report
-        from src.gemini_api import analyze_esg_report
+        from src.crawler_esgReport import ReportLookupError, validate_report_exists, download_esg_report
         
         # 解析請求參數
         data = request.get_json()
         year = int(data.get('year'))
         company_code = str(data.get('company_code')).strip()
         auto_fetch = data.get('auto_fetch', False)
+        profile = bool(data.get('profile')) or request.args.get('profile') == '1'
         
         if not year or not company_code:
             return jsonify({
@@ -173,6 +207,7 @@ def query_company():
             }), 400
         
         esg_id = f"{year}{company_code}"
+        set_attributes(year=year, company_code=company_code, auto_fetch=bool(auto_fetch))
         
         # 1. 查詢資料庫
         result = query_company_data(year, company_code)
@@ -180,6 +215,8 @@ def query_company():
         # 如果資料庫已存在該公司年度資料，使用資料庫中的真實 ESG_id (可能是 C001 等舊格式)
         if result['exists'] and result['data'] and 'ESG_id' in result['data']:
             esg_id = result['data']['ESG_id']
+        # 之後建立的 span（各步驟與外部呼叫）都會帶入 esg_id
+        set_attributes(esg_id=esg_id, db_status=result['status'])
         
         # 情況 A: completed - 直接回傳資料
         if result['status'] == 'completed':
@@ -222,8 +259,15 @@ def query_company():
         
         # 情況 C & D: failed 或 not_found - 需要驗證報告是否存在
         else:
-            # 驗證報告是否存在
-            exists, report_info = validate_report_exists(year, company_code)
+            # 驗證報告是否存在（查詢失敗時無法判斷，不可回覆查無報告）
+            try:
+                exists, report_info = validate_report_exists(year, company_code)
+            except ReportLookupError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'暫時無法查詢永續報告，請稍後再試: {str(e)}',
+                    'esg_id': esg_id
+                }), 503
             
             if not exists:
                 return jsonify({
@@ -266,9 +310,18 @@ def query_company():
                         'message': f'插入基本資料失敗: {msg}'
                     }), 500
             
+            # 本次執行的 LLM 用量由此時間點起算
+            run_start_time = time.time()
+            ANALYSES_IN_PROGRESS.inc()
+            # 指定 profile 或設定 PROFILE=1 時剖析本次流程
+            profiler = start_profiling(f"{year}_{company_code}", enabled=profile or None, esg_id=esg_id)
+            
             try:
                 # Step 2: 下載 PDF
-                download_success, pdf_path_or_error = download_esg_report(year, company_code)
+                # 沿用驗證階段取得的 report_info，避免重複查詢 TWSE API
+                download_success, pdf_path_or_error = download_esg_report(
+                    year, company_code, report_info=report_info
+                )
                 
                 if not download_success:
                     # 下載失敗，更新狀態為 failed
@@ -288,6 +341,10 @@ def query_company():
                 wordcloud_result = None
                 analysis_result = None
                 
+                # P1 每產出一筆項目就交給新聞爬蟲，與 AI 分析同時進行
+                from src.crawler_news import NewsSearchPipeline
+                news_pipeline = NewsSearchPipeline(year, company_code).start()
+                
                 def run_wordcloud():
                     """Word Cloud 生成執行緒"""
                     nonlocal wordcloud_result
@@ -296,7 +353,7 @@ def query_company():
                         wordcloud_result = generate_wordcloud(year, company_code, pdf_path, force_regenerate=False)
                     except Exception as e:
                         wordcloud_result = {'success': False, 'error': str(e)}
-                        print(f"⚠️ Word Cloud 生成錯誤: {e}")
+                        logger.exception(f"Word Cloud 生成錯誤: {e}")
                 
                 def run_ai_analysis():
                     """AI 分析執行緒"""
@@ -307,16 +364,17 @@ def query_company():
                             year, 
                             company_code,
                             company_name=report_info.get('company_name', ''),
-                            industry=report_info.get('sector', '')
+                            industry=report_info.get('sector', ''),
+                            on_item=news_pipeline.submit
                         )
                     except Exception as e:
                         raise  # AI 分析失敗則整個流程失敗
                 
                 # 建立並啟動執行緒
-                wordcloud_thread = threading.Thread(target=run_wordcloud, name="WordCloudThread")
-                ai_thread = threading.Thread(target=run_ai_analysis, name="AIAnalysisThread")
+                wordcloud_thread = threading.Thread(target=bind_context(run_wordcloud), name="WordCloudThread")
+                ai_thread = threading.Thread(target=bind_context(run_ai_analysis), name="AIAnalysisThread")
                 
-                print("🚀 啟動平行處理：Word Cloud 與 AI 分析")
+                logger.info("🚀 啟動平行處理：Word Cloud 與 AI 分析")
                 wordcloud_thread.start()
                 ai_thread.start()
                 
@@ -327,41 +385,33 @@ def query_company():
                 # 處理 Word Cloud 結果（非必要，失敗不影响主流程）
                 if wordcloud_result and wordcloud_result.get('success'):
                     if wordcloud_result.get('skipped'):
-                        print(f"ℹ️ Word Cloud 已存在，跳過生成")
+                        logger.info(f"ℹ️ Word Cloud 已存在，跳過生成")
                     else:
-                        print(f"✅ Word Cloud 生成成功: {wordcloud_result.get('word_count', 0)} 個關鍵字")
+                        logger.info(f"✅ Word Cloud 生成成功: {wordcloud_result.get('word_count', 0)} 個關鍵字")
                 else:
                     error_msg = wordcloud_result.get('error') if wordcloud_result else 'timeout'
-                    print(f"⚠️ Word Cloud 生成失敗: {error_msg}（不影響主流程）")
+                    logger.warning(f"Word Cloud 生成失敗: {error_msg}（不影響主流程）")
                 
                 # Step 4: 新聞爬蟲驗證 ✨ NEW
-                print("\n--- Step 4: 新聞爬蟲驗證 ---")
+                logger.info("--- Step 4: 新聞爬蟲驗證 ---")
                 try:
-                    from src.crawler_news import search_news_for_report
-                    
-                    news_result = search_news_for_report(
-                        year=year,
-                        company_code=company_code,
-                        force_regenerate=True
-                    )
+                    # 等待串流中的搜尋完成並補搜剩餘項目；P1 跳過分析時沿用既有新聞
+                    news_result = news_pipeline.finish(force_regenerate=False)
                     
                     if news_result['success']:
                         if news_result.get('skipped'):
-                            print(f"ℹ️ 新聞資料已存在，跳過生成")
+                            logger.info(f"ℹ️ 新聞資料已存在，跳過生成")
                         else:
-                            print(f"✅ 新聞爬蟲完成：{news_result['news_count']} 則新聞")
-                            print(f"   處理項目: {news_result['processed_items']}")
-                            print(f"   失敗項目: {news_result['failed_items']}")
+                            logger.info(f"✅ 新聞爬蟲完成：{news_result['news_count']} 則新聞"
+                                        f"（處理 {news_result['processed_items']} 項，失敗 {news_result['failed_items']} 項）")
                     else:
-                        print(f"⚠️ 新聞爬蟲失敗：{news_result.get('error')}（不影響主流程）")
+                        logger.warning(f"新聞爬蟲失敗：{news_result.get('error')}（不影響主流程）")
                 except Exception as e:
-                    print(f"⚠️ 新聞爬蟲發生錯誤: {str(e)}（不影響主流程）")
+                    logger.exception(f"新聞爬蟲發生錯誤: {str(e)}（不影響主流程）")
                 
                 # Step 5: AI 驗證與評分調整 ✨ NEW
-                print("\n--- Step 5: AI 驗證與評分調整 ---")
+                logger.info("--- Step 5: AI 驗證與評分調整 ---")
                 try:
-                    from src.run_prompt2_gemini import verify_esg_with_news
-                    
                     verify_result = verify_esg_with_news(
                         year=year,
                         company_code=company_code,
@@ -370,21 +420,20 @@ def query_company():
                     
                     if verify_result['success']:
                         if verify_result.get('skipped'):
-                            print(f"ℹ️ AI 驗證結果已存在，跳過生成")
+                            logger.info(f"ℹ️ AI 驗證結果已存在，跳過生成")
                         else:
                             stats = verify_result['statistics']
-                            print(f"✅ AI 驗證完成")
-                            print(f"   輸出檔案: {verify_result['output_path']}")
-                            print(f"   處理項目: {stats['processed_items']}")
-                            print(f"   Token 使用: {stats['total_tokens']:,} (輸入: {stats['input_tokens']:,}, 輸出: {stats['output_tokens']:,})")
-                            print(f"   執行時間: {stats['api_time']:.2f} 秒")
+                            logger.info(f"✅ AI 驗證完成：處理 {stats['processed_items']} 項，"
+                                        f"Token 使用 {stats['total_tokens']:,} (輸入: {stats['input_tokens']:,}, "
+                                        f"快取命中: {stats.get('cached_tokens', 0):,}, 輸出: {stats['output_tokens']:,})，"
+                                        f"API 時間 {stats['api_time']:.2f} 秒")
                     else:
-                        print(f"⚠️ AI 驗證失敗：{verify_result.get('error')}（不影響主流程）")
+                        logger.warning(f"AI 驗證失敗：{verify_result.get('error')}（不影響主流程）")
                 except Exception as e:
-                    print(f"⚠️ AI 驗證發生錯誤: {str(e)}（不影響主流程）")
+                    logger.exception(f"AI 驗證發生錯誤: {str(e)}（不影響主流程）")
                 
                 # Step 6: 來源可靠度驗證 ✨ NEW
-                print("\n--- Step 6: 來源可靠度驗證 ---")
+                logger.info("--- Step 6: 來源可靠度驗證 ---")
                 try:
                     from src.pplx_api import verify_evidence_sources
                     
@@ -396,36 +445,31 @@ def query_company():
                     
                     if pplx_result['success']:
                         if pplx_result.get('skipped'):
-                            print(f"ℹ️ 來源驗證結果已存在，跳過生成")
+                            logger.info(f"ℹ️ 來源驗證結果已存在，跳過生成")
                         else:
                             stats = pplx_result['statistics']
-                            print(f"✅ 來源驗證完成")
-                            print(f"   輸出檔案: {pplx_result['output_path']}")
-                            print(f"   處理項目: {stats['processed_items']}")
-                            print(f"   有效 URL: {stats['verified_count']}")
-                            print(f"   更新 URL: {stats['updated_count']}")
-                            print(f"   失敗項目: {stats['failed_count']}")
-                            print(f"   Perplexity 調用: {stats['perplexity_calls']} 次")
-                            print(f"   執行時間: {stats['execution_time']:.2f} 秒")
+                            logger.info(f"✅ 來源驗證完成：處理 {stats['processed_items']} 項，"
+                                        f"有效 {stats['verified_count']}、更新 {stats['updated_count']}、"
+                                        f"失敗 {stats['failed_count']}，Perplexity 調用 {stats['perplexity_calls']} 次，"
+                                        f"耗時 {stats['execution_time']:.2f} 秒")
                     else:
-                        print(f"⚠️ 來源驗證失敗：{pplx_result.get('error')}（不影響主流程）")
+                        logger.warning(f"來源驗證失敗：{pplx_result.get('error')}（不影響主流程）")
                 except Exception as e:
-                    print(f"⚠️ 來源驗證發生錯誤: {str(e)}（不影響主流程）")
+                    logger.exception(f"來源驗證發生錯誤: {str(e)}（不影響主流程）")
                 
                 # Step 7: 讀取 P3 JSON 並插入分析結果至資料庫
-                print("\n--- Step 7: 存入資料庫 ---")
+                logger.info("--- Step 7: 存入資料庫 ---")
                 import json
                 
                 # 讀取 P3 JSON（最終分析結果）
                 p3_path = os.path.join(PATHS['P3_JSON'], f'{year}_{company_code}_p3.json')
                 
-                if os.path.exists(p3_path):
-                    with open(p3_path, 'r', encoding='utf-8') as f:
-                        final_analysis_items = json.load(f)
-                    print(f"📂 載入 P3 JSON: {len(final_analysis_items)} 筆分析項目")
+                if resolve_artifact_path(p3_path) is not None:
+                    final_analysis_items = load_artifact(p3_path)
+                    logger.info(f"📂 載入 P3 JSON: {len(final_analysis_items)} 筆分析項目")
                 else:
                     # P3 不存在，更新狀態為 failed
-                    print(f"❌ P3 JSON 不存在: {p3_path}")
+                    logger.error(f"P3 JSON 不存在: {p3_path}")
                     update_analysis_status(esg_id, 'failed')
                     return jsonify({
                         'status': 'failed',
@@ -443,7 +487,9 @@ def query_company():
                     company_name=company_name,
                     industry=industry,
                     url=report_url,
-                    analysis_items=final_analysis_items
+                    analysis_items=final_analysis_items,
+                    year=year,
+                    company_code=company_code
                 )
                 
                 if not insert_success:
@@ -457,6 +503,10 @@ def query_company():
                 # Step 8: 更新狀態為 completed
                 update_analysis_status(esg_id, 'completed')
                 
+                llm_usage = summarize_llm_usage(company=f"{year}_{company_code}", since=run_start_time)
+                logger.info(f"💰 LLM 用量：{llm_usage['calls']} 次呼叫，{llm_usage['total_tokens']:,} tokens，"
+                            f"預估 ${llm_usage['cost_usd']:.4f}")
+                
                 # Step 9: 查詢完整資料並回傳
                 final_result = query_company_data(year, company_code)
                 
@@ -485,7 +535,9 @@ def query_company():
                         'status': 'completed',
                         'message': '自動抓取與分析完成',
                         'data': company_obj,
-                        'esg_id': esg_id
+                        'esg_id': esg_id,
+                        'llm_usage': llm_usage,
+                        'profile': profiler.output_path if profiler else None
                     })
                 else:
                     return jsonify({
@@ -502,6 +554,10 @@ def query_company():
                     'message': f'處理過程發生錯誤: {str(e)}',
                     'esg_id': esg_id
                 }), 500
+            finally:
+                ANALYSES_IN_PROGRESS.dec()
+                if profiler:
+                    profiler.stop()
     
     except Exception as e:
         return jsonify({
@@ -509,6 +565,79 @@ def query_company():
             'message': f'系統錯誤: {str(e)}'
         }), 500
 
+@app.route('/api/llm_usage')
+def api_llm_usage():
+    """
+    LLM 用量與預估成本
+    
+    查詢參數：
+        company: 公司鍵（例如 "2024_1102"），指定時回傳該公司的彙總
+        limit: 回傳的最近呼叫紀錄數（預設 50）
+    
+    回應格式：
+        {
+            "totals": {"all": {...}, "by_company": {...}, "by_model": {...}},
+            "company": {...},   # 有指定 company 時
+            "recent": [...]
+        }
+    """
+    company = request.args.get('company')
+    limit = request.args.get('limit', 50, type=int)
+    
+    response = {
+        'totals': get_llm_usage_totals(),
+        'recent': get_recent_llm_calls(limit, company=company)
+    }
+    if company:
+        response['company'] = summarize_llm_usage(company=company)
+    return jsonify(response)
+
+@app.route('/api/rankings')
+@traced('rankings.query')
+def api_rankings():
+    """
+    產業與同業排名（由增量維護的彙總回應，不重新計算所有公司）
+    
+    查詢參數：
+        year: 報告年度（必填）
+        industry: 產業別（省略時：有指定 company_code 則與同產業比較，否則為全部產業；
+                  與 company_code 的產業不符時回傳 400）
+        company_code: 要查詢名次的公司代碼（選填）
+        top: 前 N 名（預設 10，上限 100）
+    
+    回應格式：
+        {
+            "year": 2024, "industry": "水泥工業", "count": 7,
+            "mean": {"E": ..., "S": ..., "G": ..., "Total": ...},
+            "percentiles": {"p25": ..., "p50": ..., "p75": ...},
+            "top": [{"stockId": "1101", "name": "...", "rank": 1, "greenwashingScore": 62.5}, ...],
+            "company": {"stockId": "1102", "rank": 3, "percentile": 71.4, ...},   # 有指定 company_code 時
+            "industries": {"水泥工業": {"count": 7, "mean": 48.2}, ...}           # 全部產業時
+        }
+    """
+    year = request.args.get('year', type=int)
+    if year is None:
+        return jsonify({'status': 'error', 'message': '請提供 year 參數'}), 400
+    industry = request.args.get('industry') or None
+    company_code = request.args.get('company_code') or None
+    top = request.args.get('top', DEFAULT_TOP, type=int)
+    
+    try:
+        result = get_rankings(year, industry=industry, company_code=company_code, top=top)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'排名查詢失敗: {str(e)}'}), 500
+    
+    if result is None:
+        return jsonify({'status': 'not_found', 'message': '查無該年度、產業或公司的分析資料'}), 404
+    return jsonify(result)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus 格式的服務指標（路由延遲、流程步驟耗時、LLM token、快取命中率等）"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 # Serve word cloud JSON files
 @app.route('/word_cloud/wc_output/<filename>')
 def serve_wordcloud(filename):
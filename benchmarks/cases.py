@@ -0,0 +1,442 @@
+"""
+效能量測案例
+
+每個案例函數接收 (quick, repeat)，回傳 {案例鍵: 統計結果}；案例鍵的格式為
+"<量測名稱>/<參數>=<值>"，作為與基準比較時的對應依據。
+
+量測項目：
+    dashboard:   儀表板首頁（/）渲染耗時 vs 公司數（資料庫以記憶體內資料取代）
+    esg_scores:  calculate_esg_scores 的吞吐量（筆/秒）
+    esg_batch:   calculate_esg_scores_batch 的吞吐量 vs 公司數（與逐家呼叫比較）
+    pdf_extract: PDF 文字提取速度（頁/秒）
+    wordcloud:   文字雲斷詞與字頻統計速度（詞/秒）
+    news_crawl:  新聞搜尋耗時 vs SASB 議題數
+    url_verify:  P3 證據網址驗證耗時 vs 失效連結比例
+    pipeline:    完整流程（下載 → P1 + 新聞 → P2 → P3 → 文字雲 → 評分）的總耗時
+
+各案例在函數內才匯入 src 模組，確保 harness.prepare_environment() 已先行套用。
+"""
+
+import contextlib
+import io
+import os
+import random
+from typing import Any, Callable, Dict, List
+
+from benchmarks.harness import measure, summarize_samples
+
+# === 模組常數 ===
+BENCH_YEAR = 2024
+BENCH_COMPANY = {'code': '1102', 'name': '亞泥', 'industry': '水泥工業'}
+
+# 固定亂數種子，產生的測試資料每次相同
+DATA_SEED = 20240101
+
+_CATEGORIES = ['E', 'S', 'G']
+
+
+@contextlib.contextmanager
+def _quiet():
+    """隱藏被量測模組的進度輸出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _sasb_topics(industry: str) -> List[str]:
+    """取得產業在 SASB 權重表中的議題（依權重表順序）"""
+    from src.sasb_weights import get_sasb_weights
+    return [topic for topic in get_sasb_weights().industry_map(industry) if topic != '產業']
+
+
+def _make_records(count: int, industry: str, rng: random.Random) -> List[Dict[str, Any]]:
+    """產生與 company_report 查詢結果相同欄位的明細"""
+    topics = _sasb_topics(industry)
+    records = []
+    for n in range(count):
+        topic = topics[n % len(topics)]
+        records.append({
+            'ESG_category': _CATEGORIES[n % 3],
+            'SASB_topic': topic,
+            'risk_score': rng.randint(0, 4),
+            'adjustment_score': rng.choice([0, 0.5, 1, 2, 3, 4, None]),
+            'report_claim': f"{topic} 相關揭露 {n}",
+            'page_number': str(rng.randint(1, 200)),
+            'greenwashing_factor': '揭露以定性描述為主',
+            'external_evidence': f"{topic} 相關報導",
+            'external_evidence_url': f"https://news.example.com/{n}",
+            'consistency_status': rng.choice(['一致', '部分符合', '不一致']),
+            'MSCI_flag': rng.choice(['Green', 'Yellow', 'Orange', 'Red']),
+            'is_verified': 'True',
+        })
+    return records
+
+
+def _write_fake_pdf(pages: int, company_code: str = BENCH_COMPANY['code']) -> str:
+    """在 ESG_REPORTS 目錄寫入指定頁數的替身 PDF"""
+    from config import PATHS
+    from src.fake_backends import make_fake_pdf
+
+    path = os.path.join(PATHS['ESG_REPORTS'], f"{BENCH_YEAR}_{company_code}_bench{pages}.pdf")
+    with open(path, 'wb') as f:
+        f.write(make_fake_pdf(f"Sustainability Report {company_code}", pages))
+    return path
+
+
+# =========================
+# 儀表板
+# =========================
+class _FakeCursor:
+    """依 SQL 回傳記憶體內資料的 cursor（僅支援首頁的兩個查詢）"""
+
+    def __init__(self, companies: List[Dict[str, Any]], details: Dict[tuple, List[Dict[str, Any]]]):
+        self._companies = companies
+        self._details = details
+        self._rows: List[Dict[str, Any]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql: str, params=None):
+        if 'FROM company_report' in sql:
+            self._rows = self._details.get(tuple(params), [])
+        else:
+            self._rows = self._companies
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+class _FakeConnection:
+    def __init__(self, companies, details):
+        self._companies = companies
+        self._details = details
+
+    def cursor(self):
+        return _FakeCursor(self._companies, self._details)
+
+    def close(self):
+        pass
+
+
+def bench_dashboard(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """儀表板首頁渲染耗時 vs 公司數（每家 20 筆明細）"""
+    import app as app_module
+
+    rng = random.Random(DATA_SEED)
+    results = {}
+    for count in ([10, 50] if quick else [10, 50, 200]):
+        companies, details = [], {}
+        for n in range(count):
+            code = str(1000 + n)
+            companies.append({
+                'ESG_id': n + 1, 'company_name': f"公司{n}", 'company_code': code,
+                'industry': BENCH_COMPANY['industry'], 'Report_year': BENCH_YEAR,
+                'URL': f"https://example.com/{code}.pdf",
+            })
+            details[(code, BENCH_YEAR)] = _make_records(20, BENCH_COMPANY['industry'], rng)
+
+        app_module.get_db_connection = lambda: _FakeConnection(companies, details)
+        client = app_module.app.test_client()
+
+        def render():
+            response = client.get('/')
+            if response.status_code != 200:
+                raise RuntimeError(f"首頁回應 {response.status_code}")
+
+        results[f"dashboard/companies={count}"] = measure(render, repeat=repeat, warmup=1,
+                                                           work=count, unit='companies')
+    return results
+
+
+# =========================
+# 評分
+# =========================
+def bench_esg_scores(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """calculate_esg_scores 吞吐量（每個案例固定處理約 20 萬筆明細）"""
+    from src.calculate_esg import calculate_esg_scores
+
+    rng = random.Random(DATA_SEED)
+    total_records = 50_000 if quick else 200_000
+    results = {}
+    for count in [10, 100, 1000]:
+        records = _make_records(count, BENCH_COMPANY['industry'], rng)
+        calls = max(1, total_records // count)
+
+        def run():
+            for _ in range(calls):
+                calculate_esg_scores(BENCH_COMPANY['industry'], records)
+
+        results[f"esg_scores/records={count}"] = measure(run, repeat=repeat, warmup=1,
+                                                          work=count * calls, unit='records')
+    return results
+
+
+def bench_esg_batch(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """排行榜情境：多家公司（每家 30 筆明細）一次評分，批次 vs 逐家呼叫"""
+    from src.calculate_esg import calculate_esg_scores, calculate_esg_scores_batch
+    from src.sasb_weights import get_sasb_weights
+
+    rng = random.Random(DATA_SEED)
+    industries = list(get_sasb_weights().industries[:10])
+    results = {}
+    for companies in ([100, 1000] if quick else [100, 1000, 5000]):
+        company_industries = {}
+        records = []
+        for n in range(companies):
+            industry = industries[n % len(industries)]
+            company_industries[n] = industry
+            for row in _make_records(30, industry, rng):
+                row['company_id'] = n
+                records.append(row)
+        grouped = {n: [row for row in records if row['company_id'] == n] for n in company_industries}
+
+        def run_batch():
+            calculate_esg_scores_batch(company_industries, records)
+
+        def run_loop():
+            for n, industry in company_industries.items():
+                calculate_esg_scores(industry, grouped[n])
+
+        results[f"esg_batch/companies={companies}"] = measure(run_batch, repeat=repeat, warmup=1,
+                                                               work=len(records), unit='records')
+        results[f"esg_batch/companies={companies},mode=loop"] = measure(run_loop, repeat=repeat, warmup=1,
+                                                                         work=len(records), unit='records')
+    return results
+
+
+# =========================
+# PDF 與文字雲
+# =========================
+def bench_pdf_extract(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """PDF 文字提取速度（頁/秒）"""
+    from src.word_cloud import _extract_text_from_pdf
+
+    results = {}
+    for pages in ([5, 20] if quick else [5, 20, 80]):
+        path = _write_fake_pdf(pages)
+
+        def run():
+            with _quiet():
+                if not _extract_text_from_pdf(path):
+                    raise RuntimeError("PDF 文字提取失敗")
+
+        results[f"pdf_extract/pages={pages}"] = measure(run, repeat=repeat, work=pages, unit='pages')
+    return results
+
+
+def bench_wordcloud(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """文字雲生成速度（詞/秒，含 PDF 提取、斷詞與字頻統計）"""
+    import jieba
+    from src.word_cloud import _extract_text_from_pdf, generate_wordcloud
+
+    results = {}
+    for pages in ([20] if quick else [20, 80]):
+        path = _write_fake_pdf(pages)
+        with _quiet():
+            tokens = len(jieba.lcut(_extract_text_from_pdf(path)))
+
+        def run():
+            with _quiet():
+                result = generate_wordcloud(BENCH_YEAR, BENCH_COMPANY['code'], pdf_path=path, force_regenerate=True)
+            if not result['success']:
+                raise RuntimeError(result.get('error'))
+
+        results[f"wordcloud/pages={pages}"] = measure(run, repeat=repeat, warmup=1, work=tokens, unit='tokens')
+    return results
+
+
+# =========================
+# 新聞搜尋
+# =========================
+def _write_p1(topic_count: int, company_code: str = BENCH_COMPANY['code']) -> str:
+    """寫入包含 topic_count 個 SASB 議題的 P1 產物"""
+    from src.artifact_store import write_artifact
+
+    topics = _sasb_topics(BENCH_COMPANY['industry'])
+    items = []
+    for n in range(topic_count):
+        topic = topics[n % len(topics)]
+        items.append({
+            'company': BENCH_COMPANY['name'], 'company_id': company_code, 'year': str(BENCH_YEAR),
+            'esg_category': _CATEGORIES[n % 3], 'sasb_topic': topic, 'page_number': str(n + 1),
+            'report_claim': f"{BENCH_COMPANY['name']}於{BENCH_YEAR}年針對{topic}訂定具體目標。",
+            'greenwashing_factor': '揭露以定性描述為主', 'risk_score': 2,
+            'key_word': f"{BENCH_COMPANY['name']} {topic}",
+        })
+    return write_artifact('P1_JSON', BENCH_YEAR, company_code, items, stage='p1')
+
+
+def bench_news_crawl(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """新聞搜尋耗時 vs SASB 議題數（每個議題搜尋 3 個地區）"""
+    from src.crawler_news import search_news_for_report
+
+    results = {}
+    for topics in ([2, 5] if quick else [2, 5, 10]):
+        p1_path = _write_p1(topics)
+
+        def run():
+            with _quiet():
+                result = search_news_for_report(BENCH_YEAR, BENCH_COMPANY['code'], p1_json_path=p1_path,
+                                                force_regenerate=True)
+            if not result['success']:
+                raise RuntimeError(result.get('error'))
+
+        results[f"news_crawl/topics={topics}"] = measure(run, repeat=repeat, work=topics, unit='topics')
+    return results
+
+
+# =========================
+# 證據網址驗證
+# =========================
+def bench_url_verify(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """P3 證據網址驗證耗時 vs 失效連結比例（失效連結會改以 Perplexity 尋找替代）"""
+    from config import SERVICE_URLS
+    from src.artifact_store import write_artifact
+    from src.fake_backends import start_fake_server
+    from src.pplx_api import verify_evidence_sources
+
+    start_fake_server()
+    item_count = 10 if quick else 20
+    results = {}
+    for dead_ratio in ([0.0, 0.5] if quick else [0.0, 0.25, 0.5, 1.0]):
+        dead_count = int(round(item_count * dead_ratio))
+        items = []
+        for n in range(item_count):
+            # 替身服務對 /evidence/ 以外的路徑回傳 404
+            path = 'missing' if n < dead_count else 'evidence'
+            items.append({
+                'company': BENCH_COMPANY['name'], 'company_id': BENCH_COMPANY['code'], 'year': str(BENCH_YEAR),
+                'esg_category': _CATEGORIES[n % 3], 'sasb_topic': f"議題{n}",
+                'external_evidence': f"議題{n} 相關報導",
+                'external_evidence_url': f"{SERVICE_URLS['FAKE_BACKEND']}/{path}/bench{n}",
+            })
+
+        def setup():
+            write_artifact('P2_JSON', BENCH_YEAR, BENCH_COMPANY['code'], items, stage='p2')
+
+        def run():
+            with _quiet():
+                result = verify_evidence_sources(BENCH_YEAR, BENCH_COMPANY['code'], force_regenerate=True)
+            if not result['success']:
+                raise RuntimeError(result.get('error'))
+
+        results[f"url_verify/dead_ratio={dead_ratio:.2f}"] = measure(run, repeat=repeat, setup=setup,
+                                                                      work=item_count, unit='urls')
+    return results
+
+
+# =========================
+# 完整流程
+# =========================
+def run_pipeline(company_code: str = BENCH_COMPANY['code']) -> Dict[str, float]:
+    """
+    以替身後端執行一次完整流程
+
+    Returns:
+        dict: 各階段耗時（秒），含 'total'
+    """
+    import time
+    from config import PATHS
+    from src.calculate_esg import calculate_esg_scores
+    from src.artifact_format import load_artifact
+    from src.crawler_esgReport import download_esg_report, clear_report_info_cache
+    from src.crawler_news import NewsSearchPipeline
+    from src.gemini_api import analyze_esg_report
+    from src.pplx_api import verify_evidence_sources
+    from src.run_prompt2_gemini import verify_esg_with_news
+    from src.word_cloud import generate_wordcloud
+
+    timings = {}
+
+    def stage(name: str, fn: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        with _quiet():
+            result = fn()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    clear_report_info_cache()
+    pipeline_start = time.perf_counter()
+
+    ok, pdf_path = stage('download', lambda: download_esg_report(BENCH_YEAR, company_code,
+                                                                 save_dir=PATHS['ESG_REPORTS']))
+    if not ok:
+        raise RuntimeError(pdf_path)
+
+    def analyze():
+        news = NewsSearchPipeline(BENCH_YEAR, company_code).start()
+        try:
+            # 失敗時拋出 RuntimeError
+            analyze_esg_report(pdf_path, BENCH_YEAR, company_code, BENCH_COMPANY['name'],
+                               BENCH_COMPANY['industry'], force_regenerate=True,
+                               use_response_cache=False, on_item=news.submit)
+        finally:
+            news.close()
+        return news.finish(force_regenerate=True)
+
+    news_result = stage('p1_news', analyze)
+    if not news_result['success']:
+        raise RuntimeError(news_result.get('error'))
+
+    p2 = stage('p2', lambda: verify_esg_with_news(BENCH_YEAR, company_code, force_regenerate=True,
+                                                  use_response_cache=False))
+    if not p2['success']:
+        raise RuntimeError(p2.get('error'))
+
+    p3 = stage('p3', lambda: verify_evidence_sources(BENCH_YEAR, company_code, force_regenerate=True))
+    if not p3['success']:
+        raise RuntimeError(p3.get('error'))
+
+    wc = stage('wordcloud', lambda: generate_wordcloud(BENCH_YEAR, company_code, pdf_path=pdf_path,
+                                                       force_regenerate=True))
+    if not wc['success']:
+        raise RuntimeError(wc.get('error'))
+
+    def score():
+        records = [{
+            'ESG_category': item.get('esg_category'),
+            'SASB_topic': item.get('sasb_topic'),
+            'adjustment_score': item.get('adjustment_score'),
+        } for item in load_artifact(p3['output_path'])]
+        return calculate_esg_scores(BENCH_COMPANY['industry'], records)
+
+    stage('scores', score)
+    timings['total'] = time.perf_counter() - pipeline_start
+    return timings
+
+
+def bench_pipeline(quick: bool, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """完整流程總耗時（另記錄各階段耗時）"""
+    from src.fake_backends import start_fake_server
+    from src.profiling import profile_run
+    from src.tracing import span
+
+    start_fake_server()
+    runs = []
+    esg_id = f"{BENCH_YEAR}{BENCH_COMPANY['code']}"
+    for _ in range(1 if quick else max(1, repeat)):
+        # TRACING 開啟時，各階段與外部呼叫的 span 都接在同一個 trace 之下；PROFILE=1 時每次執行各存一份剖析結果
+        with span('pipeline', esg_id=esg_id), profile_run(f"pipeline_{esg_id}", esg_id=esg_id):
+            runs.append(run_pipeline())
+
+    results = {}
+    for name in runs[0]:
+        key = 'pipeline/total' if name == 'total' else f"pipeline/stage={name}"
+        results[key] = summarize_samples([timings[name] for timings in runs], unit='seconds')
+    return results
+
+
+# 量測項目（依執行順序）
+BENCHMARKS: Dict[str, Callable[[bool, int], Dict[str, Dict[str, Any]]]] = {
+    'dashboard': bench_dashboard,
+    'esg_scores': bench_esg_scores,
+    'esg_batch': bench_esg_batch,
+    'pdf_extract': bench_pdf_extract,
+    'wordcloud': bench_wordcloud,
+    'news_crawl': bench_news_crawl,
+    'url_verify': bench_url_verify,
+    'pipeline': bench_pipeline,
+}
@@ -0,0 +1,304 @@
+"""
+效能量測共用工具
+
+負責量測環境的準備、計時與統計、結果檔的讀寫，以及與基準（baseline）的比較。
+
+量測一律在本機替身後端（src/fake_backends.py）上執行，所有產物寫入暫存目錄，
+不會動到 temp_data/ 的正式資料。由於各模組在匯入時即讀取 config.PATHS 與
+FAKE_BACKENDS，prepare_environment() 必須在匯入任何 src 模組之前呼叫。
+
+主要函數：
+    prepare_environment: 設定替身後端、暫存目錄與放寬的限流設定
+    measure: 重複執行並回傳統計結果
+    save_results / load_results: 結果 JSON 的讀寫
+    compare_results: 比較目前結果與基準，找出效能回歸
+
+使用範例：
+    from benchmarks.harness import prepare_environment, measure
+
+    prepare_environment('/tmp/esg_bench')
+    result = measure(lambda: calculate_esg_scores(industry, records), repeat=5, work=len(records), unit='records')
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+# === 模組常數 ===
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+BASELINE_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'baselines')
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'baseline.json')
+
+# 結果檔格式改變時遞增，不同版本的結果不互相比較
+RESULT_VERSION = 1
+
+# 回歸判定：中位數變慢超過 DEFAULT_THRESHOLD（比例）且超過 MIN_DELTA 秒
+DEFAULT_THRESHOLD = 0.10
+MIN_DELTA = 0.002
+
+# 量測時的服務策略：替身後端的延遲才是量測對象，不讓正式的限流設定主導耗時
+BENCH_PROVIDER_LIMITS = {'rate': 1000.0, 'burst': 100, 'base_delay': 0.01, 'max_delay': 0.1}
+
+# 需要改寫到暫存目錄的產物路徑
+_WORK_PATH_KEYS = ['TEMP_DATA', 'ESG_REPORTS', 'P1_JSON', 'P2_JSON', 'P3_JSON', 'NEWS_OUTPUT', 'NEWS_SEARCH_OUTPUT',
+                   'REPORT_CATALOG', 'WORD_CLOUD_OUTPUT', 'ARTIFACT_STORE', 'CACHE_DIR', 'PROFILES']
+
+
+def prepare_environment(work_dir: str, latency: Optional[float] = None,
+                        error_rate: Optional[float] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    準備量測環境（需在匯入 src 模組前呼叫）
+
+    Args:
+        work_dir: 產物暫存目錄
+        latency: 替身後端的基本延遲（秒），None 表示沿用環境變數或預設值
+        error_rate: 替身後端的暫時性錯誤比例
+        seed: 延遲與錯誤注入的亂數種子
+
+    Returns:
+        dict: 量測設定（寫入結果檔的 settings 欄位）
+    """
+    if 'config' in sys.modules:
+        print("⚠️ config 已先行匯入，替身後端設定可能未生效")
+
+    os.environ['USE_FAKE_BACKENDS'] = '1'
+    os.environ.setdefault('FAKE_BACKEND_PORT', '8766')
+    os.environ['LLM_RESPONSE_CACHE'] = '0'
+    # 追蹤預設關閉；設定 TRACING=jsonl 時 span 寫入暫存目錄的 traces/
+    os.environ.setdefault('TRACING', 'off')
+    # 日誌只輸出警告以上，避免終端機輸出影響量測
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if latency is not None:
+        os.environ['FAKE_LATENCY'] = str(latency)
+    if error_rate is not None:
+        os.environ['FAKE_ERROR_RATE'] = str(error_rate)
+    if seed is not None:
+        os.environ['FAKE_SEED'] = str(seed)
+
+    import config
+
+    for key in _WORK_PATH_KEYS:
+        config.PATHS[key] = os.path.join(work_dir, key.lower())
+        os.makedirs(config.PATHS[key], exist_ok=True)
+    # 新聞爬蟲與 P2 讀寫同一個目錄
+    config.PATHS['NEWS_SEARCH_OUTPUT'] = config.PATHS['NEWS_OUTPUT']
+
+    from src import resilience
+    for limits in resilience.PROVIDER_LIMITS.values():
+        limits.update(BENCH_PROVIDER_LIMITS)
+    resilience.reset_policies()
+
+    return {
+        'latency': config.FAKE_BACKENDS['LATENCY'],
+        'error_rate': config.FAKE_BACKENDS['ERROR_RATE'],
+        'payload_scale': config.FAKE_BACKENDS['PAYLOAD_SCALE'],
+        'seed': config.FAKE_BACKENDS['SEED'],
+        'provider_limits': BENCH_PROVIDER_LIMITS,
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3, warmup: int = 0,
+            work: Optional[float] = None, unit: str = '',
+            setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """
+    重複執行 fn 並統計耗時
+
+    Args:
+        fn: 要量測的函數（無參數）
+        repeat: 量測次數
+        warmup: 不計入統計的預熱次數
+        work: 每次執行處理的工作量（用於計算吞吐量）
+        unit: 工作量單位（例如 'records'、'pages'）
+        setup: 每次執行前呼叫、不計時的準備函數
+
+    Returns:
+        dict: {
+            'samples': list,      # 每次耗時（秒）
+            'median': float,
+            'min': float,
+            'mean': float,
+            'stdev': float,
+            'work': float,        # 工作量（選填）
+            'unit': str,
+            'throughput': float   # 每秒工作量（以中位數計算，選填）
+        }
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    return summarize_samples(samples, work=work, unit=unit)
+
+
+def summarize_samples(samples: List[float], work: Optional[float] = None, unit: str = '') -> Dict[str, Any]:
+    """將耗時樣本整理為統計結果（格式同 measure）"""
+    median = statistics.median(samples)
+    result = {
+        'samples': [round(s, 6) for s in samples],
+        'median': round(median, 6),
+        'min': round(min(samples), 6),
+        'mean': round(statistics.fmean(samples), 6),
+        'stdev': round(statistics.stdev(samples), 6) if len(samples) > 1 else 0.0,
+        'unit': unit,
+    }
+    if work is not None:
+        result['work'] = work
+        result['throughput'] = round(work / median, 3) if median > 0 else None
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10)
+        return output.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build_report(results: Dict[str, Dict[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    組合結果檔內容
+
+    Args:
+        results: {案例鍵: measure() 結果 + benchmark / params}
+        settings: prepare_environment() 的回傳值與執行參數
+
+    Returns:
+        dict: 結果檔內容
+    """
+    return {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'results': results,
+    }
+
+
+def save_results(report: Dict[str, Any], path: Optional[str] = None) -> str:
+    """
+    寫入結果檔
+
+    Args:
+        report: build_report() 的結果
+        path: 輸出路徑（預設 benchmarks/results/<時間戳>.json）
+
+    Returns:
+        str: 實際寫入的路徑
+    """
+    if path is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(RESULTS_DIR, f"bench_{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """讀取結果檔"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD, min_delta: float = MIN_DELTA) -> Dict[str, Any]:
+    """
+    比較目前結果與基準
+
+    以各案例耗時的中位數比較；變慢超過 threshold 且絕對差距超過 min_delta 秒
+    視為回歸，變快超過同樣幅度視為改善。
+
+    Args:
+        current: 目前的結果檔內容
+        baseline: 基準的結果檔內容
+        threshold: 回歸門檻（比例，0.10 表示慢 10%）
+        min_delta: 忽略的絕對差距（秒），避免極短案例的雜訊
+
+    Returns:
+        dict: {
+            'rows': list,          # 每個案例的比較（key, baseline, current, ratio, status）
+            'regressions': list,   # 回歸的案例鍵
+            'improvements': list,  # 改善的案例鍵
+            'missing': list,       # 基準有、目前沒有的案例
+            'new': list,           # 目前有、基準沒有的案例
+            'comparable': bool     # 結果檔版本與量測設定是否一致
+        }
+    """
+    current_results = current.get('results', {})
+    baseline_results = baseline.get('results', {})
+
+    rows = []
+    regressions, improvements = [], []
+    for key in sorted(set(current_results) & set(baseline_results)):
+        base = baseline_results[key]['median']
+        now = current_results[key]['median']
+        ratio = now / base if base > 0 else float('inf')
+        if ratio > 1 + threshold and now - base > min_delta:
+            status = 'regression'
+            regressions.append(key)
+        elif ratio < 1 - threshold and base - now > min_delta:
+            status = 'improvement'
+            improvements.append(key)
+        else:
+            status = 'ok'
+        rows.append({'key': key, 'baseline': base, 'current': now, 'ratio': round(ratio, 3), 'status': status})
+
+    comparable = (current.get('version') == baseline.get('version')
+                  and _comparable_settings(current.get('settings', {}), baseline.get('settings', {})))
+
+    return {
+        'rows': rows,
+        'regressions': regressions,
+        'improvements': improvements,
+        'missing': sorted(set(baseline_results) - set(current_results)),
+        'new': sorted(set(current_results) - set(baseline_results)),
+        'comparable': comparable,
+    }
+
+
+def _comparable_settings(current: Dict[str, Any], baseline: Dict[str, Any]) -> bool:
+    """替身後端的延遲、錯誤率與回應大小需一致，結果才有比較意義"""
+    keys = ('latency', 'error_rate', 'payload_scale', 'seed')
+    return all(current.get(k) == baseline.get(k) for k in keys)
+
+
+def print_comparison(comparison: Dict[str, Any]) -> None:
+    """以表格輸出 compare_results() 的結果"""
+    marks = {'regression': '❌', 'improvement': '🚀', 'ok': '  '}
+    print(f"{'案例':<48} {'基準(秒)':>10} {'目前(秒)':>10} {'比例':>7}")
+    print("-" * 80)
+    for row in comparison['rows']:
+        print(f"{marks[row['status']]} {row['key']:<45} {row['baseline']:>10.4f} "
+              f"{row['current']:>10.4f} {row['ratio']:>7.2f}")
+    print("-" * 80)
+
+    if not comparison['comparable']:
+        print("⚠️ 基準與目前結果的量測設定不同，比較僅供參考")
+    for key in comparison['missing']:
+        print(f"⚠️ 基準中的案例未執行: {key}")
+    for key in comparison['new']:
+        print(f"ℹ️ 新案例（基準中沒有）: {key}")
+    print(f"📊 回歸 {len(comparison['regressions'])} 項，改善 {len(comparison['improvements'])} 項，"
+          f"共比較 {len(comparison['rows'])} 項")
@@ -0,0 +1,152 @@
+"""
+效能量測命令列工具
+
+以本機替身後端（USE_FAKE_BACKENDS）執行量測，結果存為 JSON，
+並可與保存的基準比較以找出效能回歸。
+
+主要指令：
+    run:     執行量測並輸出結果檔（可同時與基準比較，或存為新基準）
+    compare: 比較兩份結果檔
+
+使用範例：
+    # 執行全部量測
+    python benchmarks/run_benchmarks.py run
+
+    # 快速模式，只跑評分與 PDF 提取，並存為基準
+    python benchmarks/run_benchmarks.py run --quick --only esg_scores pdf_extract --save-baseline
+
+    # 執行後與基準比較（有回歸時結束碼為 1）
+    python benchmarks/run_benchmarks.py run --compare
+
+    # 剖析完整流程（結果寫入 benchmarks/results/profiles/，以 python src/profiling.py 摘要）
+    python benchmarks/run_benchmarks.py run --only pipeline --profile
+
+    # 比較既有的結果檔
+    python benchmarks/run_benchmarks.py compare benchmarks/results/bench_20250101_120000.json
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks import harness
+
+
+def run(args) -> int:
+    """執行量測"""
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='esg_bench_')
+    if args.profile:
+        os.environ['PROFILE'] = '1'
+    settings = harness.prepare_environment(work_dir, latency=args.latency,
+                                           error_rate=args.error_rate, seed=args.seed)
+    settings.update({'quick': args.quick, 'repeat': args.repeat, 'profile': args.profile})
+    if args.profile:
+        # 剖析結果不隨暫存目錄刪除
+        import config
+        config.PATHS['PROFILES'] = os.path.join(harness.RESULTS_DIR, 'profiles')
+
+    # 需在 prepare_environment 之後匯入（各案例會匯入 src 模組）
+    from benchmarks.cases import BENCHMARKS
+
+    selected = args.only or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ 未知的量測項目: {', '.join(unknown)}（可用: {', '.join(BENCHMARKS)}）")
+        return 2
+
+    print(f"📂 暫存目錄: {work_dir}")
+    print(f"⚙️ 替身延遲 {settings['latency']} 秒，錯誤率 {settings['error_rate']}，重複 {args.repeat} 次\n")
+
+    results = {}
+    failed = []
+    try:
+        for name in selected:
+            start = time.perf_counter()
+            print(f"▶ {name} ...")
+            try:
+                cases = BENCHMARKS[name](args.quick, args.repeat)
+            except Exception as e:
+                print(f"  ❌ 執行失敗: {type(e).__name__}: {e}")
+                failed.append(name)
+                continue
+            for key, result in cases.items():
+                throughput = f"  {result['throughput']:>12,.1f} {result['unit']}/秒" if result.get('throughput') else ''
+                print(f"  {key:<40} {result['median']:>9.4f} 秒{throughput}")
+            results.update(cases)
+            print(f"  ⏱️ {time.perf_counter() - start:.1f} 秒\n")
+    finally:
+        from src.fake_backends import stop_fake_server
+        stop_fake_server()
+        if not args.work_dir and not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = harness.build_report(results, settings)
+    output_path = harness.save_results(report, args.output)
+    print(f"📁 結果檔: {output_path}")
+
+    if args.save_baseline:
+        baseline_path = harness.save_results(report, args.baseline)
+        print(f"📌 已存為基準: {baseline_path}")
+
+    exit_code = 1 if failed else 0
+    if args.compare and not args.save_baseline:
+        exit_code = max(exit_code, _compare(report, args.baseline, args.threshold))
+    return exit_code
+
+
+def _compare(current, baseline_path: str, threshold: float) -> int:
+    if not os.path.exists(baseline_path):
+        print(f"❌ 找不到基準檔: {baseline_path}（可用 run --save-baseline 建立）")
+        return 2
+    print(f"\n📊 與基準比較: {baseline_path}\n")
+    comparison = harness.compare_results(current, harness.load_results(baseline_path), threshold=threshold)
+    harness.print_comparison(comparison)
+    return 1 if comparison['regressions'] else 0
+
+
+def compare(args) -> int:
+    """比較結果檔與基準"""
+    return _compare(harness.load_results(args.current), args.baseline, args.threshold)
+
+
+def main():
+    """命令列執行的主函數"""
+    parser = argparse.ArgumentParser(description='ESG 分析流程效能量測')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='執行量測')
+    run_parser.add_argument('--only', nargs='+', metavar='NAME', help='只執行指定的量測項目')
+    run_parser.add_argument('--quick', action='store_true', help='快速模式（較少的參數組合）')
+    run_parser.add_argument('--repeat', type=int, default=3, help='每個案例的量測次數（預設 3）')
+    run_parser.add_argument('--latency', type=float, help='替身後端的基本延遲（秒）')
+    run_parser.add_argument('--error-rate', type=float, help='替身後端的暫時性錯誤比例')
+    run_parser.add_argument('--seed', type=int, help='延遲與錯誤注入的亂數種子')
+    run_parser.add_argument('--output', help='結果檔路徑（預設 benchmarks/results/bench_<時間>.json）')
+    run_parser.add_argument('--work-dir', help='產物暫存目錄（預設建立暫存目錄並於結束後刪除）')
+    run_parser.add_argument('--keep', action='store_true', help='保留預設的暫存目錄')
+    run_parser.add_argument('--profile', action='store_true',
+                            help='剖析完整流程（會增加耗時，結果不宜作為基準）')
+    run_parser.add_argument('--save-baseline', action='store_true', help='將結果存為基準')
+    run_parser.add_argument('--compare', action='store_true', help='執行後與基準比較')
+    run_parser.add_argument('--baseline', default=harness.DEFAULT_BASELINE, help='基準檔路徑')
+    run_parser.add_argument('--threshold', type=float, default=harness.DEFAULT_THRESHOLD,
+                            help='回歸門檻（比例，預設 0.10）')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help='比較結果檔與基準')
+    compare_parser.add_argument('current', help='目前的結果檔')
+    compare_parser.add_argument('--baseline', default=harness.DEFAULT_BASELINE, help='基準檔路徑')
+    compare_parser.add_argument('--threshold', type=float, default=harness.DEFAULT_THRESHOLD,
+                                help='回歸門檻（比例，預設 0.10）')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
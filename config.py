@@ -38,12 +38,24 @@ PATHS = {
     'P3_JSON': os.path.join(PROJECT_ROOT, 'temp_data', 'prompt3_json'),
     'NEWS_OUTPUT': os.path.join(PROJECT_ROOT, 'temp_data', 'news_output'),
     
+    # 永續報告目錄（TWSE 整年度報告清單的本地索引）
+    'REPORT_CATALOG': os.path.join(PROJECT_ROOT, 'temp_data', 'report_catalog'),
+    
     # 新聞搜尋相關（統一存放於 temp_data/news_output）
     'NEWS_SEARCH_OUTPUT': os.path.join(PROJECT_ROOT, 'temp_data', 'news_output'),
     
     # Word Cloud 輸出（統一存放於 temp_data/wc_output）
     'WORD_CLOUD_OUTPUT': os.path.join(PROJECT_ROOT, 'temp_data', 'wc_output'),
     
+    # 分析產物版本檔與索引（artifact_store）
+    'ARTIFACT_STORE': os.path.join(PROJECT_ROOT, 'temp_data', 'artifacts'),
+    
+    # 本機快取（Gemini 上傳檔案參考等）
+    'CACHE_DIR': os.path.join(PROJECT_ROOT, 'temp_data', 'cache'),
+    
+    # 效能剖析結果（src/profiling.py）
+    'PROFILES': os.path.join(PROJECT_ROOT, 'temp_data', 'profiles'),
+    
     # Src 目錄（核心程式碼模組）
     'SRC_DIR': os.path.join(PROJECT_ROOT, 'src'),
     'TEMPLATES_DIR': os.path.join(PROJECT_ROOT, 'templates'),
@@ -74,10 +86,53 @@ FILE_TEMPLATES = {
     'P2_JSON': '{year}_{company_code}_p2.json',
     'P3_JSON': '{year}_{company_code}_p3.json',
     'NEWS_JSON': '{year}_{company_code}_news.json',
+    'WC_JSON': '{year}_{company_code}_wc.json',
     'ESG_REPORT_PDF': '{year}_{company_code}_*.pdf',
 }
 
 
+# === 產物檔案格式 ===
+# P1/P2/P3/新聞產物的儲存格式：'json'（預設，縮排 JSON）、'jsonl.gz'、'jsonl.zst'
+# 詳見 src/artifact_format.py
+ARTIFACT_FORMAT = os.getenv('ARTIFACT_FORMAT', 'json')
+
+
+# === 本機替身後端（離線執行與效能量測） ===
+# USE_FAKE_BACKENDS=1 時，Gemini、Perplexity、GNews 與 TWSE 皆改用 src/fake_backends.py 的替身
+FAKE_BACKENDS = {
+    'ENABLED': os.getenv('USE_FAKE_BACKENDS', '0') == '1',
+    'HOST': '127.0.0.1',
+    'PORT': int(os.getenv('FAKE_BACKEND_PORT', '8765')),
+    'LATENCY': float(os.getenv('FAKE_LATENCY', '0.05')),            # 每次呼叫的基本延遲（秒）
+    'ERROR_RATE': float(os.getenv('FAKE_ERROR_RATE', '0')),         # 暫時性錯誤（429 / 503）的比例
+    'PAYLOAD_SCALE': float(os.getenv('FAKE_PAYLOAD_SCALE', '1')),   # 回應大小倍數（PDF 頁數、新聞數、聲明長度）
+    'SEED': int(os.getenv('FAKE_SEED', '42')),                      # 延遲與錯誤注入的亂數種子
+}
+
+# === 日誌設定（src/log.py） ===
+LOGGING = {
+    'LEVEL': os.getenv('LOG_LEVEL', 'INFO').upper(),              # DEBUG / INFO / WARNING / ERROR
+    'FORMAT': os.getenv('LOG_FORMAT', 'text').lower(),            # text（人類可讀）/ json（每行一個 JSON 物件）
+    'FILE': os.getenv('LOG_FILE') or None,                        # 另外寫入的檔案（選填）
+    'SAMPLE_EVERY': int(os.getenv('LOG_SAMPLE_EVERY', '10')),     # 逐項訊息每 N 筆輸出一筆（1 表示全部輸出）
+}
+
+# === 效能剖析（src/profiling.py） ===
+PROFILING = {
+    'ENABLED': os.getenv('PROFILE', '0') == '1',                  # 剖析每一次分析與批次作業
+    'INTERVAL': float(os.getenv('PROFILE_INTERVAL', '0.005')),    # 取樣間隔（秒）
+    'MAX_DEPTH': 64,                                              # 每個樣本最多記錄的堆疊層數
+}
+
+# === 外部服務網址 ===
+_FAKE_BASE_URL = f"http://{FAKE_BACKENDS['HOST']}:{FAKE_BACKENDS['PORT']}"
+SERVICE_URLS = {
+    'ESGGENPLUS': _FAKE_BASE_URL if FAKE_BACKENDS['ENABLED'] else 'https://esggenplus.twse.com.tw',
+    'MOPSOV': _FAKE_BASE_URL if FAKE_BACKENDS['ENABLED'] else 'https://mopsov.twse.com.tw',
+    'FAKE_BACKEND': _FAKE_BASE_URL,
+}
+
+
 # === 輔助函數 ===
 def get_file_path(template_key: str, year: int, company_code: str, base_dir: str = None) -> str:
     """
@@ -90,7 +145,7 @@ def get_file_path(template_key: str, year: int, company_code: str, base_dir: str
         3. 跨平台相容（自動處理 Windows/Linux 路徑分隔符）
     
     Args:
-        template_key: 檔案類型，可選值：'P1_JSON', 'P2_JSON', 'P3_JSON', 'NEWS_JSON', 'ESG_REPORT_PDF'
+        template_key: 檔案類型，可選值：'P1_JSON', 'P2_JSON', 'P3_JSON', 'NEWS_JSON', 'WC_JSON', 'ESG_REPORT_PDF'
         year: 年份（例如：2024）
         company_code: 公司代碼（例如：'2330'）
         base_dir: 自訂基礎目錄（可選，通常不需要指定）
@@ -120,6 +175,7 @@ def get_file_path(template_key: str, year: int, company_code: str, base_dir: str
             'P2_JSON': PATHS['P2_JSON'],
             'P3_JSON': PATHS['P3_JSON'],
             'NEWS_JSON': PATHS['NEWS_OUTPUT'],
+            'WC_JSON': PATHS['WORD_CLOUD_OUTPUT'],
             'ESG_REPORT_PDF': PATHS['ESG_REPORTS'],
         }
         base_dir = dir_mapping.get(template_key, PATHS['TEMP_DATA'])
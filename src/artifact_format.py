@@ -0,0 +1,255 @@
+"""
+分析產物檔案格式模組
+
+P1/P2/P3/新聞產物預設為縮排 JSON（與既有檔案相同），可透過環境變數
+ARTIFACT_FORMAT 改為壓縮格式，以節省大量報告批次分析時的磁碟與載入時間：
+
+    json       縮排 JSON（預設）              2024_1102_p1.json
+    jsonl.gz   每行一筆的 JSON + gzip         2024_1102_p1.jsonl.gz
+    jsonl.zst  每行一筆的 JSON + zstd         2024_1102_p1.jsonl.zst（需安裝 zstandard）
+
+下游模組一律透過 load_artifact() 讀取，傳入 config.get_file_path() 產生的
+.json 路徑即可，實際存在哪一種格式由本模組判斷。
+
+主要函數：
+    load_artifact: 統一讀取任一格式的產物
+    resolve_artifact_path: 找出產物實際存在的檔案路徑
+    benchmark_formats: 比較各格式的檔案大小與載入時間
+
+使用範例：
+    from src.artifact_format import load_artifact
+
+    p1_items = load_artifact(get_file_path('P1_JSON', 2024, '1102'))
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # 選用套件，未安裝時僅停用 jsonl.zst
+    zstandard = None
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS, ARTIFACT_FORMAT
+
+# === 模組常數 ===
+FORMAT_SUFFIXES = {
+    'json': '.json',
+    'jsonl.gz': '.jsonl.gz',
+    'jsonl.zst': '.jsonl.zst',
+}
+
+# 可使用壓縮格式的產物類型（文字雲 JSON 由前端直接讀取，固定為 json）
+COMPACT_TEMPLATES = {'P1_JSON', 'P2_JSON', 'P3_JSON', 'NEWS_JSON'}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+# === 格式判斷 ===
+
+def get_format(template_key: str, fmt: Optional[str] = None) -> str:
+    """
+    取得產物應使用的格式
+
+    Args:
+        template_key: config.FILE_TEMPLATES 的鍵
+        fmt: 指定格式（None 表示使用 config.ARTIFACT_FORMAT）
+
+    Returns:
+        str: 'json' | 'jsonl.gz' | 'jsonl.zst'
+    """
+    if template_key not in COMPACT_TEMPLATES:
+        return 'json'
+    fmt = fmt or ARTIFACT_FORMAT
+    if fmt not in FORMAT_SUFFIXES:
+        raise ValueError(f"不支援的產物格式: {fmt}（可選 {', '.join(FORMAT_SUFFIXES)}）")
+    if fmt == 'jsonl.zst' and zstandard is None:
+        raise RuntimeError("ARTIFACT_FORMAT=jsonl.zst 需要安裝 zstandard 套件")
+    return fmt
+
+
+def detect_format(path: str) -> str:
+    """依副檔名判斷檔案格式"""
+    for fmt in ('jsonl.gz', 'jsonl.zst', 'json'):
+        if path.endswith(FORMAT_SUFFIXES[fmt]):
+            return fmt
+    raise ValueError(f"無法判斷檔案格式: {path}")
+
+
+def _base_path(path: str) -> str:
+    """去除格式副檔名，取得共同的檔名主幹"""
+    return path[:-len(FORMAT_SUFFIXES[detect_format(path)])]
+
+
+def with_format(path: str, fmt: str) -> str:
+    """將產物路徑轉換為指定格式的路徑（例如 .json -> .jsonl.gz）"""
+    return _base_path(path) + FORMAT_SUFFIXES[fmt]
+
+
+def format_variants(path: str) -> List[str]:
+    """列出產物所有可能格式的路徑（依 config.ARTIFACT_FORMAT 優先）"""
+    preferred = ARTIFACT_FORMAT if ARTIFACT_FORMAT in FORMAT_SUFFIXES else 'json'
+    order = [preferred] + [fmt for fmt in FORMAT_SUFFIXES if fmt != preferred]
+    return [with_format(path, fmt) for fmt in order]
+
+
+def resolve_artifact_path(path: str) -> Optional[str]:
+    """
+    找出產物實際存在的檔案路徑
+
+    Args:
+        path: 任一格式的產物路徑（通常為 get_file_path 產生的 .json 路徑）；
+              非產物格式的檔案（例如 PDF）則直接檢查該路徑
+
+    Returns:
+        str or None: 存在的檔案路徑，若各格式皆不存在則回傳 None
+    """
+    try:
+        candidates = format_variants(path)
+    except ValueError:
+        candidates = [path]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+# === 編碼與解碼 ===
+
+def encode_artifact(data: Any, fmt: str) -> bytes:
+    """
+    將資料編碼為指定格式
+
+    jsonl 格式中，陣列的每個元素各佔一行；非陣列資料則整筆寫成一行。
+    gzip 固定 mtime=0，相同內容會得到相同位元組（內容雜湊穩定）。
+    """
+    if fmt == 'json':
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+    rows = data if isinstance(data, list) else [data]
+    lines = ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n' for row in rows)
+    raw = lines.encode('utf-8')
+    if not isinstance(data, list):
+        raw = b'#object\n' + raw
+
+    if fmt == 'jsonl.gz':
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    if fmt == 'jsonl.zst':
+        if zstandard is None:
+            raise RuntimeError("需要安裝 zstandard 套件才能寫入 jsonl.zst")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    raise ValueError(f"不支援的產物格式: {fmt}")
+
+
+def decode_artifact(payload: bytes, fmt: str) -> Any:
+    """將指定格式的位元組解碼為資料"""
+    if fmt == 'json':
+        return json.loads(payload.decode('utf-8'))
+
+    if fmt == 'jsonl.gz':
+        raw = gzip.decompress(payload)
+    elif fmt == 'jsonl.zst':
+        if zstandard is None:
+            raise RuntimeError("需要安裝 zstandard 套件才能讀取 jsonl.zst")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raise ValueError(f"不支援的產物格式: {fmt}")
+
+    text = raw.decode('utf-8')
+    is_object = text.startswith('#object\n')
+    if is_object:
+        text = text[len('#object\n'):]
+    rows = [json.loads(line) for line in text.splitlines() if line]
+    return rows[0] if is_object else rows
+
+
+def load_artifact(path: str) -> Any:
+    """
+    統一讀取任一格式的產物
+
+    Args:
+        path: 產物路徑（.json 或壓縮格式皆可，會自動尋找實際存在的格式）
+
+    Returns:
+        產物內容（通常為 list）
+
+    Raises:
+        FileNotFoundError: 若各格式的檔案皆不存在
+    """
+    actual_path = resolve_artifact_path(path)
+    if actual_path is None:
+        raise FileNotFoundError(f"找不到產物檔案: {path}")
+    with open(actual_path, 'rb') as f:
+        return decode_artifact(f.read(), detect_format(actual_path))
+
+
+# === 效能比較 ===
+
+def benchmark_formats(paths: Optional[List[str]] = None, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    比較各格式的檔案大小與載入時間
+
+    Args:
+        paths: 要比較的 JSON 產物路徑（預設為 P1/P2/P3/新聞目錄中的所有 .json）
+        repeat: 每個格式重複載入的次數（取平均）
+
+    Returns:
+        dict: {格式: {'bytes': 總大小, 'load_ms': 平均載入毫秒, 'ratio': 相對 json 的大小比例}}
+    """
+    if paths is None:
+        paths = []
+        for key in ('P1_JSON', 'P2_JSON', 'P3_JSON', 'NEWS_OUTPUT'):
+            directory = PATHS[key]
+            if os.path.exists(directory):
+                paths.extend(
+                    os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                    if name.endswith('.json')
+                )
+
+    datasets = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            datasets.append(json.load(f))
+
+    formats = [fmt for fmt in FORMAT_SUFFIXES if fmt != 'jsonl.zst' or zstandard is not None]
+    results = {}
+    for fmt in formats:
+        payloads = [encode_artifact(data, fmt) for data in datasets]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for payload in payloads:
+                decode_artifact(payload, fmt)
+        elapsed = (time.perf_counter() - start) / max(repeat, 1)
+        results[fmt] = {
+            'bytes': sum(len(p) for p in payloads),
+            'load_ms': elapsed * 1000,
+        }
+
+    json_bytes = results['json']['bytes'] or 1
+    for stats in results.values():
+        stats['ratio'] = stats['bytes'] / json_bytes
+    return results
+
+
+# =========================
+# 命令列執行入口
+# =========================
+
+def main():
+    """命令列執行的主函數：比較產物格式"""
+    print("=== 分析產物格式比較 ===\n")
+    results = benchmark_formats()
+    print(f"{'格式':<12}{'大小 (KB)':>12}{'相對大小':>10}{'載入 (ms)':>12}")
+    for fmt, stats in results.items():
+        print(f"{fmt:<12}{stats['bytes'] / 1024:>12.1f}{stats['ratio']:>10.2f}{stats['load_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+分析產物儲存模組（Artifact Store）
+
+以內容雜湊（SHA-256）管理各階段產生的 JSON 檔案（P1/P2/P3/新聞/文字雲），
+並記錄產生階段、輸入檔雜湊與建立時間，讓各階段能在輸入未變更時跳過重算。
+
+檔案配置：
+    temp_data/<原有目錄>/{year}_{company_code}_*.json   # 正式路徑（沿用 config.get_file_path）
+    temp_data/artifacts/objects/ab/abcdef....json       # 以內容雜湊命名的版本檔
+    （若設定 ARTIFACT_FORMAT 為壓縮格式，副檔名改為 .jsonl.gz / .jsonl.zst，見 artifact_format）
+    temp_data/artifacts/records/P1_JSON/2024_1102.json  # 每個產物一個紀錄檔（中繼資料）
+
+每個產物的紀錄各自以原子寫入取代，Flask、命令列與批次工作等多個行程同時寫入
+不同產物時不會互相覆蓋；同一產物同時寫入時以最後完成者為準。
+
+主要函數：
+    write_artifact: 原子寫入產物並記錄中繼資料
+    register_artifact: 登記已寫入正式路徑的產物
+    is_artifact_fresh: 判斷產物是否仍對應目前的輸入
+    read_artifact: 讀取產物內容
+    collect_garbage: 清除已被取代的舊版本
+
+使用範例：
+    from src.artifact_store import write_artifact, is_artifact_fresh
+
+    inputs = [pdf_path]
+    if not is_artifact_fresh('P1_JSON', 2024, '1102', inputs):
+        data = run_analysis()
+        write_artifact('P1_JSON', 2024, '1102', data, stage='p1', inputs=inputs)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS, get_file_path
+from src.artifact_format import (
+    FORMAT_SUFFIXES, get_format, with_format, format_variants,
+    encode_artifact, load_artifact, resolve_artifact_path
+)
+
+# === 模組常數 ===
+STORE_DIR = PATHS['ARTIFACT_STORE']
+OBJECTS_DIR = os.path.join(STORE_DIR, 'objects')
+RECORDS_DIR = os.path.join(STORE_DIR, 'records')
+
+# 每個產物保留的歷史版本數（供除錯比對，超過的版本會在 collect_garbage 時清除）
+DEFAULT_KEEP_HISTORY = 1
+
+# 紀錄檔中最多記下的歷史版本數
+MAX_HISTORY = 20
+
+# 版本檔建立後的保護期（秒）：寫入端先寫版本檔、後寫紀錄檔，
+# collect_garbage 不刪除保護期內的檔案，以免刪到其他行程剛寫好、尚未登記的版本
+GC_GRACE_SECONDS = 60 * 60
+
+# atomic_write_bytes 的暫存檔前綴（寫入中的檔案，collect_garbage 一律略過）
+TMP_PREFIX = '.tmp_'
+
+# 檔案雜湊快取：{path: (mtime, size, sha256)}，避免重複雜湊大型 PDF
+_hash_cache: Dict[str, tuple] = {}
+_hash_cache_lock = threading.Lock()
+
+
+# === 雜湊與原子寫入 ===
+
+def hash_bytes(data: bytes) -> str:
+    """計算位元組內容的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> Optional[str]:
+    """
+    計算檔案內容的 SHA-256（依 mtime 與大小快取）
+
+    Args:
+        path: 檔案路徑
+
+    Returns:
+        str: 雜湊值，若檔案不存在則回傳 None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    with _hash_cache_lock:
+        cached = _hash_cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    sha = digest.hexdigest()
+
+    with _hash_cache_lock:
+        _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, sha)
+    return sha
+
+
+def hash_params(params: Optional[Dict[str, Any]]) -> Optional[str]:
+    """計算參數字典（模型名稱、產業等）的雜湊，作為非檔案類輸入"""
+    if not params:
+        return None
+    return hash_bytes(json.dumps(params, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """
+    原子寫入檔案：先寫入同目錄暫存檔，再以 os.replace 取代
+
+    讀取端永遠只會看到完整的舊檔或新檔，不會讀到寫到一半的內容。
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TMP_PREFIX, suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _serialize(data: Any) -> bytes:
+    """與專案既有檔案相同的 JSON 格式"""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """以專案既有 JSON 格式原子寫入檔案"""
+    atomic_write_bytes(path, _serialize(data))
+
+
+# === 紀錄存取 ===
+
+def _record_path(template_key: str, year: int, company_code: str) -> str:
+    return os.path.join(RECORDS_DIR, template_key, f"{year}_{company_code}.json")
+
+
+def _object_path(content_hash: str, fmt: str = 'json') -> str:
+    return os.path.join(OBJECTS_DIR, content_hash[:2], f"{content_hash}{FORMAT_SUFFIXES[fmt]}")
+
+
+def _load_record(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return None
+
+
+def _iter_records():
+    """逐一讀取所有產物紀錄"""
+    for root, _, files in os.walk(RECORDS_DIR):
+        for filename in files:
+            if filename.endswith('.json') and not filename.startswith(TMP_PREFIX):
+                record = _load_record(os.path.join(root, filename))
+                if record is not None:
+                    yield record
+
+
+def _hash_inputs(inputs: Optional[List[str]], params: Optional[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """將輸入檔路徑與參數轉為 {名稱: 雜湊}（產物輸入會自動對應到實際存在的格式）"""
+    hashes = {}
+    for path in inputs or []:
+        actual_path = resolve_artifact_path(path)
+        hashes[os.path.abspath(path)] = hash_file(actual_path) if actual_path else None
+    params_hash = hash_params(params)
+    if params_hash:
+        hashes['params'] = params_hash
+    return hashes
+
+
+# === 主要函數 ===
+
+def write_artifact(
+    template_key: str,
+    year: int,
+    company_code: str,
+    data: Any,
+    stage: str,
+    inputs: Optional[List[str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    fmt: Optional[str] = None,
+    record: bool = True
+) -> str:
+    """
+    原子寫入產物並記錄中繼資料
+
+    Args:
+        template_key: config.FILE_TEMPLATES 的鍵（例如 'P1_JSON'）
+        year: 報告年份
+        company_code: 公司代碼
+        data: 要儲存的 JSON 資料
+        stage: 產生此產物的階段名稱（例如 'p1', 'news'）
+        inputs: 輸入檔路徑清單（其內容雜湊會一併記錄）
+        params: 影響輸出的參數（例如模型名稱），會以雜湊形式記錄
+        fmt: 檔案格式（預設依 config.ARTIFACT_FORMAT，見 artifact_format）
+        record: 是否登記至索引（False 時仍寫入正式路徑並移除其他格式的舊檔，
+                但 is_artifact_fresh 不會視為最新，例如部分失敗的結果）
+
+    Returns:
+        str: 產物實際寫入的路徑
+    """
+    fmt = get_format(template_key, fmt)
+    path = with_format(get_file_path(template_key, year, company_code), fmt)
+    payload = encode_artifact(data, fmt)
+
+    # 正式路徑（下游模組以 load_artifact 讀取此檔）
+    atomic_write_bytes(path, payload)
+
+    # 移除其他格式的舊檔，避免讀到過期內容
+    for other in format_variants(path):
+        if other != path and os.path.exists(other):
+            os.remove(other)
+
+    if record:
+        _record_artifact(template_key, year, company_code, path, payload, fmt, stage, inputs, params)
+    return path
+
+
+def register_artifact(
+    template_key: str,
+    year: int,
+    company_code: str,
+    stage: str,
+    inputs: Optional[List[str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    record: bool = True
+) -> str:
+    """
+    登記已由其他程式寫入正式路徑的產物
+
+    適用於自行處理輸出的函數（例如 process_esg_news_verification），
+    參數意義同 write_artifact。檔案會依 config.ARTIFACT_FORMAT 重新寫入。
+
+    Returns:
+        str: 產物實際寫入的路徑
+
+    Raises:
+        FileNotFoundError: 若正式路徑的檔案不存在
+    """
+    data = load_artifact(get_file_path(template_key, year, company_code))
+    return write_artifact(template_key, year, company_code, data, stage, inputs, params, record=record)
+
+
+def _record_artifact(template_key, year, company_code, path, payload, fmt, stage, inputs, params) -> None:
+    """保存版本檔並更新該產物的紀錄檔"""
+    content_hash = hash_bytes(payload)
+
+    # 版本檔（內容相同時不重複寫入）
+    object_path = _object_path(content_hash, fmt)
+    if not os.path.exists(object_path):
+        atomic_write_bytes(object_path, payload)
+
+    record_path = _record_path(template_key, year, company_code)
+    previous = _load_record(record_path) or {}
+    history = previous.get('history', [])
+    if previous.get('content_hash') and previous['content_hash'] != content_hash:
+        history = [previous['content_hash']] + [h for h in history if h != previous['content_hash']]
+    atomic_write_json(record_path, {
+        'path': path,
+        'format': fmt,
+        'content_hash': content_hash,
+        'stage': stage,
+        'inputs': _hash_inputs(inputs, params),
+        'created_at': time.time(),
+        'history': [h for h in history if h != content_hash][:MAX_HISTORY]
+    })
+
+
+def get_artifact_record(template_key: str, year: int, company_code: str) -> Optional[Dict]:
+    """
+    取得產物紀錄
+
+    Returns:
+        dict or None: {'path', 'content_hash', 'stage', 'inputs', 'created_at', 'history'}
+    """
+    return _load_record(_record_path(template_key, year, company_code))
+
+
+def is_artifact_fresh(
+    template_key: str,
+    year: int,
+    company_code: str,
+    inputs: Optional[List[str]] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    判斷產物是否仍對應目前的輸入（可跳過重算）
+
+    以下情況視為過期：
+        - 沒有產物紀錄（例如舊流程直接寫入的檔案）
+        - 正式路徑的檔案不存在或內容已被修改
+        - 任一輸入檔或參數的雜湊與紀錄不同
+
+    Args:
+        template_key: config.FILE_TEMPLATES 的鍵
+        year: 報告年份
+        company_code: 公司代碼
+        inputs: 輸入檔路徑清單
+        params: 影響輸出的參數
+
+    Returns:
+        bool: 產物是否可直接沿用
+    """
+    record = get_artifact_record(template_key, year, company_code)
+    if record is None:
+        return False
+
+    path = record.get('path') or get_file_path(template_key, year, company_code)
+    if hash_file(path) != record.get('content_hash'):
+        return False
+
+    current = _hash_inputs(inputs, params)
+    if None in current.values():
+        return False
+    return current == record.get('inputs')
+
+
+def read_artifact(template_key: str, year: int, company_code: str) -> Any:
+    """
+    讀取產物內容（任一格式）
+
+    Raises:
+        FileNotFoundError: 若產物不存在
+    """
+    return load_artifact(get_file_path(template_key, year, company_code))
+
+
+def collect_garbage(keep_history: int = DEFAULT_KEEP_HISTORY,
+                    grace_seconds: float = GC_GRACE_SECONDS) -> Dict[str, int]:
+    """
+    清除已被取代的舊版本檔
+
+    每個產物保留目前版本與最近 keep_history 個歷史版本，
+    其餘不再被任何紀錄引用的版本檔都會刪除。寫入中的暫存檔與
+    建立未滿 grace_seconds 的版本檔（可能尚未登記）不會刪除；
+    紀錄檔本身不會被修改，可與其他行程的寫入同時執行。
+
+    Args:
+        keep_history: 每個產物保留的歷史版本數
+        grace_seconds: 版本檔的保護期（秒）
+
+    Returns:
+        dict: {'removed_files': int, 'removed_bytes': int}
+    """
+    referenced = set()
+    for record in _iter_records():
+        referenced.add(record.get('content_hash'))
+        referenced.update(record.get('history', [])[:keep_history])
+
+    removed_files = 0
+    removed_bytes = 0
+    if not os.path.exists(OBJECTS_DIR):
+        return {'removed_files': 0, 'removed_bytes': 0}
+
+    cutoff = time.time() - grace_seconds
+    for root, _, files in os.walk(OBJECTS_DIR):
+        for filename in files:
+            if filename.startswith(TMP_PREFIX):
+                continue
+            content_hash = filename.split('.', 1)[0]
+            if content_hash in referenced:
+                continue
+            full_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(full_path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.remove(full_path)
+                removed_bytes += stat.st_size
+                removed_files += 1
+            except OSError:
+                pass
+
+    return {'removed_files': removed_files, 'removed_bytes': removed_bytes}
+
+
+# =========================
+# 命令列執行入口
+# =========================
+
+def main():
+    """命令列執行的主函數：清除舊版本"""
+    print("=== 分析產物清理 ===\n")
+    keep = input(f"每個產物保留的歷史版本數 (預設 {DEFAULT_KEEP_HISTORY}): ").strip()
+    result = collect_garbage(int(keep) if keep else DEFAULT_KEEP_HISTORY)
+    print(f"已刪除 {result['removed_files']} 個檔案，釋放 {result['removed_bytes'] / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
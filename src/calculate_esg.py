@@ -1,22 +1,13 @@
 import os
-import json
-
-# 載入 SASB 權重設定
-# 新結構: 以「產業」為主鍵，每個產業物件包含所有議題的權重值
-def load_sasb_weights():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    json_path = os.path.join(base_dir, 'static', 'data', 'SASB_weightMap.json')
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    weights = {}
-    for item in data:
-        industry = item.get('產業')
-        if industry:
-            weights[industry] = item  # 儲存整個產業物件（包含所有議題權重）
-    return weights
+import sys
+import operator
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# SASB 權重設定：以「產業 × 議題」密集矩陣查表，權重表檔案更新時自動重新載入
+from src.sasb_weights import get_sasb_weights
 
-SASB_WEIGHTS = load_sasb_weights()
 
 def calculate_esg_scores(company_industry, esg_records):
     """
@@ -26,6 +17,10 @@ def calculate_esg_scores(company_industry, esg_records):
     :return: dict 包含 e_score, s_score, g_score, total_score
     """
     
+    # 1. 取得權重：整列產業權重只查一次，逐筆以議題索引取值（未知產業 / 議題權重為 1）
+    sasb_weights = get_sasb_weights()
+    industry_weights = sasb_weights.industry_weights(company_industry)
+
     scores = {
         'E': {'numerator': 0, 'denominator': 0},
         'S': {'numerator': 0, 'denominator': 0},
@@ -38,9 +33,7 @@ def calculate_esg_scores(company_industry, esg_records):
         category = row['ESG_category'] # 舊: category
         topic = row['SASB_topic']      # 舊: sasb_topic
         
-        # 1. 取得權重 (新結構: 先查產業，再查議題)
-        industry_info = SASB_WEIGHTS.get(company_industry, {})
-        weight = industry_info.get(topic, 1)  # 預設權重為 1
+        weight = industry_weights[sasb_weights.topic_id(topic)]
         
         # 2. 第五層分數：直接使用外部新聞驗證的調整分數 (adjustment_score)
         # [Important] adjustment_score 定義為 DECIMAL，Python通常會自動轉為 Decimal 或 float
@@ -73,4 +66,77 @@ def calculate_esg_scores(company_industry, esg_records):
         else:
             final_results[key] = 0
 
-    return final_results
\ No newline at end of file
+    return final_results
+
+
+# 批次計算時的類別欄位索引（其他類別只計入 Total）
+_CATEGORY_INDEX = {'E': 0, 'S': 1, 'G': 2}
+_OTHER_CATEGORY = len(_CATEGORY_INDEX)
+
+
+def calculate_esg_scores_batch(company_industries, esg_records, key='company_id'):
+    """
+    一次計算多家公司的 E, S, G 分數以及總風險分數（排行榜 / 產業比較用）
+    逐筆只做欄位解析，加總與百分比以 NumPy 一次完成；結果與逐家呼叫
+    calculate_esg_scores() 完全相同（np.bincount 依資料順序逐筆累加，與原本的迴圈同序）
+    :param company_industries: dict，公司鍵值 -> 產業別
+    :param esg_records: 所有公司的明細 list (dict)，欄位同 calculate_esg_scores，另含 key 指定的欄位
+    :param key: 識別公司的欄位名稱，或欄位名稱的 tuple（例如 ('company_id', 'year')）
+    :return: dict，公司鍵值 -> {'E', 'S', 'G', 'Total'}；不在 company_industries 內的明細會略過
+    """
+    esg_records = list(esg_records)  # 以下逐欄各走訪一次，需可重複迭代
+    companies = list(company_industries)
+    company_index = {company: i for i, company in enumerate(companies)}
+    if not isinstance(key, tuple):
+        get_key = operator.itemgetter(key)
+    elif len(key) > 1:
+        get_key = operator.itemgetter(*key)
+    else:
+        # itemgetter 只有一個欄位時回傳純量，需包成 tuple 才能與 company_industries 的鍵值比對
+        field = key[0]
+        get_key = lambda row: (row[field],)
+
+    # 1. 逐欄解析為陣列：公司、類別、議題、調整分數（不在 company_industries 內的明細公司索引為 -1，稍後濾除）
+    sasb_weights = get_sasb_weights()
+    industry_ids = np.array([sasb_weights.industry_id(company_industries[company]) for company in companies],
+                            dtype=np.intp)
+    company_ids = np.array([company_index.get(company_key, -1) for company_key in map(get_key, esg_records)],
+                           dtype=np.intp)
+    # 類別只有少數幾種寫法，每種只正規化一次
+    categories = [row['ESG_category'] for row in esg_records]
+    category_index = {category: _CATEGORY_INDEX.get(category.strip().upper() if category else 'E', _OTHER_CATEGORY)
+                      for category in set(categories)}
+    category_ids = np.array([category_index[category] for category in categories], dtype=np.intp)
+    topic_ids = sasb_weights.topic_ids([row['SASB_topic'] for row in esg_records])
+    adjustments = np.array([float(row['adjustment_score']) if row['adjustment_score'] else 0
+                            for row in esg_records], dtype=np.float64)
+
+    known = company_ids >= 0
+    if not known.all():
+        company_ids, category_ids, topic_ids, adjustments = (
+            company_ids[known], category_ids[known], topic_ids[known], adjustments[known])
+
+    # 權重整批查表（索引 -1 落在預設列／欄，權重為 1）
+    weights = sasb_weights.weights[industry_ids[company_ids], topic_ids]
+    # 與 max(0, adjustment) 相同：負值與 NaN 皆視為 0
+    weighted_scores = np.where(adjustments > 0, adjustments, 0.0) * weights
+    max_weighted_scores = 4 * weights
+
+    # 2. 累加：E/S/G 依 (公司, 類別) 分組，Total 依公司分組
+    n = len(companies)
+    cells = company_ids * (_OTHER_CATEGORY + 1) + category_ids
+    size = n * (_OTHER_CATEGORY + 1)
+    numerators = np.bincount(cells, weights=weighted_scores, minlength=size).reshape(n, _OTHER_CATEGORY + 1)
+    denominators = np.bincount(cells, weights=max_weighted_scores, minlength=size).reshape(n, _OTHER_CATEGORY + 1)
+    numerators[:, _OTHER_CATEGORY] = np.bincount(company_ids, weights=weighted_scores, minlength=n)
+    denominators[:, _OTHER_CATEGORY] = np.bincount(company_ids, weights=max_weighted_scores, minlength=n)
+
+    # 3. 計算最終百分比（round 使用 Python 內建，與 calculate_esg_scores 的進位一致）
+    percents = np.divide(numerators, denominators, out=np.zeros(numerators.shape), where=denominators > 0) * 100
+    final_results = {}
+    for i, company in enumerate(companies):
+        final_results[company] = {
+            name: round(float(percents[i, j]), 1) if denominators[i, j] > 0 else 0
+            for j, name in enumerate(['E', 'S', 'G', 'Total'])
+        }
+    return final_results
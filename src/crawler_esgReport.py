@@ -3,28 +3,228 @@ import urllib3
 import os
 import sys
 import time
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 # 隱藏安全連線警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import PATHS
+from config import PATHS, SERVICE_URLS, FAKE_BACKENDS
+from src.log import get_logger, sampled
+from src.profiling import profiled
+from src.resilience import ProviderPolicy, get_policy, get_provider_limits, check_response
+from src.tracing import bind_context, set_attributes, span, traced
+
+logger = get_logger(__name__)
+# 批次下載的逐檔進度只取樣輸出
+item_logger = sampled(logger)
 
 # 設定預設的 ESG 報告儲存目錄
 DEFAULT_SAVE_DIR = PATHS['ESG_REPORTS']
 
+# 報告資訊（MopsSustainReport/data 回應）快取存活時間（秒）
+# 驗證與下載通常在同一次請求內相隔數秒，短 TTL 即可避免重複查詢
+REPORT_INFO_CACHE_TTL = 300
+
+# 本地報告目錄的有效期限（秒），超過則改回查詢 API
+CATALOG_MAX_AGE = 24 * 60 * 60
+
+# 目錄同步的單次請求逾時（秒）：API 沒有分頁參數，整年度清單只能一次取回
+CATALOG_SYNC_TIMEOUT = 600
+
+# 批次下載設定（請求頻率、重試與熔斷由 resilience 的 twse 策略控制，每個主機各自限流）
+BULK_MAX_WORKERS = 4        # 同時下載的 worker 數
+
+# TWSE 永續報告 API（網址由 config.SERVICE_URLS 決定，啟用本機替身時指向本機服務）
+ESGGENPLUS_URL = SERVICE_URLS['ESGGENPLUS']
+MOPSOV_URL = SERVICE_URLS['MOPSOV']
+REPORT_API_URL = f'{ESGGENPLUS_URL}/api/api/MopsSustainReport/data'
+REPORT_API_URL_OLD = f'{ESGGENPLUS_URL}/api/api/MopsSustainReport/data/old'
+REPORT_API_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Content-Type': 'application/json',
+    'Accept': 'application/json, text/plain, */*',
+    'Origin': ESGGENPLUS_URL,
+    'Referer': f'{ESGGENPLUS_URL}/info/mops-sustain-report'
+}
+
+# 共用 HTTP Session（連線池）
+_session = None
+_session_lock = threading.Lock()
+
+# 報告資訊快取：{(year, company_code, market_type): (寫入時間, (exists, report_info))}
+_report_info_cache = {}
+_report_info_cache_lock = threading.Lock()
+
+# 本地報告目錄的記憶體索引：{(year, market_type): (檔案 mtime, catalog)}
+_catalog_index = {}
+_catalog_lock = threading.Lock()
+
+
+class ReportLookupError(RuntimeError):
+    """查詢 TWSE API 失敗（連線錯誤、熔斷中或無法解析的回應），無法判斷報告是否存在"""
+
+
+# ==================== 內部輔助函式 ====================
+
+def _get_session():
+    """
+    取得共用的 requests.Session
+    
+    驗證（POST API）與下載（GET PDF）共用同一個連線池，
+    避免每次呼叫都重新建立 TCP/TLS 連線。
+    
+    Returns:
+        requests.Session: 共用 Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                if FAKE_BACKENDS['ENABLED']:
+                    from src.fake_backends import start_fake_server
+                    start_fake_server()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.verify = False
+                _session = session
+    return _session
+
+
+def _twse_request(method, url, **kwargs):
+    """
+    依主機限流並重試的 TWSE 請求
+    
+    Returns:
+        requests.Response（408 / 429 / 5xx 以外的回應）
+    
+    Raises:
+        RetryableHTTPError: 重試用盡後仍為可重試的狀態碼
+        CircuitOpenError: 該主機熔斷中
+    """
+    host = urlparse(url).netloc
+    policy = get_policy('twse', scope=host)
+    with span('twse.request', method=method, host=host, path=urlparse(url).path) as request_span:
+        response = policy.call(lambda: check_response(_get_session().request(method, url, **kwargs)))
+        request_span.set(status_code=response.status_code, bytes=len(response.content))
+        return response
+
+
+def _get_report_api_url(year):
+    """
+    根據年份決定 API 網址
+    
+    Returns:
+        tuple: (url: str, is_new_version: bool)
+    """
+    if year >= 2023:
+        return REPORT_API_URL, True
+    return REPORT_API_URL_OLD, False
+
+
+def _parse_report_item(item, year, is_new_version):
+    """
+    將 API 回傳的單筆資料轉為 report_info
+    
+    Returns:
+        dict or None: report_info，若無法取得下載路徑則回傳 None
+    """
+    if is_new_version:
+        # 新版邏輯 (2023+)
+        stock_code = item.get('code')
+        company_name = item.get('shortName')
+        sector = item.get('sector')  # 2023+ 使用 sector 欄位
+        report_id = item.get('twFirstReportDownloadId')
+        download_url = f"{ESGGENPLUS_URL}/api/api/MopsSustainReport/data/FileStream?id={report_id}" if report_id else None
+    else:
+        # 舊版邏輯 (2022-)
+        stock_code = item.get('companY_ID')
+        company_name = item.get('companY_ABBR_NAME')
+        sector = item.get('name')  # 2022- 使用 name 欄位
+        file_name_api = item.get('filE_NAME')
+        download_url = f"{MOPSOV_URL}/server-java/FileDownLoad?step=9&filePath=/home/html/nas/protect/t100/&fileName={file_name_api}" if file_name_api else None
+    
+    if not download_url:
+        return None
+    
+    return {
+        'company_code': stock_code,
+        'company_name': company_name,
+        'sector': sector,
+        'download_url': download_url,
+        'file_name': f"{year}_{stock_code}_{company_name}_永續報告書.pdf"
+    }
+
+
+def _get_catalog_path(year, market_type, save_dir=None):
+    """取得報告目錄檔路徑"""
+    if save_dir is None:
+        save_dir = PATHS['REPORT_CATALOG']
+    return os.path.join(save_dir, f"{year}_{market_type}_catalog.json")
+
+
+def _is_catalog_stale(catalog):
+    """判斷報告目錄是否超過有效期限"""
+    return time.time() - catalog.get('synced_at', 0) > CATALOG_MAX_AGE
+
+
+def _get_cached_report_info(cache_key):
+    """
+    從快取取得尚未過期的報告資訊
+    
+    Returns:
+        tuple or None: (exists, report_info)，若無快取或已過期則回傳 None
+    """
+    with _report_info_cache_lock:
+        entry = _report_info_cache.get(cache_key)
+        if entry is None:
+            return None
+        cached_at, result = entry
+        if time.monotonic() - cached_at > REPORT_INFO_CACHE_TTL:
+            del _report_info_cache[cache_key]
+            return None
+    exists, report_info = result
+    # 回傳副本，避免呼叫端修改到快取內容
+    return (exists, dict(report_info) if report_info else None)
+
+
+def _set_cached_report_info(cache_key, result):
+    """寫入報告資訊快取"""
+    exists, report_info = result
+    with _report_info_cache_lock:
+        _report_info_cache[cache_key] = (time.monotonic(), (exists, dict(report_info) if report_info else None))
+
+
+def clear_report_info_cache():
+    """清除報告資訊快取（例如需要強制重新查詢時）"""
+    with _report_info_cache_lock:
+        _report_info_cache.clear()
+
 
 # ==================== 可程式化呼叫的函式 ====================
 
-def validate_report_exists(year, company_code, market_type=0):
+def validate_report_exists(year, company_code, market_type=0, use_cache=True, use_catalog=True):
     """
     快速驗證永續報告是否存在（不下載檔案）
     
+    查詢順序：記憶體快取 -> 本地報告目錄（sync_report_catalog）-> TWSE API。
+    查詢結果會快取 REPORT_INFO_CACHE_TTL 秒，同一次流程中的驗證與下載
+    只會對 TWSE API 發出一次請求。只有 API 明確回覆「查無資料」才視為不存在；
+    連線失敗或熔斷中會拋出 ReportLookupError，且不寫入快取。
+    
     Args:
         year: 查詢年度（西元）
         company_code: 公司代碼
         market_type: 市場類型 (0: 上市, 1: 上櫃)
+        use_cache: 是否使用快取（預設 True）
+        use_catalog: 是否查詢本地報告目錄（預設 True）
     
     Returns:
         tuple: (exists: bool, report_info: dict or None)
@@ -35,23 +235,27 @@ def validate_report_exists(year, company_code, market_type=0):
             'download_url': str,
             'file_name': str
         }
+    
+    Raises:
+        ReportLookupError: 若無法向 TWSE API 查詢（連線錯誤、熔斷中或回應格式錯誤）
     """
-    # 根據年份決定 API 網址
-    if year >= 2023:
-        url = 'https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data'
-        is_new_version = True
-    else:
-        url = 'https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data/old'
-        is_new_version = False
+    cache_key = (int(year), str(company_code), int(market_type))
+    if use_cache:
+        cached = _get_cached_report_info(cache_key)
+        if cached is not None:
+            return cached
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Content-Type': 'application/json',
-        'Accept': 'application/json, text/plain, */*',
-        'Origin': 'https://esggenplus.twse.com.tw',
-        'Referer': 'https://esggenplus.twse.com.tw/info/mops-sustain-report'
-    }
+    # 優先查詢本地報告目錄（由 sync_report_catalog 建立）
+    if use_catalog:
+        catalog = load_report_catalog(year, market_type)
+        if catalog is not None and not _is_catalog_stale(catalog):
+            report_info = catalog['companies'].get(str(company_code))
+            if report_info:
+                _set_cached_report_info(cache_key, (True, report_info))
+                return (True, dict(report_info))
+            # 目錄中沒有此公司：可能是同步後才上傳，改查 API 確認
     
+    url, is_new_version = _get_report_api_url(year)
     payload = {
         "marketType": market_type,
         "year": year,
@@ -62,51 +266,150 @@ def validate_report_exists(year, company_code, market_type=0):
     }
     
     try:
-        res = requests.post(url, headers=headers, json=payload, timeout=30, verify=False)
+        res = _twse_request('POST', url, headers=REPORT_API_HEADERS, json=payload, timeout=30)
         res.raise_for_status()
-        json_data = res.json()
-        items = json_data.get('data')
-        
-        if not items or len(items) == 0:
-            return (False, None)
-        
-        # 取得第一筆資料
-        item = items[0]
-        
-        if is_new_version:
-            # 新版邏輯 (2023+)
-            stock_code = item.get('code')
-            company_name = item.get('shortName')
-            sector = item.get('sector')  # 2023+ 使用 sector 欄位
-            report_id = item.get('twFirstReportDownloadId')
-            download_url = f"https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data/FileStream?id={report_id}" if report_id else None
-        else:
-            # 舊版邏輯 (2022-)
-            stock_code = item.get('companY_ID')
-            company_name = item.get('companY_ABBR_NAME')
-            sector = item.get('name')  # 2022- 使用 name 欄位
-            file_name_api = item.get('filE_NAME')
-            download_url = f"https://mopsov.twse.com.tw/server-java/FileDownLoad?step=9&filePath=/home/html/nas/protect/t100/&fileName={file_name_api}" if file_name_api else None
-        
-        if not download_url:
-            return (False, None)
-        
-        report_info = {
-            'company_code': stock_code,
-            'company_name': company_name,
-            'sector': sector,
-            'download_url': download_url,
-            'file_name': f"{year}_{stock_code}_{company_name}_永續報告書.pdf"
+        items = res.json().get('data')
+    except Exception as e:
+        # 無法判斷報告是否存在：不可當成「查無報告」，也不寫入快取
+        logger.warning(f"[驗證失敗] {e}")
+        raise ReportLookupError(f"TWSE 報告查詢失敗: {e}") from e
+    
+    if not items:
+        _set_cached_report_info(cache_key, (False, None))
+        return (False, None)
+    
+    # 取得第一筆資料
+    report_info = _parse_report_item(items[0], year, is_new_version)
+    
+    if report_info is None:
+        _set_cached_report_info(cache_key, (False, None))
+        return (False, None)
+    
+    _set_cached_report_info(cache_key, (True, report_info))
+    return (True, dict(report_info))
+
+
+def sync_report_catalog(year, market_type=0, save_dir=None):
+    """
+    同步整年度的永續報告目錄至本地
+    
+    以單一 POST（不指定公司代碼）取得該年度、該市場所有已上傳報告的公司清單，
+    並以公司代碼建立索引後存成 JSON。MopsSustainReport/data 沒有分頁參數，
+    整年度清單只能一次取回（逾時 CATALOG_SYNC_TIMEOUT 秒）。之後 validate_report_exists() 會直接
+    查詢本地索引，批次回補時不需逐家呼叫 TWSE API。
+    
+    Args:
+        year: 查詢年度（西元）
+        market_type: 市場類型 (0: 上市, 1: 上櫃)
+        save_dir: 目錄檔儲存位置（預設 PATHS['REPORT_CATALOG']）
+    
+    Returns:
+        dict: {
+            'success': bool,
+            'output_path': str,     # 目錄檔路徑
+            'company_count': int,   # 有效報告的公司數
+            'skipped_count': int,   # 無下載路徑而略過的筆數
+            'error': str            # 錯誤訊息（若失敗）
         }
-        
-        return (True, report_info)
+    """
+    output_path = _get_catalog_path(year, market_type, save_dir)
+    url, is_new_version = _get_report_api_url(year)
+    payload = {
+        "marketType": market_type,
+        "year": year,
+        "industryNameList": [],
+        "companyCodeList": [],
+        "industryName": "all",
+        "companyCode": ""
+    }
     
+    try:
+        logger.info(f"[*] 同步 {year} 年報告目錄（{'上市' if market_type == 0 else '上櫃'}）...")
+        res = _twse_request('POST', url, headers=REPORT_API_HEADERS, json=payload, timeout=CATALOG_SYNC_TIMEOUT)
+        res.raise_for_status()
+        items = res.json().get('data') or []
     except Exception as e:
-        print(f"[驗證失敗] {e}")
-        return (False, None)
+        return {'success': False, 'output_path': output_path, 'error': f"目錄同步失敗: {e}"}
+    
+    companies = {}
+    skipped_count = 0
+    for item in items:
+        report_info = _parse_report_item(item, year, is_new_version)
+        if report_info is None or not report_info['company_code']:
+            skipped_count += 1
+            continue
+        # 同一公司若有多筆，保留第一筆（與 validate_report_exists 的行為一致）
+        companies.setdefault(str(report_info['company_code']), report_info)
+    
+    catalog = {
+        'year': int(year),
+        'market_type': int(market_type),
+        'synced_at': time.time(),
+        'company_count': len(companies),
+        'companies': companies
+    }
+    
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        return {'success': False, 'output_path': output_path, 'error': f"目錄寫入失敗: {e}"}
+    
+    if save_dir is None:
+        with _catalog_lock:
+            _catalog_index[(int(year), int(market_type))] = (os.path.getmtime(output_path), catalog)
+    
+    logger.info(f"[OK] 共 {len(companies)} 家公司，略過 {skipped_count} 筆")
+    return {
+        'success': True,
+        'output_path': output_path,
+        'company_count': len(companies),
+        'skipped_count': skipped_count
+    }
 
 
-def download_esg_report(year, company_code, market_type=0, save_dir=None):
+def load_report_catalog(year, market_type=0, save_dir=None):
+    """
+    讀取本地報告目錄（含記憶體快取，檔案更新時自動重新載入）
+    
+    Args:
+        year: 查詢年度（西元）
+        market_type: 市場類型 (0: 上市, 1: 上櫃)
+        save_dir: 目錄檔儲存位置（預設 PATHS['REPORT_CATALOG']）
+    
+    Returns:
+        dict or None: 目錄內容（'companies' 為 公司代碼 -> report_info），若尚未同步則回傳 None
+    """
+    path = _get_catalog_path(year, market_type, save_dir)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    key = (int(year), int(market_type))
+    with _catalog_lock:
+        entry = _catalog_index.get(key)
+        if entry is not None and entry[0] == mtime and save_dir is None:
+            return entry[1]
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"[目錄讀取失敗] {e}")
+        return None
+    
+    if save_dir is None:
+        with _catalog_lock:
+            _catalog_index[key] = (mtime, catalog)
+    return catalog
+
+
+@traced('stage.download')
+def download_esg_report(year, company_code, market_type=0, save_dir=None, report_info=None):
     """
     下載永續報告書
     
@@ -115,6 +418,8 @@ def download_esg_report(year, company_code, market_type=0, save_dir=None):
         company_code: 公司代碼
         market_type: 市場類型 (0: 上市, 1: 上櫃)
         save_dir: 儲存目錄路徑
+        report_info: validate_report_exists() 回傳的報告資訊（選填）。
+                     若已先行驗證，傳入即可略過重複查詢
     
     Returns:
         tuple: (success: bool, file_path_or_error: str)
@@ -125,11 +430,15 @@ def download_esg_report(year, company_code, market_type=0, save_dir=None):
     if save_dir is None:
         save_dir = DEFAULT_SAVE_DIR
     
-    # 先驗證報告是否存在
-    exists, report_info = validate_report_exists(year, company_code, market_type)
-    
-    if not exists:
-        return (False, f"查無 {year} 年的報告資料（公司代碼: {company_code}）")
+    # 先驗證報告是否存在（呼叫端已驗證則直接沿用）
+    if report_info is None:
+        try:
+            exists, report_info = validate_report_exists(year, company_code, market_type)
+        except ReportLookupError as e:
+            return (False, str(e))
+        
+        if not exists:
+            return (False, f"查無 {year} 年的報告資料（公司代碼: {company_code}）")
     
     # 建立儲存目錄
     if not os.path.exists(save_dir):
@@ -145,25 +454,260 @@ def download_esg_report(year, company_code, market_type=0, save_dir=None):
     }
     
     try:
-        print(f"[*] 開始下載: {file_name}")
-        file_res = requests.get(download_url, headers=headers, timeout=120, verify=False)
+        logger.info(f"[*] 開始下載: {file_name}")
+        file_res = _twse_request('GET', download_url, headers=headers, timeout=120)
         
         if file_res.status_code == 200:
             with open(full_path, 'wb') as f:
                 f.write(file_res.content)
-            print(f"    [OK] 下載成功！")
+            set_attributes(bytes=len(file_res.content))
+            logger.info(f"[OK] 下載成功！")
             return (True, full_path)
         else:
             error_msg = f"下載失敗，狀態碼: {file_res.status_code}"
-            print(f"    [Error] {error_msg}")
+            logger.error(error_msg)
             return (False, error_msg)
     
     except Exception as e:
         error_msg = f"下載過程出錯: {str(e)}"
-        print(f"    [Error] {error_msg}")
+        logger.error(error_msg)
         return (False, error_msg)
 
 
+# ==================== 批次下載 ====================
+
+def _fetch_pdf(download_url, full_path, policy):
+    """
+    下載單一 PDF（串流寫入暫存檔後改名）
+    
+    限流、重試（429 / 5xx / 連線錯誤）與熔斷由 policy 處理；
+    其他 4xx 重試也不會成功，直接回傳失敗。
+    
+    Returns:
+        tuple: (success: bool, bytes_or_error: int | str, attempts: int)
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    tmp_path = full_path + '.part'
+    attempts = 0
+    
+    def fetch():
+        nonlocal attempts
+        attempts += 1
+        with _get_session().get(download_url, headers=headers, timeout=120, stream=True) as res:
+            check_response(res)
+            if res.status_code != 200:
+                return (False, f"狀態碼: {res.status_code}", attempts)
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in res.iter_content(chunk_size=256 * 1024):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, full_path)
+            return (True, size, attempts)
+    
+    with span('twse.download', host=urlparse(download_url).netloc) as download_span:
+        try:
+            result = policy.call(fetch)
+        except Exception as e:
+            result = (False, str(e), attempts)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        ok, bytes_or_error, _ = result
+        download_span.set(attempts=attempts, **({'bytes': bytes_or_error} if ok else {'failed': bytes_or_error}))
+        return result
+
+
+def _load_download_manifest(manifest_path):
+    """讀取下載進度檔，不存在或格式錯誤時回傳空進度"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get('items'), dict):
+            return manifest
+    except (IOError, json.JSONDecodeError):
+        pass
+    return {'items': {}}
+
+
+def _save_download_manifest(manifest_path, manifest):
+    """原子寫入下載進度檔"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+@traced('stage.bulk_download')
+@profiled('bulk_download')
+def bulk_download_reports(year, company_codes=None, market_type=0, save_dir=None,
+                          max_workers=BULK_MAX_WORKERS, host_interval=None,
+                          max_retries=None, resume=True):
+    """
+    批次下載永續報告書（多執行緒 + 主機限速 + 斷點續傳）
+    
+    每個主機依 resilience 的 twse 策略限流、退避重試與熔斷；
+    指定 host_interval 或 max_retries 時，本次下載改用獨立的策略。
+    
+    Args:
+        year: 查詢年度（西元）
+        company_codes: 公司代碼清單（None 表示下載報告目錄中的全部公司）
+        market_type: 市場類型 (0: 上市, 1: 上櫃)
+        save_dir: 儲存目錄路徑
+        max_workers: 同時下載的 worker 數
+        host_interval: 同一主機兩次請求的最小間隔（秒，None 表示使用 twse 策略的速率）
+        max_retries: 每個檔案的最大嘗試次數（None 表示使用 twse 策略的設定）
+        resume: 是否依進度檔略過已完成的檔案
+    
+    Returns:
+        dict: {
+            'success': bool,
+            'manifest_path': str,     # 進度檔路徑
+            'total': int,             # 目標公司數
+            'downloaded': int,        # 本次下載成功數
+            'skipped': int,           # 依進度檔略過數
+            'failed': int,            # 失敗數
+            'not_found': list,        # 查無報告的公司代碼
+            'lookup_failed': dict,    # 查詢 API 失敗的公司代碼 -> 錯誤訊息（可重新執行）
+            'bytes': int,             # 本次下載總位元組
+            'elapsed': float,         # 執行時間（秒）
+            'mb_per_sec': float,      # 吞吐量（MB/s）
+            'files_per_min': float,   # 吞吐量（檔案/分鐘）
+            'error': str              # 錯誤訊息（若失敗）
+        }
+    """
+    start_time = time.perf_counter()
+    
+    if save_dir is None:
+        save_dir = DEFAULT_SAVE_DIR
+    os.makedirs(save_dir, exist_ok=True)
+    
+    # 1. 決定下載目標
+    not_found = []
+    lookup_failed = {}
+    targets = {}
+    if company_codes is None:
+        catalog = load_report_catalog(year, market_type)
+        if catalog is None or _is_catalog_stale(catalog):
+            sync_result = sync_report_catalog(year, market_type)
+            if not sync_result['success']:
+                return {'success': False, 'error': sync_result['error']}
+            catalog = load_report_catalog(year, market_type)
+        targets = dict(catalog['companies']) if catalog else {}
+    else:
+        for code in company_codes:
+            try:
+                exists, report_info = validate_report_exists(year, str(code), market_type)
+            except ReportLookupError as e:
+                lookup_failed[str(code)] = str(e)
+                continue
+            if exists:
+                targets[str(code)] = report_info
+            else:
+                not_found.append(str(code))
+    
+    # 2. 讀取進度檔
+    manifest_path = os.path.join(save_dir, f"{year}_{market_type}_download_manifest.json")
+    manifest = _load_download_manifest(manifest_path) if resume else {'items': {}}
+    manifest['year'] = int(year)
+    manifest['market_type'] = int(market_type)
+    manifest_lock = threading.Lock()
+    
+    pending = []
+    skipped = 0
+    for code, report_info in targets.items():
+        entry = manifest['items'].get(code)
+        if entry and entry.get('status') == 'done' and os.path.exists(entry.get('file_path', '')):
+            skipped += 1
+            continue
+        pending.append((code, report_info))
+    
+    logger.info(f"[*] 批次下載 {year} 年報告：共 {len(targets)} 家，"
+                f"已完成 {skipped} 家，待下載 {len(pending)} 家（{max_workers} workers）")
+    
+    # 3. 平行下載
+    overrides = {}
+    if host_interval:
+        overrides.update(rate=1.0 / host_interval, burst=1)
+    if max_retries:
+        overrides['max_attempts'] = max_retries
+    local_policies = {}
+    local_policies_lock = threading.Lock()
+    
+    def policy_for(url):
+        host = urlparse(url).netloc
+        if not overrides:
+            return get_policy('twse', scope=host)
+        with local_policies_lock:
+            if host not in local_policies:
+                local_policies[host] = ProviderPolicy(f"twse:{host}", **{**get_provider_limits('twse'), **overrides})
+            return local_policies[host]
+    
+    downloaded = 0
+    failed = 0
+    total_bytes = 0
+    
+    def worker(code, report_info):
+        full_path = os.path.join(save_dir, report_info['file_name'])
+        download_url = report_info['download_url']
+        return full_path, _fetch_pdf(download_url, full_path, policy_for(download_url))
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        traced_worker = bind_context(worker)
+        futures = {executor.submit(traced_worker, code, info): code for code, info in pending}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            code = futures[future]
+            full_path, (ok, bytes_or_error, attempts) = future.result()
+            
+            with manifest_lock:
+                if ok:
+                    downloaded += 1
+                    total_bytes += bytes_or_error
+                    manifest['items'][code] = {
+                        'status': 'done',
+                        'file_path': full_path,
+                        'bytes': bytes_or_error,
+                        'attempts': attempts
+                    }
+                    item_logger.info(f"[OK] ({done_count}/{len(pending)}) {code}")
+                else:
+                    failed += 1
+                    manifest['items'][code] = {
+                        'status': 'failed',
+                        'error': bytes_or_error,
+                        'attempts': attempts
+                    }
+                    logger.warning(f"[Error] ({done_count}/{len(pending)}) {code}: {bytes_or_error}")
+                manifest['updated_at'] = time.time()
+                _save_download_manifest(manifest_path, manifest)
+    
+    # 4. 吞吐量統計
+    elapsed = time.perf_counter() - start_time
+    mb_per_sec = (total_bytes / (1024 * 1024)) / elapsed if elapsed > 0 else 0.0
+    files_per_min = downloaded / (elapsed / 60) if elapsed > 0 else 0.0
+    
+    logger.info(f"[*] 批次下載完成：成功 {downloaded}，略過 {skipped}，失敗 {failed}，"
+                f"{total_bytes / (1024 * 1024):.1f} MB / {elapsed:.1f} 秒 "
+                f"({mb_per_sec:.2f} MB/s, {files_per_min:.1f} 檔/分鐘)")
+    
+    return {
+        'success': failed == 0 and not lookup_failed,
+        'manifest_path': manifest_path,
+        'total': len(targets),
+        'downloaded': downloaded,
+        'skipped': skipped,
+        'failed': failed,
+        'not_found': not_found,
+        'lookup_failed': lookup_failed,
+        'bytes': total_bytes,
+        'elapsed': elapsed,
+        'mb_per_sec': mb_per_sec,
+        'files_per_min': files_per_min
+    }
+
+
 # ==================== 原有互動式功能 ====================
 
 if __name__ == '__main__':
@@ -182,96 +726,24 @@ if __name__ == '__main__':
         print("錯誤：年度請輸入數字。")
         exit()
     
-    # 3. 公司代碼輸入 (支援多筆)
-    codes_raw = input("請輸入公司代碼: ")
+    # 3. 公司代碼輸入 (支援多筆，留空表示下載該年度全部公司)
+    codes_raw = input("請輸入公司代碼 (多筆以逗號分隔，留空下載全部): ")
     # 將字串轉換為清單，並移除多餘空格
     companyCodeList = [code.strip() for code in codes_raw.replace('，', ',').split(',') if code.strip()]
-    
-    if not companyCodeList:
-        print("錯誤：必須提供至少一個公司代碼。")
-        exit()
-    
-    # 為了符合 API 格式，取清單第一個值作為單一代碼參數
-    companyCode = companyCodeList[0] 
-    industryNameList = []  
-    industryName = "all"  
     # --------------------------
     
-    # 根據年份決定 API 網址
-    if year >= 2023:
-        url = 'https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data'
-        is_new_version = True
-    else:
-        url = 'https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data/old'
-        is_new_version = False
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Content-Type': 'application/json',
-        'Accept': 'application/json, text/plain, */*',
-        'Origin': 'https://esggenplus.twse.com.tw',
-        'Referer': 'https://esggenplus.twse.com.tw/info/mops-sustain-report'
-    }
-    
-    payload = {
-        "marketType": marketType,
-        "year": year,
-        "industryNameList": industryNameList,
-        "companyCodeList": companyCodeList,
-        "industryName": industryName,
-        "companyCode": companyCode
-    }
-    
-    save_path = DEFAULT_SAVE_DIR
-    if not os.path.exists(save_path):
-        os.makedirs(save_path)
-    
     # ----- 執行流程 -----
-    try:
-        print(f"\n>>> 正在請求 {year} 年資料，網址: {url}")
-        res = requests.post(url, headers=headers, json=payload, timeout=600, verify=False)
-        res.raise_for_status() 
-        json_data = res.json() 
-        items = json_data.get('data')   # 大部分公司資料會出現在這，可以print出來看看
-
-        if not items:
-            print(f"[-] 查無 {year} 年的資料，請確認該年度是否有上傳報告或代碼是否正確。")
-        else:
-            for item in items:
-                if is_new_version:
-                    # --- 新版邏輯 (2023+) ---
-                    stock_code = item.get('code')
-                    company_name = item.get('shortName')
-                    report_id = item.get('twFirstReportDownloadId')
-                    download_url = f"https://esggenplus.twse.com.tw/api/api/MopsSustainReport/data/FileStream?id={report_id}" if report_id else None
-                else:
-                    # --- 舊版邏輯 (2022-) ---
-                    stock_code = item.get('companY_ID')
-                    company_name = item.get('companY_ABBR_NAME')
-                    file_name_api = item.get('filE_NAME')
-                    download_url = f"https://mopsov.twse.com.tw/server-java/FileDownLoad?step=9&filePath=/home/html/nas/protect/t100/&fileName={file_name_api}" if file_name_api else None
-
-                if download_url:
-                    file_local_name = f"{year}_{stock_code}_{company_name}_永續報告書.pdf"
-                    full_path = os.path.join(save_path, file_local_name)
-
-                    print(f"[*] 發現檔案: {file_local_name}，準備下載...")
-                    
-                    try:
-                        file_res = requests.get(download_url, headers=headers, timeout=120, verify=False)
-                        if file_res.status_code == 200:
-                            with open(full_path, 'wb') as f:
-                                f.write(file_res.content)
-                            print(f"    [OK] 下載成功！")
-                            time.sleep(1) # 下載間隔
-                        else:
-                            print(f"    [Error] 下載失敗，狀態碼: {file_res.status_code}")
-                    except Exception as e:
-                        print(f"    [Error] 下載過程出錯: {e}")
-                else:
-                    print(f"[-] 跳過 {stock_code}: 無法取得有效的下載路徑或 ID")
-
-    except Exception as e:
-        print(f"[!] 程式執行發生錯誤: {e}")
+    result = bulk_download_reports(
+        year,
+        company_codes=companyCodeList or None,
+        market_type=marketType
+    )
+    
+    if result.get('error'):
+        print(f"[!] 程式執行發生錯誤: {result['error']}")
+    for code in result.get('not_found', []):
+        print(f"[-] 跳過 {code}: 查無 {year} 年的報告或無法取得有效的下載路徑")
+    for code, error in result.get('lookup_failed', {}).items():
+        print(f"[!] 跳過 {code}: {error}")
     
-    print("\n--- 所有任務處理完成 ---")
\ No newline at end of file
+    print("\n--- 所有任務處理完成 ---")
@@ -3,8 +3,9 @@
 
 提供從 P1 JSON 分析結果搜尋相關新聞的功能。
 
-主要函數：
+主要函數與類別：
     search_news_for_report: 針對 ESG 報告搜尋相關新聞
+    NewsSearchPipeline: 與 P1 分析同時進行的串流新聞搜尋管線
 
 使用範例：
     from news_search.crawler_news import search_news_for_report
@@ -15,17 +16,29 @@
 """
 
 import json
+import queue
+import threading
 import time
 import os
 import sys
+import weakref
 from datetime import datetime
 from typing import Dict, List, Any, Optional
-from gnews import GNews
 from dateutil import parser as date_parser
 
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import PATHS, DATA_FILES
+from config import PATHS, DATA_FILES, FAKE_BACKENDS
+from src.artifact_store import write_artifact, is_artifact_fresh
+from src.artifact_format import FORMAT_SUFFIXES, load_artifact, resolve_artifact_path
+from src.log import get_logger, sampled
+from src.resilience import get_policy
+from src.tracing import bind_context, set_attributes, span, traced
+
+if FAKE_BACKENDS['ENABLED']:
+    from src.fake_backends import FakeGNews as GNews
+else:
+    from gnews import GNews
 
 # === 模組常數 - 使用 config.py 的路徑定義 ===
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -34,10 +47,7 @@ DEFAULT_OUTPUT_DIR = PATHS['NEWS_SEARCH_OUTPUT']  # 新聞輸出目錄 (app/news
 COMPANY_MAP_PATH = DATA_FILES['TW_LISTED_COMPANIES']  # 台灣上市公司資料
 SASB_KEYWORD_PATH = DATA_FILES['SASB_KEYWORD']  # SASB 關鍵字
 
-# API 設定
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # 秒
-SEARCH_DELAY = 2  # 每次搜尋後延遲
+# API 設定（請求頻率與重試由 resilience 的 gnews 策略控制）
 MAX_RESULTS_PER_TOPIC = 10
 
 # 多地區搜索配置
@@ -47,6 +57,13 @@ SEARCH_REGIONS = [
     {'language': 'en', 'country': 'GB', 'name': '英國'},
 ]
 
+# 新聞產物的參數（變更時既有新聞視為過期）
+ARTIFACT_PARAMS = {'regions': SEARCH_REGIONS, 'max_results': MAX_RESULTS_PER_TOPIC}
+
+logger = get_logger(__name__)
+# 逐議題的進度訊息只取樣輸出
+item_logger = sampled(logger)
+
 
 # === 輔助函數 ===
 
@@ -68,10 +85,10 @@ def _load_company_map() -> Dict[str, str]:
                     stock_map[code] = name
             return stock_map
     except FileNotFoundError:
-        print(f"⚠️ 找不到公司對照表: {COMPANY_MAP_PATH}")
+        logger.warning(f"找不到公司對照表: {COMPANY_MAP_PATH}")
         return {}
     except Exception as e:
-        print(f"⚠️ 載入公司對照表失敗: {e}")
+        logger.warning(f"載入公司對照表失敗: {e}")
         return {}
 
 
@@ -86,10 +103,10 @@ def _load_sasb_keywords() -> Dict[str, List[str]]:
         with open(SASB_KEYWORD_PATH, 'r', encoding='utf-8') as f:
             return json.load(f)
     except FileNotFoundError:
-        print(f"⚠️ 找不到 SASB 關鍵字檔案: {SASB_KEYWORD_PATH}")
+        logger.warning(f"找不到 SASB 關鍵字檔案: {SASB_KEYWORD_PATH}")
         return {}
     except Exception as e:
-        print(f"⚠️ 載入 SASB 關鍵字失敗: {e}")
+        logger.warning(f"載入 SASB 關鍵字失敗: {e}")
         return {}
 
 
@@ -130,21 +147,22 @@ def _find_p1_json(year: int, company_code: str, p1_dir: str = DEFAULT_P1_DIR) ->
     standard_name = f"{year}_{company_code}_p1.json"
     standard_path = os.path.join(p1_dir, standard_name)
     
-    if os.path.exists(standard_path):
+    if resolve_artifact_path(standard_path):
         return standard_path
     
     # 嘗試小寫 p1
     lowercase_name = f"{year}_{company_code}_p1.json"
     lowercase_path = os.path.join(p1_dir, lowercase_name)
     
-    if os.path.exists(lowercase_path):
+    if resolve_artifact_path(lowercase_path):
         return lowercase_path
     
-    # 嘗試搜尋符合格式的檔案
+    # 嘗試搜尋符合格式的檔案（任一產物格式）
     if os.path.exists(p1_dir):
         prefix = f"{year}_{company_code}"
+        suffixes = tuple(FORMAT_SUFFIXES.values())
         for filename in os.listdir(p1_dir):
-            if filename.startswith(prefix) and filename.lower().endswith('.json'):
+            if filename.startswith(prefix) and filename.lower().endswith(suffixes):
                 return os.path.join(p1_dir, filename)
     
     return None
@@ -171,8 +189,213 @@ def _is_date_in_year(date_str: str, target_year: int) -> bool:
         return False
 
 
+def _get_news(google_news: GNews, query: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    依 gnews 策略限流並重試的新聞查詢
+
+    Returns:
+        新聞列表；重試用盡或熔斷中時回傳 None
+    """
+    with span('gnews.query', query=query, language=getattr(google_news, 'language', ''),
+              country=getattr(google_news, 'country', '')) as query_span:
+        try:
+            results = get_policy('gnews').call(google_news.get_news, query)
+        except Exception as e:
+            query_span.set(failed=f"{type(e).__name__}: {e}")
+            return None
+        query_span.set(results=len(results or []))
+        return results
+
+
+def _item_key(item: Dict[str, Any]) -> str:
+    """P1 項目的識別鍵（用於比對串流收到的項目與最終 P1 JSON）"""
+    return json.dumps(item, ensure_ascii=False, sort_keys=True)
+
+
+@traced('news.item', stage='news')
+def _search_news_for_item(
+    item: Dict[str, Any],
+    year: int,
+    company_code: str,
+    sasb_keywords: Dict[str, List[str]],
+    label: str = ''
+) -> Dict[str, Any]:
+    """
+    針對單筆 P1 項目進行多地區新聞搜尋
+    
+    Args:
+        item: P1 分析項目
+        year: 報告年份（項目未提供 year 時使用）
+        company_code: 公司代碼（項目未提供 company_id 時使用）
+        sasb_keywords: SASB 關鍵字字典
+        label: 進度標籤（例如 "[3/26]"）
+    
+    Returns:
+        {
+            'topic': str,        # SASB 議題
+            'articles': list,    # 新聞（news_id 於合併時編號）
+            'error': str         # 失敗原因（成功時為 None）
+        }
+    """
+    # 取得基本資訊
+    company_name = item.get("company", "")  # 現在直接是公司名稱
+    stock_code = item.get("company_id", company_code)  # 從 company_id 取得代碼
+    topic = item.get("sasb_topic", "")
+    year_str = item.get("year", str(year))
+    set_attributes(topic=topic)
+    
+    item_logger.info(f"{label} 查核: {company_name} ({stock_code}) - {topic}")
+    
+    # === 關鍵字三層級 Fallback ===
+    # 層級 1: 優先使用 P1 提供的 key_word
+    key_word = item.get("key_word", "")
+    
+    # 層級 2: 從 SASB 關鍵字表生成
+    if not key_word and topic:
+        key_word = _get_keywords_from_sasb(topic, company_name, sasb_keywords)
+        logger.debug(f"{label} 使用 SASB 關鍵字生成: {key_word}")
+    
+    # 層級 3: 基本組合
+    if not key_word:
+        key_word = f"{company_name} {topic}"
+        logger.debug(f"{label} 使用基本組合: {key_word}")
+    
+    # 設定搜尋年份
+    try:
+        target_year = int(year_str)
+        logger.debug(f"{label} 搜索範圍: {target_year}/01/01 ~ {target_year}/12/31")
+    except ValueError:
+        logger.warning(f"{label} 日期格式錯誤（{year_str}），跳過此筆: {topic}")
+        return {'topic': topic, 'articles': [], 'error': '日期格式錯誤'}
+    
+    # === 搜尋策略（擴大至多地區） ===
+    articles = []
+    final_query = key_word
+    
+    try:
+        # 對多個地區進行搜尋並合併結果
+        for region in SEARCH_REGIONS:
+            # 設定 GNews
+            google_news = GNews(
+                language=region['language'], 
+                country=region['country'], 
+                max_results=MAX_RESULTS_PER_TOPIC
+            )
+            google_news.start_date = (target_year, 1, 1)
+            google_news.end_date = (target_year, 12, 31)
+            
+            # 策略 1: 使用完整關鍵字（失敗時靜默處理，繼續下一個地區）
+            region_results = _get_news(google_news, key_word)
+            
+            # 策略 2: 簡化關鍵字（取前3個詞）
+            if not region_results or len(region_results) < 3:
+                key_words_list = key_word.split()
+                if len(key_words_list) >= 3:
+                    query2 = ' '.join(key_words_list[:3])
+                    results2 = _get_news(google_news, query2)
+                    if results2 and len(results2) > len(region_results or []):
+                        region_results = results2
+                        final_query = query2
+            
+            # 策略 3: 公司名稱 + 主題
+            if not region_results or len(region_results) < 2:
+                query3 = f"{company_name} {topic}"
+                results3 = _get_news(google_news, query3)
+                if results3 and len(results3) > len(region_results or []):
+                    region_results = results3
+                    final_query = query3
+            
+            # 收集此地區的結果
+            if region_results:
+                for news in region_results:
+                    published_date = news.get('published date', '')
+                    if _is_date_in_year(published_date, target_year):
+                        articles.append({
+                            "news_id": None,
+                            "stock_code": stock_code,
+                            "company_name": company_name,
+                            "sasb_topic": topic,
+                            "search_query": final_query,
+                            "title": news.get('title', ''),
+                            "url": news.get('url', ''),
+                            "published_date": published_date,
+                            "publisher": news.get('publisher', {}).get('title', '') if isinstance(news.get('publisher'), dict) else ''
+                        })
+        
+        # 統一輸出結果
+        set_attributes(articles=len(articles))
+        logger.debug(f"{label} 找到 {len(articles)} 則 {target_year} 年相關新聞: {topic}")
+            
+    except Exception as e:
+        logger.warning(f"{label} 搜尋失敗: {topic}: {str(e)}")
+        return {'topic': topic, 'articles': articles, 'error': str(e)}
+    
+    return {'topic': topic, 'articles': articles, 'error': None}
+
+
+def _save_news_results(
+    year: int,
+    company_code: str,
+    p1_json_path: str,
+    item_results: List[Dict[str, Any]],
+    start_time: float
+) -> Dict[str, Any]:
+    """
+    依 P1 項目順序編號並儲存新聞結果
+    
+    Args:
+        item_results: 各 P1 項目的搜尋結果（依 P1 JSON 順序）
+        start_time: 開始時間（time.time()）
+    
+    Returns:
+        search_news_for_report 的回傳格式
+    """
+    all_news_articles = []
+    for result in item_results:
+        for article in result['articles']:
+            article = dict(article)
+            article['news_id'] = len(all_news_articles) + 1
+            all_news_articles.append(article)
+    
+    processed_items = len(item_results)
+    failure_details = [
+        {'topic': result['topic'], 'reason': result['error']}
+        for result in item_results if result['error']
+    ]
+    failed_items = len(failure_details)
+    
+    try:
+        output_filename = write_artifact(
+            'NEWS_JSON', year, company_code, all_news_articles,
+            stage='news', inputs=[p1_json_path], params=ARTIFACT_PARAMS
+        )
+        
+        elapsed_time = time.time() - start_time
+        
+        logger.info(f"✅ 新聞搜尋完成！處理 {processed_items} 項（失敗 {failed_items}），"
+                    f"新聞 {len(all_news_articles)} 則，耗時 {elapsed_time:.1f} 秒")
+        logger.info(f"📁 結果已儲存至: {output_filename}")
+        
+        return {
+            'success': True,
+            'output_file': output_filename,
+            'news_count': len(all_news_articles),
+            'processed_items': processed_items,
+            'failed_items': failed_items,
+            'skipped': False,
+            'failure_details': failure_details if failure_details else None
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'儲存檔案失敗: {str(e)}'
+        }
+
+
 # === 主要函數 ===
 
+@traced('stage.news')
 def search_news_for_report(
     year: int,
     company_code: str,
@@ -208,217 +431,184 @@ def search_news_for_report(
     # 輸出檔名（無時間戳）
     output_filename = os.path.join(DEFAULT_OUTPUT_DIR, f"{year}_{company_code}_news.json")
     
-    # === 2. 檔案存在性檢查 ===
-    if not force_regenerate and os.path.exists(output_filename):
-        try:
-            with open(output_filename, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            
-            if isinstance(existing_data, list) and len(existing_data) > 0:
-                return {
-                    'success': True,
-                    'output_file': output_filename,
-                    'news_count': len(existing_data),
-                    'processed_items': 0,
-                    'failed_items': 0,
-                    'skipped': True
-                }
-        except (json.JSONDecodeError, IOError):
-            print(f"⚠️ 現有檔案格式錯誤，將重新生成")
-    
-    # === 3. 尋找 P1 JSON ===
+    # === 2. 尋找 P1 JSON ===
     if p1_json_path is None:
         p1_json_path = _find_p1_json(year, company_code)
     
-    if p1_json_path is None or not os.path.exists(p1_json_path):
+    if p1_json_path is None or resolve_artifact_path(p1_json_path) is None:
         return {
             'success': False,
             'error': f'找不到 P1 JSON 檔案: {year}_{company_code}_p1.json'
         }
     
+    # === 3. 產物新鮮度檢查（P1 未變更則沿用既有新聞） ===
+    if not force_regenerate and is_artifact_fresh('NEWS_JSON', year, company_code, [p1_json_path], ARTIFACT_PARAMS):
+        try:
+            existing_data = load_artifact(output_filename)
+            
+            return {
+                'success': True,
+                'output_file': output_filename,
+                'news_count': len(existing_data),
+                'processed_items': 0,
+                'failed_items': 0,
+                'skipped': True
+            }
+        except (json.JSONDecodeError, IOError):
+            logger.warning(f"現有檔案格式錯誤，將重新生成: {output_filename}")
+    
     # === 4. 載入資源 ===
     try:
-        with open(p1_json_path, 'r', encoding='utf-8') as f:
-            p1_data_list = json.load(f)
+        p1_data_list = load_artifact(p1_json_path)
     except Exception as e:
         return {
             'success': False,
             'error': f'讀取 P1 JSON 失敗: {str(e)}'
         }
     
-    stock_map = _load_company_map()
     sasb_keywords = _load_sasb_keywords()
     
     # === 5. 執行新聞搜尋 ===
-    all_news_articles = []
-    news_id_counter = 1
-    processed_items = 0
-    failed_items = 0
-    failure_details = []
+    item_results = []
     
-    print(f"\n開始執行新聞搜尋，共 {len(p1_data_list)} 筆資料...")
-    print("=" * 60)
+    logger.info(f"開始執行新聞搜尋，共 {len(p1_data_list)} 筆資料...")
     
     for idx, item in enumerate(p1_data_list, 1):
-        # 取得基本資訊
-        company_name = item.get("company", "")  # 現在直接是公司名稱
-        stock_code = item.get("company_id", company_code)  # 從 company_id 取得代碼
-        topic = item.get("sasb_topic", "")
-        year_str = item.get("year", str(year))
-        
-        print(f"[{idx}/{len(p1_data_list)}] 查核: {company_name} ({stock_code}) - {topic}")
-        
-        processed_items += 1
-        
-        # === 關鍵字三層級 Fallback ===
-        # 層級 1: 優先使用 P1 提供的 key_word
-        key_word = item.get("key_word", "")
+        result = _search_news_for_item(item, year, company_code, sasb_keywords, label=f"[{idx}/{len(p1_data_list)}]")
+        item_results.append(result)
+    
+    # === 6. 儲存結果 ===
+    return _save_news_results(year, company_code, p1_json_path, item_results, start_time)
+
+
+class NewsSearchPipeline:
+    """
+    P1 → 新聞搜尋的生產者/消費者管線
+    
+    P1 分析以串流方式每產出一筆項目，就透過 submit() 放入佇列，
+    背景執行緒立即以該項目的 key_word 搜尋新聞，讓 LLM 等待時間與爬蟲重疊。
+    P1 完成後呼叫 finish()：以最終 P1 JSON 為準補搜尚未處理的項目、
+    捨棄不在最終結果中的項目，並依 P1 順序編號儲存。
+    
+    若整個過程沒有收到任何項目（例如 P1 輸入未變更而跳過分析），
+    finish() 會改走 search_news_for_report() 的一般流程（含產物新鮮度檢查）。
+    
+    使用範例：
+        pipeline = NewsSearchPipeline(2024, "1102").start()
+        analyze_esg_report(pdf_path, 2024, "1102", on_item=pipeline.submit)
+        news_result = pipeline.finish()
+    """
+    
+    _STOP = object()
+    _active: "weakref.WeakSet[NewsSearchPipeline]" = weakref.WeakSet()
+    
+    def __init__(self, year: int, company_code: str):
+        self.year = year
+        self.company_code = company_code
+        self.submitted = 0
+        self._submitted_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._sasb_keywords: Dict[str, List[str]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = time.time()
+    
+    def start(self) -> "NewsSearchPipeline":
+        """啟動背景搜尋執行緒"""
+        self._start_time = time.time()
+        self._sasb_keywords = _load_sasb_keywords()
+        self._thread = threading.Thread(target=bind_context(self._worker), name="NewsPipelineThread", daemon=True)
+        self._thread.start()
+        NewsSearchPipeline._active.add(self)
+        return self
+    
+    def submit(self, item: Dict[str, Any]) -> None:
+        """放入一筆 P1 項目（可作為 P1 的 on_item 回呼，執行緒安全）"""
+        if not isinstance(item, dict):
+            return
+        # 分段 P1 會由多個執行緒同時呼叫
+        with self._submitted_lock:
+            self.submitted += 1
+        self._queue.put(item)
+    
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            try:
+                key = _item_key(item)
+                if key in self._results:
+                    continue
+                self._results[key] = _search_news_for_item(
+                    item, self.year, self.company_code, self._sasb_keywords,
+                    label=f"[串流 #{len(self._results) + 1}]"
+                )
+            except Exception as e:
+                # 單筆失敗不可結束執行緒；未寫入結果的項目會在 finish() 補搜
+                logger.exception(f"[串流] 新聞搜尋失敗（{item.get('sasb_topic', '')}），finish() 時重試: {e}")
+    
+    def close(self) -> None:
+        """等待佇列中的項目處理完畢並停止背景執行緒"""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        NewsSearchPipeline._active.discard(self)
+    
+    @traced('news.finish')
+    def finish(self, p1_json_path: Optional[str] = None, force_regenerate: bool = False) -> Dict[str, Any]:
+        """
+        結束管線並儲存新聞結果
         
-        # 層級 2: 從 SASB 關鍵字表生成
-        if not key_word and topic:
-            key_word = _get_keywords_from_sasb(topic, company_name, sasb_keywords)
-            print(f"  🔧 使用 SASB 關鍵字生成: {key_word}")
+        Args:
+            p1_json_path: P1 JSON 路徑（選填，預設自動尋找）
+            force_regenerate: 未收到任何串流項目時，是否強制重新生成
         
-        # 層級 3: 基本組合
-        if not key_word:
-            key_word = f"{company_name} {topic}"
-            print(f"  🔧 使用基本組合: {key_word}")
+        Returns:
+            search_news_for_report 的回傳格式
+        """
+        self.close()
         
-        # 設定搜尋年份
-        try:
-            target_year = int(year_str)
-            print(f"  📅 搜索範圍: {target_year}/01/01 ~ {target_year}/12/31")
-        except ValueError:
-            print(f"  ⚠️ 日期格式錯誤，跳過此筆")
-            failed_items += 1
-            failure_details.append({'topic': topic, 'reason': '日期格式錯誤'})
-            continue
+        if self.submitted == 0:
+            return search_news_for_report(self.year, self.company_code, p1_json_path, force_regenerate)
         
-        # === 搜尋策略（擴大至多地區） ===
-        news_results = None
-        final_query = key_word
-        found_count = 0
+        if p1_json_path is None:
+            p1_json_path = _find_p1_json(self.year, self.company_code)
+        if p1_json_path is None or resolve_artifact_path(p1_json_path) is None:
+            return {
+                'success': False,
+                'error': f'找不到 P1 JSON 檔案: {self.year}_{self.company_code}_p1.json'
+            }
         
         try:
-            # 對多個地區進行搜尋並合併結果
-            for region in SEARCH_REGIONS:
-                # 設定 GNews
-                google_news = GNews(
-                    language=region['language'], 
-                    country=region['country'], 
-                    max_results=MAX_RESULTS_PER_TOPIC
-                )
-                google_news.start_date = (target_year, 1, 1)
-                google_news.end_date = (target_year, 12, 31)
-                
-                region_results = None
-                
-                # 策略 1: 使用完整關鍵字
-                for attempt in range(MAX_RETRIES):
-                    try:
-                        region_results = google_news.get_news(key_word)
-                        break
-                    except Exception as e:
-                        if attempt < MAX_RETRIES - 1:
-                            time.sleep(RETRY_DELAY)
-                        else:
-                            # 靜默處理錯誤，繼續下一個地區
-                            pass
-                
-                # 策略 2: 簡化關鍵字（取前3個詞）
-                if not region_results or len(region_results) < 3:
-                    key_words_list = key_word.split()
-                    if len(key_words_list) >= 3:
-                        query2 = ' '.join(key_words_list[:3])
-                        try:
-                            results2 = google_news.get_news(query2)
-                            if results2 and len(results2) > len(region_results or []):
-                                region_results = results2
-                                final_query = query2
-                        except:
-                            pass
-                
-                # 策略 3: 公司名稱 + 主題
-                if not region_results or len(region_results) < 2:
-                    query3 = f"{company_name} {topic}"
-                    try:
-                        results3 = google_news.get_news(query3)
-                        if results3 and len(results3) > len(region_results or []):
-                            region_results = results3
-                            final_query = query3
-                    except:
-                        pass
-                
-                # 收集此地區的結果
-                if region_results:
-                    for news in region_results:
-                        published_date = news.get('published date', '')
-                        if _is_date_in_year(published_date, target_year):
-                            all_news_articles.append({
-                                "news_id": news_id_counter,
-                                "stock_code": stock_code,
-                                "company_name": company_name,
-                                "sasb_topic": topic,
-                                "search_query": final_query,
-                                "title": news.get('title', ''),
-                                "url": news.get('url', ''),
-                                "published_date": published_date,
-                                "publisher": news.get('publisher', {}).get('title', '') if isinstance(news.get('publisher'), dict) else ''
-                            })
-                            news_id_counter += 1
-                            found_count += 1
-                
-                # 避免請求太快
-                time.sleep(SEARCH_DELAY)
-            
-            # 統一輸出結果
-            if found_count > 0:
-                print(f"  ✓ 找到 {found_count} 則 {target_year} 年相關新聞")
-            else:
-                print(f"  ⚠️ 無相關新聞")
-                
+            p1_data_list = load_artifact(p1_json_path)
         except Exception as e:
-            print(f"  ❌ 搜尋失敗: {str(e)}")
-            failed_items += 1
-            failure_details.append({'topic': topic, 'reason': str(e)})
+            return {
+                'success': False,
+                'error': f'讀取 P1 JSON 失敗: {str(e)}'
+            }
         
-        # 避免請求太快
-        time.sleep(SEARCH_DELAY)
-        print("-" * 60)
-    
-    # === 6. 儲存結果 ===
-    try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(all_news_articles, f, ensure_ascii=False, indent=2)
-        
-        elapsed_time = time.time() - start_time
-        
-        print("\n" + "=" * 60)
-        print(f"✅ 新聞搜尋完成！")
-        print(f"📁 結果已儲存至: {output_filename}")
-        print(f"📊 統計:")
-        print(f"   - 處理項目數: {processed_items}")
-        print(f"   - 成功項目數: {processed_items - failed_items}")
-        print(f"   - 失敗項目數: {failed_items}")
-        print(f"   - 新聞總數: {len(all_news_articles)}")
-        print(f"   - 執行時間: {elapsed_time:.1f} 秒")
-        print("=" * 60)
-        
-        return {
-            'success': True,
-            'output_file': output_filename,
-            'news_count': len(all_news_articles),
-            'processed_items': processed_items,
-            'failed_items': failed_items,
-            'skipped': False,
-            'failure_details': failure_details if failure_details else None
-        }
+        # 以最終 P1 JSON 為準：沿用已搜尋的結果，補搜串流中未出現的項目
+        item_results = []
+        pending = [item for item in p1_data_list if _item_key(item) not in self._results]
+        if pending:
+            logger.info(f"補搜 {len(pending)} 筆串流中未處理的 P1 項目...")
+        for idx, item in enumerate(p1_data_list, 1):
+            key = _item_key(item)
+            if key not in self._results:
+                self._results[key] = _search_news_for_item(
+                    item, self.year, self.company_code, self._sasb_keywords,
+                    label=f"[{idx}/{len(p1_data_list)}]"
+                )
+            item_results.append(self._results[key])
         
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'儲存檔案失敗: {str(e)}'
-        }
+        return _save_news_results(self.year, self.company_code, p1_json_path, item_results, self._start_time)
+
+
+def get_news_queue_depth() -> int:
+    """所有進行中管線的佇列長度合計（供 metrics 使用）"""
+    return sum(pipeline._queue.qsize() for pipeline in list(NewsSearchPipeline._active))
 
 
 # === 命令列執行 ===
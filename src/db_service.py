@@ -9,8 +9,15 @@ import os
 from dotenv import load_dotenv
 from contextlib import contextmanager
 
+from src.calculate_esg import calculate_esg_scores
+from src.log import get_logger
+from src.rankings import update_company_scores
+from src.tracing import set_attributes, traced
+
 load_dotenv()
 
+logger = get_logger(__name__)
+
 
 @contextmanager
 def get_db_connection():
@@ -37,6 +44,7 @@ def get_db_connection():
         conn.close()
 
 
+@traced('db.query_company_data')
 def query_company_data(year, company_code):
     """
     查詢公司 ESG 資料及分析狀態
@@ -93,6 +101,7 @@ def query_company_data(year, company_code):
                 """
                 cursor.execute(sql_details, (company_code, year))
                 details = cursor.fetchall()
+                set_attributes(rows=len(details))
             else:
                 details = None
             
@@ -104,6 +113,7 @@ def query_company_data(year, company_code):
             }
 
 
+@traced('db.insert_company_basic')
 def insert_company_basic(year, company_code, company_name='', industry='', url='', status='processing'):
     """
     插入公司基本資料並設定分析狀態
@@ -144,6 +154,7 @@ def insert_company_basic(year, company_code, company_name='', industry='', url='
         return (False, esg_id, f"插入失敗: {str(e)}")
 
 
+@traced('db.update_analysis_status')
 def update_analysis_status(esg_id, status, error_msg=None):
     """
     更新分析狀態 (仍支援使用 ESG_id 更新，因為流程中我們通常知道 ID)
@@ -167,10 +178,22 @@ def update_analysis_status(esg_id, status, error_msg=None):
         return (False, f"更新失敗: {str(e)}")
 
 
-def insert_analysis_results(esg_id, company_name, industry, url, analysis_items):
+@traced('db.insert_analysis_results')
+def insert_analysis_results(esg_id, company_name, industry, url, analysis_items, year, company_code):
     """
     插入完整的分析結果至 company_report 表，並更新 company 表的基本資料
+    寫入成功後同步更新排名彙總（src/rankings.py）中這家公司的分數
+    
+    Args:
+        esg_id: company 表的 ESG_id（舊資料可能為 C001 等非標準格式，不從中解析年度與代碼）
+        company_name: 公司名稱
+        industry: 產業別
+        url: 永續報告書連結
+        analysis_items: 分析結果項目
+        year: 報告年份（company_report.year）
+        company_code: 公司代碼（company_report.company_id）
     """
+    set_attributes(esg_id=esg_id, rows=len(analysis_items))
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
@@ -184,11 +207,6 @@ def insert_analysis_results(esg_id, company_name, industry, url, analysis_items)
                 
                 # 2. 插入分析結果至 company_report 表
                 if analysis_items:
-                    # 拆解 ESG_id 取得 company_code 和 year
-                    # 假設 ESG_id 是標準格式 20242330
-                    year = int(esg_id[:4])
-                    company_code = esg_id[4:]
-                    
                     # 先刪除舊資料（依據 company_id 和 year）
                     cursor.execute("DELETE FROM company_report WHERE company_id = %s AND year = %s", (company_code, year))
                     
@@ -228,11 +246,24 @@ def insert_analysis_results(esg_id, company_name, industry, url, analysis_items)
                             item.get('adjustment_score', 0.0),
                             is_verified
                         ))
-                
-                return (True, f"已插入 {len(analysis_items)} 筆分析資料")
     
     except Exception as e:
         return (False, f"插入分析結果失敗: {str(e)}")
+    
+    # 3. 交易提交後更新排名彙總（只重算這一家公司，失敗不影響寫入結果）
+    if analysis_items:
+        try:
+            records = [{
+                'ESG_category': item.get('esg_category', ''),
+                'SASB_topic': item.get('sasb_topic', ''),
+                'adjustment_score': item.get('adjustment_score', 0.0)
+            } for item in analysis_items]
+            update_company_scores(year, company_code, company_name, industry,
+                                  calculate_esg_scores(industry, records))
+        except Exception as e:
+            logger.warning(f"排名彙總更新失敗 ({type(e).__name__}): {e}")
+    
+    return (True, f"已插入 {len(analysis_items)} 筆分析資料")
 
 
 if __name__ == '__main__':
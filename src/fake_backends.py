@@ -0,0 +1,718 @@
+"""
+本機替身後端模組
+
+提供不需網路即可執行的外部服務替身，用於驗證快取等邏輯，以及離線量測
+完整分析流程（下載 → P1 → 新聞 → P2 → P3）的吞吐量與效能回歸。
+
+設定 USE_FAKE_BACKENDS=1 後（見 config.FAKE_BACKENDS），各模組自動改用替身：
+    genai_client.get_genai_client -> FakeGenaiClient
+    pplx_api.Perplexity           -> FakePerplexity
+    crawler_news.GNews            -> FakeGNews（查詢本機 RSS 服務）
+    crawler_esgReport             -> 本機 HTTP 服務（MopsSustainReport/data、FileStream、FileDownLoad）
+
+延遲、錯誤率與回應大小由 FAKE_LATENCY、FAKE_ERROR_RATE、FAKE_PAYLOAD_SCALE 控制。
+錯誤注入與延遲抖動以（種子, 請求內容, 第幾次請求）的雜湊決定，與執行緒排程無關，
+相同設定重跑會得到相同的結果。
+
+主要類別與函數：
+    FakeGenaiClient: 模擬 google.genai.Client 的 files / models / caches 介面，
+                     依 Prompt 產生 P1 / P2 格式的回應
+    FakePerplexity: 模擬 Perplexity 的 chat.completions 介面
+    FakeGNews: 以本機 RSS 服務取代 Google News 的 GNews 替身
+    start_fake_server: 啟動本機 HTTP 服務（TWSE、RSS、證據網頁）
+
+使用範例：
+    # 單獨啟動本機 HTTP 服務
+    python src/fake_backends.py
+
+    # Gemini 上傳檔案快取的檢查見 tests/test_gemini_file_cache.py
+
+    # 以替身後端執行分析流程
+    USE_FAKE_BACKENDS=1 FAKE_LATENCY=0.2 FAKE_ERROR_RATE=0.05 python app.py
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import DATA_FILES, FAKE_BACKENDS, SERVICE_URLS
+from src.log import get_logger
+
+logger = get_logger(__name__)
+
+# SASB 議題對應的 ESG 類別（未列出的議題視為 G）
+_TOPIC_CATEGORY = {
+    '溫室氣體排放': 'E', '空氣品質': 'E', '能源管理': 'E', '水資源與廢水處理管理': 'E',
+    '廢棄物與有害物質管理': 'E', '生態影響': 'E', '氣候變遷的實質影響': 'E', '材料採購與效率': 'E',
+    '人權與社區關係': 'S', '顧客隱私': 'S', '資訊安全': 'S', '通路與價格': 'S', '產品品質與安全': 'S',
+    '顧客權益': 'S', '行銷策略與產品標示': 'S', '勞工法規': 'S', '員工健康與安全': 'S',
+    '員工忠誠度、多元化和包容性': 'S',
+}
+_MSCI_DEDUCTION = {'Green': 0, 'Yellow': 1, 'Orange': 2, 'Red': 4}
+
+
+# =========================
+# 延遲與錯誤注入
+# =========================
+
+class FakeTransientError(Exception):
+    """模擬服務端的暫時性錯誤（429 / 503），可被 resilience 判斷為可重試"""
+
+    def __init__(self, status_code: int, message: str = '', retry_after: Optional[float] = None):
+        super().__init__(f"{status_code} {message or ('RESOURCE_EXHAUSTED' if status_code == 429 else 'UNAVAILABLE')}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class FakeBehavior:
+    """
+    可重現的延遲與錯誤注入
+
+    Args:
+        latency: 每次呼叫的基本延遲（秒，實際延遲為 0.8~1.2 倍）
+        error_rate: 暫時性錯誤的比例（0~1）
+        seed: 亂數種子
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.injected_errors = 0
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> 'FakeBehavior':
+        return cls(FAKE_BACKENDS['LATENCY'], FAKE_BACKENDS['ERROR_RATE'], FAKE_BACKENDS['SEED'])
+
+    def _fraction(self, *parts: Any) -> float:
+        digest = hashlib.sha256(':'.join(str(part) for part in (self.seed,) + parts).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def begin(self, key: str, scale: float = 1.0) -> Optional[int]:
+        """
+        開始一次請求：等待模擬延遲，並決定是否注入錯誤
+
+        Args:
+            key: 請求識別（相同請求第 n 次重送會得到相同結果）
+            scale: 延遲倍數（例如依檔案大小放大）
+
+        Returns:
+            int or None: 要注入的狀態碼（429 或 503），不注入時回傳 None
+        """
+        with self._lock:
+            self.requests += 1
+            attempt = self._seen.get(key, 0)
+            self._seen[key] = attempt + 1
+
+        if self.latency > 0:
+            time.sleep(self.latency * scale * (0.8 + 0.4 * self._fraction('latency', key, attempt)))
+
+        if self.error_rate > 0 and self._fraction('error', key, attempt) < self.error_rate:
+            with self._lock:
+                self.injected_errors += 1
+            return 429 if self._fraction('status', key, attempt) < 0.5 else 503
+        return None
+
+    def pick(self, *parts: Any) -> float:
+        """依內容決定的 0~1 值（用於產生可重現的假資料）"""
+        return self._fraction('pick', *parts)
+
+
+def _payload_scale() -> float:
+    return max(FAKE_BACKENDS['PAYLOAD_SCALE'], 0.1)
+
+
+# =========================
+# Gemini 替身
+# =========================
+
+class FakeNotFoundError(Exception):
+    """模擬 Gemini Files API 的 404（檔案不存在或已過期）"""
+
+
+class _FakeFiles:
+    """模擬 client.files"""
+
+    def __init__(self, processing_polls: int = 1, ttl_seconds: int = 48 * 60 * 60,
+                 behavior: Optional[FakeBehavior] = None):
+        self.processing_polls = processing_polls
+        self.ttl_seconds = ttl_seconds
+        self.behavior = behavior or FakeBehavior()
+        self.upload_count = 0
+        self.get_count = 0
+        self._files: Dict[str, SimpleNamespace] = {}
+        self._pending_polls: Dict[str, int] = {}
+
+    def upload(self, file, config=None):
+        data = file.read() if hasattr(file, 'read') else open(file, 'rb').read()
+        # 上傳延遲隨檔案大小增加（每 MB 加一倍基本延遲）
+        status = self.behavior.begin(f"upload:{hashlib.sha256(data).hexdigest()}", 1 + len(data) / (1024 * 1024))
+        if status:
+            raise FakeTransientError(status)
+        self.upload_count += 1
+        name = f"files/fake-{self.upload_count:04d}"
+        file_ref = SimpleNamespace(
+            name=name,
+            uri=f"https://fake.local/v1beta/{name}",
+            display_name=getattr(config, 'display_name', None),
+            mime_type=getattr(config, 'mime_type', None),
+            size_bytes=len(data),
+            state=SimpleNamespace(name="PROCESSING" if self.processing_polls > 0 else "ACTIVE"),
+            expiration_time=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        )
+        self._files[name] = file_ref
+        self._pending_polls[name] = self.processing_polls
+        return file_ref
+
+    def get(self, name):
+        self.get_count += 1
+        file_ref = self._files.get(name)
+        if file_ref is None or file_ref.expiration_time <= datetime.now(timezone.utc):
+            raise FakeNotFoundError(f"404 NOT_FOUND: {name}")
+        if self._pending_polls.get(name, 0) > 0:
+            self._pending_polls[name] -= 1
+        if self._pending_polls.get(name, 0) == 0:
+            file_ref.state = SimpleNamespace(name="ACTIVE")
+        return file_ref
+
+    def delete(self, name):
+        self._files.pop(name, None)
+
+    # --- 測試輔助 ---
+    def expire(self, name):
+        """讓伺服器端的檔案立即過期"""
+        if name in self._files:
+            self._files[name].expiration_time = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+
+def _text_parts(contents: Any) -> str:
+    """取出請求內容中的文字（略過檔案參考）"""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    return '\n'.join(part for part in parts if isinstance(part, str))
+
+
+def _decode_json_after(text: str, marker: str) -> Any:
+    """解析 marker 之後的第一個 JSON 值"""
+    start = text.find(marker)
+    if start < 0:
+        return None
+    match = re.search(r'[\[{]', text[start + len(marker):])
+    if match is None:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start + len(marker) + match.start())
+        return value
+    except json.JSONDecodeError:
+        return None
+
+
+def _fake_p1_items(prompt: str, behavior: FakeBehavior, items_per_topic: int) -> List[Dict[str, Any]]:
+    """依 P1 任務 Prompt（SASB 權重表與分析對象）產生分析項目"""
+    sasb_map = _decode_json_after(prompt, 'SASB 產業權重表') or {}
+    fields = {key: (re.search(rf'- {key}: "([^"]*)"', prompt) or [None, ''])[1]
+              for key in ('company', 'company_id', 'year')}
+    filler = '並持續揭露相關績效指標與管理方針，' * max(1, int(3 * _payload_scale()))
+
+    items = []
+    for topic in (key for key in sasb_map if key != '產業'):
+        for n in range(items_per_topic):
+            score = int(behavior.pick('risk', fields['company_id'], topic, n) * 5)
+            items.append({
+                'company': fields['company'],
+                'company_id': fields['company_id'],
+                'year': fields['year'],
+                'esg_category': _TOPIC_CATEGORY.get(topic, 'G'),
+                'sasb_topic': topic,
+                'page_number': str(5 + int(behavior.pick('page', topic, n) * 120)),
+                'report_claim': f"{fields['company']}於{fields['year']}年針對{topic}訂定具體目標，{filler}已達成年度目標。",
+                'greenwashing_factor': f"{topic}的揭露以定性描述為主，缺乏可驗證的量化基準。",
+                'risk_score': score,
+                'internal_consistency': score < 3,
+                'key_word': f"{fields['company']} {topic}"
+            })
+    return items
+
+
+def _fake_p2_items(user_input: str, behavior: FakeBehavior) -> List[Dict[str, Any]]:
+    """依 P2 請求（同一主題的聲明與新聞）產生驗證結果，筆數與聲明相同"""
+    claims = _decode_json_after(user_input, '【原檔數據】') or []
+    news = _decode_json_after(user_input, '【驗證資料】') or []
+
+    results = []
+    for idx, claim in enumerate(claims):
+        article = news[idx % len(news)] if news else None
+        roll = behavior.pick('msci', claim.get('company_id'), claim.get('sasb_topic'), idx)
+        flag = 'Red' if roll > 0.97 else 'Orange' if roll > 0.9 else 'Yellow' if roll > 0.75 else 'Green'
+        result = {key: claim.get(key) for key in (
+            'company', 'company_id', 'year', 'esg_category', 'sasb_topic',
+            'page_number', 'report_claim', 'greenwashing_factor', 'risk_score'
+        )}
+        result.update({
+            'external_evidence': article.get('title', '') if article else '無相關新聞證據',
+            'external_evidence_url': article.get('url', '') if article else '',
+            'consistency_status': '一致' if flag == 'Green' else '部分符合' if flag != 'Red' else '不一致',
+            'msci_flag': flag,
+            'adjustment_score': max(0, int(claim.get('risk_score') or 0) - _MSCI_DEDUCTION[flag])
+        })
+        results.append(result)
+    return results
+
+
+class _FakeModels:
+    """模擬 client.models"""
+
+    def __init__(self, response_text: Optional[str] = None, behavior: Optional[FakeBehavior] = None,
+                 items_per_topic: int = 1, chunk_size: int = 64):
+        self.response_text = response_text
+        self.behavior = behavior or FakeBehavior()
+        self.items_per_topic = items_per_topic
+        self.chunk_size = chunk_size
+        self.calls: List[Dict[str, Any]] = []
+        self._calls_lock = threading.Lock()
+
+    def _respond(self, contents, config) -> str:
+        """回傳固定回應，或依 Prompt 產生 P1 / P2 格式的回應"""
+        if self.response_text is not None:
+            return self.response_text
+        text = _text_parts(contents)
+        if '【原檔數據】' in text:
+            items = _fake_p2_items(text, self.behavior)
+        elif 'SASB 產業權重表' in text:
+            items = _fake_p1_items(text, self.behavior, self.items_per_topic)
+        else:
+            items = []
+        return json.dumps(items, ensure_ascii=False, indent=2)
+
+    def _usage(self, contents, config, output_text: str):
+        prompt_tokens = len(_text_parts(contents)) // 2
+        # 每個檔案參考以 1,000 tokens / 頁估算（頁數隨 PAYLOAD_SCALE 調整）
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        prompt_tokens += sum(int(20 * _payload_scale()) * 1000 for part in parts if not isinstance(part, str))
+        cached_tokens = 0
+        if getattr(config, 'cached_content', None):
+            cached_tokens = 4096
+            prompt_tokens += cached_tokens
+        output_tokens = len(output_text) // 2
+        return SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            cached_content_token_count=cached_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+    def _begin(self, model, contents, config, stream: bool) -> None:
+        with self._calls_lock:
+            self.calls.append({'model': model, 'contents': contents, 'config': config, 'stream': stream})
+        key = hashlib.sha256(f"{model}:{_text_parts(contents)}".encode('utf-8')).hexdigest()
+        status = self.behavior.begin(f"generate:{key}")
+        if status:
+            raise FakeTransientError(status, retry_after=0 if status == 429 else None)
+
+    def generate_content(self, model, contents, config=None):
+        self._begin(model, contents, config, stream=False)
+        text = self._respond(contents, config)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, config, text))
+
+    def generate_content_stream(self, model, contents, config=None, chunk_size: Optional[int] = None):
+        self._begin(model, contents, config, stream=True)
+        text = self._respond(contents, config)
+        chunk_size = chunk_size or self.chunk_size
+        starts = list(range(0, len(text), chunk_size)) or [0]
+        for start in starts:
+            is_last = start == starts[-1]
+            yield SimpleNamespace(
+                text=text[start:start + chunk_size],
+                usage_metadata=self._usage(contents, config, text) if is_last else None
+            )
+
+
+class _FakeCaches:
+    """模擬 client.caches（內容快取）"""
+
+    def __init__(self, fail_create: bool = False):
+        self.fail_create = fail_create
+        self.create_count = 0
+        self._caches: Dict[str, SimpleNamespace] = {}
+
+    def create(self, model, config=None):
+        if self.fail_create:
+            raise RuntimeError("400 INVALID_ARGUMENT: cached content is too small")
+        self.create_count += 1
+        name = f"cachedContents/fake-{self.create_count:04d}"
+        ttl = int(str(getattr(config, 'ttl', '3600s')).rstrip('s'))
+        cached = SimpleNamespace(
+            name=name,
+            model=model,
+            display_name=getattr(config, 'display_name', None),
+            expire_time=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            usage_metadata=SimpleNamespace(total_token_count=4096)
+        )
+        self._caches[name] = cached
+        return cached
+
+    def get(self, name):
+        if name not in self._caches:
+            raise FakeNotFoundError(f"404 NOT_FOUND: {name}")
+        return self._caches[name]
+
+    def update(self, name, config=None):
+        cached = self.get(name)
+        ttl = int(str(getattr(config, 'ttl', '3600s')).rstrip('s'))
+        cached.expire_time = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        return cached
+
+    def delete(self, name):
+        self._caches.pop(name, None)
+
+
+class FakeGenaiClient:
+    """
+    google.genai.Client 的本機替身
+
+    Args:
+        processing_polls: 上傳後需要幾次 files.get 才會變成 ACTIVE
+        ttl_seconds: 上傳檔案的有效期限（秒）
+        response_text: models.generate_content 回傳的固定文字（None 表示依 Prompt 產生 P1 / P2 回應）
+        behavior: 延遲與錯誤注入設定（預設不延遲、不注入錯誤）
+        items_per_topic: 產生 P1 回應時每個 SASB 議題的項目數
+    """
+
+    def __init__(self, processing_polls: int = 1, ttl_seconds: int = 48 * 60 * 60,
+                 response_text: Optional[str] = None, behavior: Optional[FakeBehavior] = None,
+                 items_per_topic: int = 1):
+        self.behavior = behavior or FakeBehavior()
+        self.files = _FakeFiles(processing_polls, ttl_seconds, self.behavior)
+        self.models = _FakeModels(response_text, self.behavior, items_per_topic)
+        self.caches = _FakeCaches()
+
+    @classmethod
+    def from_config(cls) -> 'FakeGenaiClient':
+        """依 config.FAKE_BACKENDS 建立（供 get_genai_client 使用）"""
+        return cls(processing_polls=0, behavior=_shared_behavior('gemini'),
+                   items_per_topic=max(1, round(_payload_scale())))
+
+
+# =========================
+# Perplexity 替身
+# =========================
+
+class _FakeCompletions:
+    """模擬 client.chat.completions"""
+
+    def __init__(self, behavior: FakeBehavior):
+        self.behavior = behavior
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        status = self.behavior.begin(f"perplexity:{key}")
+        if status:
+            raise FakeTransientError(status)
+        self.calls += 1
+        content = json.dumps({'urls': [f"{SERVICE_URLS['FAKE_BACKEND']}/evidence/{key}"]})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 2, completion_tokens=len(content) // 2,
+                                  total_tokens=len(prompt) // 2 + len(content) // 2)
+        )
+
+
+class FakePerplexity:
+    """
+    perplexity.Perplexity 的本機替身
+
+    回傳的網址指向本機 HTTP 服務的 /evidence/ 頁面，後續的 URL 驗證也能離線完成。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, behavior: Optional[FakeBehavior] = None):
+        start_fake_server()
+        self.chat = SimpleNamespace(completions=_FakeCompletions(behavior or _shared_behavior('perplexity')))
+
+
+# =========================
+# GNews 替身
+# =========================
+
+class FakeGNews:
+    """
+    gnews.GNews 的本機替身
+
+    與 GNews 相同，以 HTTP 取得 RSS 後解析；RSS 由本機服務依查詢內容產生。
+    """
+
+    def __init__(self, language: str = 'en', country: str = 'US', max_results: int = 100,
+                 start_date=None, end_date=None):
+        start_fake_server()
+        self.language = language
+        self.country = country
+        self.max_results = max_results
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def get_news(self, key: str) -> List[Dict[str, Any]]:
+        year = (self.start_date or self.end_date or (datetime.now().year,))[0]
+        query = urllib.parse.urlencode({
+            'q': key, 'hl': self.language, 'gl': self.country, 'year': year, 'max': self.max_results
+        })
+        url = f"{SERVICE_URLS['FAKE_BACKEND']}/rss/search?{query}"
+        try:
+            with urllib.request.urlopen(url, timeout=30) as res:
+                body = res.read()
+        except urllib.error.HTTPError as e:
+            raise FakeTransientError(e.code, retry_after=float(e.headers.get('Retry-After') or 0))
+
+        results = []
+        for node in ET.fromstring(body).iter('item'):
+            source = node.find('source')
+            results.append({
+                'title': node.findtext('title', ''),
+                'description': node.findtext('description', ''),
+                'published date': node.findtext('pubDate', ''),
+                'url': node.findtext('link', ''),
+                'publisher': {
+                    'href': source.get('url', '') if source is not None else '',
+                    'title': source.text if source is not None else ''
+                }
+            })
+        return results
+
+
+# =========================
+# 本機 HTTP 服務（TWSE、RSS、證據網頁）
+# =========================
+
+def make_fake_pdf(title: str, pages: int) -> bytes:
+    """
+    產生可由 pdfplumber 解析文字的簡單 PDF
+
+    Args:
+        title: 每頁開頭的標題文字（ASCII）
+        pages: 頁數
+    """
+    def escape(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages（待頁面物件編號確定後填入）
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(1, pages + 1):
+        lines = [f"{title} - page {page}"] + [
+            f"Greenhouse gas emissions, energy management and water stewardship disclosure line {n}."
+            for n in range(30)
+        ]
+        stream = "BT /F1 10 Tf 50 800 Td 12 TL " + ' '.join(f"({escape(line)}) '" for line in lines) + " ET"
+        stream_bytes = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream")
+        content_id = len(objects)
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode('latin-1'))
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('latin-1')
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+
+def _load_fake_companies() -> List[Dict[str, str]]:
+    try:
+        with open(DATA_FILES['TW_LISTED_COMPANIES'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return [{'公司代號': '1102', '公司簡稱': '亞泥', '產業別': '01'}]
+
+
+class _FakeServiceHandler(BaseHTTPRequestHandler):
+    """本機 HTTP 服務的路由"""
+
+    server_version = 'FakeBackend/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject(self, key: str, scale: float = 1.0) -> bool:
+        """套用延遲與錯誤注入；注入錯誤時已送出回應並回傳 True"""
+        status = self.server.behavior.begin(key, scale)
+        if status is None:
+            return False
+        self._send(status, b'{"error": "injected"}', 'application/json', {'Retry-After': '0'})
+        return True
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b'{}'
+        if not path.startswith('/api/api/MopsSustainReport/data'):
+            return self._send(404, b'{}', 'application/json')
+        if self._inject(f"twse:{path}:{raw.decode('utf-8', 'ignore')}"):
+            return
+
+        payload = json.loads(raw or b'{}')
+        year = int(payload.get('year') or datetime.now().year)
+        code = str(payload.get('companyCode') or '')
+        old_version = path.endswith('/old')
+        data = []
+        for company in _load_fake_companies():
+            company_code = company.get('公司代號')
+            if code and company_code != code:
+                continue
+            if old_version:
+                data.append({'companY_ID': company_code, 'companY_ABBR_NAME': company.get('公司簡稱'),
+                             'name': company.get('產業別'), 'filE_NAME': f"{year}_{company_code}.pdf"})
+            else:
+                data.append({'code': company_code, 'shortName': company.get('公司簡稱'),
+                             'sector': company.get('產業別'), 'twFirstReportDownloadId': f"{year}-{company_code}"})
+        self._send(200, json.dumps({'data': data}, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        scale = _payload_scale()
+
+        if parsed.path in ('/api/api/MopsSustainReport/data/FileStream', '/server-java/FileDownLoad'):
+            report_id = params.get('id') or params.get('fileName', '')
+            pages = max(1, int(20 * scale))
+            if self._inject(f"pdf:{report_id}", 1 + pages / 20):
+                return
+            return self._send(200, make_fake_pdf(f"Sustainability Report {report_id}", pages), 'application/pdf')
+
+        if parsed.path == '/rss/search':
+            if self._inject(f"rss:{parsed.query}"):
+                return
+            return self._send(200, self._rss(params, scale), 'application/rss+xml; charset=utf-8')
+
+        if parsed.path.startswith('/evidence/'):
+            if self._inject(f"evidence:{parsed.path}"):
+                return
+            body = f"<html><head><title>ESG Evidence {parsed.path.rsplit('/', 1)[-1]}</title></head><body></body></html>"
+            return self._send(200, body.encode('utf-8'), 'text/html; charset=utf-8')
+
+        self._send(404, b'not found', 'text/plain')
+
+    def _rss(self, params: Dict[str, str], scale: float) -> bytes:
+        query = params.get('q', '')
+        year = int(params.get('year') or datetime.now().year)
+        behavior = self.server.behavior
+        count = min(int(params.get('max') or 10), max(0, int(behavior.pick('rss', query) * 6 * scale)))
+
+        channel = ET.Element('channel')
+        ET.SubElement(channel, 'title').text = f'"{query}" - Google News'
+        for n in range(count):
+            published = datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(
+                days=int(behavior.pick('date', query, n) * 364))
+            item = ET.SubElement(channel, 'item')
+            ET.SubElement(item, 'title').text = f"{query} 相關報導 {n + 1}"
+            ET.SubElement(item, 'link').text = f"{SERVICE_URLS['FAKE_BACKEND']}/evidence/{hashlib.md5(f'{query}{n}'.encode()).hexdigest()[:12]}"
+            ET.SubElement(item, 'pubDate').text = format_datetime(published)
+            ET.SubElement(item, 'description').text = f"{query} 新聞摘要"
+            source = ET.SubElement(item, 'source', url='https://news.fake.local')
+            source.text = f"假新聞社 {n % 3 + 1}"
+        rss = ET.Element('rss', version='2.0')
+        rss.append(channel)
+        return ET.tostring(rss, encoding='utf-8', xml_declaration=True)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+_behaviors: Dict[str, FakeBehavior] = {}
+
+
+def _shared_behavior(name: str) -> FakeBehavior:
+    """各替身服務共用的 FakeBehavior（依 config 建立）"""
+    with _server_lock:
+        if name not in _behaviors:
+            _behaviors[name] = FakeBehavior.from_config()
+        return _behaviors[name]
+
+
+def start_fake_server(host: Optional[str] = None, port: Optional[int] = None) -> str:
+    """
+    在背景執行緒啟動本機 HTTP 服務（重複呼叫不會重複啟動）
+
+    Args:
+        host: 綁定位址（預設 FAKE_BACKENDS['HOST']）
+        port: 連接埠（預設 FAKE_BACKENDS['PORT']）
+
+    Returns:
+        str: 服務網址
+    """
+    global _server
+    host = host or FAKE_BACKENDS['HOST']
+    port = port or FAKE_BACKENDS['PORT']
+    behavior = _shared_behavior('http')
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _FakeServiceHandler)
+            _server.daemon_threads = True
+            _server.behavior = behavior
+            threading.Thread(target=_server.serve_forever, name='fake-backend', daemon=True).start()
+            logger.info(f"[FAKE] 本機替身服務已啟動: http://{host}:{port}")
+    return f"http://{host}:{port}"
+
+
+def stop_fake_server() -> None:
+    """停止本機 HTTP 服務"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def get_fake_stats() -> Dict[str, Dict[str, int]]:
+    """各替身服務的請求數與注入錯誤數"""
+    with _server_lock:
+        behaviors = dict(_behaviors)
+    return {name: {'requests': behavior.requests, 'injected_errors': behavior.injected_errors}
+            for name, behavior in behaviors.items()}
+
+
+if __name__ == "__main__":
+    url = start_fake_server()
+    print(f"以 USE_FAKE_BACKENDS=1 FAKE_BACKEND_PORT={FAKE_BACKENDS['PORT']} 執行分析流程即可連線至 {url}")
+    print("按 Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_fake_server()
@@ -12,18 +12,19 @@ ESG 報告書自動分析模組
     
     analyzer = ESGReportAnalyzer(target_year=2024, target_company_id="2330")
     analyzer.run()  # 產生分析結果 JSON
+    
+    # 超長報告書：依 SASB 議題分段並行分析
+    analyzer.run(chunked=True, max_workers=4)
 """
 
 import os
 import json
 import time
-import re
 import sys
-from typing import Dict, List, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple
 
-# ✅ 使用 Google 官方 GenAI SDK
-from google import genai
-from google.genai import types
+# Google GenAI SDK 於第一次呼叫時才載入（見 genai_client、gemini_context_cache、gemini_file_cache）
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -32,6 +33,22 @@ load_dotenv()
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import PATHS, DATA_FILES
+from src.artifact_store import write_artifact, is_artifact_fresh, hash_file
+from src.artifact_format import load_artifact, resolve_artifact_path
+from src.gemini_file_cache import get_or_upload_file
+from src.genai_client import get_genai_client
+from src.sasb_weights import get_sasb_weights
+from src.llm_telemetry import llm_call
+from src.gemini_context_cache import (
+    get_cached_context, build_generate_config, invalidate_cached_context, should_retry_without_cache
+)
+from src.json_stream import stream_json_array
+from src.llm_response_cache import make_response_key
+from src.log import get_logger
+from src.resilience import get_policy
+from src.tracing import bind_context, traced
+
+logger = get_logger(__name__)
 
 
 # =========================
@@ -63,6 +80,50 @@ class ESGReportAnalyzer:
     
     # ✅ 使用 Gemini 2.5 Flash Lite
     MODEL_NAME = "models/gemini-2.5-flash-lite" 
+    
+    # SASB 權重表中找不到對應產業時使用的預設產業
+    FALLBACK_INDUSTRY = "其他"
+
+    # ====== 分段分析設定 ======
+    CHUNK_TOPICS = 7                        # 每段分析的 SASB 議題數
+    CHUNK_MAX_WORKERS = 4                   # 同時進行的分段請求上限
+    CHUNK_AUTO_BYTES = 20 * 1024 * 1024     # PDF 超過此大小時自動採用分段分析
+
+    # ====== P1 系統指令（各公司共用，可建立內容快取） ======
+    SYSTEM_PROMPT = """
+你是一個專業的 ESG 稽核員。請分析使用者提供的 PDF 檔案 (ESG 報告書)。
+
+**分析核心任務：**
+1. **目標**：請依據使用者提供的 SASB 產業權重表，識別分析對象產業的SASB議題，從報告中找出每一項議題對應的宣稱report_claim，並依以下評分邏輯進行評分。
+2. **評分邏輯 (基於 Clarkson et al. 2008)**：
+   - 0分：未揭露。
+   - 1分 (軟性)：僅有願景、口號或模糊承諾。
+   - 2分 (定性)：有具體管理措施，但缺乏數據。
+   - 3分 (硬性/定量)：具體量化數據、歷史趨勢。
+   - 4分 (確信/查驗)：數據經過 ISAE 3000 或 AA1000 第三方查驗/確信 (須嚴格檢查附錄查證聲明)。
+3. **重大議題檢核**：若該議題的數值為 2 (高重大性)，但報告書完全未提及，屬於重大資訊缺失。請務必填寫 "report_claim": "N/A", "risk_score": 1。
+4. **邏輯一致性檢查**：請檢查報告前後文。若同一議題的數據或宣稱出現矛盾 (例如不同章節數字不符)，請將 "Internal_consistency": false，並在 "greenwashing_factor" 具體指出矛盾點，同時將最終 risk_score 扣減 1 分 (最低為 0)；若一致則 "Internal_consistency": true。
+5. **漂綠因子分析(greenwashing_factor)**：(必須使用中文輸出) 格式為：[疑慮類型] 具體分析說明。
+    - 若 internal_consistency 為 false，此處必須包含矛盾點對比。
+    - 若 risk_score 低於 3 分，必須點出該議題在「透明度」或「量化程度」上的具體缺失。
+6. **分析範圍**：若使用者指定了本次分析範圍，僅輸出範圍內的議題。
+
+**輸出欄位要求 (嚴格執行)：**
+- **company**: 分析對象的 company（原樣填入）
+- **company_id**: 分析對象的 company_id（原樣填入）
+- **year**: 分析對象的 year（原樣填入）
+- **esg_category**: 必須且僅能從 ["E", "S", "G"] 中選擇一個代碼。E 代表環境、S 代表社會、G 代表治理。
+- **sasb_topic**: 議題名稱（必須與 SASB 權重表中的議題名稱完全一致）
+- **page_number**: 證據來源頁碼
+- **report_claim**: 針對該議題，僅選取「最具數據代表性」的一段話。必須完整摘錄報告書原文，不得改寫。
+- **greenwashing_factor**: 根據漂綠因子分析，填寫具體分析說明。
+- **risk_score**: 0~4 分
+- **internal_consistency**: (Boolean)
+- **key_word**: 根據 report_claim 內容，產生 3-5 個適合 Google News 搜尋的繁體中文關鍵字，以空格分隔。格式為：「公司名稱 + 核心指標/事件 + ESG相關詞」，例如「2024 台積電 淨零排放 RE100」或「 鴻海 碳排放強度 永續」。避免過長或抽象的詞彙。
+
+**輸出格式**：
+請直接輸出 JSON Array，不要包含 Markdown 標記。
+"""
 
     def __init__(self, target_year: int, target_company_id: str, company_name: str = '', industry: str = ''):
         """
@@ -78,16 +139,14 @@ class ESGReportAnalyzer:
             RuntimeError: 若找不到 GEMINI_API_KEY 環境變數
             FileNotFoundError: 若找不到符合條件的 PDF 檔案或 SASB 權重表
         """
-        # 取得 API Key
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise RuntimeError("❌ 找不到 GEMINI_API_KEY，請檢查 .env 檔案。")
-
-        self.client = genai.Client(api_key=api_key)
+        # 取得共用的 Gemini Client（第一次使用時才建立）
+        self.client = get_genai_client()
         self.target_year = target_year
         self.target_company_id = str(target_company_id).strip()
         self.company_name = company_name or f'公司{target_company_id}'
         self.industry = industry or '其他'
+        self.use_response_cache = True
+        self._pdf_hash: Optional[str] = None
 
         # 準備輸出目錄
         os.makedirs(self.OUTPUT_DIR, exist_ok=True)
@@ -99,88 +158,28 @@ class ESGReportAnalyzer:
         # 設定輸出檔名：格式為 "{年份}_{公司代碼}_p1.json"
         self.output_json_name = f"{self.target_year}_{self.target_company_id}_p1.json"
         
-        print(f"[CONFIG] 輸出檔名已設定為: {self.output_json_name}")
-        print(f"[CONFIG] 產業類別: {self.industry}")
+        logger.debug(f"[CONFIG] 輸出檔名已設定為: {self.output_json_name}")
+        logger.info(f"[CONFIG] 產業類別: {self.industry}")
 
-    def _parse_json_with_recovery(self, raw_json: str) -> List[Dict[str, Any]]:
-        """
-        嘗試解析 JSON，並在失敗時使用多重修復策略
-        
-        修復策略順序：
-            1. 直接解析
-            2. 清除 Markdown 標記後解析
-            3. 修復被截斷的 JSON Array
-        
-        Args:
-            raw_json: Gemini API 回傳的原始 JSON 字串
-        
-        Returns:
-            List[Dict]: 解析後的 JSON 陣列
-        
-        Raises:
-            RuntimeError: 若所有修復策略都失敗
+    def _artifact_inputs(self) -> Tuple[List[str], Dict[str, Any]]:
         """
-        # 策略 1: 直接解析
-        try:
-            return json.loads(raw_json)
-        except json.JSONDecodeError as e:
-            print(f"[WARN] 直接解析失敗: {e}")
-        
-        # 策略 2: 清除 Markdown 標記後解析
-        clean_text = re.sub(r"^```json|```$", "", raw_json.strip(), flags=re.MULTILINE).strip()
-        try:
-            return json.loads(clean_text)
-        except json.JSONDecodeError as e:
-            print(f"[WARN] 清除 Markdown 後解析失敗: {e}")
-        
-        # 策略 3: 修復被截斷的 JSON Array
-        print("[INFO] 嘗試修復被截斷的 JSON...")
-        repaired_json = self._repair_truncated_json(clean_text)
-        
-        if repaired_json:
-            try:
-                parsed = json.loads(repaired_json)
-                print(f"[SUCCESS] JSON 修復成功！保留 {len(parsed)} 筆完整資料")
-                return parsed
-            except json.JSONDecodeError as e:
-                print(f"[ERROR] 修復後仍無法解析: {e}")
-        
-        # 所有策略都失敗
-        raise RuntimeError(f"無法解析 Gemini 回應的 JSON (原始長度: {len(raw_json)} 字元)")
+        P1 產物的輸入檔與參數（用於判斷是否可跳過重算）
 
-    def _repair_truncated_json(self, text: str) -> str:
-        """
-        修復被截斷的 JSON Array
-        
-        尋找最後一個完整的 JSON 物件，並重新封閉陣列。
-        
-        Args:
-            text: 可能被截斷的 JSON 字串
-        
         Returns:
-            str: 修復後的 JSON 字串，若無法修復則回傳空字串
+            Tuple[List[str], Dict]: (輸入檔路徑清單, 參數)
         """
-        if not text.strip().startswith('['):
-            return ""
-        
-        # 找到所有 "}," 的位置，這些是完整物件的結尾
-        last_complete_obj = text.rfind('},')
-        
-        if last_complete_obj == -1:
-            # 嘗試找單一物件結尾 "}"
-            last_complete_obj = text.rfind('}')
-            if last_complete_obj == -1:
-                return ""
-            # 檢查這個 } 後面是否是 ]
-            remaining = text[last_complete_obj + 1:].strip()
-            if remaining == ']':
-                return text  # 原本就是完整的
-            # 否則嘗試直接封閉
-            return text[:last_complete_obj + 1] + ']'
-        
-        # 截取到最後一個完整物件
-        repaired = text[:last_complete_obj + 1] + ']'
-        return repaired
+        inputs = [self.pdf_path, self.SASB_MAP_FILE]
+        params = {
+            'model': self.MODEL_NAME,
+            'company_name': self.company_name,
+            'industry': self.industry
+        }
+        return inputs, params
+
+    def is_output_fresh(self) -> bool:
+        """判斷既有 P1 JSON 是否仍對應目前的 PDF、權重表與參數"""
+        inputs, params = self._artifact_inputs()
+        return is_artifact_fresh('P1_JSON', self.target_year, self.target_company_id, inputs, params)
 
     def _find_target_pdf(self) -> Tuple[str, str]:
         """
@@ -196,80 +195,305 @@ class ESGReportAnalyzer:
             raise FileNotFoundError(f"資料夾不存在: {self.INPUT_DIR}")
         
         prefix = f"{self.target_year}_{self.target_company_id}"
-        print(f"[SEARCH] 正在搜尋包含 '{prefix}' 的 PDF 檔案...")
+        logger.debug(f"[SEARCH] 正在搜尋包含 '{prefix}' 的 PDF 檔案...")
         
         for f in os.listdir(self.INPUT_DIR):
             if prefix in f and f.lower().endswith(".pdf"):
-                print(f"[FOUND] 找到檔案: {f}")
+                logger.info(f"[FOUND] 找到檔案: {f}")
                 return os.path.join(self.INPUT_DIR, f), f
                 
         raise FileNotFoundError(f"❌ 找不到符合 {prefix} 的 PDF 檔。")
 
     def _load_sasb_map(self) -> str:
         """
-        讀取 SASB 產業權重對照表
+        讀取 SASB 產業權重對照表，僅保留目標產業的議題與權重
+        
+        完整權重表包含所有產業（約 30 KB），但每次分析只需要 self.industry 這一列。
+        權重表與評分共用同一份編譯後的矩陣（src/sasb_weights.py），檔案更新時自動重新載入。
+        產業名稱比對順序：完全相符 -> 包含關係（例如「半導體」對應「半導體業」）
+        -> FALLBACK_INDUSTRY。
         
         Returns:
-            str: SASB 權重表的 JSON 字串內容
+            str: 目標產業權重的 JSON 字串
         
         Raises:
             FileNotFoundError: 若找不到 SASB 權重表檔案
         """
-        if not os.path.exists(self.SASB_MAP_FILE):
-             raise FileNotFoundError(f"❌ 找不到 SASB 權重表檔案: {self.SASB_MAP_FILE}")
-        with open(self.SASB_MAP_FILE, 'r', encoding='utf-8') as f:
-            return f.read()
+        sasb_weights = get_sasb_weights(self.SASB_MAP_FILE)
+        
+        industry_name = sasb_weights.match_industry(self.industry)
+        if industry_name is None:
+            logger.warning(f"SASB 權重表中找不到產業「{self.industry}」，改用「{self.FALLBACK_INDUSTRY}」")
+            industry_name = self.FALLBACK_INDUSTRY
+        matched = sasb_weights.industry_map(industry_name)
+        
+        self.sasb_industry = matched.get('產業', self.FALLBACK_INDUSTRY)
+        self.sasb_weights = {k: v for k, v in matched.items() if k != '產業'}
+        industry_map_text = json.dumps(matched, ensure_ascii=False, indent=2)
+        
+        # 只比較字元數，不在每次初始化時對完整權重表做 tokenize
+        full_chars = len(sasb_weights.source_text)
+        if full_chars:
+            logger.debug(f"[CONFIG] SASB 權重表: {self.sasb_industry}，{len(industry_map_text):,} 字元"
+                         f"（完整表 {full_chars:,} 字元，節省 {1 - len(industry_map_text) / full_chars:.0%}）")
+        return industry_map_text
 
     def upload_file_to_gemini(self):
         """
         將 PDF 檔案上傳至 Gemini 伺服器
         
+        同一份 PDF（依內容雜湊）若先前已上傳且尚未過期，會直接沿用該檔案參考，
+        詳見 gemini_file_cache。
+        
         Returns:
             Gemini 檔案參考物件
         
         Raises:
             RuntimeError: 若上傳失敗或檔案處理失敗
         """
-        print(f"[UPLOAD] 準備上傳: {self.pdf_filename} ...")
         safe_display_name = f"Report_{self.target_year}_{self.target_company_id}"
+        return get_or_upload_file(self.client, self.pdf_path, display_name=safe_display_name)
+
+    def _build_prompt(self, sasb_map_content: str, topic_scope: str = "") -> str:
+        """
+        建構 P1 任務 Prompt（僅包含本次分析的資料，評分規則在 SYSTEM_PROMPT）
+
+        Args:
+            sasb_map_content: 放入 Prompt 的 SASB 權重表 JSON 字串
+            topic_scope: 分段分析時限定的議題說明（空字串表示分析全部議題）
+
+        Returns:
+            str: Prompt 內容
+        """
+        return f"""
+**任務輸入資料：**
+1. **SASB 產業權重表 (JSON，{self.sasb_industry})**: 
+{sasb_map_content}
+{topic_scope}
+**分析對象：**
+- 產業：{self.industry}
+- company: "{self.company_name}"
+- company_id: "{self.target_company_id}"
+- year: "{self.target_year}"
+"""
+
+    def _get_context_cache(self, uploaded_pdf, include_pdf: bool) -> Optional[Dict[str, Any]]:
+        """
+        取得 P1 的內容快取
+
+        Args:
+            uploaded_pdf: Gemini 檔案參考物件
+            include_pdf: 是否連同 PDF 一併快取（同一份 PDF 會被多次請求引用時）
+
+        Returns:
+            dict or None: {'name': 快取名稱, 'includes_pdf': bool}；無法使用快取時回傳 None
+        """
+        contents = [uploaded_pdf] if include_pdf else None
+        display_name = f"P1_{self.target_year}_{self.target_company_id}" if include_pdf else "P1_rubric"
+        cache_name = get_cached_context(
+            self.client, self.MODEL_NAME, self.SYSTEM_PROMPT,
+            contents=contents, display_name=display_name
+        )
+        if cache_name is None:
+            return None
+        return {'name': cache_name, 'includes_pdf': include_pdf}
+
+    def _generate_items(self, uploaded_pdf, prompt_text: str,
+                        on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        以串流方式呼叫 Gemini 模型，逐筆解析回傳的 JSON Array
 
+        每個項目的結尾括號一到就解析並交給 on_item；回應被截斷時保留所有已完整的項目。
+        暫時性錯誤（429、5xx、逾時）依 resilience 的 gemini 策略限流並退避重試；
+        使用內容快取的請求失敗時，會改以完整內容重試一次。
+        PDF 內容與 Prompt 皆未變更時，直接沿用本機回應快取，不重新呼叫模型。
+
+        Args:
+            uploaded_pdf: Gemini 檔案參考物件
+            prompt_text: 任務 Prompt 內容
+            on_item: 每完成一筆分析項目時呼叫的回呼函數
+            context: _get_context_cache() 的結果（None 表示不使用快取）
+
+        Returns:
+            List[Dict]: 分析項目
+
+        Raises:
+            RuntimeError: 若回應中沒有任何可解析的項目
+        """
+        cache_name = context['name'] if context else None
+        contents = [prompt_text] if context and context['includes_pdf'] else [uploaded_pdf, prompt_text]
+        generate_params = {
+            'response_mime_type': "application/json",
+            'temperature': 0  # 設定為 0 以確保分析結果的嚴謹與穩定
+        }
+        config = build_generate_config(cache_name, self.SYSTEM_PROMPT, **generate_params)
+
+        response_key = None
+        if self.use_response_cache:
+            if self._pdf_hash is None:
+                self._pdf_hash = hash_file(self.pdf_path)
+            response_key = make_response_key(
+                self.MODEL_NAME, self.SYSTEM_PROMPT, [self._pdf_hash, prompt_text], generate_params
+            )
+
+        company_key = f"{self.target_year}_{self.target_company_id}"
         try:
-            with open(self.pdf_path, "rb") as f:
-                file_ref = self.client.files.upload(
-                    file=f,
-                    config=types.UploadFileConfig(
-                        display_name=safe_display_name,
-                        mime_type="application/pdf"
-                    )
+            with llm_call('gemini', self.MODEL_NAME, stage='p1', company=company_key) as call:
+                result = get_policy('gemini').call(
+                    stream_json_array,
+                    self.client,
+                    model=self.MODEL_NAME,
+                    contents=contents,
+                    config=config,
+                    on_item=on_item,
+                    cache_key=response_key,
+                    stage='p1',
+                    on_retry=call.add_retry
                 )
+                call.record_gemini_usage(result['usage_metadata'])
+                call.response_cached = result['cached']
         except Exception as e:
-            raise RuntimeError(f"上傳失敗: {e}")
-        
-        print(f"[UPLOAD] 上傳成功，URI: {file_ref.uri}")
-        print(f"[WAIT] 等待 Google 處理檔案中...", end="")
+            if cache_name is None or not should_retry_without_cache(e):
+                raise
+            logger.warning(f"[CACHE] 使用內容快取的請求失敗 ({e})，改以完整內容重試")
+            invalidate_cached_context(cache_name)
+            return self._generate_items(uploaded_pdf, prompt_text, on_item=on_item)
+
+        # 記錄原始回應長度，用於偵錯
+        logger.debug(f"原始回應長度: {len(result['text'])} 字元")
+        if result['cached']:
+            logger.info(f"[CACHE] 輸入未變更，沿用快取的模型回應")
+        if call.cached_tokens:
+            logger.info(f"[CACHE] 快取命中 {call.cached_tokens:,} / {call.prompt_tokens:,} 輸入 tokens")
+
+        items = result['items']
+        if result['skipped']:
+            logger.warning(f"略過 {result['skipped']} 筆無法解析的項目")
+        if not result['complete']:
+            if not items:
+                raise RuntimeError(f"無法解析 Gemini 回應的 JSON (原始長度: {len(result['text'])} 字元)")
+            logger.warning(f"回應被截斷，保留 {len(items)} 筆完整資料")
+        return items
+
+    def _topic_chunks(self, topics_per_chunk: int) -> List[List[str]]:
+        """
+        依權重表順序將目標產業的 SASB 議題分組
 
-        while file_ref.state.name == "PROCESSING":
-            time.sleep(2)
-            file_ref = self.client.files.get(name=file_ref.name)
-            print(".", end="", flush=True)
-        
-        print()
-        if file_ref.state.name != "ACTIVE":
-            raise RuntimeError(f"❌ 檔案處理失敗，狀態: {file_ref.state.name}")
-            
-        print(f"[READY] 檔案準備就緒。")
-        return file_ref
+        Args:
+            topics_per_chunk: 每組議題數
+
+        Returns:
+            List[List[str]]: 議題分組
+        """
+        topics = list(self.sasb_weights)
+        size = max(1, topics_per_chunk)
+        return [topics[i:i + size] for i in range(0, len(topics), size)]
+
+    def _merge_chunk_results(self, chunks: List[List[str]], chunk_results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        合併各段分析結果
 
-    def run(self):
+        結果依權重表的議題順序排列，與各段完成的先後無關。
+        模型回傳了不屬於該段的議題時，若該議題由其他段負責則捨棄，避免重複；
+        權重表以外的議題則依分段順序附加在最後。
+
+        Args:
+            chunks: 議題分組
+            chunk_results: 各段的分析項目（與 chunks 順序對應）
+
+        Returns:
+            List[Dict]: 合併後的分析項目
+        """
+        topic_order = {topic: index for index, topic in enumerate(self.sasb_weights)}
+        ranked = []
+        for chunk_index, (topics, items) in enumerate(zip(chunks, chunk_results)):
+            assigned = set(topics)
+            for position, item in enumerate(items):
+                topic = item.get('sasb_topic') if isinstance(item, dict) else None
+                if topic in topic_order and topic not in assigned:
+                    continue
+                rank = topic_order.get(topic, len(topic_order))
+                ranked.append(((rank, chunk_index, position), item))
+        ranked.sort(key=lambda pair: pair[0])
+        return [item for _, item in ranked]
+
+    def _run_chunked(self, uploaded_pdf, topics_per_chunk: int, max_workers: int,
+                     on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        分段分析：每段只負責一組 SASB 議題，並行呼叫模型後再合併
+
+        各段共用同一份已上傳的 PDF，每段的輸出只有數筆項目，不會因回應過長而被截斷。
+        系統指令與 PDF 會建立為內容快取，各段只需送出各自的議題範圍。
+
+        Args:
+            topics_per_chunk: 每段議題數
+            max_workers: 同時進行的請求上限
+            on_item: 每完成一筆分析項目時呼叫的回呼函數（會由多個執行緒呼叫）
+
+        Returns:
+            List[Dict]: 合併後的分析項目
+
+        Raises:
+            RuntimeError: 若任一段分析失敗
+        """
+        chunks = self._topic_chunks(topics_per_chunk)
+        logger.info(f">>> 分段分析：{len(self.sasb_weights)} 項議題分為 {len(chunks)} 段，並行上限 {max_workers}")
+        context = self._get_context_cache(uploaded_pdf, include_pdf=True)
+
+        def analyze_chunk(topics: List[str]) -> List[Dict[str, Any]]:
+            chunk_map = {'產業': self.sasb_industry}
+            chunk_map.update({topic: self.sasb_weights[topic] for topic in topics})
+            topic_scope = (
+                f"\n**本次分析範圍：**僅分析以下 {len(topics)} 項議題，其他議題請勿輸出：{'、'.join(topics)}\n"
+            )
+            prompt_text = self._build_prompt(json.dumps(chunk_map, ensure_ascii=False, indent=2), topic_scope)
+            return self._generate_items(uploaded_pdf, prompt_text, on_item=on_item, context=context)
+
+        chunk_results: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(bind_context(analyze_chunk), topics): index for index, topics in enumerate(chunks)}
+            for future, index in futures.items():
+                try:
+                    chunk_results[index] = future.result()
+                    logger.info(f"✓ 第 {index + 1}/{len(chunks)} 段完成，{len(chunk_results[index])} 筆")
+                except Exception as e:
+                    errors.append(f"第 {index + 1} 段 ({'、'.join(chunks[index])}): {e}")
+
+        if errors:
+            raise RuntimeError("分段分析失敗：" + "；".join(errors))
+        return self._merge_chunk_results(chunks, chunk_results)
+
+    def _should_chunk(self) -> bool:
+        """判斷是否自動採用分段分析（PDF 超過 CHUNK_AUTO_BYTES）"""
+        try:
+            return os.path.getsize(self.pdf_path) > self.CHUNK_AUTO_BYTES
+        except OSError:
+            return False
+
+    def run(self, chunked: Optional[bool] = None, topics_per_chunk: Optional[int] = None,
+            max_workers: Optional[int] = None, on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+            use_response_cache: bool = True):
         """
         執行完整的 ESG 報告書分析流程
         
         流程：
             1. 上傳 PDF 至 Gemini
             2. 建構分析 Prompt
-            3. 呼叫 Gemini AI 模型進行分析
+            3. 呼叫 Gemini AI 模型進行分析（單次或分段並行）
             4. 解析並儲存 JSON 結果
         
+        任何步驟失敗都會拋出例外（不會寫入 P1 JSON）。
+        
+        Args:
+            chunked: 是否依 SASB 議題分段並行分析（None 表示依 PDF 大小自動決定）
+            topics_per_chunk: 每段議題數（預設 CHUNK_TOPICS）
+            max_workers: 分段並行上限（預設 CHUNK_MAX_WORKERS）
+            on_item: 每完成一筆分析項目時立即呼叫的回呼函數（例如交給新聞搜尋管線）；
+                     分段模式下收到的項目可能多於最終結果，應以存檔的 P1 JSON 為準
+            use_response_cache: 是否沿用本機回應快取（False 時一律重新呼叫模型）
+        
         產生的 JSON 格式：
             [
                 {
@@ -288,90 +512,54 @@ class ESGReportAnalyzer:
                 ...
             ]
         """
-        # 1. 上傳 PDF
-        uploaded_pdf = self.upload_file_to_gemini()
-
-        # 2. 建構 Prompt
-        print(">>> 發送分析請求 (Gemini 2.0 Flash)...")
-        
-        prompt_text = f"""
-你是一個專業的 ESG 稽核員。請分析我提供的 PDF 檔案 (ESG 報告書)。
-
-**任務輸入資料：**
-1. **SASB 產業權重表 (JSON)**: 
-{self.sasb_map_content}
-
-**分析核心任務：**
-1. **目標**：請依據SASB 產業權重表，識別{self.industry}產業的SASB議題，從報告中找出每一項議題對應的宣稱report_claim，並依以下評分邏輯進行評分。
-2. **評分邏輯 (基於 Clarkson et al. 2008)**：
-   - 0分：未揭露。
-   - 1分 (軟性)：僅有願景、口號或模糊承諾。
-   - 2分 (定性)：有具體管理措施，但缺乏數據。
-   - 3分 (硬性/定量)：具體量化數據、歷史趨勢。
-   - 4分 (確信/查驗)：數據經過 ISAE 3000 或 AA1000 第三方查驗/確信 (須嚴格檢查附錄查證聲明)。
-3. **重大議題檢核**：若該議題的數值為 2 (高重大性)，但報告書完全未提及，屬於重大資訊缺失。請務必填寫 "report_claim": "N/A", "risk_score": 1。
-4. **邏輯一致性檢查**：請檢查報告前後文。若同一議題的數據或宣稱出現矛盾 (例如不同章節數字不符)，請將 "Internal_consistency": false，並在 "greenwashing_factor" 具體指出矛盾點，同時將最終 risk_score 扣減 1 分 (最低為 0)；若一致則 "Internal_consistency": true。
-5. **漂綠因子分析(greenwashing_factor)**：(必須使用中文輸出) 格式為：[疑慮類型] 具體分析說明。
-    - 若 internal_consistency 為 false，此處必須包含矛盾點對比。
-    - 若 risk_score 低於 3 分，必須點出該議題在「透明度」或「量化程度」上的具體缺失。
+        if chunked is None:
+            chunked = self._should_chunk()
+        self.use_response_cache = use_response_cache
 
-**輸出欄位要求 (嚴格執行)：**
-- **company**: "{self.company_name}"
-- **company_id**: "{self.target_company_id}"
-- **year**: "{self.target_year}"
-- **esg_category**: 必須且僅能從 ["E", "S", "G"] 中選擇一個代碼。E 代表環境、S 代表社會、G 代表治理。
-- **sasb_topic**: 議題名稱（必須與 SASB 權重表中的議題名稱完全一致）
-- **page_number**: 證據來源頁碼
-- **report_claim**: 針對該議題，僅選取「最具數據代表性」的一段話。必須完整摘錄報告書原文，不得改寫。
-- **greenwashing_factor**: 根據漂綠因子分析，填寫具體分析說明。
-- **risk_score**: 0~4 分
-- **internal_consistency**: (Boolean)
-- **key_word**: 根據 report_claim 內容，產生 3-5 個適合 Google News 搜尋的繁體中文關鍵字，以空格分隔。格式為：「公司名稱 + 核心指標/事件 + ESG相關詞」，例如「2024 台積電 淨零排放 RE100」或「 鴻海 碳排放強度 永續」。避免過長或抽象的詞彙。
-
-**輸出格式**：
-請直接輸出 JSON Array，不要包含 Markdown 標記。
-"""
+        # 1. 上傳 PDF（各段共用同一份檔案）
+        uploaded_pdf = self.upload_file_to_gemini()
 
-        # 3. 呼叫模型
         try:
-            response = self.client.models.generate_content(
-                model=self.MODEL_NAME,
-                contents=[
+            # 2~3. 建構 Prompt 並呼叫模型
+            if chunked and len(self.sasb_weights) > 1:
+                parsed_data = self._run_chunked(
                     uploaded_pdf,
-                    prompt_text
-                ],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0  # 設定為 0 以確保分析結果的嚴謹與穩定
+                    topics_per_chunk or self.CHUNK_TOPICS,
+                    max_workers or self.CHUNK_MAX_WORKERS,
+                    on_item=on_item
+                )
+            else:
+                logger.info(">>> 發送分析請求 (Gemini 2.0 Flash)...")
+                context = self._get_context_cache(uploaded_pdf, include_pdf=False)
+                parsed_data = self._generate_items(
+                    uploaded_pdf, self._build_prompt(self.sasb_map_content),
+                    on_item=on_item, context=context
                 )
-            )
-
-            # 4. 處理結果
-            raw_json = response.text
-            output_path = os.path.join(self.OUTPUT_DIR, self.output_json_name)
-            
-            # 記錄原始回應長度，用於偵錯
-            print(f"[DEBUG] 原始回應長度: {len(raw_json)} 字元")
-
-            # 嘗試解析 JSON，使用多重修復策略
-            parsed_data = self._parse_json_with_recovery(raw_json)
             
-            # 存檔
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(parsed_data, f, ensure_ascii=False, indent=2)
+            # 4. 存檔（原子寫入並記錄輸入雜湊）
+            inputs, params = self._artifact_inputs()
+            output_path = write_artifact(
+                'P1_JSON', self.target_year, self.target_company_id, parsed_data,
+                stage='p1', inputs=inputs, params=params
+            )
                 
-            print(f"\n[SUCCESS] 分析完成！結果已儲存至: {output_path}")
-            print(f"提取項目數: {len(parsed_data)}")
+            logger.info(f"[SUCCESS] 分析完成！結果已儲存至: {output_path}（提取項目數: {len(parsed_data)}）")
 
         except Exception as e:
-            print(f"\n[ERROR] 分析過程發生錯誤: {e}")
+            # 記錄後拋出：呼叫端不可把磁碟上既有（已判定過期）的 P1 JSON 當成本次結果
+            logger.exception(f"分析過程發生錯誤: {e}")
+            raise
 
 
 # =========================
 # 主要分析接口
 # =========================
 
-def analyze_esg_report(pdf_path: str, year: int, company_code: str, company_name: str = '', industry: str = '') -> dict:
+@traced('stage.p1')
+def analyze_esg_report(pdf_path: str, year: int, company_code: str, company_name: str = '', industry: str = '',
+                       force_regenerate: bool = False, chunked: Optional[bool] = None,
+                       on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       use_response_cache: bool = True) -> dict:
     """
     使用 Gemini AI 分析 ESG 永續報告書
     
@@ -383,6 +571,10 @@ def analyze_esg_report(pdf_path: str, year: int, company_code: str, company_name
         company_code: 公司代碼
         company_name: 公司名稱（選填）
         industry: 產業類別（選填）
+        force_regenerate: 是否強制重新分析（預設 False，輸入未變更時沿用既有 P1 JSON）
+        chunked: 是否依 SASB 議題分段並行分析（None 表示依 PDF 大小自動決定）
+        on_item: 每完成一筆分析項目時呼叫的回呼函數（跳過分析時不會被呼叫）
+        use_response_cache: 是否沿用本機的模型回應快取（False 時一律重新呼叫 Gemini）
     
     Returns:
         dict: 分析結果
@@ -399,8 +591,7 @@ def analyze_esg_report(pdf_path: str, year: int, company_code: str, company_name
         RuntimeError: 若 AI 分析過程發生錯誤
         FileNotFoundError: 若找不到 PDF 或必要的設定檔
     """
-    print(f"\n=== 啟動 AI 分析 (Gemini 2.0 Flash) ===")
-    print(f"    年份: {year}, 公司代碼: {company_code}")
+    logger.info(f"=== 啟動 AI 分析 (Gemini 2.0 Flash) === 年份: {year}, 公司代碼: {company_code}")
     
     try:
         # 1. 初始化分析器
@@ -411,19 +602,21 @@ def analyze_esg_report(pdf_path: str, year: int, company_code: str, company_name
             industry=industry
         )
         
-        # 2. 執行 AI 分析（會產生 P1 JSON 檔案）
-        analyzer.run()
+        # 2. 執行 AI 分析（會產生 P1 JSON 檔案；輸入未變更則跳過）
+        if not force_regenerate and analyzer.is_output_fresh():
+            logger.info(f"ℹ️ P1 JSON 已存在且輸入未變更，跳過 AI 分析")
+        else:
+            analyzer.run(chunked=chunked, on_item=on_item, use_response_cache=use_response_cache)
         
         # 3. 讀取產生的 P1 JSON
         output_path = os.path.join(analyzer.OUTPUT_DIR, analyzer.output_json_name)
         
-        if not os.path.exists(output_path):
+        if resolve_artifact_path(output_path) is None:
             raise RuntimeError(f"AI 分析完成但找不到輸出檔案: {output_path}")
         
-        with open(output_path, 'r', encoding='utf-8') as f:
-            analysis_items = json.load(f)
+        analysis_items = load_artifact(output_path)
         
-        print(f"✅ AI 分析完成，讀取 {len(analysis_items)} 筆分析項目")
+        logger.info(f"✅ AI 分析完成，讀取 {len(analysis_items)} 筆分析項目")
         
         # 4. 回傳結果（與 app.py 相容的格式）
         return {
@@ -0,0 +1,264 @@
+"""
+Gemini 內容快取（Context Caching）模組
+
+將每次請求都相同的內容（系統指令、評分規則，以及同一份報告書 PDF）建立為
+Gemini cached content，後續請求以 cached_content 引用，快取命中的 token
+以較低價格計費，也縮短首個 token 的等待時間。
+
+快取以 (模型, 系統指令, 內容識別) 的 SHA-256 為鍵，記錄於 CACHE_DIR：
+    name:        Gemini 快取名稱（cachedContents/xxxx）
+    expire_time: 到期時間（epoch 秒）
+    token_count: 快取的 token 數
+
+快取無法使用時（內容低於模型的最低 token 數、API 不支援、建立失敗），
+get_cached_context() 回傳 None，呼叫端改為直接送出完整內容；建立失敗的鍵會
+暫停嘗試 FAILURE_BACKOFF 秒，避免每次請求都重試。
+
+主要函數：
+    get_cached_context: 取得仍有效的快取名稱，必要時建立或延長
+    build_generate_config: 依是否有快取建立 GenerateContentConfig
+    invalidate_cached_context: 快取失效時移除紀錄
+    should_retry_without_cache: 引用快取的請求失敗時，判斷是否應改以完整內容重送
+
+使用範例：
+    from src.gemini_context_cache import get_cached_context, build_generate_config
+
+    cache_name = get_cached_context(client, model, system_instruction=SYSTEM_PROMPT)
+    config = build_generate_config(cache_name, SYSTEM_PROMPT, temperature=0)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS
+from src.artifact_store import atomic_write_json
+from src.log import get_logger
+from src.resilience import CircuitOpenError, classify_error
+
+logger = get_logger(__name__)
+
+# === 模組常數 ===
+CACHE_PATH = os.path.join(PATHS['CACHE_DIR'], 'gemini_contexts.json')
+
+DEFAULT_TTL = 60 * 60          # 快取存活時間（秒）
+REFRESH_MARGIN = 10 * 60       # 剩餘時間少於此值時延長 TTL
+FAILURE_BACKOFF = 30 * 60      # 建立失敗後暫停嘗試的時間（秒）
+
+# 各模型建立快取的最低 token 數（低於此值 API 會拒絕建立）
+MIN_CACHE_TOKENS = {
+    'gemini-2.5-pro': 2048,
+    'gemini-2.5-flash': 1024,
+    'gemini-2.5-flash-lite': 1024,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+
+# 設為 0 可停用內容快取
+CONTEXT_CACHE_ENABLED = os.getenv('GEMINI_CONTEXT_CACHE', '1') != '0'
+
+_cache_lock = threading.Lock()
+_failed_until: Dict[str, float] = {}
+_token_encoding = None
+
+
+# === 快取存取 ===
+
+def _load_cache() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return {}
+
+
+def _update_cache(key: str, entry: Optional[Dict[str, Any]]) -> None:
+    """寫入或刪除（entry 為 None）單筆快取紀錄，並清除已過期的項目"""
+    with _cache_lock:
+        cache = _load_cache()
+        if entry is None:
+            cache.pop(key, None)
+        else:
+            cache[key] = entry
+        now = time.time()
+        cache = {k: v for k, v in cache.items() if v.get('expire_time', 0) > now}
+        atomic_write_json(CACHE_PATH, cache)
+
+
+def _estimate_tokens(text: str) -> int:
+    """以 tiktoken 估算 token 數；無法使用時以字元數粗估"""
+    global _token_encoding
+    try:
+        if _token_encoding is None:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_token_encoding.encode(text))
+    except Exception:
+        return len(text)
+
+
+def _content_id(part: Any) -> str:
+    """內容的識別字串：上傳檔案以名稱識別，文字以原文識別"""
+    name = getattr(part, 'name', None)
+    if name:
+        return f"file:{name}"
+    return f"text:{part}"
+
+
+def _cache_key(model: str, system_instruction: str, contents: List[Any]) -> str:
+    digest = hashlib.sha256()
+    for piece in [model, system_instruction] + [_content_id(part) for part in contents]:
+        digest.update(piece.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _expire_epoch(cached, created_at: float, ttl: int) -> float:
+    expire_time = getattr(cached, 'expire_time', None)
+    if expire_time is not None and hasattr(expire_time, 'timestamp'):
+        return expire_time.timestamp()
+    return created_at + ttl
+
+
+# === 主要函數 ===
+
+def get_cached_context(
+    client,
+    model: str,
+    system_instruction: str,
+    contents: Optional[List[Any]] = None,
+    ttl: int = DEFAULT_TTL,
+    display_name: str = ''
+) -> Optional[str]:
+    """
+    取得仍有效的 Gemini 內容快取名稱，必要時建立或延長 TTL
+
+    Args:
+        client: genai.Client（或相容的替身）
+        model: 模型名稱
+        system_instruction: 要快取的系統指令
+        contents: 一併快取的內容（例如已上傳的 PDF 檔案參考）
+        ttl: 快取存活時間（秒）
+        display_name: 快取顯示名稱
+
+    Returns:
+        str or None: 快取名稱；無法使用快取時回傳 None
+    """
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+
+    contents = contents or []
+    key = _cache_key(model, system_instruction, contents)
+
+    # 只有文字時先確認是否達到模型的最低 token 數（含檔案時通常遠超過）
+    if not contents:
+        min_tokens = MIN_CACHE_TOKENS.get(model.split('/')[-1], DEFAULT_MIN_CACHE_TOKENS)
+        if _estimate_tokens(system_instruction) < min_tokens:
+            return None
+
+    if _failed_until.get(key, 0) > time.time():
+        return None
+
+    with _cache_lock:
+        entry = _load_cache().get(key)
+
+    now = time.time()
+    if entry and entry.get('expire_time', 0) - now > REFRESH_MARGIN:
+        return entry['name']
+
+    # SDK 於實際建立快取時才載入，匯入本模組不會拖慢啟動
+    from google.genai import types
+
+    if entry and entry.get('expire_time', 0) > now:
+        # 即將到期：延長 TTL，失敗則重新建立
+        try:
+            updated = client.caches.update(
+                name=entry['name'],
+                config=types.UpdateCachedContentConfig(ttl=f"{ttl}s")
+            )
+            entry['expire_time'] = _expire_epoch(updated, now, ttl)
+            _update_cache(key, entry)
+            return entry['name']
+        except Exception as e:
+            logger.warning(f"[CACHE] 延長內容快取失敗 ({e})，將重新建立")
+
+    try:
+        cached = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=display_name or None,
+                system_instruction=system_instruction,
+                contents=contents or None,
+                ttl=f"{ttl}s"
+            )
+        )
+    except Exception as e:
+        logger.warning(f"[CACHE] 無法建立內容快取，改為直接送出完整內容: {e}")
+        _failed_until[key] = time.time() + FAILURE_BACKOFF
+        _update_cache(key, None)
+        return None
+
+    usage = getattr(cached, 'usage_metadata', None)
+    token_count = getattr(usage, 'total_token_count', 0) or 0
+    _update_cache(key, {
+        'name': cached.name,
+        'model': model,
+        'display_name': display_name,
+        'token_count': token_count,
+        'created_at': now,
+        'expire_time': _expire_epoch(cached, now, ttl)
+    })
+    logger.info(f"[CACHE] 已建立內容快取: {cached.name}（{token_count:,} tokens）")
+    return cached.name
+
+
+def invalidate_cached_context(cache_name: str) -> None:
+    """移除指定快取的紀錄（例如引用時伺服器回報已不存在）"""
+    with _cache_lock:
+        keys = [key for key, entry in _load_cache().items() if entry.get('name') == cache_name]
+    for key in keys:
+        _update_cache(key, None)
+
+
+def should_retry_without_cache(error: Exception) -> bool:
+    """
+    引用快取的請求失敗時，是否應移除快取改以完整內容重送
+
+    只有快取不存在、無法引用等不可重試的錯誤才改送完整內容；
+    限流、服務暫時無法使用（重試已用盡）與熔斷中的錯誤與快取無關，
+    改送完整內容只會對已過載的服務加倍請求，應直接拋出。
+
+    Args:
+        error: 引用快取的請求拋出的例外
+
+    Returns:
+        bool: True 表示應改以完整內容重送
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    retryable, _, _ = classify_error(error)
+    return not retryable
+
+
+def build_generate_config(cache_name: Optional[str], system_instruction: str, **kwargs):
+    """
+    建立 GenerateContentConfig
+
+    有快取時以 cached_content 引用（不可再帶 system_instruction），
+    否則直接帶入完整的系統指令。
+
+    Args:
+        cache_name: get_cached_context() 的結果
+        system_instruction: 系統指令（無快取時使用）
+        **kwargs: 其他 GenerateContentConfig 參數（temperature、response_mime_type 等）
+    """
+    from google.genai import types
+
+    if cache_name:
+        return types.GenerateContentConfig(cached_content=cache_name, **kwargs)
+    return types.GenerateContentConfig(system_instruction=system_instruction, **kwargs)
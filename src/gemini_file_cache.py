@@ -0,0 +1,204 @@
+"""
+Gemini 上傳檔案快取模組
+
+同一份 PDF 在有效期限內重複分析時，沿用先前上傳至 Gemini 的檔案參考，
+不必每次 run() 都重新上傳並輪詢等待 ACTIVE。
+
+快取以 PDF 內容的 SHA-256 為鍵（檔名或路徑改變不影響命中），記錄：
+    name:            Gemini 檔案名稱（files/xxxx）
+    uri:             檔案 URI
+    expiration_time: 到期時間（epoch 秒）
+    uploaded_at:     上傳時間（epoch 秒）
+
+主要函數：
+    get_or_upload_file: 取得仍有效的上傳檔案，必要時才重新上傳
+
+使用範例：
+    from src.gemini_file_cache import get_or_upload_file
+
+    file_ref = get_or_upload_file(client, pdf_path, display_name="Report_2024_1102")
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS
+from src.artifact_store import hash_file, atomic_write_json
+from src.log import get_logger
+from src.tracing import span, set_attributes, traced
+
+logger = get_logger(__name__)
+
+# === 模組常數 ===
+CACHE_PATH = os.path.join(PATHS['CACHE_DIR'], 'gemini_files.json')
+
+# Gemini Files API 的檔案保留 48 小時；若回應未帶到期時間則以此估算
+DEFAULT_FILE_TTL = 48 * 60 * 60
+
+# 剩餘有效時間少於此值就重新上傳，避免分析途中檔案過期
+REUSE_MARGIN = 60 * 60
+
+POLL_INTERVAL = 2  # 等待檔案處理的輪詢間隔（秒）
+
+_cache_lock = threading.Lock()
+
+
+# === 快取存取 ===
+
+def _load_cache() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return {}
+
+
+def _update_cache(content_hash: str, entry: Optional[Dict[str, Any]]) -> None:
+    """寫入或刪除（entry 為 None）單筆快取"""
+    with _cache_lock:
+        cache = _load_cache()
+        if entry is None:
+            cache.pop(content_hash, None)
+        else:
+            cache[content_hash] = entry
+        # 順便清掉已過期的項目
+        now = time.time()
+        cache = {k: v for k, v in cache.items() if v.get('expiration_time', 0) > now}
+        atomic_write_json(CACHE_PATH, cache)
+
+
+def _expiration_epoch(file_ref, uploaded_at: float) -> float:
+    """取得檔案到期時間（epoch 秒）"""
+    expiration = getattr(file_ref, 'expiration_time', None)
+    if expiration is not None and hasattr(expiration, 'timestamp'):
+        return expiration.timestamp()
+    return uploaded_at + DEFAULT_FILE_TTL
+
+
+def _wait_until_active(client, file_ref, poll_interval: float = POLL_INTERVAL):
+    """
+    輪詢直到檔案處理完成
+
+    Raises:
+        RuntimeError: 若檔案處理失敗
+    """
+    if file_ref.state.name == "PROCESSING":
+        logger.info(f"[WAIT] 等待 Google 處理檔案中...")
+        polls = 0
+        while file_ref.state.name == "PROCESSING":
+            time.sleep(poll_interval)
+            file_ref = client.files.get(name=file_ref.name)
+            polls += 1
+        logger.debug(f"[WAIT] 檔案處理完成，輪詢 {polls} 次")
+
+    if file_ref.state.name != "ACTIVE":
+        raise RuntimeError(f"❌ 檔案處理失敗，狀態: {file_ref.state.name}")
+    return file_ref
+
+
+def _reuse_cached_file(client, entry: Dict[str, Any], poll_interval: float):
+    """
+    嘗試沿用快取中的檔案
+
+    Returns:
+        Gemini 檔案參考物件，若已失效則回傳 None
+    """
+    if entry.get('expiration_time', 0) - time.time() < REUSE_MARGIN:
+        return None
+    try:
+        file_ref = client.files.get(name=entry['name'])
+        return _wait_until_active(client, file_ref, poll_interval)
+    except Exception as e:
+        # 檔案已被刪除或過期（404）、處理失敗等，改為重新上傳
+        logger.info(f"[CACHE] 快取檔案已失效 ({e})，將重新上傳")
+        return None
+
+
+# === 主要函數 ===
+
+@traced('gemini.file')
+def get_or_upload_file(
+    client,
+    pdf_path: str,
+    display_name: str,
+    mime_type: str = "application/pdf",
+    poll_interval: float = POLL_INTERVAL,
+    use_cache: bool = True
+):
+    """
+    取得仍有效的 Gemini 上傳檔案，必要時才重新上傳
+
+    Args:
+        client: genai.Client（或相容的測試替身）
+        pdf_path: 本機 PDF 路徑
+        display_name: 上傳時的顯示名稱
+        mime_type: 檔案 MIME 類型
+        poll_interval: 等待處理完成的輪詢間隔（秒）
+        use_cache: 是否使用快取（False 時一律重新上傳）
+
+    Returns:
+        ACTIVE 狀態的 Gemini 檔案參考物件
+
+    Raises:
+        RuntimeError: 若上傳失敗或檔案處理失敗
+    """
+    content_hash = hash_file(pdf_path)
+    if content_hash is None:
+        raise RuntimeError(f"上傳失敗: 找不到檔案 {pdf_path}")
+
+    if use_cache:
+        with _cache_lock:
+            entry = _load_cache().get(content_hash)
+        if entry:
+            file_ref = _reuse_cached_file(client, entry, poll_interval)
+            if file_ref is not None:
+                logger.info(f"[CACHE] 沿用已上傳檔案: {file_ref.name}")
+                set_attributes(reused=True)
+                return file_ref
+            _update_cache(content_hash, None)
+
+    # SDK 於實際上傳時才載入，匯入本模組不會拖慢啟動
+    from google.genai import types
+
+    logger.info(f"[UPLOAD] 準備上傳: {os.path.basename(pdf_path)} ...")
+    set_attributes(reused=False)
+    uploaded_at = time.time()
+    with span('gemini.upload', bytes=os.path.getsize(pdf_path)):
+        try:
+            with open(pdf_path, "rb") as f:
+                file_ref = client.files.upload(
+                    file=f,
+                    config=types.UploadFileConfig(
+                        display_name=display_name,
+                        mime_type=mime_type
+                    )
+                )
+        except Exception as e:
+            raise RuntimeError(f"上傳失敗: {e}")
+
+        logger.info(f"[UPLOAD] 上傳成功，URI: {file_ref.uri}")
+        file_ref = _wait_until_active(client, file_ref, poll_interval)
+
+    if use_cache:
+        _update_cache(content_hash, {
+            'name': file_ref.name,
+            'uri': file_ref.uri,
+            'display_name': display_name,
+            'uploaded_at': uploaded_at,
+            'expiration_time': _expiration_epoch(file_ref, uploaded_at)
+        })
+
+    logger.info(f"[READY] 檔案準備就緒。")
+    return file_ref
+
+
+def clear_file_cache() -> None:
+    """清除所有快取項目（不會刪除 Gemini 端的檔案）"""
+    with _cache_lock:
+        atomic_write_json(CACHE_PATH, {})
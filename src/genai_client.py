@@ -0,0 +1,73 @@
+"""
+Gemini Client 共用模組
+
+在第一次使用時才建立 google.genai.Client，並由整個行程共用：
+匯入模組時不需要 GEMINI_API_KEY，也不會初始化 SDK；
+各分析步驟共用同一個 Client，可重複使用底層 HTTP 連線。
+
+主要函數：
+    get_genai_client: 取得共用的 Gemini Client（執行緒安全）
+    set_genai_client: 替換共用的 Client（例如改用本機替身）
+
+使用範例：
+    from src.genai_client import get_genai_client
+
+    client = get_genai_client()
+    response = client.models.generate_content(model=..., contents=...)
+"""
+
+import os
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import FAKE_BACKENDS
+
+# 載入環境變數
+load_dotenv()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_genai_client():
+    """
+    取得共用的 Gemini Client，第一次呼叫時才建立
+
+    Returns:
+        google.genai.Client（USE_FAKE_BACKENDS=1 時為 FakeGenaiClient，或以 set_genai_client 設定的替身）
+
+    Raises:
+        RuntimeError: 若找不到 GEMINI_API_KEY 環境變數
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None and FAKE_BACKENDS['ENABLED']:
+            from src.fake_backends import FakeGenaiClient
+            _client = FakeGenaiClient.from_config()
+        if _client is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("❌ 找不到 GEMINI_API_KEY，請檢查 .env 檔案。")
+
+            from google import genai
+            _client = genai.Client(api_key=api_key)
+    return _client
+
+
+def set_genai_client(client) -> None:
+    """
+    替換共用的 Client
+
+    Args:
+        client: 相容 google.genai.Client 介面的物件；None 表示下次呼叫時重新建立
+    """
+    global _client
+    with _client_lock:
+        _client = client
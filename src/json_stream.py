@@ -0,0 +1,249 @@
+"""
+串流 JSON 陣列解析模組
+
+Gemini 以 generate_content_stream 逐段回傳文字時，每收到一個頂層元素的
+結尾括號就立即解析並交給呼叫端，不必等待完整回應後再反覆嘗試修復解析。
+回應被截斷時，所有已完整的元素都會保留。
+
+可處理：
+    - 陣列前後的 Markdown 標記（```json ... ```）或其他文字
+    - 字串中的括號、跳脫字元（\\"、\\\\）
+    - 頂層之後的多餘內容（例如重複輸出的第二個陣列會被忽略）
+
+主要類別與函數：
+    JsonArrayStreamParser: 增量解析器，feed() 回傳新完成的元素
+    parse_json_array: 一次解析完整（或被截斷的）文字
+    stream_json_array: 呼叫 generate_content_stream 並逐筆產出元素（可使用回應快取）
+
+使用範例：
+    from src.json_stream import stream_json_array
+
+    result = stream_json_array(client, model, contents, config,
+                               on_item=lambda item: print(item['sasb_topic']))
+    items = result['items']
+"""
+
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.llm_response_cache import get_cached_response, store_response
+
+
+class JsonArrayStreamParser:
+    """
+    頂層 JSON 陣列的增量解析器
+
+    屬性：
+        items: 目前已解析的元素
+        complete: 是否已讀到頂層陣列的結尾 ']'
+        skipped: 無法解析而略過的元素數
+    """
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.complete = False
+        self.skipped = 0
+        self._buffer = ''
+        self._pos = 0           # 下一個要掃描的字元位置
+        self._depth = 0         # 0 = 尚未進入陣列；1 = 頂層陣列內
+        self._in_string = False
+        self._escape = False
+        self._item_start = -1   # 目前元素在 buffer 中的起點（-1 表示尚未開始）
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        餵入一段文字
+
+        Args:
+            chunk: 串流回應的下一段文字
+
+        Returns:
+            List: 這段文字中新完成的元素
+        """
+        if self.complete or not chunk:
+            return []
+        self._buffer += chunk
+        completed = []
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                i += 1
+                continue
+
+            if self._depth == 0:
+                # 陣列開始前的內容（Markdown 標記、說明文字）一律略過
+                if ch == '[':
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._depth == 1 and self._item_start < 0 and ch not in ' \t\r\n,]':
+                self._item_start = i
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '[{':
+                self._depth += 1
+            elif ch in ']}':
+                self._depth -= 1
+                if self._depth == 1 and self._item_start >= 0:
+                    # 物件或陣列元素結束
+                    self._emit(buffer[self._item_start:i + 1], completed)
+                elif self._depth == 0:
+                    # 頂層陣列結束（結尾前可能有未以逗號結束的純量元素）
+                    if self._item_start >= 0:
+                        self._emit(buffer[self._item_start:i], completed)
+                    self.complete = True
+                    i += 1
+                    break
+            elif ch == ',' and self._depth == 1 and self._item_start >= 0:
+                # 純量元素結束
+                self._emit(buffer[self._item_start:i], completed)
+            i += 1
+
+        # 丟棄已處理完的內容，避免長回應反覆累積
+        keep_from = self._item_start if self._item_start >= 0 else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._item_start >= 0:
+            self._item_start = 0
+        return completed
+
+    def _emit(self, text: str, completed: List[Any]) -> None:
+        self._item_start = -1
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            self.skipped += 1
+            return
+        self.items.append(item)
+        completed.append(item)
+
+    @property
+    def truncated(self) -> bool:
+        """回應是否在陣列結束前中斷"""
+        return self._depth > 0 and not self.complete
+
+
+def parse_json_array(text: str) -> Tuple[List[Any], bool]:
+    """
+    解析完整或被截斷的 JSON 陣列文字
+
+    Args:
+        text: 模型回應文字
+
+    Returns:
+        Tuple[List, bool]: (已完整的元素, 是否讀到陣列結尾)
+    """
+    parser = JsonArrayStreamParser()
+    parser.feed(text)
+    return parser.items, parser.complete
+
+
+def iter_json_array(chunks: Iterable[str], parser: Optional[JsonArrayStreamParser] = None):
+    """
+    逐段餵入文字並逐筆產出完成的元素
+
+    Args:
+        chunks: 文字片段的可迭代物件
+        parser: 指定解析器（可於結束後查看 complete / skipped）
+
+    Yields:
+        每個完成的頂層元素
+    """
+    parser = parser or JsonArrayStreamParser()
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+        if parser.complete:
+            break
+
+
+def stream_json_array(
+    client,
+    model: str,
+    contents: Any,
+    config: Any = None,
+    on_item: Optional[Callable[[Any], None]] = None,
+    cache_key: Optional[str] = None,
+    stage: str = ''
+) -> Dict[str, Any]:
+    """
+    以 generate_content_stream 呼叫模型並逐筆解析 JSON 陣列
+
+    指定 cache_key 時先查詢回應快取，命中則直接重播快取的回應（仍會逐筆呼叫 on_item），
+    未命中且回應完整時寫入快取。
+
+    Args:
+        client: genai.Client（或相容的替身）
+        model: 模型名稱
+        contents: 請求內容
+        config: GenerateContentConfig
+        on_item: 每完成一筆元素時呼叫的回呼函數
+        cache_key: llm_response_cache.make_response_key() 的結果（None 表示不使用回應快取）
+        stage: 分析步驟（寫入快取時記錄用）
+
+    Returns:
+        dict: {
+            'items': List,          # 已完整的元素
+            'text': str,            # 完整回應文字（除錯用）
+            'complete': bool,       # 是否讀到陣列結尾
+            'skipped': int,         # 無法解析而略過的元素數
+            'usage_metadata': Any,  # 最後一段回應的 usage_metadata（快取命中時為 None）
+            'cached': bool          # 是否來自回應快取
+        }
+    """
+    parser = JsonArrayStreamParser()
+
+    cached_text = get_cached_response(cache_key) if cache_key else None
+    if cached_text is not None:
+        for item in parser.feed(cached_text):
+            if on_item is not None:
+                on_item(item)
+        return {
+            'items': parser.items,
+            'text': cached_text,
+            'complete': parser.complete,
+            'skipped': parser.skipped,
+            'usage_metadata': None,
+            'cached': True
+        }
+
+    text_parts = []
+    usage_metadata = None
+
+    for chunk in client.models.generate_content_stream(model=model, contents=contents, config=config):
+        usage_metadata = getattr(chunk, 'usage_metadata', None) or usage_metadata
+        piece = getattr(chunk, 'text', None)
+        if not piece:
+            continue
+        text_parts.append(piece)
+        for item in parser.feed(piece):
+            if on_item is not None:
+                on_item(item)
+
+    text = ''.join(text_parts)
+    if cache_key and parser.complete and not parser.skipped:
+        store_response(cache_key, text, model=model, stage=stage)
+
+    return {
+        'items': parser.items,
+        'text': text,
+        'complete': parser.complete,
+        'skipped': parser.skipped,
+        'usage_metadata': usage_metadata,
+        'cached': False
+    }
@@ -0,0 +1,202 @@
+"""
+LLM 回應快取模組
+
+P1 / P2 皆以 temperature=0 呼叫模型，輸入未變時重跑會得到相同的結果。
+此模組將完整的模型回應保存在本機，下游修正（合併、評分、輸出格式）後
+重新處理同一份報告時直接重播回應，不必再次計費。
+
+快取鍵為下列內容的 SHA-256：
+    model:              模型名稱
+    system_instruction: 系統指令（以全文雜湊，不使用會變動的內容快取名稱）
+    contents:           請求內容的識別（文字以原文、PDF 以檔案內容雜湊）
+    config:             影響輸出的參數（temperature、response_mime_type 等）
+
+每筆回應存為 CACHE_DIR/llm_responses/<鍵>.json；總大小超過 MAX_CACHE_BYTES 時，
+依最後使用時間淘汰最舊的項目（淘汰至上限的 EVICT_TARGET_RATIO）。總大小只在第一次寫入與超過上限時掃描目錄，
+其餘寫入只累加該筆的大小（其他行程寫入的項目會在下次掃描時計入）。只有完整（讀到陣列結尾、沒有略過項目）的
+回應才會寫入快取。
+
+設定環境變數 LLM_RESPONSE_CACHE=0 可停用；單次呼叫可傳入 use_response_cache=False。
+
+主要函數：
+    make_response_key: 計算快取鍵
+    get_cached_response: 讀取快取的回應文字
+    store_response: 寫入回應並執行容量淘汰
+    clear_response_cache: 清除所有快取
+
+使用範例：
+    from src.llm_response_cache import make_response_key
+
+    key = make_response_key(model, SYSTEM_PROMPT, [pdf_hash, prompt_text], {'temperature': 0})
+    result = stream_json_array(client, model, contents, config, cache_key=key)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS
+from src.artifact_store import atomic_write_json
+
+# === 模組常數 ===
+CACHE_DIR = os.path.join(PATHS['CACHE_DIR'], 'llm_responses')
+
+# 快取總容量上限（位元組），可用 LLM_RESPONSE_CACHE_MAX_MB 調整
+MAX_CACHE_BYTES = int(float(os.getenv('LLM_RESPONSE_CACHE_MAX_MB', '200')) * 1024 * 1024)
+
+# 超過上限時淘汰至上限的此比例，留出空間，避免之後每次寫入都重新掃描目錄
+EVICT_TARGET_RATIO = 0.9
+
+# 回應格式或解析方式改變時遞增，使舊快取全部失效
+CACHE_VERSION = 1
+
+# 設為 0 可停用回應快取
+RESPONSE_CACHE_ENABLED = os.getenv('LLM_RESPONSE_CACHE', '1') != '0'
+
+_cache_lock = threading.Lock()
+
+# 估計的快取總大小（位元組）；None 表示尚未掃描目錄
+_cache_bytes: Optional[int] = None
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+# === 主要函數 ===
+
+def make_response_key(
+    model: str,
+    system_instruction: str,
+    contents: List[str],
+    config: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    計算回應快取鍵
+
+    Args:
+        model: 模型名稱
+        system_instruction: 系統指令全文
+        contents: 請求內容的識別字串（檔案請傳入內容雜湊，而非會變動的上傳名稱）
+        config: 影響輸出的生成參數
+
+    Returns:
+        str: 64 字元的十六進位雜湊
+    """
+    payload = json.dumps({
+        'version': CACHE_VERSION,
+        'model': model.split('/')[-1],
+        'system': hashlib.sha256(system_instruction.encode('utf-8')).hexdigest(),
+        'contents': [hashlib.sha256(str(part).encode('utf-8')).hexdigest() for part in contents],
+        'config': config or {}
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """
+    讀取快取的回應文字
+
+    Args:
+        key: make_response_key() 的結果
+
+    Returns:
+        str or None: 回應文字；停用或未命中時回傳 None
+    """
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return None
+
+    # 更新最後使用時間，作為淘汰依據
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return entry.get('text')
+
+
+def store_response(key: str, text: str, model: str = '', stage: str = '') -> None:
+    """
+    寫入回應並在超過容量上限時淘汰最久未使用的項目
+
+    Args:
+        key: make_response_key() 的結果
+        text: 完整的回應文字
+        model: 模型名稱（記錄用）
+        stage: 分析步驟（記錄用）
+    """
+    global _cache_bytes
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(key)
+    try:
+        previous_size = os.path.getsize(path)
+    except OSError:
+        previous_size = 0
+    atomic_write_json(path, {
+        'model': model,
+        'stage': stage,
+        'created_at': time.time(),
+        'text': text
+    })
+
+    with _cache_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += os.path.getsize(path) - previous_size
+        needs_scan = _cache_bytes is None or _cache_bytes > MAX_CACHE_BYTES
+    if needs_scan:
+        _evict(int(MAX_CACHE_BYTES * EVICT_TARGET_RATIO))
+
+
+def _evict(max_bytes: int) -> int:
+    """依最後使用時間淘汰項目直到總大小不超過 max_bytes，回傳刪除數（並重新計算估計大小）"""
+    global _cache_bytes
+    with _cache_lock:
+        entries = []
+        for name in os.listdir(CACHE_DIR):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        _cache_bytes = total
+    return removed
+
+
+def clear_response_cache() -> int:
+    """
+    清除所有快取的回應
+
+    Returns:
+        int: 刪除的項目數
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    return _evict(0)
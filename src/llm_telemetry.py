@@ -0,0 +1,259 @@
+"""
+LLM 呼叫用量與成本統計模組
+
+統一記錄 Gemini 與 Perplexity 每次呼叫的：
+    provider / model / stage：服務、模型與分析步驟（p1、p2、p3）
+    company：公司鍵（"{year}_{company_code}"）
+    prompt_tokens / output_tokens / cached_tokens / total_tokens：實際 token 用量
+    thoughts_tokens：思考 token 數（以輸出價格計費，已包含在 output_tokens 中）
+    latency：呼叫耗時（秒）
+    retries：重試次數
+    response_cached：是否由本機回應快取提供（未實際呼叫模型）
+    error：錯誤訊息（成功時為 None）
+
+統計資料保存在行程記憶體中：累計值依公司與模型彙總，另保留最近的呼叫紀錄，
+可依公司與起始時間彙總單次分析流程的用量（例如 query_company 的一次執行）。
+
+主要函數：
+    llm_call: 包住單次 LLM 呼叫的 context manager，自動記錄耗時與錯誤
+    summarize_llm_usage: 彙總指定公司（與起始時間）的用量與預估成本
+    get_llm_usage_totals: 取得全部累計用量（供 metrics 端點使用）
+
+使用範例：
+    from src.llm_telemetry import llm_call
+
+    with llm_call('gemini', model, stage='p1', company='2024_1102') as call:
+        response = client.models.generate_content(model=model, contents=...)
+        call.record_gemini_usage(response.usage_metadata)
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+from src.tracing import span
+
+# === 模組常數 ===
+
+# 每百萬 token 的預估價格（美元）：(輸入, 輸出, 快取輸入)
+# 價格以各服務公開牌價為準，僅用於估算每份報告的成本
+MODEL_PRICING = {
+    'gemini-2.5-pro': (1.25, 10.00, 0.31),
+    'gemini-2.5-flash': (0.30, 2.50, 0.075),
+    'gemini-2.5-flash-lite': (0.10, 0.40, 0.025),
+    'sonar': (1.00, 1.00, 1.00),
+}
+
+MAX_RECENT_CALLS = 5000  # 保留的最近呼叫紀錄數
+
+_lock = threading.Lock()
+_recent_calls: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_CALLS)
+_totals: Dict[str, Dict[str, Any]] = {}
+
+
+# === 單次呼叫 ===
+
+class LLMCall:
+    """單次 LLM 呼叫的紀錄（由 llm_call 建立）"""
+
+    def __init__(self, provider: str, model: str, stage: str, company: Optional[str]):
+        self.provider = provider
+        self.model = model
+        self.stage = stage
+        self.company = company
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.thoughts_tokens = 0
+        self.total_tokens = 0
+        self.retries = 0
+        self.response_cached = False
+        self.error: Optional[str] = None
+
+    def record_gemini_usage(self, usage_metadata) -> None:
+        """
+        記錄 Gemini 回應的 usage_metadata（可為 None）
+
+        思考模型（例如 gemini-2.5-pro）的思考 token 以輸出價格計費，
+        因此 output_tokens 為回應與思考 token 的合計。
+        """
+        if usage_metadata is None:
+            return
+        self.prompt_tokens = getattr(usage_metadata, 'prompt_token_count', 0) or 0
+        self.thoughts_tokens = getattr(usage_metadata, 'thoughts_token_count', 0) or 0
+        self.output_tokens = (getattr(usage_metadata, 'candidates_token_count', 0) or 0) + self.thoughts_tokens
+        self.cached_tokens = getattr(usage_metadata, 'cached_content_token_count', 0) or 0
+        self.total_tokens = (getattr(usage_metadata, 'total_token_count', 0)
+                             or self.prompt_tokens + self.output_tokens)
+
+    def add_retry(self, *_args) -> None:
+        """遞增重試次數（可直接作為 resilience 的 on_retry 回呼）"""
+        self.retries += 1
+
+    def record_openai_usage(self, usage) -> None:
+        """記錄 OpenAI 相容格式（Perplexity）的 usage（可為 None）"""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        self.output_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        self.total_tokens = getattr(usage, 'total_tokens', 0) or self.prompt_tokens + self.output_tokens
+
+
+def estimate_cost(model: str, prompt_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    依 MODEL_PRICING 估算成本（美元）
+
+    Args:
+        model: 模型名稱（可含 "models/" 前綴）
+        prompt_tokens: 輸入 token 數（含快取命中的部分）
+        output_tokens: 輸出 token 數（含思考 token）
+        cached_tokens: 快取命中的輸入 token 數
+
+    Returns:
+        float: 預估成本，未知模型回傳 0
+    """
+    pricing = MODEL_PRICING.get(model.split('/')[-1])
+    if pricing is None:
+        return 0.0
+    input_price, output_price, cached_price = pricing
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {
+        'calls': 0, 'errors': 0, 'retries': 0, 'response_cache_hits': 0,
+        'prompt_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0, 'thoughts_tokens': 0, 'total_tokens': 0,
+        'latency': 0.0, 'cost_usd': 0.0
+    }
+
+
+def _add_to_bucket(bucket: Dict[str, Any], record: Dict[str, Any]) -> None:
+    bucket['calls'] += 1
+    bucket['errors'] += 1 if record['error'] else 0
+    bucket['response_cache_hits'] += 1 if record['response_cached'] else 0
+    for field in ('retries', 'prompt_tokens', 'output_tokens', 'cached_tokens', 'thoughts_tokens', 'total_tokens',
+                  'latency', 'cost_usd'):
+        bucket[field] += record[field]
+
+
+def _record(call: LLMCall, latency: float) -> Dict[str, Any]:
+    record = {
+        'timestamp': time.time(),
+        'provider': call.provider,
+        'model': call.model,
+        'stage': call.stage,
+        'company': call.company,
+        'prompt_tokens': call.prompt_tokens,
+        'output_tokens': call.output_tokens,
+        'cached_tokens': call.cached_tokens,
+        'thoughts_tokens': call.thoughts_tokens,
+        'total_tokens': call.total_tokens,
+        'latency': latency,
+        'retries': call.retries,
+        'response_cached': call.response_cached,
+        'error': call.error,
+        'cost_usd': estimate_cost(call.model, call.prompt_tokens, call.output_tokens, call.cached_tokens)
+    }
+    with _lock:
+        _recent_calls.append(record)
+        for key in ('all', f"company:{call.company}", f"model:{call.provider}/{call.model}"):
+            _add_to_bucket(_totals.setdefault(key, _new_bucket()), record)
+    return record
+
+
+@contextmanager
+def llm_call(provider: str, model: str, stage: str, company: Optional[str] = None):
+    """
+    記錄單次 LLM 呼叫
+
+    區塊內呼叫 call.record_gemini_usage() / call.record_openai_usage() 記錄 token 用量，
+    重試時遞增 call.retries；區塊拋出的例外會記錄為錯誤後原樣拋出。
+    每次呼叫同時產生一個 "llm.<provider>" span，帶有 token 用量與重試次數。
+
+    Args:
+        provider: 'gemini' | 'perplexity'
+        model: 模型名稱
+        stage: 分析步驟（例如 'p1'、'p2'、'p3'）
+        company: 公司鍵（"{year}_{company_code}"）
+
+    Yields:
+        LLMCall
+    """
+    call = LLMCall(provider, model, stage, company)
+    start = time.perf_counter()
+    with span(f"llm.{provider}", model=model, stage=stage, company=company) as llm_span:
+        try:
+            yield call
+        except Exception as e:
+            call.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _record(call, time.perf_counter() - start)
+            llm_span.set(prompt_tokens=call.prompt_tokens, output_tokens=call.output_tokens,
+                         cached_tokens=call.cached_tokens, thoughts_tokens=call.thoughts_tokens, retries=call.retries,
+                         response_cached=call.response_cached)
+
+
+# === 彙總 ===
+
+def summarize_llm_usage(company: Optional[str] = None, since: Optional[float] = None) -> Dict[str, Any]:
+    """
+    彙總最近呼叫紀錄中的用量與預估成本
+
+    Args:
+        company: 公司鍵（None 表示所有公司）
+        since: 起始時間（time.time()，None 表示不限）
+
+    Returns:
+        dict: {
+            'calls', 'errors', 'retries', 'response_cache_hits',
+            'prompt_tokens', 'output_tokens', 'cached_tokens', 'thoughts_tokens', 'total_tokens',
+            'latency', 'cost_usd',
+            'by_stage': {stage: 同上欄位}
+        }
+    """
+    with _lock:
+        records = [
+            record for record in _recent_calls
+            if (company is None or record['company'] == company)
+            and (since is None or record['timestamp'] >= since)
+        ]
+
+    summary = _new_bucket()
+    by_stage: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        _add_to_bucket(summary, record)
+        _add_to_bucket(by_stage.setdefault(record['stage'], _new_bucket()), record)
+    summary['by_stage'] = by_stage
+    return summary
+
+
+def get_llm_usage_totals() -> Dict[str, Any]:
+    """
+    取得行程啟動以來的累計用量
+
+    Returns:
+        dict: {
+            'all': {...},
+            'by_company': {公司鍵: {...}},
+            'by_model': {"provider/model": {...}}
+        }
+    """
+    with _lock:
+        snapshot = {key: dict(bucket) for key, bucket in _totals.items()}
+
+    return {
+        'all': snapshot.get('all', _new_bucket()),
+        'by_company': {key.split(':', 1)[1]: value for key, value in snapshot.items() if key.startswith('company:')},
+        'by_model': {key.split(':', 1)[1]: value for key, value in snapshot.items() if key.startswith('model:')},
+    }
+
+
+def get_recent_llm_calls(limit: int = 100, company: Optional[str] = None) -> List[Dict[str, Any]]:
+    """取得最近的呼叫紀錄（新到舊，可指定公司）"""
+    with _lock:
+        records = [record for record in _recent_calls if company is None or record['company'] == company]
+    return records[-limit:][::-1]
@@ -0,0 +1,230 @@
+"""
+結構化日誌模組
+
+取代各模組的 print()：提供層級（DEBUG / INFO / WARNING / ERROR）、自動帶入的
+esg_id / stage 欄位、JSON 輸出，以及逐項訊息（逐頁、逐議題、逐筆 URL）的取樣。
+
+esg_id、company、stage 取自目前的追蹤 span（src/tracing.py）：query_company 設定的
+esg_id 與 stage.* span 的步驟名稱會自動出現在其下所有日誌，以 bind_context()
+啟動的執行緒也一樣，呼叫端不需另外傳遞。
+
+寫出由背景執行緒負責：記錄端只把訊息放入佇列，多個執行緒的日誌不會互相穿插，
+緩慢的終端機或檔案 I/O 也不會拖慢呼叫端的迴圈。
+
+設定（config.LOGGING，皆可由環境變數覆寫）：
+    LOG_LEVEL:        最低輸出層級（預設 INFO）
+    LOG_FORMAT:       text（預設，人類可讀）/ json（每行一個 JSON 物件）
+    LOG_FILE:         另外寫入的檔案路徑（選填）
+    LOG_SAMPLE_EVERY: sampled() 的取樣間隔（預設 10；LOG_LEVEL=DEBUG 時全部輸出）
+
+主要函數：
+    get_logger: 取得模組的 logger
+    sampled: 包裝 logger，INFO 以下的訊息每 N 筆只輸出一筆（WARNING 以上一律輸出）
+    configure_logging: 依設定重新建立輸出（一般不需手動呼叫）
+
+使用範例：
+    from src.log import get_logger, sampled
+
+    logger = get_logger(__name__)
+    item_logger = sampled(logger)
+
+    logger.info(f"開始驗證 {total} 筆資料")
+    for item in items:
+        item_logger.info(f"處理: {item['url']}")      # 每 10 筆輸出一筆
+        logger.debug(f"原始回應: {response}")         # LOG_LEVEL=DEBUG 時才輸出
+
+    # JSON 輸出
+    LOG_FORMAT=json python app.py
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import LOGGING
+
+# === 模組常數 ===
+ROOT_LOGGER_NAME = 'greenwashing'
+
+# 由目前 span 帶入日誌的欄位
+CONTEXT_FIELDS = ('esg_id', 'company', 'stage')
+
+# LogRecord 的內建屬性（其餘屬性視為呼叫端以 extra= 傳入的欄位）
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+class _ContextFilter(logging.Filter):
+    """在記錄端的執行緒補上 span 的 esg_id / stage / trace_id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # tracing 會匯入本模組，因此不在模組層級匯入；tracing 尚未載入時也不會有 span
+        tracing = sys.modules.get('src.tracing')
+        current = tracing.current_span() if tracing else None
+        if current is not None:
+            for key in CONTEXT_FIELDS:
+                value = current.attributes.get(key)
+                if value is not None and not hasattr(record, key):
+                    setattr(record, key, value)
+            record.trace_id = current.trace_id
+            record.span_id = current.span_id
+        return True
+
+
+def _context_of(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_')}
+
+
+class TextFormatter(logging.Formatter):
+    """人類可讀格式：時間、層級、[esg_id stage]、訊息"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = [str(getattr(record, key)) for key in ('esg_id', 'stage') if hasattr(record, key)]
+        prefix = f"[{' '.join(context)}] " if context else ''
+        line = (f"{datetime.fromtimestamp(record.created).strftime('%H:%M:%S')} "
+                f"{record.levelname:<7} {prefix}{record.getMessage()}")
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆日誌一行 JSON（ts、level、logger、message、esg_id、stage、trace_id 及 extra 欄位）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        entry.update(_context_of(record))
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """只把 record 放入佇列，格式化與寫出都交給背景執行緒"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 預先合併訊息與例外，避免參數物件跨執行緒被修改
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_handlers() -> List[logging.Handler]:
+    formatter = JsonFormatter() if LOGGING['FORMAT'] == 'json' else TextFormatter()
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if LOGGING['FILE']:
+        os.makedirs(os.path.dirname(os.path.abspath(LOGGING['FILE'])), exist_ok=True)
+        handlers.append(logging.FileHandler(LOGGING['FILE'], encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging() -> None:
+    """依 config.LOGGING 建立（或重新建立）輸出；get_logger 第一次呼叫時自動執行"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(getattr(logging, LOGGING['LEVEL'], logging.INFO))
+        # 不往上傳遞，Flask / werkzeug 等第三方日誌的設定不受影響
+        root.propagate = False
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(_ContextFilter())
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """寫出佇列中剩餘的日誌（程式結束時自動呼叫）"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    取得模組的 logger
+
+    Args:
+        name: 模組名稱（通常傳入 __name__，例如 'src.crawler_news'）
+
+    Returns:
+        logging.Logger: 名稱為 'greenwashing.<模組>' 的 logger
+    """
+    if _listener is None:
+        configure_logging()
+    module = name.rsplit('.', 1)[-1]
+    if module == '__main__':
+        module = os.path.splitext(os.path.basename(sys.argv[0] or 'main'))[0] or 'main'
+    return logging.getLogger(ROOT_LOGGER_NAME).getChild(module)
+
+
+class _SampledLogger(logging.LoggerAdapter):
+    """INFO 以下的訊息每 every 筆只輸出一筆；WARNING 以上與 DEBUG 模式不取樣"""
+
+    def __init__(self, logger: logging.Logger, every: int):
+        super().__init__(logger, {'sample_every': every} if every > 1 else {})
+        self.every = max(1, every)
+        # itertools.count 的 next() 在 GIL 下為原子操作，多執行緒共用不需加鎖
+        self._counter = itertools.count()
+
+    def isEnabledFor(self, level: int) -> bool:
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level >= logging.WARNING or self.every == 1 or self.logger.isEnabledFor(logging.DEBUG):
+            return True
+        return next(self._counter) % self.every == 0
+
+    def process(self, msg: Any, kwargs: Dict[str, Any]):
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return msg, kwargs
+
+
+def sampled(logger: logging.Logger, every: Optional[int] = None) -> logging.LoggerAdapter:
+    """
+    包裝 logger，用於逐項訊息（逐頁、逐議題、逐筆 URL）
+
+    Args:
+        logger: get_logger() 取得的 logger
+        every: 取樣間隔（預設 config.LOGGING['SAMPLE_EVERY']）
+
+    Returns:
+        logging.LoggerAdapter: 介面同 logger（info / warning / ...）
+    """
+    return _SampledLogger(logger, every or LOGGING['SAMPLE_EVERY'])
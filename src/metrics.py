@@ -0,0 +1,355 @@
+"""
+Prometheus 格式的服務指標模組
+
+提供 app.py 的 /metrics 端點所需的計數器、量表與直方圖，以 Prometheus 文字格式輸出。
+
+熱路徑不加鎖：每個指標在每個執行緒各有一份獨立的數值（threading.local），
+記錄時只更新本執行緒的資料；只有執行緒第一次記錄時登錄分片、以及 /metrics
+讀取時合併分片才需要取得鎖。已結束執行緒（例如 Flask 每個請求的執行緒）的分片
+會在讀取時併入彙總，不會無限累積。
+
+指標來源：
+    HTTP 路由延遲:       app.py 的 before_request / after_request
+    流程步驟、資料庫、外部呼叫、LLM 耗時與 token、快取命中:
+                         tracing 的 span 結束回呼（stage.*、db.*、llm.*、gemini.file 等）
+    進行中的分析數:      app.py 自動抓取流程
+    LLM 累計用量、限流與熔斷狀態、新聞佇列長度:
+                         讀取時由 llm_telemetry、resilience、crawler_news 取得
+
+主要函數：
+    observe_request: 記錄一次 HTTP 請求的延遲
+    render_metrics: 輸出 Prometheus 文字格式
+    ANALYSES_IN_PROGRESS: 進行中的分析數量表
+
+使用範例：
+    from src.metrics import render_metrics, observe_request
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
+"""
+
+import bisect
+import math
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.tracing import Span, add_span_processor
+
+# === 模組常數 ===
+NAMESPACE = 'greenwashing'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 直方圖區間
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+
+# 視為外部呼叫的 span 名稱（名稱即 target 標籤）
+EXTERNAL_SPANS = ('gnews.query', 'http.probe', 'twse.request', 'twse.download', 'gemini.upload')
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+# =========================
+# 指標類型
+# =========================
+class _ShardedMetric:
+    """
+    每個執行緒各自累加的指標
+
+    每組標籤對應一列數值（list），記錄時只修改本執行緒的列；讀取時逐欄加總。
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict[LabelValues, List[float]]]] = []
+        self._retired: Dict[LabelValues, List[float]] = {}
+
+    def _row_size(self) -> int:
+        return 1
+
+    def _row(self, labels: LabelValues) -> List[float]:
+        try:
+            shard = self._local.values
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            self._local.values = shard
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * self._row_size()
+        return row
+
+    @staticmethod
+    def _merge(target: Dict[LabelValues, List[float]], source: Iterable[Tuple[LabelValues, List[float]]]) -> None:
+        for labels, row in source:
+            existing = target.get(labels)
+            if existing is None:
+                target[labels] = list(row)
+            else:
+                for i, value in enumerate(row):
+                    existing[i] += value
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        """合併所有執行緒的數值（已結束執行緒的分片併入彙總後移除）"""
+        merged: Dict[LabelValues, List[float]] = {}
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, list(shard.items()))
+            self._shards = alive
+            self._merge(merged, self._retired.items())
+            for _, shard in alive:
+                self._merge(merged, list(shard.items()))
+        return merged
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        rows = self.collect()
+        if not rows and not self.labelnames:
+            rows = {(): [0]}
+        for labels, row in sorted(rows.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(row[0])}")
+        return lines
+
+
+class Counter(_ShardedMetric):
+    """只增不減的計數器"""
+
+    kind = 'counter'
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self._row(tuple(str(v) for v in labels))[0] += amount
+
+
+class Gauge(_ShardedMetric):
+    """可增減的量表（各執行緒的增減量加總即為目前值）"""
+
+    kind = 'gauge'
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self._row(tuple(str(v) for v in labels))[0] += amount
+
+    def dec(self, *labels: Any, amount: float = 1) -> None:
+        self._row(tuple(str(v) for v in labels))[0] -= amount
+
+
+class Histogram(_ShardedMetric):
+    """
+    直方圖
+
+    每列為 [各區間次數..., +Inf 區間次數, 總和, 次數]，輸出時再轉為累積次數。
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _row_size(self) -> int:
+        return len(self.buckets) + 3
+
+    def observe(self, value: float, *labels: Any) -> None:
+        row = self._row(tuple(str(v) for v in labels))
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        bounds = self.buckets + (math.inf,)
+        for labels, row in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(float(row[-2]))}")
+            lines.append(f"{self.name}_count{label_text} {_format_value(row[-1])}")
+        return lines
+
+
+class CallbackMetric:
+    """讀取時才計算數值的指標（資料已由其他模組彙總）"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = list(self.callback())
+        except Exception as e:
+            return lines + [f"# {self.name} 讀取失敗: {_escape(e)}"]
+        for labels, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(float(value))}")
+        return lines
+
+
+# =========================
+# 指標定義
+# =========================
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Flask 路由處理時間', ('route', 'method', 'status'))
+STAGE_DURATION = Histogram(
+    'pipeline_stage_duration_seconds', '分析流程各步驟耗時', ('stage', 'status'), STAGE_BUCKETS)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', '資料庫操作耗時', ('operation',))
+EXTERNAL_CALL_DURATION = Histogram(
+    'external_call_duration_seconds', '外部服務呼叫耗時（GNews、URL 探測、TWSE、Gemini 上傳）',
+    ('target', 'status'), LATENCY_BUCKETS + (120.0,))
+LLM_CALL_DURATION = Histogram(
+    'llm_call_duration_seconds', 'LLM 呼叫耗時（含重試）', ('provider', 'stage'), LATENCY_BUCKETS + (120.0, 300.0))
+LLM_TOKENS = Histogram(
+    'llm_tokens', '單次 LLM 呼叫的 token 數', ('provider', 'kind'), TOKEN_BUCKETS)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', '快取查詢次數（result: hit / miss）', ('cache', 'result'))
+ANALYSES_IN_PROGRESS = Gauge(
+    'analyses_in_progress', '進行中的自動抓取分析數')
+
+
+def _llm_usage_samples():
+    from src.llm_telemetry import get_llm_usage_totals
+    for model_key, bucket in get_llm_usage_totals()['by_model'].items():
+        provider, _, model = model_key.partition('/')
+        for kind in ('prompt', 'output', 'cached', 'thoughts'):
+            yield (provider, model, kind), bucket[f"{kind}_tokens"]
+
+
+def _llm_cost_samples():
+    from src.llm_telemetry import get_llm_usage_totals
+    for model_key, bucket in get_llm_usage_totals()['by_model'].items():
+        provider, _, model = model_key.partition('/')
+        yield (provider, model), bucket['cost_usd']
+
+
+def _resilience_samples(field: str):
+    from src.resilience import get_resilience_stats
+    for policy, stats in get_resilience_stats().items():
+        yield (policy,), stats.get(field, 0)
+
+
+def _circuit_samples():
+    from src.resilience import get_resilience_stats
+    for policy, stats in get_resilience_stats().items():
+        yield (policy,), 1 if stats.get('circuit_state') == 'open' else 0
+
+
+def _news_queue_samples():
+    # 只在新聞爬蟲已載入時讀取，避免為了 metrics 匯入 gnews
+    module = sys.modules.get('src.crawler_news')
+    yield (), module.get_news_queue_depth() if module else 0
+
+
+_CALLBACK_METRICS = [
+    CallbackMetric('llm_tokens_total', 'LLM 累計 token 數', 'counter', ('provider', 'model', 'kind'),
+                   _llm_usage_samples),
+    CallbackMetric('llm_cost_usd_total', 'LLM 累計預估成本（美元）', 'counter', ('provider', 'model'),
+                   _llm_cost_samples),
+    CallbackMetric('provider_calls_total', '外部服務呼叫次數（依限流策略）', 'counter', ('policy',),
+                   lambda: _resilience_samples('calls')),
+    CallbackMetric('provider_retries_total', '外部服務重試次數', 'counter', ('policy',),
+                   lambda: _resilience_samples('retries')),
+    CallbackMetric('provider_throttled_total', '外部服務回應 429 的次數', 'counter', ('policy',),
+                   lambda: _resilience_samples('throttled')),
+    CallbackMetric('provider_rate', '目前的限流速率（每秒請求數）', 'gauge', ('policy',),
+                   lambda: _resilience_samples('rate')),
+    CallbackMetric('provider_circuit_open', '熔斷中（1）或正常（0）', 'gauge', ('policy',), _circuit_samples),
+    CallbackMetric('news_queue_depth', 'P1 → 新聞搜尋管線中等待處理的項目數', 'gauge', (), _news_queue_samples),
+]
+
+_METRICS = [HTTP_REQUEST_DURATION, STAGE_DURATION, DB_QUERY_DURATION, EXTERNAL_CALL_DURATION,
+            LLM_CALL_DURATION, LLM_TOKENS, CACHE_REQUESTS, ANALYSES_IN_PROGRESS] + _CALLBACK_METRICS
+
+
+# =========================
+# 記錄
+# =========================
+def observe_request(route: str, method: str, status: int, duration: float) -> None:
+    """記錄一次 HTTP 請求的延遲"""
+    HTTP_REQUEST_DURATION.observe(duration, route, method, status)
+
+
+def _observe_span(span: Span) -> None:
+    """tracing 的 span 結束回呼：依 span 名稱更新對應的指標"""
+    name = span.name
+    duration = span.duration or 0.0
+    attributes = span.attributes
+
+    if name.startswith('stage.'):
+        STAGE_DURATION.observe(duration, name[6:], span.status)
+    elif name.startswith('db.'):
+        operation = attributes.get('table', name[3:]) if name == 'db.query' else name[3:]
+        DB_QUERY_DURATION.observe(duration, operation)
+    elif name.startswith('llm.'):
+        provider = name[4:]
+        LLM_CALL_DURATION.observe(duration, provider, attributes.get('stage', ''))
+        response_cached = attributes.get('response_cached', False)
+        CACHE_REQUESTS.inc('llm_response', 'hit' if response_cached else 'miss')
+        if not response_cached:
+            for kind in ('prompt', 'output', 'cached', 'thoughts'):
+                LLM_TOKENS.observe(attributes.get(f"{kind}_tokens", 0), provider, kind)
+            if provider == 'gemini':
+                CACHE_REQUESTS.inc('gemini_context', 'hit' if attributes.get('cached_tokens') else 'miss')
+    elif name == 'gemini.file':
+        CACHE_REQUESTS.inc('gemini_file', 'hit' if attributes.get('reused') else 'miss')
+    elif name in EXTERNAL_SPANS:
+        EXTERNAL_CALL_DURATION.observe(duration, name, span.status)
+
+
+add_span_processor(_observe_span)
+
+
+def render_metrics() -> str:
+    """
+    輸出所有指標（Prometheus 文字格式）
+
+    Returns:
+        str: /metrics 的回應內容
+    """
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
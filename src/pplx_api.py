@@ -3,7 +3,6 @@ import requests
 import os
 import sys
 from dotenv import load_dotenv
-from perplexity import Perplexity
 import glob
 import time
 
@@ -11,77 +10,99 @@ load_dotenv()
 
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import PATHS
+from config import PATHS, FAKE_BACKENDS
+from src.artifact_store import write_artifact, is_artifact_fresh
+from src.artifact_format import load_artifact, resolve_artifact_path
+from src.llm_telemetry import llm_call
+from src.log import get_logger, sampled
+from src.resilience import get_policy
+from src.tracing import span, traced
+
+if FAKE_BACKENDS['ENABLED']:
+    from src.fake_backends import FakePerplexity as Perplexity
+else:
+    from perplexity import Perplexity
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 TIMEOUT = 20
 
+logger = get_logger(__name__)
+# 逐筆驗證的進度訊息只取樣輸出
+item_logger = sampled(logger)
+
 def verify_single_url(url):
     """驗證單一 URL 的有效性並提取標題"""
-    try:
-        url = url.strip().strip('"').strip("'")
-        response = requests.get(url, headers=HEADERS, timeout=TIMEOUT, allow_redirects=True)
-        
-        if response.status_code in [200, 403]:
-            text = response.text
-            title_start = text.find('<title>') + 7
-            title_end = text.find('</title>', title_start)
-            page_title = text[title_start:title_end].strip() if title_start > 6 else "ESG Evidence"
+    with span('http.probe', url=url) as probe:
+        try:
+            url = url.strip().strip('"').strip("'")
+            response = requests.get(url, headers=HEADERS, timeout=TIMEOUT, allow_redirects=True)
+            probe.set(status_code=response.status_code, bytes=len(response.content))
             
-            return {
-                "url": url,
-                "is_valid": True,
-                "page_title": page_title,
-                "status_code": response.status_code
-            }
-    except Exception as e:
-        print(f"  ❌ 驗證錯誤 ({type(e).__name__}): {url}")
-    return {"url": url, "is_valid": False, "page_title": None}
+            if response.status_code in [200, 403]:
+                text = response.text
+                title_start = text.find('<title>') + 7
+                title_end = text.find('</title>', title_start)
+                page_title = text[title_start:title_end].strip() if title_start > 6 else "ESG Evidence"
+                
+                return {
+                    "url": url,
+                    "is_valid": True,
+                    "page_title": page_title,
+                    "status_code": response.status_code
+                }
+        except Exception as e:
+            probe.set(failed=type(e).__name__)
+            logger.warning(f"驗證錯誤 ({type(e).__name__}): {url}")
+        return {"url": url, "is_valid": False, "page_title": None}
 
 
-def search_with_perplexity(query):
-    """使用 Perplexity 搜尋"""
+def search_with_perplexity(query, company_key=None):
+    """使用 Perplexity 搜尋（company_key 為用量統計的公司鍵）"""
     try:
         perplexity_client = Perplexity(api_key=os.environ.get("PERPLEXITY_API_KEY"))
         prompt = f"提供關於「{query}」的1個可靠資訊來源網址。僅輸出JSON格式：{{\"urls\": [\"url1\"]}}"
         
-        response = perplexity_client.chat.completions.create(
-            model="sonar",
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with llm_call('perplexity', 'sonar', stage='p3', company=company_key) as call:
+            response = get_policy('perplexity').call(
+                perplexity_client.chat.completions.create,
+                model="sonar",
+                messages=[{"role": "user", "content": prompt}],
+                on_retry=call.add_retry
+            )
+            call.record_openai_usage(response.usage)
         
-        usage = response.usage  # Access prompt_tokens, completion_tokens, total_tokens
-        print(f"Perplexity API: Input={usage.prompt_tokens}, Output={usage.completion_tokens}, Total={usage.total_tokens}")
+        logger.debug(f"Perplexity API: Input={call.prompt_tokens}, Output={call.output_tokens}, Total={call.total_tokens}")
 
         content = response.choices[0].message.content
         clean_json = content.replace('```json', '').replace('```', '').strip()
         result = json.loads(clean_json)
         return result.get('urls', [])
     except Exception as e:
-        print(f"Perplexity 失敗: {e}")
+        logger.warning(f"Perplexity 失敗: {e}")
         return []
 
-def find_alternative_url(company, year, evidence_summary, original_url):
+def find_alternative_url(company, year, evidence_summary, original_url, company_key=None):
     """尋找替代的有效 URL"""
     # 構建搜尋關鍵字
     search_query = f"{company} {year} ESG {evidence_summary[:50]}"
     
-    print(f"  🔍 搜尋替代 URL: {search_query}")
+    logger.debug(f"🔍 搜尋替代 URL: {search_query}")
 
 
     # 備援：Perplexity搜尋新聞
-    pplx_urls = search_with_perplexity(search_query)
+    pplx_urls = search_with_perplexity(search_query, company_key=company_key)
     for url in pplx_urls:
         verification = verify_single_url(url)
         if verification["is_valid"]:
-            print(f"  ✅ Perplexity 找到有效 URL: {url}")
+            logger.info(f"✅ Perplexity 找到有效 URL: {url}")
             return url
     
-    print(f"  ⚠️ 無法找到替代 URL，保留原網址")
+    logger.warning(f"無法找到替代 URL，保留原網址: {original_url}")
     return original_url
 
+@traced('stage.p3')
 def verify_evidence_sources(year, company_code, force_regenerate=False):
     """
     驗證 ESG 分析外部證據來源的可靠度
@@ -122,15 +143,15 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
         output_file = os.path.join(output_folder, f'{year}_{company_code}_p3.json')
         
         # 2. 檢查輸入檔案是否存在
-        if not os.path.exists(input_file):
+        if resolve_artifact_path(input_file) is None:
             return {
                 'success': False,
                 'message': f'輸入檔案不存在: {input_file}',
                 'error': 'Input file not found'
             }
         
-        # 3. 檢查輸出檔案是否已存在
-        if os.path.exists(output_file) and not force_regenerate:
+        # 3. 檢查輸出檔案是否仍對應目前的 P2（P2 未變更則跳過）
+        if not force_regenerate and is_artifact_fresh('P3_JSON', year, company_code, [input_file]):
             execution_time = time.perf_counter() - start_time
             return {
                 'success': True,
@@ -143,9 +164,8 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
             }
         
         # 4. 讀取 P2 JSON
-        print(f"📖 讀取檔案: {input_file}")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        logger.info(f"📖 讀取檔案: {input_file}")
+        data = load_artifact(input_file)
         
         total = len(data)
         verified_count = 0
@@ -153,7 +173,7 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
         failed_count = 0
         perplexity_calls = 0
         
-        print(f"\n開始驗證 {total} 筆資料...\n")
+        logger.info(f"開始驗證 {total} 筆資料...")
         
         # 5. 逐筆驗證 URL
         for idx, item in enumerate(data, 1):
@@ -162,46 +182,40 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
             year_str = item.get("year", "")
             evidence = item.get("external_evidence", "")
             
-            print(f"[{idx}/{total}] 處理: {company} {year_str} - {item.get('esg_category')}")
-            print(f"  原始 URL: {url}")
+            item_logger.info(f"[{idx}/{total}] 處理: {company} {year_str} - {item.get('esg_category')}")
+            logger.debug(f"原始 URL: {url}")
             
             # 驗證原始 URL
             verification = verify_single_url(url)
             
             if verification["is_valid"]:
-                print(f"  ✅ URL 有效 (狀態碼: {verification['status_code']})")
+                logger.debug(f"✅ URL 有效 (狀態碼: {verification['status_code']})")
                 verified_count += 1
                 item["is_verified"] = "True"
             else:
-                print(f"  ❌ URL 失效，開始尋找替代...")
+                logger.info(f"[{idx}/{total}] URL 失效，開始尋找替代: {url}")
                 perplexity_calls += 1
-                new_url = find_alternative_url(company, year_str, evidence, url)
+                new_url = find_alternative_url(company, year_str, evidence, url,
+                                               company_key=f"{year}_{company_code}")
                 
                 if new_url != url:
                     item["external_evidence_url"] = new_url
                     item["is_verified"] = "True"
                     updated_count += 1
-                    print(f"  🔄 已更新為新 URL")
+                    logger.info(f"[{idx}/{total}] 🔄 已更新為新 URL")
                 else:
                     item["is_verified"] = "Failed"
                     failed_count += 1
-            
-            print()
         
-        # 6. 寫入 P3 JSON
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 6. 寫入 P3 JSON（原子寫入並記錄輸入雜湊）
+        output_file = write_artifact('P3_JSON', year, company_code, data, stage='p3', inputs=[input_file])
         
         execution_time = time.perf_counter() - start_time
         
         # 7. 返回結果
-        print(f"✅ 處理完成！")
-        print(f"📊 統計結果:")
-        print(f"  - 總共處理: {total} 筆")
-        print(f"  - 有效 URL: {verified_count} 筆")
-        print(f"  - 已更新 URL: {updated_count} 筆")
-        print(f"  - 失敗: {failed_count} 筆")
-        print(f"📁 輸出檔案: {output_file}")
+        logger.info(f"✅ 處理完成！共 {total} 筆：有效 {verified_count}、已更新 {updated_count}、失敗 {failed_count}"
+                    f"（{execution_time:.1f} 秒）")
+        logger.info(f"📁 輸出檔案: {output_file}")
         
         return {
             'success': True,
@@ -221,7 +235,7 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
     except Exception as e:
         execution_time = time.perf_counter() - start_time
         error_msg = str(e)
-        print(f"❌ 驗證過程發生錯誤: {error_msg}")
+        logger.exception(f"驗證過程發生錯誤: {error_msg}")
         
         return {
             'success': False,
@@ -234,7 +248,7 @@ def verify_evidence_sources(year, company_code, force_regenerate=False):
 
 def process_json_file(input_file, output_file):
     """處理 JSON 檔案中的所有 URL"""
-    print(f"📖 讀取檔案: {input_file}")
+    logger.info(f"📖 讀取檔案: {input_file}")
     
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -243,7 +257,7 @@ def process_json_file(input_file, output_file):
     verified_count = 0
     updated_count = 0
     
-    print(f"\n開始驗證 {total} 筆資料...\n")
+    logger.info(f"開始驗證 {total} 筆資料...")
     
     for idx, item in enumerate(data, 1):
         url = item.get("external_evidence_url", "")
@@ -251,38 +265,31 @@ def process_json_file(input_file, output_file):
         year = item.get("year", "")
         evidence = item.get("external_evidence", "")
         
-        print(f"[{idx}/{total}] 處理: {company} {year} - {item.get('esg_category')}")
-        print(f"  原始 URL: {url}")
+        item_logger.info(f"[{idx}/{total}] 處理: {company} {year} - {item.get('esg_category')}")
+        logger.debug(f"原始 URL: {url}")
         
         # 驗證原始 URL
         verification = verify_single_url(url)
         
         if verification["is_valid"]:
-            print(f"  ✅ URL 有效 (狀態碼: {verification['status_code']})")
+            logger.debug(f"✅ URL 有效 (狀態碼: {verification['status_code']})")
             verified_count += 1
             item["is_verified"] = "True"
         else:
-            print(f"  ❌ URL 失效，開始尋找替代...")
+            logger.info(f"[{idx}/{total}] URL 失效，開始尋找替代: {url}")
             new_url = find_alternative_url(company, year, evidence, url)
             
             if new_url != url:
                 item["external_evidence_url"] = new_url
                 item["is_verified"] = "True"
                 updated_count += 1
-                print(f" 🔄 已更新為新 URL")
+                logger.info(f"[{idx}/{total}] 🔄 已更新為新 URL")
             else:
                 item["is_verified"] = "Failed"
-            
-        print()
-    
     
-    print(f"✅ 處理完成！")
-    print(f"📊 統計結果:")
-    print(f"  - 總共處理: {total} 筆")
-    print(f"  - 有效 URL: {verified_count} 筆")
-    print(f"  - 已更新 URL: {updated_count} 筆")
-    print(f"  - 失敗: {total - verified_count - updated_count} 筆")
-    print(f"📁 輸出檔案: {output_file}")
+    logger.info(f"✅ 處理完成！共 {total} 筆：有效 {verified_count}、已更新 {updated_count}、"
+                f"失敗 {total - verified_count - updated_count}")
+    logger.info(f"📁 輸出檔案: {output_file}")
 
 def get_latest_file(folder_path, extension=".json"):
     """自動偵測資料夾中最新的 JSON 檔案"""
@@ -0,0 +1,369 @@
+"""
+效能剖析模組
+
+以取樣方式（每 PROFILE_INTERVAL 秒擷取一次所有相關執行緒的呼叫堆疊）剖析單次分析或批次作業，
+找出某份報告特別慢時時間花在哪些函數上。取樣記錄的是牆鐘時間，等待 Gemini、GNews、
+TWSE 回應的時間也會計入（堆疊頂端為 socket / ssl 等函數）。
+
+只取樣屬於本次執行的執行緒：發起剖析的執行緒，以及正在執行同一個 trace 之 span 的執行緒
+（以 bind_context() 啟動的 Word Cloud、P1、新聞管線、P2 並行驗證等）。每個樣本依該執行緒
+目前 span 的 stage 屬性（download、p1、news、p2、p3、wordcloud…）歸類，可分別檢視各步驟的熱點。
+
+啟用方式：
+    單次請求:  POST /api/query_company 時帶入 "profile": true（或 ?profile=1）
+    所有執行:  環境變數 PROFILE=1（含 bulk_download_reports 等批次作業）
+
+結果寫入 temp_data/profiles/<名稱>_<時間>.json，可用本模組的命令列工具摘要，
+或以 --folded 匯出折疊堆疊，交給 speedscope / flamegraph.pl 繪製火焰圖。
+
+主要函數：
+    start_profiling: 開始剖析（未啟用時回傳 None），結束時呼叫 session.stop()
+    profile_run: 以 context manager 剖析一段程式
+    profiled: 剖析整個函數的裝飾器（依 PROFILE 環境變數決定是否啟用）
+    load_profile / summarize_profile: 讀取結果並統計各步驟的熱點函數
+
+使用範例：
+    from src.profiling import profile_run
+
+    with profile_run('2024_1102', enabled=True) as session:
+        run_pipeline()
+    print(session.output_path)
+
+    # 摘要各步驟最耗時的函數
+    python src/profiling.py temp_data/profiles/2024_1102_20250101_120000.json --top 15
+    python src/profiling.py temp_data/profiles/2024_1102_20250101_120000.json --stage p1 --folded p1.folded
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS, PROFILING, PROJECT_ROOT
+from src.artifact_store import atomic_write_json
+from src.log import get_logger
+from src.tracing import Span, add_span_processor, add_span_start_processor, current_span, span
+
+logger = get_logger(__name__)
+
+# 不在任何 stage.* span 內的樣本（例如 query_company 的資料庫操作）
+OTHER_STAGE = 'other'
+
+# === 各執行緒目前所在的 span（只在有剖析進行時維護） ===
+_sessions: Dict[int, 'ProfileSession'] = {}
+_sessions_lock = threading.Lock()
+_thread_spans: Dict[int, List[Span]] = {}
+
+
+def _on_span_start(started: Span) -> None:
+    if not _sessions:
+        return
+    _thread_spans.setdefault(threading.get_ident(), []).append(started)
+
+
+def _on_span_end(ended: Span) -> None:
+    if not _sessions:
+        return
+    stack = _thread_spans.get(threading.get_ident())
+    if stack and ended in stack:
+        # 通常就是最上層；剖析途中才開始記錄的執行緒可能缺少外層 span
+        del stack[len(stack) - 1 - stack[::-1].index(ended):]
+
+
+add_span_start_processor(_on_span_start)
+add_span_processor(_on_span_end)
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(PROJECT_ROOT):
+        path = os.path.relpath(path, PROJECT_ROOT)
+    elif 'site-packages' in path:
+        path = path.split('site-packages' + os.sep, 1)[-1]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """
+    一次剖析
+
+    背景執行緒每 interval 秒以 sys._current_frames() 擷取堆疊，
+    依執行緒目前 span 的 stage 分別累計（堆疊以 code 物件的 tuple 表示，寫出時才轉為文字）。
+    """
+
+    def __init__(self, name: str, interval: float = PROFILING['INTERVAL'], **metadata: Any):
+        self.name = name
+        self.interval = interval
+        self.metadata = metadata
+        self.output_path = os.path.join(
+            PATHS['PROFILES'], f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        self.samples: Dict[str, Counter] = {}
+        self.sample_count = 0
+        self.trace_id: Optional[str] = None
+        self._owner_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._start = 0.0
+        self.duration = 0.0
+
+    def start(self) -> "ProfileSession":
+        """開始取樣（需在本次執行的根 span 之內呼叫，才能涵蓋子執行緒）"""
+        root = current_span()
+        self.trace_id = root.trace_id if root else None
+        self._owner_thread = threading.get_ident()
+        with _sessions_lock:
+            _sessions[id(self)] = self
+            if root is not None:
+                _thread_spans.setdefault(self._owner_thread, []).append(root)
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='ProfilerThread', daemon=True)
+        self._sampler.start()
+        logger.info(f"🔬 開始效能剖析: {self.name}（每 {self.interval * 1000:.0f} ms 取樣）")
+        return self
+
+    def _stage_of(self, thread_id: int) -> Optional[str]:
+        stack = _thread_spans.get(thread_id)
+        if stack:
+            for active in reversed(stack):
+                if self.trace_id is not None and active.trace_id == self.trace_id:
+                    return active.attributes.get('stage') or OTHER_STAGE
+        return OTHER_STAGE if thread_id == self._owner_thread else None
+
+    def _run(self) -> None:
+        sampler_id = threading.get_ident()
+        max_depth = PROFILING['MAX_DEPTH']
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                stage = self._stage_of(thread_id)
+                if stage is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < max_depth:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.setdefault(stage, Counter())[tuple(stack)] += 1
+                self.sample_count += 1
+
+    def stop(self) -> Optional[str]:
+        """
+        停止取樣並寫出結果
+
+        Returns:
+            str: 結果檔路徑（寫出失敗時為 None）
+        """
+        if self._sampler is None:
+            return None
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self.duration = time.perf_counter() - self._start
+        with _sessions_lock:
+            _sessions.pop(id(self), None)
+            if not _sessions:
+                _thread_spans.clear()
+
+        stages = {}
+        for stage, counter in self.samples.items():
+            stacks: Counter = Counter()
+            for stack, count in counter.items():
+                stacks[';'.join(_frame_label(code) for code in stack)] += count
+            stages[stage] = {'samples': sum(counter.values()), 'stacks': dict(stacks.most_common())}
+
+        profile = {
+            'name': self.name,
+            'started_at': datetime.fromtimestamp(self._started_at).isoformat(timespec='seconds'),
+            'duration': round(self.duration, 3),
+            'interval': self.interval,
+            'samples': self.sample_count,
+            'trace_id': self.trace_id,
+            'metadata': self.metadata,
+            'stages': stages,
+        }
+        try:
+            atomic_write_json(self.output_path, profile)
+        except OSError as e:
+            logger.error(f"效能剖析結果寫入失敗: {e}")
+            return None
+        logger.info(f"🔬 效能剖析完成: {self.sample_count} 個樣本，{self.duration:.1f} 秒 → {self.output_path}")
+        return self.output_path
+
+
+def start_profiling(name: str, enabled: Optional[bool] = None, **metadata: Any) -> Optional[ProfileSession]:
+    """
+    開始剖析
+
+    Args:
+        name: 結果檔名稱前綴（例如 '2024_1102'）
+        enabled: 是否剖析（None 表示依 PROFILE 環境變數）
+        **metadata: 寫入結果檔的附加資訊（esg_id 等）
+
+    Returns:
+        ProfileSession（未啟用時為 None）
+    """
+    if enabled is None:
+        enabled = PROFILING['ENABLED']
+    if not enabled:
+        return None
+    return ProfileSession(name, **metadata).start()
+
+
+@contextmanager
+def profile_run(name: str, enabled: Optional[bool] = None, **metadata: Any) -> Iterator[Optional[ProfileSession]]:
+    """
+    剖析一段程式（區塊外沒有 span 時會建立 'profile' span 作為根）
+
+    Yields:
+        ProfileSession（未啟用時為 None）
+    """
+    if enabled is None:
+        enabled = PROFILING['ENABLED']
+    if not enabled:
+        yield None
+        return
+
+    with span('profile', name=name) if current_span() is None else nullcontext():
+        session = start_profiling(name, True, **metadata)
+        try:
+            yield session
+        finally:
+            session.stop()
+
+
+def profiled(name: str) -> Callable:
+    """
+    依 PROFILE 環境變數剖析整個函數的裝飾器（用於批次作業）
+
+    Args:
+        name: 結果檔名稱前綴
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_run(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =========================
+# 檢視
+# =========================
+def load_profile(path: str) -> Dict[str, Any]:
+    """讀取剖析結果檔"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def summarize_profile(profile: Dict[str, Any], stage: Optional[str] = None,
+                      top: int = 20) -> Dict[str, Dict[str, Any]]:
+    """
+    統計各步驟的熱點函數
+
+    Args:
+        profile: load_profile() 的結果
+        stage: 只統計指定步驟（None 表示全部）
+        top: 每個步驟列出的函數數
+
+    Returns:
+        dict: {步驟: {
+            'samples': int,
+            'seconds': float,                        # 執行緒秒數（樣本數 × 取樣間隔）
+            'self': [(函數, 樣本數), ...],            # 位於堆疊頂端（正在執行）的次數
+            'total': [(函數, 樣本數), ...]            # 出現在堆疊中（含呼叫的函數）的次數
+        }}
+    """
+    summary = {}
+    for name, data in profile['stages'].items():
+        if stage and name != stage:
+            continue
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in data['stacks'].items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        summary[name] = {
+            'samples': data['samples'],
+            'seconds': round(data['samples'] * profile['interval'], 3),
+            'self': self_counts.most_common(top),
+            'total': total_counts.most_common(top),
+        }
+    return dict(sorted(summary.items(), key=lambda item: -item[1]['samples']))
+
+
+def _print_table(title: str, rows: List[Tuple[str, int]], samples: int) -> None:
+    print(f"  {title}")
+    for label, count in rows:
+        print(f"    {count / samples:>6.1%} {count:>7}  {label}")
+
+
+def export_folded(profile: Dict[str, Any], path: str, stage: Optional[str] = None) -> int:
+    """
+    匯出折疊堆疊（每行 "步驟;函數;...;函數 樣本數"，供 speedscope / flamegraph.pl 使用）
+
+    Returns:
+        int: 寫出的行數
+    """
+    lines = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for name, data in profile['stages'].items():
+            if stage and name != stage:
+                continue
+            for stack, count in data['stacks'].items():
+                f.write(f"{name};{stack} {count}\n")
+                lines += 1
+    return lines
+
+
+def main():
+    """命令列執行：摘要剖析結果"""
+    parser = argparse.ArgumentParser(description='效能剖析結果摘要')
+    parser.add_argument('path', nargs='?', help='剖析結果檔（預設為 temp_data/profiles 中最新的檔案）')
+    parser.add_argument('--stage', help='只顯示指定步驟（例如 p1、news、p2）')
+    parser.add_argument('--top', type=int, default=15, help='每個步驟列出的函數數（預設 15）')
+    parser.add_argument('--folded', metavar='FILE', help='匯出折疊堆疊檔')
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        profile_dir = PATHS['PROFILES']
+        files = [os.path.join(profile_dir, name) for name in os.listdir(profile_dir)
+                 if name.endswith('.json')] if os.path.isdir(profile_dir) else []
+        if not files:
+            print(f"❌ 找不到剖析結果: {profile_dir}")
+            sys.exit(1)
+        path = max(files, key=os.path.getmtime)
+
+    profile = load_profile(path)
+    print(f"📁 {path}")
+    print(f"🔬 {profile['name']}：{profile['duration']:.1f} 秒，{profile['samples']} 個樣本"
+          f"（每 {profile['interval'] * 1000:.0f} ms）\n")
+
+    for name, stats in summarize_profile(profile, args.stage, args.top).items():
+        print(f"=== {name}: {stats['samples']} 個樣本（約 {stats['seconds']:.1f} 執行緒秒）===")
+        _print_table('自身（正在執行）', stats['self'], stats['samples'])
+        _print_table('累計（含呼叫的函數）', stats['total'], stats['samples'])
+        print()
+
+    if args.folded:
+        lines = export_folded(profile, args.folded, args.stage)
+        print(f"📁 已匯出折疊堆疊（{lines} 行）: {args.folded}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+產業與同業排名彙總模組
+
+以記憶體內的增量彙總回答「1102 在 2024 年水泥工業中排第幾」這類問題，
+不需每次查詢都重新計算所有公司的分數：
+
+    - 依（年度, 產業）分組，另有（年度, 全部產業）一組
+    - 每組保存依漂綠風險總分（Total）排序的 list，名次與百分位以 bisect 求得（O(log n)）
+    - E / S / G / Total 的合計隨寫入增減，平均值為 O(1)；前 N 名為排序 list 的尾端切片
+    - insert_analysis_results() 寫入一家公司時呼叫 update_company_scores() 即時更新該公司
+
+彙總在第一次查詢時由資料庫一次建立（每家公司以 calculate_esg_scores_batch 評分），
+之後靠增量更新維持。彙總保存在行程記憶體中，多個行程各自維護一份；增量更新只涵蓋
+本行程的寫入，因此建立超過 REFRESH_SECONDS 後的查詢會重新由資料庫建立，其他行程
+（其他 worker、批次腳本）寫入的分析最遲在這段時間後出現。重建期間其他查詢繼續使用
+既有的彙總，不會被擋住。
+
+名次依 Total 由高至低排列（第 1 名為漂綠風險最高者）；百分位為分數小於或等於
+該公司的同業比例。
+
+主要函數：
+    update_company_scores: 新增或更新一家公司的分數（增量維護）
+    get_rankings: 查詢某年度（及產業）的平均、四分位數、前 N 名與指定公司的名次
+
+使用範例：
+    from src.rankings import get_rankings
+
+    result = get_rankings(2024, industry='水泥工業', company_code='1102', top=5)
+    print(result['company']['rank'], result['company']['percentile'])
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.log import get_logger
+
+logger = get_logger(__name__)
+
+# === 模組常數 ===
+SCORE_KEYS = ('E', 'S', 'G', 'Total')
+
+# 前 N 名的預設與上限
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+# 彙總建立後經過多久（秒）由資料庫重建，以納入其他行程的寫入
+REFRESH_SECONDS = float(os.getenv('RANKINGS_REFRESH_SECONDS', '300'))
+
+
+class _Group:
+    """單一（年度, 產業）分組：依 Total 排序的名單與各分數合計"""
+
+    def __init__(self):
+        self.ranked: List[Tuple[float, str]] = []  # (Total, 公司代碼)，由低至高
+        self.sums = {key: 0.0 for key in SCORE_KEYS}
+
+    def add(self, company_code: str, scores: Dict[str, float]) -> None:
+        bisect.insort(self.ranked, (scores['Total'], company_code))
+        for key in SCORE_KEYS:
+            self.sums[key] += scores[key]
+
+    def remove(self, company_code: str, scores: Dict[str, float]) -> None:
+        index = bisect.bisect_left(self.ranked, (scores['Total'], company_code))
+        del self.ranked[index]
+        for key in SCORE_KEYS:
+            self.sums[key] -= scores[key]
+
+    def rank_of(self, total: float) -> Tuple[int, float]:
+        """回傳 (名次, 百分位)：同分者名次相同"""
+        count = len(self.ranked)
+        at_or_below = bisect.bisect_right(self.ranked, total, key=lambda item: item[0])
+        return count - at_or_below + 1, round(at_or_below / count * 100, 1)
+
+    def quantile(self, q: float) -> float:
+        """Total 的分位數（相鄰兩名線性內插）"""
+        position = q * (len(self.ranked) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(self.ranked) - 1)
+        low, high = self.ranked[lower][0], self.ranked[upper][0]
+        return round(low + (high - low) * (position - lower), 1)
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.ranked)
+        return {
+            'count': count,
+            'mean': {key: round(value / count, 1) for key, value in self.sums.items()},
+            'percentiles': {'p25': self.quantile(0.25), 'p50': self.quantile(0.5), 'p75': self.quantile(0.75)},
+        }
+
+
+class RankingIndex:
+    """各年度、產業的排名彙總（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 序列化由資料庫建立彙總的流程（讀取資料庫時不持有 _lock）
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._loaded_at = 0.0  # time.monotonic()
+        self._loading = False
+        # 建立期間收到的增量更新，建立完成後依序套用
+        self._pending: List[Tuple[int, str, str, str, Dict[str, float]]] = []
+        self._groups: Dict[Tuple[int, Optional[str]], _Group] = {}
+        # {(年度, 公司代碼): {'name', 'industry', 'scores'}}
+        self._companies: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+    def _apply(self, year: int, company_code: str, company_name: str, industry: str,
+               scores: Dict[str, float]) -> None:
+        """新增或取代一家公司（呼叫端需持有鎖）"""
+        # None 代表「全部產業」分組，未填產業的公司歸入空字串
+        industry = industry or ''
+        key = (year, company_code)
+        previous = self._companies.get(key)
+        if previous is not None:
+            for group_key in ((year, previous['industry']), (year, None)):
+                group = self._groups[group_key]
+                group.remove(company_code, previous['scores'])
+                if not group.ranked:
+                    del self._groups[group_key]
+
+        scores = {name: float(scores[name]) for name in SCORE_KEYS}
+        self._companies[key] = {'name': company_name, 'industry': industry, 'scores': scores}
+        for group_key in ((year, industry), (year, None)):
+            self._groups.setdefault(group_key, _Group()).add(company_code, scores)
+
+    def load(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        以完整資料建立彙總（取代目前內容）
+
+        Args:
+            rows: [{'year', 'company_code', 'company_name', 'industry', 'scores'}, ...]
+        """
+        with self._lock:
+            self._load(rows)
+
+    def _load(self, rows: List[Dict[str, Any]]) -> None:
+        self._groups.clear()
+        self._companies.clear()
+        for row in rows:
+            self._apply(int(row['year']), str(row['company_code']), row['company_name'],
+                        row['industry'], row['scores'])
+        self._loaded = True
+
+    def _is_fresh(self) -> bool:
+        return self._loaded and time.monotonic() - self._loaded_at < REFRESH_SECONDS
+
+    def ensure_loaded(self) -> None:
+        """
+        尚未建立或已超過 REFRESH_SECONDS 時由資料庫建立
+
+        第一次建立時所有查詢都等待建立完成；之後的重建只由一個執行緒進行，
+        其他查詢直接使用既有的彙總，重建失敗時也保留既有的彙總。
+        """
+        if self._is_fresh():
+            return
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._rebuild()
+            return
+        if not self._load_lock.acquire(blocking=False):
+            return
+        try:
+            if not self._is_fresh():
+                self._rebuild()
+        except Exception as e:
+            logger.warning(f"[RANKINGS] 重建排名彙總失敗，沿用既有彙總: {e}")
+        finally:
+            self._load_lock.release()
+
+    def _rebuild(self) -> None:
+        """
+        由資料庫重新建立彙總（呼叫端需持有 _load_lock）
+
+        讀取資料庫與建立彙總都在 _lock 之外進行，完成後才整份替換；
+        建立期間的增量更新先暫存，替換後再套用，不會被資料庫讀取擋住。
+        """
+        with self._lock:
+            self._loading = True
+            self._pending.clear()
+        try:
+            rows = _fetch_company_scores()
+            fresh = RankingIndex()
+            fresh._load(rows)
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending.clear()
+            raise
+        with self._lock:
+            self._groups, self._companies = fresh._groups, fresh._companies
+            for pending in self._pending:
+                self._apply(*pending)
+            self._pending.clear()
+            self._loading = False
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+        logger.info(f"[RANKINGS] 已建立排名彙總：{len(rows)} 家公司")
+
+    def update(self, year: int, company_code: str, company_name: str, industry: str,
+               scores: Dict[str, float]) -> None:
+        """新增或更新一家公司；彙總尚未建立時略過（建立時會從資料庫讀到這筆資料）"""
+        update = (int(year), str(company_code), company_name, industry, scores)
+        with self._lock:
+            if self._loaded:
+                self._apply(*update)
+            if self._loading:
+                # 資料庫讀取可能早於這筆寫入，建立完成（替換彙總）後再套用一次
+                self._pending.append(update)
+
+    def query(self, year: int, industry: Optional[str] = None, company_code: Optional[str] = None,
+              top: int = DEFAULT_TOP) -> Optional[Dict[str, Any]]:
+        """見 get_rankings"""
+        self.ensure_loaded()
+        year = int(year)
+        with self._lock:
+            company = self._companies.get((year, str(company_code))) if company_code else None
+            if company_code and company is None:
+                return None
+            if company is not None:
+                if industry is None:
+                    # 只指定公司時，與同產業的公司比較
+                    industry = company['industry']
+                elif industry != company['industry']:
+                    raise ValueError(f"公司 {company_code} 的產業為「{company['industry']}」，不屬於「{industry}」")
+            group = self._groups.get((year, industry))
+            if group is None:
+                return None
+
+            result = {'year': year, 'industry': industry}
+            result.update(group.summary())
+            result['top'] = []
+            for total, code in reversed(group.ranked[-top:] if top > 0 else []):
+                info = self._companies[(year, code)]
+                result['top'].append({
+                    'stockId': code,
+                    'name': info['name'],
+                    'industry': info['industry'],
+                    'rank': group.rank_of(total)[0],
+                    'greenwashingScore': total,
+                })
+            if company is not None:
+                rank, percentile = group.rank_of(company['scores']['Total'])
+                result['company'] = {
+                    'stockId': str(company_code),
+                    'name': company['name'],
+                    'industry': company['industry'],
+                    'rank': rank,
+                    'percentile': percentile,
+                    'greenwashingScore': company['scores']['Total'],
+                    'eScore': company['scores']['E'],
+                    'sScore': company['scores']['S'],
+                    'gScore': company['scores']['G'],
+                }
+            if industry is None:
+                # 全部產業：附上各產業的公司數與平均總分
+                result['industries'] = {
+                    name: {'count': len(g.ranked), 'mean': round(g.sums['Total'] / len(g.ranked), 1)}
+                    for (group_year, name), g in self._groups.items()
+                    if group_year == year and name is not None
+                }
+            return result
+
+
+def _fetch_company_scores() -> List[Dict[str, Any]]:
+    """由資料庫讀取所有已完成分析的公司，並以批次評分計算分數（建立彙總時使用一次）"""
+    # db_service 寫入時會呼叫本模組，因此在函數內匯入
+    from src.calculate_esg import calculate_esg_scores_batch
+    from src.db_service import get_db_connection
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT company_code, Report_year, company_name, industry
+                FROM company
+                WHERE analysis_status = 'completed'
+            """)
+            companies = cursor.fetchall()
+            cursor.execute("""
+                SELECT company_id, year, ESG_category, SASB_topic, adjustment_score
+                FROM company_report
+            """)
+            records = cursor.fetchall()
+
+    info = {(str(row['company_code']), int(row['Report_year'])): row for row in companies}
+    for record in records:
+        record['company_id'] = str(record['company_id'])
+        record['year'] = int(record['year'])
+    scores = calculate_esg_scores_batch({key: row['industry'] for key, row in info.items()},
+                                        records, key=('company_id', 'year'))
+    return [{
+        'year': year,
+        'company_code': company_code,
+        'company_name': info[(company_code, year)]['company_name'],
+        'industry': info[(company_code, year)]['industry'],
+        'scores': company_scores,
+    } for (company_code, year), company_scores in scores.items()]
+
+
+_index = RankingIndex()
+
+
+def update_company_scores(year: int, company_code: str, company_name: str, industry: str,
+                          scores: Dict[str, float]) -> None:
+    """
+    新增或更新一家公司的分數（insert_analysis_results 寫入後呼叫）
+
+    Args:
+        year: 報告年度
+        company_code: 公司代碼
+        company_name: 公司名稱
+        industry: 產業別
+        scores: calculate_esg_scores() 的結果（E / S / G / Total）
+    """
+    _index.update(year, company_code, company_name, industry, scores)
+
+
+def get_rankings(year: int, industry: Optional[str] = None, company_code: Optional[str] = None,
+                 top: int = DEFAULT_TOP) -> Optional[Dict[str, Any]]:
+    """
+    查詢排名彙總
+
+    Args:
+        year: 報告年度
+        industry: 產業別（省略時：有指定公司則用該公司的產業，否則為全部產業；指定公司時須為該公司的產業）
+        company_code: 要查詢名次的公司代碼（選填）
+        top: 前 N 名（0 表示不列出，上限 MAX_TOP）
+
+    Returns:
+        dict or None: {
+            'year', 'industry', 'count',
+            'mean': {'E', 'S', 'G', 'Total'},
+            'percentiles': {'p25', 'p50', 'p75'},   # Total 的四分位數
+            'top': [{'stockId', 'name', 'industry', 'rank', 'greenwashingScore'}, ...],
+            'company': {'stockId', 'rank', 'percentile', 'greenwashingScore', ...},  # 有指定公司時
+            'industries': {產業: {'count', 'mean'}}                                   # 全部產業時
+        }；找不到該年度、產業或公司時回傳 None
+
+    Raises:
+        ValueError: 同時指定 industry 與 company_code，但該公司不屬於這個產業
+    """
+    return _index.query(year, industry=industry, company_code=company_code,
+                        top=max(0, min(int(top), MAX_TOP)))
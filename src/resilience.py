@@ -0,0 +1,488 @@
+"""
+外部服務呼叫的限流、重試與熔斷模組
+
+Gemini、Perplexity、GNews 與 TWSE 共用同一套呼叫策略，每個服務（或服務下的
+主機）各自維護：
+    TokenBucket:    令牌桶限流；收到 429 時降低速率並暫停 Retry-After 秒，
+                    之後連續成功逐步恢復至設定上限（AIMD）
+    RetryPolicy:    指數退避加隨機抖動（full jitter），有 Retry-After 時以其為準
+    CircuitBreaker: 連續多次呼叫重試用盡仍失敗時熔斷，冷卻後放行一次試探請求
+
+可重試的錯誤：HTTP 408 / 429 / 5xx、RESOURCE_EXHAUSTED / UNAVAILABLE、逾時與連線錯誤。
+其他錯誤（例如 400、404）不重試，直接拋出給呼叫端。
+
+各服務的速率可用環境變數覆寫（每秒請求數），例如 RATE_LIMIT_GEMINI=2。
+
+主要類別與函數：
+    get_policy: 取得服務（與主機）共用的呼叫策略
+    ProviderPolicy.call: 依限流、熔斷、重試規則執行呼叫
+    check_response: HTTP 回應為可重試狀態碼時拋出 RetryableHTTPError
+    get_resilience_stats: 各策略的呼叫統計（供 metrics 使用）
+
+使用範例：
+    from src.resilience import get_policy, check_response
+
+    response = get_policy('perplexity').call(client.chat.completions.create, model="sonar", messages=messages)
+    res = get_policy('twse', scope=host).call(lambda: check_response(session.get(url, timeout=30)))
+"""
+
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.log import get_logger
+
+logger = get_logger(__name__)
+
+# === 模組常數 ===
+
+# 各服務的預設策略
+#   rate: 每秒請求數    burst: 可瞬間發出的請求數
+#   max_attempts: 最大嘗試次數    base_delay / max_delay: 退避基準與上限（秒）
+#   failure_threshold: 熔斷門檻（連續重試用盡仍失敗的呼叫數）    reset_timeout: 熔斷冷卻時間（秒）
+PROVIDER_LIMITS = {
+    'gemini': {'rate': 1.0, 'burst': 4, 'max_attempts': 4, 'base_delay': 2.0, 'max_delay': 60.0,
+               'failure_threshold': 5, 'reset_timeout': 60.0},
+    'perplexity': {'rate': 0.8, 'burst': 2, 'max_attempts': 3, 'base_delay': 1.0, 'max_delay': 30.0,
+                   'failure_threshold': 5, 'reset_timeout': 60.0},
+    'gnews': {'rate': 0.5, 'burst': 1, 'max_attempts': 3, 'base_delay': 5.0, 'max_delay': 60.0,
+              'failure_threshold': 6, 'reset_timeout': 120.0},
+    'twse': {'rate': 1.0, 'burst': 1, 'max_attempts': 3, 'base_delay': 2.0, 'max_delay': 30.0,
+             'failure_threshold': 5, 'reset_timeout': 60.0},
+}
+DEFAULT_LIMITS = {'rate': 1.0, 'burst': 1, 'max_attempts': 3, 'base_delay': 1.0, 'max_delay': 30.0,
+                  'failure_threshold': 5, 'reset_timeout': 60.0}
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ('RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'Too Many Requests',
+                     'timed out', 'Timeout', 'Connection reset', 'Connection aborted')
+THROTTLE_MARKERS = ('RESOURCE_EXHAUSTED', 'Too Many Requests', 'rate limit')
+
+MAX_RETRY_AFTER = 300.0   # Retry-After 的上限（秒），避免單次等待過久
+
+# 令牌桶自適應參數
+RATE_DECREASE = 0.5       # 收到 429 時速率乘數
+RATE_MIN_FRACTION = 0.1   # 速率下限（設定值的比例）
+RECOVERY_SUCCESSES = 10   # 連續成功幾次後提高速率
+RATE_INCREASE = 0.1       # 每次提高設定值的比例
+
+
+# === 例外 ===
+
+class CircuitOpenError(RuntimeError):
+    """熔斷中，請求未送出"""
+
+
+class RetryableHTTPError(RuntimeError):
+    """HTTP 回應為可重試的狀態碼"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# === 錯誤判斷 ===
+
+def _parse_retry_after(value: Any) -> Optional[float]:
+    """解析 Retry-After（秒數或 HTTP 日期）"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(str(value))
+        return max(0.0, parsed.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response):
+    """
+    檢查 HTTP 回應，可重試的狀態碼拋出 RetryableHTTPError
+
+    Args:
+        response: requests.Response
+
+    Returns:
+        原 response（狀態碼不需重試時）
+
+    Raises:
+        RetryableHTTPError: 狀態碼為 408 / 429 / 5xx
+    """
+    if response.status_code in RETRYABLE_STATUS:
+        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+        response.close()
+        raise RetryableHTTPError(response.status_code, retry_after)
+    return response
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    """取得例外所對應的 HTTP 狀態碼（非 HTTP 回應造成的例外回傳 None）"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    code = getattr(error, 'code', None)
+    if status is None and isinstance(code, int):
+        status = code
+    return status
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    判斷錯誤是否可重試
+
+    Args:
+        error: 呼叫拋出的例外
+
+    Returns:
+        Tuple[bool, bool, Optional[float]]: (可重試, 是否為限流, Retry-After 秒數)
+    """
+    if isinstance(error, CircuitOpenError):
+        return False, False, None
+
+    response = getattr(error, 'response', None)
+    status = _http_status(error)
+
+    retry_after = getattr(error, 'retry_after', None)
+    headers = getattr(response, 'headers', None)
+    if retry_after is None and headers is not None:
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+
+    message = str(error)
+    if retry_after is None:
+        # Gemini 的 429 在錯誤內容中附帶 retryDelay（例如 "retryDelay": "32s"）
+        match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", message)
+        if match:
+            retry_after = float(match.group(1))
+
+    throttled = status == 429 or any(marker in message for marker in THROTTLE_MARKERS)
+    if status is not None:
+        retryable = status in RETRYABLE_STATUS
+    else:
+        name = type(error).__name__
+        retryable = (isinstance(error, (ConnectionError, TimeoutError))
+                     or 'Timeout' in name or 'Connection' in name
+                     or any(marker in message for marker in RETRYABLE_MARKERS))
+    return retryable or throttled, throttled, retry_after
+
+
+def _is_client_error(error: Exception) -> bool:
+    """服務有回應且為 4xx（請求本身的問題，不代表服務異常）"""
+    status = _http_status(error)
+    return isinstance(status, int) and 400 <= status < 500
+
+
+# === 限流、重試、熔斷 ===
+
+class TokenBucket:
+    """
+    自適應令牌桶
+
+    令牌不足時以負值預約，後到的呼叫依序等待，確保平均速率不超過 rate。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        取得一個令牌，必要時等待
+
+        Returns:
+            float: 等待時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """收到限流回應：降低速率，並讓後續請求至少等待 retry_after 秒"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.max_rate * RATE_MIN_FRACTION, self.rate * RATE_DECREASE)
+            pause = min(retry_after, MAX_RETRY_AFTER) if retry_after is not None else 1.0 / self.rate
+            self.tokens = min(self.tokens, 0.0) - pause * self.rate
+            self._successes = 0
+
+    def success(self) -> None:
+        """呼叫成功：連續成功後逐步恢復速率"""
+        with self._lock:
+            if self.rate >= self.max_rate:
+                return
+            self._successes += 1
+            if self._successes >= RECOVERY_SUCCESSES:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE)
+                self._successes = 0
+
+
+class RetryPolicy:
+    """指數退避加隨機抖動"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        第 attempt 次失敗後的等待時間
+
+        有 Retry-After 時以其為準（加上少量抖動避免同時重送），
+        否則在 [0, min(max_delay, base_delay * 2^(attempt-1))] 間隨機取值。
+        """
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_AFTER) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    熔斷器
+
+    狀態：closed（正常）→ open（連續失敗達門檻，拒絕請求）→
+    half_open（冷卻後放行一次試探請求，成功則恢復 closed，失敗則再次 open）
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self, name: str = '') -> bool:
+        """
+        確認是否可送出請求
+
+        Returns:
+            bool: 本次請求是否為半開狀態的試探請求
+
+        Raises:
+            CircuitOpenError: 熔斷中（或已有試探請求進行中）
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return False
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"{name} 熔斷中，約 {remaining:.0f} 秒後重試")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """試探請求未記錄成功或失敗就結束時（例如被中斷）釋放，讓下一個請求可再試探"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    self.opened_count += 1
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class ProviderPolicy:
+    """
+    單一服務（或主機）的呼叫策略
+
+    Args:
+        name: 策略名稱（例如 'gemini'、'twse:esggenplus.twse.com.tw'）
+        rate, burst, max_attempts, base_delay, max_delay, failure_threshold, reset_timeout:
+            見 PROVIDER_LIMITS
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_attempts: int, base_delay: float,
+                 max_delay: float, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.retry = RetryPolicy(max_attempts, base_delay, max_delay)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._stats = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                       'throttled': 0, 'rejected': 0, 'wait_time': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[field] += amount
+
+    def call(self, fn: Callable[..., Any], *args,
+             on_retry: Optional[Callable[[int, Exception, float], None]] = None, **kwargs) -> Any:
+        """
+        依限流、熔斷、重試規則執行 fn(*args, **kwargs)
+
+        Args:
+            fn: 要執行的呼叫
+            on_retry: 每次重試前呼叫 on_retry(第幾次失敗, 例外, 等待秒數)
+
+        Returns:
+            fn 的回傳值
+
+        Raises:
+            CircuitOpenError: 熔斷中
+            Exception: 不可重試的錯誤，或重試次數用盡時的最後一個錯誤
+        """
+        self._count('calls')
+        # 熔斷只在呼叫開始時檢查一次：半開狀態下整個呼叫（含重試）即為試探請求，
+        # 結果一律以 record_success / record_failure 結算，重試不會被自己的試探擋下
+        try:
+            is_trial = self.breaker.before_call(self.name)
+        except CircuitOpenError:
+            self._count('rejected')
+            raise
+        try:
+            return self._call_with_retries(fn, args, kwargs, on_retry)
+        finally:
+            # 已結算時不影響；未結算（非 HTTP 的例外、被中斷）時釋放試探資格
+            if is_trial:
+                self.breaker.release_trial()
+
+    def _call_with_retries(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any],
+                           on_retry: Optional[Callable[[int, Exception, float], None]]) -> Any:
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self._count('wait_time', self.bucket.acquire())
+
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable, throttled, retry_after = classify_error(e)
+                if throttled:
+                    self._count('throttled')
+                    self.bucket.throttle(retry_after)
+                if not retryable or attempt == self.retry.max_attempts:
+                    # 重試用盡才計入熔斷；服務有正常回應（HTTP 4xx）代表服務本身正常。
+                    # 其他例外（解析錯誤、程式錯誤等）無法判斷服務狀態，熔斷器維持原狀
+                    if retryable:
+                        self.breaker.record_failure()
+                    elif _is_client_error(e):
+                        self.breaker.record_success()
+                    self._count('failures')
+                    raise
+
+                delay = self.retry.delay(attempt, retry_after)
+                self._count('retries')
+                logger.warning(f"[RETRY] {self.name} 第 {attempt} 次失敗（{e}），{delay:.1f} 秒後重試")
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.bucket.success()
+            self._count('successes')
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """呼叫統計與目前狀態"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'rate': self.bucket.rate,
+            'max_rate': self.bucket.max_rate,
+            'circuit_state': self.breaker.state,
+            'circuit_opened': self.breaker.opened_count
+        })
+        return stats
+
+
+# === 策略登錄 ===
+
+_policies: Dict[str, ProviderPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_provider_limits(provider: str) -> Dict[str, Any]:
+    """取得服務的策略設定（含環境變數 RATE_LIMIT_<PROVIDER> 覆寫的速率）"""
+    limits = dict(PROVIDER_LIMITS.get(provider, DEFAULT_LIMITS))
+    env_rate = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+    if env_rate:
+        try:
+            limits['rate'] = float(env_rate)
+        except ValueError:
+            logger.warning(f"忽略無效的 RATE_LIMIT_{provider.upper()}: {env_rate}")
+    return limits
+
+
+def get_policy(provider: str, scope: Optional[str] = None, **overrides) -> ProviderPolicy:
+    """
+    取得共用的呼叫策略（同一服務與範圍在行程內共用限流與熔斷狀態）
+
+    Args:
+        provider: 'gemini' | 'perplexity' | 'gnews' | 'twse'
+        scope: 範圍（例如主機名稱），不同範圍各自限流
+        **overrides: 首次建立時覆寫的設定（例如 rate=0.5、max_attempts=5）
+
+    Returns:
+        ProviderPolicy
+    """
+    name = provider if scope is None else f"{provider}:{scope}"
+    policy = _policies.get(name)
+    if policy is None:
+        with _policies_lock:
+            policy = _policies.get(name)
+            if policy is None:
+                limits = get_provider_limits(provider)
+                limits.update(overrides)
+                policy = ProviderPolicy(name, **limits)
+                _policies[name] = policy
+    return policy
+
+
+def reset_policies() -> None:
+    """清除所有策略（下次取得時依目前設定重新建立）"""
+    with _policies_lock:
+        _policies.clear()
+
+
+def get_resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    取得所有策略的統計
+
+    Returns:
+        dict: {策略名稱: {'calls', 'successes', 'failures', 'retries', 'throttled', 'rejected',
+                         'wait_time', 'rate', 'max_rate', 'circuit_state', 'circuit_opened'}}
+    """
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {policy.name: policy.stats() for policy in policies}
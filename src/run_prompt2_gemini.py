@@ -1,80 +1,36 @@
-import json, os, re, sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+import json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import PATHS, DATA_FILES
-
-# 1. 載入 .env 檔案並初始化 Client
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-
-if not api_key:
-    raise ValueError("找不到 GEMINI_API_KEY。請確保 .env 檔案存在且設定正確。")
-
-client = genai.Client(api_key=api_key)
-
-
-def process_esg_news_verification(input_json_path, news_json_path, msci_json_path, output_json_path):
-    """
-    處理 ESG 新聞驗證
-    
-    Args:
-        input_json_path: 原檔路徑 (2024_1102_p1.json)
-        news_json_path: 驗證資料路徑 (2024_1102_news.json)
-        msci_json_path: MSCI 判斷標準路徑 (msci_flag.json)
-        output_json_path: 輸出結果路徑
-    
-    Returns:
-        dict: {
-            'success': bool,
-            'processed_items': int,
-            'input_tokens': int,
-            'output_tokens': int,
-            'total_tokens': int,
-            'api_time': float,
-            'total_time': float
-        }
-    """
-
-    # 2. 讀取原檔
-    try:
-        with open(input_json_path, 'r', encoding='utf-8') as f:
-            original_data = json.load(f)
-        print(f"✅ 成功讀取原檔：{len(original_data)} 筆資料")
-    except FileNotFoundError:
-        print(f"❌ 錯誤：找不到輸入檔案 {input_json_path}")
-        return {'success': False, 'error': 'FileNotFoundError'}
-    except json.JSONDecodeError:
-        print(f"❌ 錯誤：輸入檔案 {input_json_path} 格式並非正確的 JSON")
-        return {'success': False, 'error': 'JSONDecodeError'}
-
-    # 3. 直接讀取驗證資料
-    try:
-        with open(news_json_path, 'r', encoding='utf-8') as f:
-            news_data = json.load(f)
-        print(f"✅ 成功讀取驗證資料：{len(news_data)} 筆新聞")
-    except Exception as e:
-        print(f"❌ 錯誤：讀取驗證資料失敗 - {e}")
-        return {'success': False, 'error': f'News data read error: {e}'}
-
-    # 4. 使用 pandas 讀取 MSCI 判斷標準
-    try:
-        with open(msci_json_path, 'r', encoding='utf-8') as f:
-            msci_flag = json.load(f)
-        print(f"✅ 成功讀取 MSCI 判斷標準")
-    except Exception as e:
-        print(f"❌ 錯誤：讀取 MSCI 標準失敗 - {e}")
-        return {'success': False, 'error': f'MSCI data read error: {e}'}
-
-    # 5. 準備 Prompt（將變數嵌入）
-    prompt_template = f"""
+from src.artifact_store import atomic_write_json, register_artifact, is_artifact_fresh
+from src.artifact_format import load_artifact, resolve_artifact_path
+from src.json_stream import stream_json_array
+from src.genai_client import get_genai_client
+from src.llm_telemetry import llm_call
+from src.gemini_context_cache import (
+    get_cached_context, build_generate_config, invalidate_cached_context, should_retry_without_cache
+)
+from src.llm_response_cache import make_response_key
+from src.log import get_logger
+from src.resilience import get_policy
+from src.tracing import bind_context, traced
+
+logger = get_logger(__name__)
+
+# P2 驗證使用的模型
+P2_MODEL_NAME = "gemini-2.5-pro"
+
+# 同時進行的議題驗證請求上限
+P2_MAX_WORKERS = 4
+
+# P2 系統指令（各議題共用，不含任何單次執行的資料）
+P2_SYSTEM_PROMPT = """
 你將扮演ESG審查員，負責進行外部新聞比對與風險調整。
 
 【原檔說明】
-原檔為該公司永續報告書的聲明與風險分數，包含以下欄位：
+原檔為該公司永續報告書中同一 SASB 主題的聲明與風險分數，包含以下欄位：
 - company: 公司名稱（例如："亞泥"）
 - company_id: 公司代碼（例如："1102"）
 - year: 年分
@@ -87,7 +43,7 @@ def process_esg_news_verification(input_json_path, news_json_path, msci_json_pat
 - key_word: 關鍵字
 
 【驗證資料說明】
-驗證資料包含 {len(news_data)} 筆新聞，欄位如下：
+驗證資料為同一 SASB 主題的新聞，欄位如下：
 - news_id: 新聞編號
 - stock_code: 股票代號
 - company_name: 公司名稱
@@ -131,7 +87,7 @@ def process_esg_news_verification(input_json_path, news_json_path, msci_json_pat
    - Red 通常涉及「系統性、長期、不可逆」
    - Orange 則多為「大規模、嚴重、但已開始修復」
 5. 先比對 sasb_topic 一致，再依據原檔 report_claim 從驗證資料選出一筆最具代表性的新聞
-6. 若原檔輸入 X 筆聲稱，就要輸出 X 筆結果
+6. 若原檔輸入 X 筆聲稱，就要輸出 X 筆結果，順序與原檔相同
 
 【相關性檢查】
 比對前，請先執行相關性檢查：
@@ -153,16 +109,16 @@ def process_esg_news_verification(input_json_path, news_json_path, msci_json_pat
 - **company_id** 必須維持原檔的公司代碼（例如 "1102"）
 - **report_claim** 欄位名稱維持不變，不要改為 disclosure_claim
 
-輸出範例：
-**company**: {original_data[0]['company']},  # 必須是名稱，例如 "亞泥"
-**company_id**: {original_data[0]['company_id']},  # 必須是代號，例如 "1102"
-**year**: {original_data[0]['year']},
-**esg_category**: {original_data[0]['esg_category']},
-**sasb_topic**: {original_data[0]['sasb_topic']},
-**page_number**: {original_data[0]['page_number']},
-**report_claim**: {original_data[0]['report_claim']},  # 維持此欄位名稱
-**greenwashing_factor**: {original_data[0]['greenwashing_factor']},
-**risk_score**: {original_data[0]['risk_score']},
+輸出欄位：
+**company**: 原檔 company,  # 必須是名稱，例如 "亞泥"
+**company_id**: 原檔 company_id,  # 必須是代號，例如 "1102"
+**year**: 原檔 year,
+**esg_category**: 原檔 esg_category,
+**sasb_topic**: 原檔 sasb_topic,
+**page_number**: 原檔 page_number,
+**report_claim**: 原檔 report_claim,  # 維持此欄位名稱
+**greenwashing_factor**: 原檔 greenwashing_factor,
+**risk_score**: 原檔 risk_score,
 **external_evidence**: 驗證資料標題或'無相關新聞證據',
 **external_evidence_url**: 驗證資料新聞連結或空字串,
 **consistency_status**: 一致/部分符合/不一致,
@@ -174,140 +130,297 @@ def process_esg_news_verification(input_json_path, news_json_path, msci_json_pat
 請直接輸出 JSON Array。
 """
 
-    # 6. 將原檔和驗證資料轉為字串
-    user_input = f"""
-    【原檔數據】
-    {json.dumps(original_data, ensure_ascii=False, indent=2)}
+# 原檔帶入輸出的欄位
+P1_PASSTHROUGH_FIELDS = (
+    'company', 'company_id', 'year', 'esg_category', 'sasb_topic',
+    'page_number', 'report_claim', 'greenwashing_factor', 'risk_score'
+)
+
+
+def _compact_json(data):
+    """不含縮排與多餘空白的 JSON 字串（減少 prompt token）"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
 
-    【驗證資料】
-    {json.dumps(news_data, ensure_ascii=False, indent=2)}
+
+def _fallback_result(claim, evidence, consistency_status):
     """
+    不經 AI 驗證時的結果：沿用原檔欄位，分數維持原 risk_score
 
-    # 7. 呼叫 Gemini API
-    print("\n🔄 正在呼叫 Gemini API，請稍候...")
+    Args:
+        claim: P1 項目
+        evidence: external_evidence 說明
+        consistency_status: 一致性狀態
+    """
+    result = {field: claim.get(field) for field in P1_PASSTHROUGH_FIELDS if field in claim}
+    result.update({
+        'external_evidence': evidence,
+        'external_evidence_url': '',
+        'consistency_status': consistency_status,
+        'msci_flag': 'Green',
+        'adjustment_score': claim.get('risk_score', 0)
+    })
+    return result
+
+
+def _stream_verification(user_input, company_key=None, cache_name=None, use_response_cache=True):
+    """
+    送出單一主題的驗證請求
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
+    Args:
+        user_input: 使用者內容（聲明與新聞）
+        company_key: 用量統計的公司鍵
+        cache_name: P2 系統指令的內容快取名稱（None 表示直接帶入系統指令）
+        use_response_cache: 是否沿用本機回應快取（聲明與新聞皆未變更時不重新呼叫模型）
+
+    Returns:
+        tuple: (stream_json_array 的結果, LLMCall)
+    """
+    generate_params = {'temperature': 0, 'response_mime_type': "application/json"}
+    response_key = None
+    if use_response_cache:
+        response_key = make_response_key(P2_MODEL_NAME, P2_SYSTEM_PROMPT, [user_input], generate_params)
+
+    with llm_call('gemini', P2_MODEL_NAME, stage='p2', company=company_key) as call:
+        result = get_policy('gemini').call(
+            stream_json_array,
+            get_genai_client(),
+            model=P2_MODEL_NAME,
             contents=user_input,
-            config=types.GenerateContentConfig(
-                system_instruction=prompt_template,
-                temperature=0,
-                response_mime_type="application/json"
-            )
+            config=build_generate_config(cache_name, P2_SYSTEM_PROMPT, **generate_params),
+            cache_key=response_key,
+            stage='p2',
+            on_retry=call.add_retry
         )
+        call.record_gemini_usage(result['usage_metadata'])
+        call.response_cached = result['cached']
+    return result, call
+
+
+def _verify_topic(topic, claims, topic_news, company_key=None, cache_name=None, use_response_cache=True):
+    """
+    驗證單一 SASB 主題的聲明
+
+    Args:
+        topic: SASB 主題
+        claims: 此主題的 P1 項目（依原檔順序）
+        topic_news: 此主題的新聞
+        company_key: 用量統計的公司鍵（"{year}_{company_code}"）
+        cache_name: P2 系統指令的內容快取名稱（失敗時改以完整系統指令重試一次）
+        use_response_cache: 是否沿用本機回應快取
+
+    Returns:
+        dict: {
+            'topic': str,
+            'items': list,           # 驗證結果（與 claims 筆數相同）
+            'error': str,            # 失敗原因（成功時為 None）
+            'api_calls': int,        # 實際呼叫模型的次數（回應快取命中時為 0）
+            'response_cached': bool, # 是否沿用本機回應快取
+            'input_tokens': int,
+            'output_tokens': int,
+            'cached_tokens': int     # 輸入中由內容快取提供的 token 數
+        }
+    """
+    outcome = {'topic': topic, 'items': [], 'error': None, 'api_calls': 0, 'response_cached': False,
+               'input_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0}
+
+    # 無任何新聞：依處理規則直接輸出，不呼叫 API
+    if not topic_news:
+        outcome['items'] = [_fallback_result(claim, '無相關新聞證據', '一致') for claim in claims]
+        return outcome
+
+    user_input = f"【原檔數據】\n{_compact_json(claims)}\n\n【驗證資料】\n{_compact_json(topic_news)}"
+
+    try:
+        outcome['api_calls'] = 1
+        try:
+            result, call = _stream_verification(user_input, company_key, cache_name, use_response_cache)
+        except Exception as e:
+            if cache_name is None or not should_retry_without_cache(e):
+                raise
+            # 快取已失效或無法引用：改以完整系統指令重試
+            logger.warning(f"{topic}: 使用內容快取失敗 ({e})，改以完整內容重試")
+            invalidate_cached_context(cache_name)
+            outcome['api_calls'] += 1
+            result, call = _stream_verification(user_input, company_key, use_response_cache=use_response_cache)
+        if result['cached']:
+            outcome['api_calls'] -= 1
+            outcome['response_cached'] = True
+        outcome['input_tokens'] = call.prompt_tokens
+        outcome['output_tokens'] = call.output_tokens
+        outcome['cached_tokens'] = call.cached_tokens
     except Exception as e:
-        print(f"❌ API 呼叫失敗: {e}")
-        return {'success': False, 'error': f'API call failed: {e}'}
+        outcome['error'] = f'API call failed: {e}'
+        return outcome
 
-    print(f"✅ Gemini API 呼叫完成")
+    items = [item for item in result['items'] if isinstance(item, dict)]
+    if len(items) != len(claims):
+        outcome['error'] = f'回傳 {len(items)} 筆，預期 {len(claims)} 筆'
+        if not result['complete']:
+            outcome['error'] += '（回應被截斷）'
+        return outcome
 
-    # 8. 處理與儲存結果
-    raw_text = response.text.strip()
+    outcome['items'] = items
+    return outcome
 
-    # 8. 處理與儲存結果 - 直接查找 JSON 陣列
-    print("\n🔍 正在解析 JSON 回應...")
+
+def process_esg_news_verification(input_json_path, news_json_path, msci_json_path, output_json_path,
+                                  max_workers=P2_MAX_WORKERS, company_key=None, use_response_cache=True):
+    """
+    處理 ESG 新聞驗證
     
+    依 SASB 主題拆分為多個請求（每個請求只帶該主題的聲明與新聞，使用緊湊 JSON），
+    以 max_workers 為上限並行呼叫，最後依 P1 原檔順序合併。
+    沒有任何新聞的主題直接輸出「無相關新聞證據」，不呼叫 API；
+    驗證失敗的主題以原 risk_score 帶入並標記為「未驗證」，不影響其他主題。
+    
+    Args:
+        input_json_path: 原檔路徑 (2024_1102_p1.json)
+        news_json_path: 驗證資料路徑 (2024_1102_news.json)
+        msci_json_path: MSCI 判斷標準路徑 (msci_flag.json)
+        output_json_path: 輸出結果路徑
+        max_workers: 同時進行的主題驗證請求上限
+        company_key: 用量統計的公司鍵（"{year}_{company_code}"）
+        use_response_cache: 是否沿用本機回應快取（聲明與新聞未變更的主題不重新呼叫模型）
+    
+    Returns:
+        dict: {
+            'success': bool,
+            'processed_items': int,
+            'input_tokens': int,
+            'output_tokens': int,
+            'total_tokens': int,
+            'cached_tokens': int,
+            'api_time': float,
+            'total_time': float,
+            'api_calls': int,
+            'response_cache_hits': int,  # 沿用本機回應快取的主題數
+            'failed_topics': list   # 驗證失敗的主題
+        }
+    """
+    total_start_time = time.perf_counter()
+
+    # 2. 讀取原檔
     try:
-        final_json = None
-        all_arrays = re.findall(r'(\[.*\])', raw_text, re.DOTALL)
-        if all_arrays:
-            clean_json_str = all_arrays[0]
-            # 處理可能的多個陣列
-            if "][" in clean_json_str:
-                clean_json_str = clean_json_str.split("][")[0] + "]"
-            elif "] [" in clean_json_str:
-                clean_json_str = clean_json_str.split("] [")[0] + "]"
-            
-            try:
-                final_json = json.loads(clean_json_str)
-                print("✅ JSON 解析成功")
-            except json.JSONDecodeError as e:
-                print(f"⚠️  JSON 解析失敗: {e}")
-        
-        # 儲存結果
-        if final_json:
-            os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
-            with open(output_json_path, 'w', encoding='utf-8') as f:
-                json.dump(final_json, f, ensure_ascii=False, indent=2)
-            print(f"✅ 成功！結果已儲存至 {output_json_path}，共 {len(final_json)} 筆")
-        else:
-            raise ValueError("無法從回應中提取 JSON 結構")
+        original_data = load_artifact(input_json_path)
+        logger.info(f"✅ 成功讀取原檔：{len(original_data)} 筆資料")
+    except FileNotFoundError:
+        logger.error(f"找不到輸入檔案 {input_json_path}")
+        return {'success': False, 'error': 'FileNotFoundError'}
+    except json.JSONDecodeError:
+        logger.error(f"輸入檔案 {input_json_path} 格式並非正確的 JSON")
+        return {'success': False, 'error': 'JSONDecodeError'}
 
-    except json.JSONDecodeError as e:
-        print(f"⚠️  JSON 解析錯誤: {e}")
-        print("⚠️  正在嘗試修復模式...")
-        try:
-            # 使用括號計數法提取完整 JSON
-            start = raw_text.find('[')
-            if start == -1:
-                raise ValueError("找不到 JSON 陣列起始標記 '['")
-            
-            count = 0
-            end_pos = -1
-            for i in range(start, len(raw_text)):
-                if raw_text[i] == '[':
-                    count += 1
-                elif raw_text[i] == ']':
-                    count -= 1
-                if count == 0:
-                    end_pos = i + 1
-                    break
-            
-            if end_pos > start:
-                extreme_clean = raw_text[start:end_pos]
-                final_json = json.loads(extreme_clean)
-                os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
-                with open(output_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(final_json, f, ensure_ascii=False, indent=2)
-                print(f"✅ 修復成功！結果儲存至 {output_json_path}，共 {len(final_json)} 筆")
-            else:
-                raise ValueError("無法找到完整的 JSON 陣列")
-        except Exception as repair_error:
-            print(f"❌ 修復失敗：{repair_error}")
-            # 將原始回應儲存到文件以便調試
-            debug_path = output_json_path.replace('.json', '_debug_response.txt')
-            with open(debug_path, 'w', encoding='utf-8') as f:
-                f.write(raw_text)
-            print(f"💾 已將完整原始回應儲存至：{debug_path}")
+    # 3. 直接讀取驗證資料
+    try:
+        news_data = load_artifact(news_json_path)
+        logger.info(f"✅ 成功讀取驗證資料：{len(news_data)} 筆新聞")
+    except Exception as e:
+        logger.error(f"讀取驗證資料失敗 - {e}")
+        return {'success': False, 'error': f'News data read error: {e}'}
+
+    # 4. 讀取 MSCI 判斷標準
+    try:
+        with open(msci_json_path, 'r', encoding='utf-8') as f:
+            msci_flag = json.load(f)
+        logger.debug(f"成功讀取 MSCI 判斷標準")
     except Exception as e:
-        print(f"❌ 發生非預期錯誤: {e}")
-        # 將原始回應儲存到文件以便調試
-        debug_path = output_json_path.replace('.json', '_debug_response.txt')
-        with open(debug_path, 'w', encoding='utf-8') as f:
-            f.write(raw_text)
-        print(f"💾 已將完整原始回應儲存至：{debug_path}")
+        logger.error(f"讀取 MSCI 標準失敗 - {e}")
+        return {'success': False, 'error': f'MSCI data read error: {e}'}
+
+    # 5. 依 SASB 主題分組（主題順序依原檔首次出現的位置，並記下每筆聲明在原檔中的位置）
+    claims_by_topic = {}
+    positions_by_topic = {}
+    for position, claim in enumerate(original_data):
+        topic = claim.get('sasb_topic', '')
+        claims_by_topic.setdefault(topic, []).append(claim)
+        positions_by_topic.setdefault(topic, []).append(position)
+
+    news_by_topic = {}
+    for news in news_data:
+        news_by_topic.setdefault(news.get('sasb_topic', ''), []).append(news)
+
+    api_topics = sum(1 for topic in claims_by_topic if news_by_topic.get(topic))
+    logger.info(f"🔄 依主題驗證：{len(claims_by_topic)} 個主題，其中 {api_topics} 個需呼叫 Gemini API（並行上限 {max_workers}）")
+
+    # 6. 並行驗證各主題（系統指令各主題共用，可用時建立內容快取）
+    api_start_time = time.perf_counter()
+    cache_name = None
+    if api_topics:
+        cache_name = get_cached_context(get_genai_client(), P2_MODEL_NAME, P2_SYSTEM_PROMPT, display_name='P2_rubric')
+        if cache_name:
+            logger.info(f"♻️ 使用內容快取: {cache_name}")
+    outcomes = {}
+    verify_topic = bind_context(_verify_topic)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(verify_topic, topic, claims, news_by_topic.get(topic, []),
+                            company_key, cache_name, use_response_cache): topic
+            for topic, claims in claims_by_topic.items()
+        }
+        for future in as_completed(futures):
+            outcome = future.result()
+            outcomes[outcome['topic']] = outcome
+            if outcome['error']:
+                logger.warning(f"{outcome['topic']}: {outcome['error']}")
+            elif outcome['api_calls']:
+                logger.debug(f"✓ {outcome['topic']}: {len(outcome['items'])} 筆")
+    api_elapsed = time.perf_counter() - api_start_time
+
+    logger.info(f"✅ Gemini API 呼叫完成")
+
+    # 7. 依原檔順序合併結果（各主題的結果放回聲明原本的位置；失敗主題維持原分數）
+    final_json = [None] * len(original_data)
+    failed_topics = []
+    for topic, claims in claims_by_topic.items():
+        outcome = outcomes[topic]
+        if outcome['error']:
+            failed_topics.append(topic)
+            items = [_fallback_result(claim, f"AI 驗證失敗：{outcome['error']}", '未驗證') for claim in claims]
+        else:
+            items = outcome['items']
+        for position, item in zip(positions_by_topic[topic], items):
+            final_json[position] = item
+
+    if not final_json:
+        logger.error("原檔沒有任何聲明，未產生結果")
+        return {'success': False, 'error': 'No claims to verify'}
+
+    atomic_write_json(output_json_path, final_json)
+    logger.info(f"✅ 成功！結果已儲存至 {output_json_path}，共 {len(final_json)} 筆")
+    if failed_topics:
+        logger.warning(f"{len(failed_topics)} 個主題驗證失敗，已保留原分數：{'、'.join(failed_topics)}")
 
     # ===== TOKEN USAGE & TIME COST =====
-    total_end_time = time.perf_counter()
-    total_elapsed = total_end_time - total_start_time
-
-    print("\n" + "="*50)
-    print("📊 Token 使用統計")
-    print("="*50)
-    print(f"輸入 Token 數 : {input_token_est:,}")
-    print(f"輸出 Token 數 : {output_token_est:,}")
-    print(f"總計 Token 數 : {total_token_est:,}")
-    print("\n" + "="*50)
-    print("⏱️  執行時間統計")
-    print("="*50)
-    print(f"API 呼叫時間  : {api_elapsed:.2f} 秒")
-    print(f"總執行時間    : {total_elapsed:.2f} 秒")
-    print("="*50)
+    input_tokens = sum(outcome['input_tokens'] for outcome in outcomes.values())
+    output_tokens = sum(outcome['output_tokens'] for outcome in outcomes.values())
+    cached_tokens = sum(outcome['cached_tokens'] for outcome in outcomes.values())
+    api_calls = sum(outcome['api_calls'] for outcome in outcomes.values())
+    response_cache_hits = sum(1 for outcome in outcomes.values() if outcome['response_cached'])
+    total_elapsed = time.perf_counter() - total_start_time
+
+    logger.info(f"📊 Token 使用統計：API 呼叫 {api_calls} 次，回應快取命中 {response_cache_hits} 個主題，"
+                f"輸入 {input_tokens:,}（快取命中 {cached_tokens:,}），輸出 {output_tokens:,}，"
+                f"總計 {input_tokens + output_tokens:,}")
+    logger.info(f"⏱️ 執行時間：API 呼叫 {api_elapsed:.2f} 秒，總計 {total_elapsed:.2f} 秒")
     
     # 返回統計資訊供模組化接口使用
     return {
         'success': True,
-        'processed_items': len(final_json) if final_json else 0,
-        'input_tokens': input_token_est,
-        'output_tokens': output_token_est,
-        'total_tokens': total_token_est,
+        'processed_items': len(final_json),
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+        'total_tokens': input_tokens + output_tokens,
+        'cached_tokens': cached_tokens,
         'api_time': api_elapsed,
-        'total_time': total_elapsed
+        'total_time': total_elapsed,
+        'api_calls': api_calls,
+        'response_cache_hits': response_cache_hits,
+        'failed_topics': failed_topics
     }
 
 
-def verify_esg_with_news(year, company_code, force_regenerate=False):
+@traced('stage.p2')
+def verify_esg_with_news(year, company_code, force_regenerate=False, use_response_cache=True):
     """
     模組化接口：執行 ESG 新聞驗證與評分調整
     
@@ -315,6 +428,7 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
         year: 報告年份
         company_code: 公司代碼
         force_regenerate: 是否強制重新生成（預設 False）
+        use_response_cache: 是否沿用本機的模型回應快取（False 時所有主題都重新呼叫 Gemini）
     
     Returns:
         dict: {
@@ -327,13 +441,16 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
                 'input_tokens': int,
                 'output_tokens': int,
                 'total_tokens': int,
+                'cached_tokens': int,
                 'api_time': float,
-                'total_time': float
+                'total_time': float,
+                'api_calls': int,
+                'response_cache_hits': int,
+                'failed_topics': list   # 驗證失敗（維持原分數）的主題
             },
             'error': str  # 錯誤訊息（若失敗）
         }
     """
-    import time
     start_time = time.perf_counter()
     
     try:
@@ -345,12 +462,13 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
         msci_path = DATA_FILES['MSCI_FLAG']
         output_path = os.path.join(PATHS['P2_JSON'], f'{base_filename}_p2.json')
         
-        # 2. 檔案存在性檢查（跳過重複執行）
-        if os.path.exists(output_path) and not force_regenerate:
+        # 2. 產物新鮮度檢查（P1、新聞與 MSCI 標準皆未變更則跳過）
+        artifact_inputs = [input_path, news_path, msci_path]
+        artifact_params = {'model': P2_MODEL_NAME}
+        if not force_regenerate and is_artifact_fresh('P2_JSON', year, company_code, artifact_inputs, artifact_params):
             # 讀取已存在的檔案以獲取統計資訊
             try:
-                with open(output_path, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
+                existing_data = load_artifact(output_path)
                 
                 return {
                     'success': True,
@@ -362,20 +480,20 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
                         'input_tokens': 0,
                         'output_tokens': 0,
                         'total_tokens': 0,
+                        'cached_tokens': 0,
                         'api_time': 0,
                         'total_time': time.perf_counter() - start_time
                     }
                 }
             except Exception as e:
-                # 檔案存在但無法讀取，刪除並重新生成
-                print(f"⚠️ 現有檔案無法讀取，將重新生成: {e}")
-                os.remove(output_path)
+                # 檔案存在但無法讀取，重新生成
+                logger.warning(f"現有檔案無法讀取，將重新生成: {e}")
         
         # 3. 檢查必要輸入檔案
         missing_files = []
-        if not os.path.exists(input_path):
+        if resolve_artifact_path(input_path) is None:
             missing_files.append(f"P1 檔案: {input_path}")
-        if not os.path.exists(news_path):
+        if resolve_artifact_path(news_path) is None:
             missing_files.append(f"新聞檔案: {news_path}")
         if not os.path.exists(msci_path):
             missing_files.append(f"MSCI 標準: {msci_path}")
@@ -390,12 +508,12 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
             }
         
         # 4. 執行 AI 驗證（獲取統計資訊）
-        print(f"\n{'='*60}")
-        print(f"開始 AI 驗證與評分調整: {year} 年 {company_code}")
-        print(f"{'='*60}")
+        logger.info(f"開始 AI 驗證與評分調整: {year} 年 {company_code}")
         
         # 呼叫原有函數並獲取統計資訊
-        stats = process_esg_news_verification(input_path, news_path, msci_path, output_path)
+        stats = process_esg_news_verification(input_path, news_path, msci_path, output_path,
+                                              company_key=base_filename,
+                                              use_response_cache=use_response_cache)
         
         # 檢查執行結果
         if not stats or not stats.get('success'):
@@ -420,6 +538,13 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
                 'skipped': False
             }
         
+        # 一律經 write_artifact 寫入正式路徑（同時移除其他格式的舊檔，下游不會讀到過期的 P2）；
+        # 有主題驗證失敗時不登記輸入雜湊，下次執行會重新驗證
+        failed_topics = stats.get('failed_topics') or []
+        output_path = register_artifact('P2_JSON', year, company_code, stage='p2',
+                                        inputs=artifact_inputs, params=artifact_params,
+                                        record=not failed_topics)
+        
         # 6. 返回結果（使用從 process_esg_news_verification 獲得的統計資訊）
         return {
             'success': True,
@@ -431,8 +556,12 @@ def verify_esg_with_news(year, company_code, force_regenerate=False):
                 'input_tokens': stats.get('input_tokens', 0),
                 'output_tokens': stats.get('output_tokens', 0),
                 'total_tokens': stats.get('total_tokens', 0),
+                'cached_tokens': stats.get('cached_tokens', 0),
                 'api_time': stats.get('api_time', 0),
-                'total_time': total_time
+                'total_time': total_time,
+                'api_calls': stats.get('api_calls', 0),
+                'response_cache_hits': stats.get('response_cache_hits', 0),
+                'failed_topics': failed_topics
             }
         }
     
@@ -0,0 +1,228 @@
+"""
+SASB 權重矩陣模組
+
+將 SASB_weightMap.json 於載入時編譯為「產業 × 議題」的密集權重矩陣，
+供評分（calculate_esg）與 P1 提示詞（gemini_api）共用：
+
+    - 產業與議題各自對應到整數索引，議題名稱經 sys.intern 駐留
+    - 權重矩陣多一列、一欄作為預設值（1）：未知產業或未知議題的索引為 -1，
+      直接落在預設列／欄，批次評分可整批以 NumPy 索引查表
+    - 權重表檔案更新時（mtime / 大小改變）自動重新編譯，不需重啟服務；
+      新檔格式錯誤時保留上一版矩陣
+
+主要類別：
+    SASBWeightMatrix: 編譯後的權重矩陣（不可變，重新載入時整份替換）
+
+主要函數：
+    get_sasb_weights: 取得目前的權重矩陣（檔案有變更時自動重新載入）
+
+使用範例：
+    from src.sasb_weights import get_sasb_weights
+
+    matrix = get_sasb_weights()
+    weights = matrix.industry_weights('水泥工業')      # 依議題索引排列的權重 list
+    weight = weights[matrix.topic_id('溫室氣體排放')]   # 未知議題得到預設權重 1
+
+    matrix.industry_map('水泥工業')                     # {'產業': '水泥工業', '溫室氣體排放': 1, ...}
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import DATA_FILES
+from src.log import get_logger
+
+logger = get_logger(__name__)
+
+# === 模組常數 ===
+INDUSTRY_KEY = '產業'
+
+# 權重表中沒有的產業或議題使用的權重
+DEFAULT_WEIGHT = 1
+
+# 已載入的矩陣：{path: (mtime_ns, size, matrix)}
+_matrices: Dict[str, Tuple[int, int, 'SASBWeightMatrix']] = {}
+_matrices_lock = threading.Lock()
+
+
+class SASBWeightMatrix:
+    """
+    編譯後的 SASB 權重矩陣
+
+    Attributes:
+        industries: 產業名稱（依權重表順序）
+        topics: 議題名稱（依首次出現順序，已 intern）
+        weights: shape 為 (產業數 + 1, 議題數 + 1) 的 float64 矩陣，最後一列／欄為預設權重
+        source_text: 權重表原始 JSON 文字（供比較提示詞大小）
+    """
+
+    def __init__(self, entries: Sequence[Dict[str, Any]], source_text: str = ''):
+        """
+        Args:
+            entries: 權重表 JSON 的產業物件清單（每個物件含「產業」與各議題權重）
+            source_text: 權重表原始 JSON 文字
+        """
+        industries: List[str] = []
+        topics: List[str] = []
+        topic_index: Dict[str, int] = {}
+        rows: List[List[Tuple[int, Any]]] = []
+        for item in entries:
+            industry = item.get(INDUSTRY_KEY)
+            if not industry or industry in industries:
+                continue
+            row = []
+            for topic, weight in item.items():
+                if topic == INDUSTRY_KEY:
+                    continue
+                if topic not in topic_index:
+                    topic = sys.intern(topic)
+                    topic_index[topic] = len(topics)
+                    topics.append(topic)
+                row.append((topic_index[topic], weight))
+            industries.append(industry)
+            rows.append(row)
+
+        self.industries: Tuple[str, ...] = tuple(industries)
+        self.topics: Tuple[str, ...] = tuple(topics)
+        self.source_text = source_text
+        self._industry_index = {industry: i for i, industry in enumerate(industries)}
+        self._topic_index = topic_index
+
+        weights = np.full((len(industries) + 1, len(topics) + 1), DEFAULT_WEIGHT, dtype=np.float64)
+        for i, row in enumerate(rows):
+            for j, weight in row:
+                weights[i, j] = weight
+        weights.flags.writeable = False
+        self.weights = weights
+
+        # 每個產業在權重表中的議題順序與原始值（提示詞需保留原本的排列與整數寫法）
+        self._industry_topics: Tuple[Tuple[Tuple[int, Any], ...], ...] = tuple(tuple(row) for row in rows)
+        # 逐筆評分用的 Python list（索引 list 比索引 NumPy 陣列快）
+        self._weight_lists: Tuple[List[float], ...] = tuple(weights.tolist())
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SASBWeightMatrix':
+        """
+        讀取並編譯權重表檔案
+
+        Args:
+            path: SASB_weightMap.json 路徑
+
+        Returns:
+            SASBWeightMatrix: 編譯後的矩陣
+
+        Raises:
+            FileNotFoundError: 若找不到權重表檔案
+            ValueError: 若檔案不是有效的 JSON
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        return cls(json.loads(text), source_text=text)
+
+    def industry_id(self, industry: Optional[str]) -> int:
+        """產業的列索引；不在權重表中則回傳 -1（預設列）"""
+        return self._industry_index.get(industry, -1)
+
+    def topic_id(self, topic: Optional[str]) -> int:
+        """議題的欄索引；不在權重表中則回傳 -1（預設欄）"""
+        return self._topic_index.get(topic, -1)
+
+    def topic_ids(self, topics: Sequence[Optional[str]]) -> np.ndarray:
+        """一次取得多個議題的欄索引（批次評分用）"""
+        topic_index = self._topic_index
+        return np.array([topic_index.get(topic, -1) for topic in topics], dtype=np.intp)
+
+    def industry_weights(self, industry: Optional[str]) -> List[float]:
+        """
+        取得產業的整列權重
+
+        Args:
+            industry: 產業名稱（不在權重表中時回傳預設列，全部為 1）
+
+        Returns:
+            list: 依議題索引排列的權重，最後一項為未知議題的預設權重
+        """
+        return self._weight_lists[self.industry_id(industry)]
+
+    def match_industry(self, industry: str) -> Optional[str]:
+        """
+        比對權重表中的產業名稱：完全相符 -> 包含關係（例如「半導體」對應「半導體業」）
+
+        Returns:
+            str or None: 權重表中的產業名稱，找不到時回傳 None
+        """
+        if industry in self._industry_index:
+            return industry
+        return next((name for name in self.industries if name in industry or industry in name), None)
+
+    def industry_map(self, industry: str) -> Dict[str, Any]:
+        """
+        還原產業在權重表中的原始物件（議題順序與數值寫法同檔案）
+
+        Args:
+            industry: 權重表中的產業名稱
+
+        Returns:
+            dict: {'產業': 名稱, 議題: 權重, ...}；產業不存在時回傳空 dict
+        """
+        i = self._industry_index.get(industry)
+        if i is None:
+            return {}
+        matched: Dict[str, Any] = {INDUSTRY_KEY: industry}
+        matched.update((self.topics[j], weight) for j, weight in self._industry_topics[i])
+        return matched
+
+
+def get_sasb_weights(path: Optional[str] = None) -> SASBWeightMatrix:
+    """
+    取得目前的 SASB 權重矩陣（檔案有變更時自動重新載入）
+
+    每次呼叫只需一次 os.stat；重新載入失敗（例如檔案寫到一半）時沿用上一版矩陣。
+
+    Args:
+        path: 權重表路徑（預設 DATA_FILES['SASB_WEIGHT_MAP']）
+
+    Returns:
+        SASBWeightMatrix: 權重矩陣
+
+    Raises:
+        FileNotFoundError: 若找不到權重表檔案且尚未載入過
+    """
+    path = path or DATA_FILES['SASB_WEIGHT_MAP']
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+
+    entry = _matrices.get(path)
+    if entry is not None and (version is None or entry[:2] == version):
+        return entry[2]
+    if version is None:
+        raise FileNotFoundError(f"❌ 找不到 SASB 權重表檔案: {path}")
+
+    with _matrices_lock:
+        entry = _matrices.get(path)
+        if entry is not None and entry[:2] == version:
+            return entry[2]
+        try:
+            matrix = SASBWeightMatrix.from_file(path)
+        except (OSError, ValueError) as e:
+            if entry is None:
+                raise
+            logger.warning(f"SASB 權重表重新載入失敗，沿用上一版: {e}")
+            # 記下這個版本，檔案再次變更前不重試
+            _matrices[path] = (version[0], version[1], entry[2])
+            return entry[2]
+        _matrices[path] = (version[0], version[1], matrix)
+
+    if entry is not None:
+        logger.info(f"[CONFIG] SASB 權重表已更新：{len(matrix.industries)} 個產業 × {len(matrix.topics)} 項議題")
+    return matrix
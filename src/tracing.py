@@ -0,0 +1,455 @@
+"""
+分析流程追蹤模組
+
+以 span 記錄每個流程步驟（下載、P1、新聞、P2、P3、文字雲）與每次外部呼叫
+（Gemini 上傳與生成、GNews 查詢、URL 探測、TWSE 請求、資料庫查詢）的耗時與大小，
+用來找出一次緩慢的分析把時間花在哪裡。
+
+span 之間的父子關係以 contextvars 傳遞；esg_id 等識別欄位由父 span 自動帶入子 span。
+另開執行緒或使用 ThreadPoolExecutor 時，以 bind_context() 包住目標函數，
+子執行緒中的 span 才會接在同一個 trace 之下。
+
+匯出方式由環境變數 TRACING 決定（預設不匯出，需要時再開啟）：
+    off（預設）: 不匯出（metrics 等 span 回呼仍會執行）
+    jsonl:       每個 span 一行 JSON，寫入 temp_data/traces/traces_<日期>.jsonl
+    otlp:        以 OTLP/HTTP JSON 批次送往本機 OpenTelemetry Collector
+                 （OTEL_EXPORTER_OTLP_ENDPOINT，預設 http://localhost:4318）
+    both:        兩者皆輸出
+
+主要函數：
+    span: 建立 span 的 context manager
+    traced: 以 span 包住整個函數的裝飾器
+    set_attributes: 在目前的 span 加上屬性（沒有 span 時不做任何事）
+    add_span_processor: 註冊 span 結束時的回呼（例如 metrics 統計耗時，不受 TRACING 影響）
+    add_span_start_processor: 註冊 span 開始時的回呼（例如 profiling 追蹤各執行緒所在的步驟）
+    bind_context: 讓其他執行緒沿用目前的 trace
+    load_spans / print_trace: 讀取 JSONL 並以樹狀顯示各 span 耗時
+
+使用範例：
+    from src.tracing import span, set_attributes
+
+    with span('query_company', esg_id='20241102'):
+        with span('gnews.query', query=query) as s:
+            results = google_news.get_news(query)
+            s.set(results=len(results))
+
+    # 以 TRACING=jsonl 執行後，顯示最近一次 trace 的耗時分布
+    python src/tracing.py temp_data/traces/traces_20250101.jsonl
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# 導入集中配置
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import PATHS
+from src.log import get_logger
+
+# === 模組常數 ===
+TRACING_MODE = os.getenv('TRACING', 'off').lower()
+TRACE_DIR = os.path.join(PATHS['TEMP_DATA'], 'traces')
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318').rstrip('/') + '/v1/traces'
+SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'greenwashing-detective')
+
+# 由父 span 自動帶入子 span 的屬性（stage 由 stage.* span 設定，日誌也以此標示所屬步驟）
+INHERITED_ATTRIBUTES = ('esg_id', 'company', 'stage')
+
+# OTLP 批次設定
+OTLP_BATCH_SIZE = 256
+OTLP_FLUSH_INTERVAL = 2.0   # 秒
+OTLP_TIMEOUT = 5            # 秒
+
+logger = get_logger(__name__)
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """單一步驟或外部呼叫的計時紀錄"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+                 'start_time', 'end_time', 'duration', 'status', 'error', '_start')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES
+                           if parent and key in parent.attributes}
+        self.attributes.update(attributes)
+        if name.startswith('stage.') and 'stage' not in attributes:
+            self.attributes['stage'] = name[6:]
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """加上或覆寫屬性（例如結果筆數、位元組數）"""
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """累加數值屬性（例如重複下載的位元組數）"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self._start
+        self.end_time = self.start_time + self.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration': round(self.duration or 0.0, 6),
+            'status': self.status,
+            'error': self.error,
+            'thread': threading.current_thread().name,
+            'attributes': self.attributes,
+        }
+
+
+# =========================
+# 匯出
+# =========================
+class JsonlExporter:
+    """每個 span 以一行 JSON 附加到當日的檔案"""
+
+    def __init__(self, trace_dir: str = TRACE_DIR):
+        self.trace_dir = trace_dir
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        path = os.path.join(self.trace_dir, f"traces_{datetime.now():%Y%m%d}.jsonl")
+        with self._lock:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def flush(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OtlpExporter:
+    """
+    以 OTLP/HTTP JSON 批次送出 span
+
+    span 先放入緩衝區，由背景執行緒每 OTLP_FLUSH_INTERVAL 秒或累積
+    OTLP_BATCH_SIZE 筆時送出。Collector 無法連線時捨棄該批並只警告一次，
+    不影響分析流程。
+    """
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT):
+        self.endpoint = endpoint
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._warned = False
+        self._thread = threading.Thread(target=self._run, name='OtlpExporterThread', daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            full = len(self._buffer) >= OTLP_BATCH_SIZE
+        if full:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(OTLP_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'src.tracing'}, 'spans': [self._encode(s) for s in batch]}],
+        }]}
+        request = urllib.request.Request(self.endpoint, data=json.dumps(payload, default=str).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=OTLP_TIMEOUT):
+                pass
+        except Exception as e:
+            if not self._warned:
+                self._warned = True
+                logger.warning(f"[TRACE] 無法送出至 OTLP Collector ({self.endpoint}): {e}")
+
+    @staticmethod
+    def _encode(span: Span) -> Dict[str, Any]:
+        encoded = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(int(span.start_time * 1e9)),
+            'endTimeUnixNano': str(int((span.end_time or span.start_time) * 1e9)),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+            'status': {'code': 2, 'message': span.error or ''} if span.status == 'error' else {'code': 1},
+        }
+        if span.parent_id:
+            encoded['parentSpanId'] = span.parent_id
+        return encoded
+
+
+def _build_exporters(mode: str) -> List[Any]:
+    exporters = []
+    if mode in ('jsonl', 'both'):
+        exporters.append(JsonlExporter())
+    if mode in ('otlp', 'both'):
+        exporters.append(OtlpExporter())
+    return exporters
+
+
+_exporters = _build_exporters(TRACING_MODE)
+
+# span 開始 / 結束時呼叫的回呼（與匯出無關，TRACING=off 時也會執行）
+_start_processors: List[Callable[[Span], None]] = []
+_processors: List[Callable[[Span], None]] = []
+
+
+def set_exporters(exporters: List[Any]) -> None:
+    """替換匯出器（例如量測時改用記憶體內的收集器）"""
+    global _exporters
+    _exporters = list(exporters)
+
+
+@atexit.register
+def flush() -> None:
+    """送出所有緩衝中的 span"""
+    for exporter in _exporters:
+        exporter.flush()
+
+
+def add_span_processor(processor: Callable[[Span], None]) -> None:
+    """
+    註冊 span 結束時的回呼
+
+    回呼在結束 span 的執行緒中同步執行，必須輕量且不可拋出例外。
+
+    Args:
+        processor: 接收已結束 Span 的函數
+    """
+    _processors.append(processor)
+
+
+def add_span_start_processor(processor: Callable[[Span], None]) -> None:
+    """
+    註冊 span 開始時的回呼（在 span 成為目前的 span 之後、區塊執行之前呼叫）
+
+    Args:
+        processor: 接收剛開始的 Span 的函數（同 add_span_processor，必須輕量且不可拋出例外）
+    """
+    _start_processors.append(processor)
+
+
+def _export(span: Span) -> None:
+    for exporter in _exporters:
+        try:
+            exporter.export(span)
+        except Exception as e:
+            logger.warning(f"[TRACE] span 匯出失敗: {e}")
+
+
+# =========================
+# 建立 span
+# =========================
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    記錄一個步驟的 span
+
+    區塊拋出的例外會記錄在 span 的 status / error 後原樣拋出。
+    TRACING=off 時仍會產生 Span 物件（讓呼叫端的 set() 照常運作），只是不匯出。
+
+    Args:
+        name: span 名稱（例如 'p1.analyze'、'gnews.query'）
+        **attributes: 屬性（esg_id、url、bytes 等）
+
+    Yields:
+        Span
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    for processor in _start_processors:
+        processor(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+        for processor in _processors:
+            processor(current)
+        if _exporters:
+            _export(current)
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """
+    以 span 包住整個函數的裝飾器
+
+    Args:
+        name: span 名稱（預設為 "模組.函數"）
+        **attributes: 固定屬性
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    """目前的 span（沒有時回傳 None）"""
+    return _current_span.get()
+
+
+def set_attributes(**attributes: Any) -> None:
+    """在目前的 span 加上屬性；沒有 span 時不做任何事"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    讓 fn 在其他執行緒執行時沿用呼叫當下的 trace
+
+    Args:
+        fn: 要交給 threading.Thread 或 executor.submit 的函數
+
+    Returns:
+        包裝後的函數（可重複、並行呼叫）
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # 每次呼叫使用副本，同一個包裝函數可在多個執行緒同時執行
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+# =========================
+# 檢視
+# =========================
+def load_spans(path: str, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    讀取 JSONL 追蹤檔
+
+    Args:
+        path: JSONL 檔案路徑
+        trace_id: 只讀取指定的 trace（預設為檔案中最後一個 trace）
+
+    Returns:
+        list: span 字典（依開始時間排序）
+    """
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    if not spans:
+        return []
+    if trace_id is None:
+        trace_id = max(spans, key=lambda s: s['start_time'])['trace_id']
+    return sorted((s for s in spans if s['trace_id'] == trace_id), key=lambda s: s['start_time'])
+
+
+def print_trace(spans: List[Dict[str, Any]], min_duration: float = 0.0) -> None:
+    """
+    以樹狀顯示 trace 中各 span 的耗時
+
+    Args:
+        spans: load_spans() 的結果
+        min_duration: 省略耗時低於此值（秒）的 span
+    """
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {s['span_id'] for s in spans}
+    for s in spans:
+        parent = s['parent_id'] if s['parent_id'] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    def show(node: Dict[str, Any], depth: int) -> None:
+        if node['duration'] >= min_duration:
+            attrs = {k: v for k, v in node['attributes'].items() if k not in INHERITED_ATTRIBUTES}
+            mark = '❌ ' if node['status'] == 'error' else ''
+            print(f"{'  ' * depth}{mark}{node['name']:<{max(1, 40 - 2 * depth)}} {node['duration']:>9.3f} 秒  "
+                  f"{json.dumps(attrs, ensure_ascii=False, default=str)[:120]}")
+        for child in children.get(node['span_id'], []):
+            show(child, depth + 1)
+
+    for root in children.get(None, []):
+        show(root, 0)
+
+
+def main():
+    """命令列執行：顯示 JSONL 追蹤檔中一個 trace 的耗時分布"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='顯示分析流程的 span 耗時')
+    parser.add_argument('path', nargs='?', help=f'JSONL 追蹤檔（預設 {TRACE_DIR} 中最新的檔案）')
+    parser.add_argument('--trace', help='trace_id（預設為最後一個 trace）')
+    parser.add_argument('--min', type=float, default=0.0, help='省略耗時低於此秒數的 span')
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        files = sorted(f for f in os.listdir(TRACE_DIR) if f.endswith('.jsonl')) if os.path.isdir(TRACE_DIR) else []
+        if not files:
+            print(f"❌ 找不到追蹤檔: {TRACE_DIR}")
+            sys.exit(1)
+        path = os.path.join(TRACE_DIR, files[-1])
+
+    spans = load_spans(path, args.trace)
+    if not spans:
+        print("❌ 追蹤檔中沒有 span")
+        sys.exit(1)
+    print(f"📁 {path}")
+    print(f"🔎 trace {spans[0]['trace_id']}，共 {len(spans)} 個 span\n")
+    print_trace(spans, args.min)
+
+
+if __name__ == '__main__':
+    main()
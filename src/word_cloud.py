@@ -27,14 +27,21 @@ from typing import Dict, List, Optional
 
 # 導入集中配置
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import PATHS, DATA_FILES
+from config import PATHS, DATA_FILES, get_file_path
+from src.artifact_store import write_artifact, is_artifact_fresh
+from src.log import get_logger
+from src.tracing import set_attributes, traced
 
 # 模組常數 - 使用 config.py 的路徑定義
 DICT_DIR = PATHS['STATIC_DICT']  # 字典檔目錄
 OUTPUT_DIR = PATHS['WORD_CLOUD_OUTPUT']  # 文字雲輸出目錄
 PDF_DIR = PATHS['ESG_REPORTS']  # PDF 報告書目錄
+DICT_FILES = ["esg_dict.txt", "fuzzy_dict.txt", "stopword_list.txt"]  # 影響斷詞結果的字典檔
 
+logger = get_logger(__name__)
 
+
+@traced('pdf.extract')
 def _extract_text_from_pdf(pdf_path: str) -> str:
     """
     讀取 PDF 並提取文字
@@ -45,7 +52,7 @@ def _extract_text_from_pdf(pdf_path: str) -> str:
     Returns:
         str: 提取的文字內容
     """
-    print(f"正在讀取 PDF: {pdf_path} ...")
+    logger.info(f"正在讀取 PDF: {pdf_path} ...")
     text = ""
     try:
         with pdfplumber.open(pdf_path) as pdf:
@@ -54,11 +61,12 @@ def _extract_text_from_pdf(pdf_path: str) -> str:
                 if page_text:
                     text += page_text + "\n"
                 if (i + 1) % 10 == 0:
-                    print(f"  已處理 {i + 1} 頁...")
-        print("PDF 讀取完成。")
+                    logger.debug(f"已處理 {i + 1} 頁...")
+        logger.info(f"PDF 讀取完成，共 {len(pdf.pages)} 頁。")
+        set_attributes(pages=len(pdf.pages), chars=len(text))
         return text
     except Exception as e:
-        print(f"PDF 讀取失敗: {e}")
+        logger.error(f"PDF 讀取失敗: {e}")
         return ""
 
 
@@ -70,7 +78,7 @@ def _load_dictionaries() -> None:
             if os.path.exists(full_path):
                 jieba.load_userdict(full_path)
     except Exception as e:
-        print(f"提醒：字典檔讀取失敗 ({e})，將僅使用預設斷詞。")
+        logger.warning(f"字典檔讀取失敗 ({e})，將僅使用預設斷詞。")
 
 
 def _load_stopwords() -> set:
@@ -85,10 +93,11 @@ def _load_stopwords() -> set:
         with open(stopwords_path, 'r', encoding='utf-8') as f:
             return set(f.read().splitlines())
     except Exception as e:
-        print(f"警告：停用詞檔讀取失敗 ({e})，將使用空集合。")
+        logger.warning(f"停用詞檔讀取失敗 ({e})，將使用空集合。")
         return set()
 
 
+@traced('stage.wordcloud')
 def generate_wordcloud(
     year: int,
     company_code: str,
@@ -102,7 +111,7 @@ def generate_wordcloud(
         year: 報告年份
         company_code: 公司代碼
         pdf_path: PDF 檔案路徑（選填，若未提供則自動搜尋）
-        force_regenerate: 是否強制重新生成（預設 False，會檢查檔案是否已存在）
+        force_regenerate: 是否強制重新生成（預設 False，PDF 與詞典未變更時沿用既有檔案）
     
     Returns:
         dict: {
@@ -118,34 +127,9 @@ def generate_wordcloud(
     
     # === 1. 建立輸出路徑 ===
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    output_filename = f"{year}_{company_code}_wc.json"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = get_file_path('WC_JSON', year, company_code)
     
-    # === 2. 檔案存在性檢查 ===
-    if not force_regenerate and os.path.exists(output_path):
-        try:
-            with open(output_path, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            
-            # 驗證格式正確
-            if isinstance(existing_data, list) and len(existing_data) > 0:
-                if all('name' in item and 'value' in item for item in existing_data[:5]):
-                    top_10 = existing_data[:10] if len(existing_data) >= 10 else existing_data
-                    
-                    execution_time = time.time() - start_time
-                    print(f"ℹ️ 文字雲 JSON 已存在，跳過生成 (耗時: {execution_time:.2f} 秒)")
-                    
-                    return {
-                        'success': True,
-                        'output_file': output_path,
-                        'word_count': len(existing_data),
-                        'top_keywords': [item['name'] for item in top_10],
-                        'skipped': True
-                    }
-        except (json.JSONDecodeError, KeyError, IOError, TypeError) as e:
-            print(f"⚠️ 現有檔案格式錯誤 ({e})，將重新生成")
-    
-    # === 3. 尋找 PDF 檔案 ===
+    # === 2. 尋找 PDF 檔案 ===
     if pdf_path is None:
         pattern = os.path.join(PDF_DIR, f"{year}_{company_code}_*.pdf")
         matched_files = glob.glob(pattern)
@@ -156,11 +140,36 @@ def generate_wordcloud(
                 'error': f"找不到符合格式的 PDF 檔案: {pattern}"
             }
         elif len(matched_files) > 1:
-            print(f"⚠️ 找到多個符合的檔案，將使用第一個: {matched_files[0]}")
+            logger.warning(f"找到多個符合的檔案，將使用第一個: {matched_files[0]}")
             pdf_path = matched_files[0]
         else:
             pdf_path = matched_files[0]
-            print(f"找到檔案: {pdf_path}")
+            logger.debug(f"找到檔案: {pdf_path}")
+    
+    # === 3. 產物新鮮度檢查（PDF 與詞典未變更則沿用） ===
+    artifact_inputs = [pdf_path] + [
+        path for path in (os.path.join(DICT_DIR, name) for name in DICT_FILES)
+        if os.path.exists(path)
+    ]
+    if not force_regenerate and is_artifact_fresh('WC_JSON', year, company_code, artifact_inputs):
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                existing_data = json.load(f)
+            
+            top_10 = existing_data[:10] if len(existing_data) >= 10 else existing_data
+            
+            execution_time = time.time() - start_time
+            logger.info(f"ℹ️ 文字雲 JSON 已存在，跳過生成 (耗時: {execution_time:.2f} 秒)")
+            
+            return {
+                'success': True,
+                'output_file': output_path,
+                'word_count': len(existing_data),
+                'top_keywords': [item['name'] for item in top_10],
+                'skipped': True
+            }
+        except (json.JSONDecodeError, KeyError, IOError, TypeError) as e:
+            logger.warning(f"現有檔案格式錯誤 ({e})，將重新生成")
     
     # === 4. 提取文字 ===
     text = _extract_text_from_pdf(pdf_path)
@@ -176,6 +185,7 @@ def generate_wordcloud(
     
     # === 6. 斷詞並過濾 ===
     words = jieba.lcut(text)
+    set_attributes(tokens=len(words))
     filtered_words = [
         w for w in words
         if len(w) >= 2 and w != '\n' and w not in stopwords
@@ -192,14 +202,15 @@ def generate_wordcloud(
     
     # === 9. 儲存檔案 ===
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(word_cloud_json, f, ensure_ascii=False, indent=2)
+        output_path = write_artifact(
+            'WC_JSON', year, company_code, word_cloud_json,
+            stage='wordcloud', inputs=artifact_inputs
+        )
         
         top_10 = word_cloud_json[:10] if len(word_cloud_json) >= 10 else word_cloud_json
         execution_time = time.time() - start_time
         
-        print(f"✅ JSON 檔已儲存至: {output_path}")
-        print(f"⏱️ 程式執行時間: {execution_time:.2f} 秒")
+        logger.info(f"✅ JSON 檔已儲存至: {output_path}（耗時 {execution_time:.2f} 秒）")
         
         return {
             'success': True,
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 與各模組相同：以專案根目錄為匯入基準（from config / from src.x）
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
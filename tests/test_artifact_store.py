@@ -0,0 +1,68 @@
+"""src/artifact_store.py 的產物紀錄與版本清理"""
+
+import os
+import time
+
+import pytest
+
+from src import artifact_store
+from src.artifact_store import collect_garbage, get_artifact_record, is_artifact_fresh, write_artifact
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch, tmp_path):
+    store_dir = tmp_path / 'artifacts'
+    monkeypatch.setattr(artifact_store, 'OBJECTS_DIR', str(store_dir / 'objects'))
+    monkeypatch.setattr(artifact_store, 'RECORDS_DIR', str(store_dir / 'records'))
+    monkeypatch.setattr(artifact_store, 'get_file_path',
+                        lambda key, year, code: str(tmp_path / 'out' / f"{year}_{code}_{key}.json"))
+    return store_dir
+
+
+def age(path, seconds):
+    """把檔案的 mtime 往回調，模擬建立已久的版本檔"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_records_are_stored_per_artifact(store):
+    write_artifact('P1_JSON', 2024, '1102', {'v': 1}, stage='p1')
+    write_artifact('P1_JSON', 2024, '2330', {'v': 2}, stage='p1')
+
+    # 另一個行程只會改寫自己的紀錄檔，不會覆蓋其他產物
+    assert sorted(os.listdir(store / 'records' / 'P1_JSON')) == ['2024_1102.json', '2024_2330.json']
+    assert get_artifact_record('P1_JSON', 2024, '1102')['stage'] == 'p1'
+    assert is_artifact_fresh('P1_JSON', 2024, '2330')
+
+
+def test_history_is_kept_in_the_record():
+    write_artifact('P1_JSON', 2024, '1102', {'v': 1}, stage='p1')
+    first = get_artifact_record('P1_JSON', 2024, '1102')['content_hash']
+    write_artifact('P1_JSON', 2024, '1102', {'v': 2}, stage='p1')
+
+    assert get_artifact_record('P1_JSON', 2024, '1102')['history'] == [first]
+
+
+def test_collect_garbage_skips_temp_and_recent_files(store):
+    for version in range(3):
+        write_artifact('P1_JSON', 2024, '1102', {'v': version}, stage='p1')
+    objects = [os.path.join(root, name) for root, _, names in os.walk(store / 'objects') for name in names]
+    for path in objects:
+        age(path, 2 * artifact_store.GC_GRACE_SECONDS)
+
+    # 其他行程寫入中的暫存檔與剛寫好、尚未登記的版本檔
+    pending_dir = store / 'objects' / 'ff'
+    pending_dir.mkdir(parents=True)
+    tmp_file = pending_dir / '.tmp_abcffff.json'
+    tmp_file.write_bytes(b'{}')
+    age(tmp_file, 2 * artifact_store.GC_GRACE_SECONDS)
+    fresh_object = pending_dir / ('ff' * 32 + '.json')
+    fresh_object.write_bytes(b'{}')
+
+    result = collect_garbage(keep_history=1)
+
+    assert result['removed_files'] == 1
+    assert tmp_file.exists() and fresh_object.exists()
+    record = get_artifact_record('P1_JSON', 2024, '1102')
+    for content_hash in [record['content_hash']] + record['history'][:1]:
+        assert os.path.exists(artifact_store._object_path(content_hash))
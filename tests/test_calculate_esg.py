@@ -0,0 +1,93 @@
+"""calculate_esg_scores_batch 與逐家呼叫 calculate_esg_scores 的結果必須完全相同"""
+
+import math
+import random
+from decimal import Decimal
+
+from src.calculate_esg import calculate_esg_scores, calculate_esg_scores_batch
+from src.sasb_weights import get_sasb_weights
+
+ADJUSTMENTS = [None, 0, '0', '', '2.5', Decimal('1.3'), -1, -0.5, float('nan'), 3, 4, 0.1, 0.7]
+CATEGORIES = ['E', 'S', 'G', ' e ', 's', None, '', 'X']
+
+
+def assert_identical(expected, actual):
+    """值與型別都相同（float 以 repr 比較，確保位元層級一致）"""
+    assert set(expected) == set(actual)
+    for key in expected:
+        assert type(expected[key]) is type(actual[key]), key
+        assert repr(expected[key]) == repr(actual[key]), key
+
+
+def make_rows(rng, company_count=200):
+    weights = get_sasb_weights()
+    industries = list(weights.industries) + ['不存在的產業', None]
+    company_industries = {}
+    records = []
+    for n in range(company_count):
+        key = (str(1000 + n), 2024)
+        industry = rng.choice(industries)
+        company_industries[key] = industry
+        topics = [topic for topic in weights.industry_map(industry) if topic != '產業'] or list(weights.topics)
+        for _ in range(rng.randint(0, 30)):
+            records.append({
+                'company_id': key[0],
+                'year': key[1],
+                'ESG_category': rng.choice(CATEGORIES),
+                'SASB_topic': rng.choice(topics + ['不存在的議題', None]),
+                'adjustment_score': rng.choice(ADJUSTMENTS + [rng.random() * 4]),
+            })
+    rng.shuffle(records)
+    return company_industries, records
+
+
+def test_batch_matches_per_company_scores():
+    rng = random.Random(20240101)
+    company_industries, records = make_rows(rng)
+
+    batch = calculate_esg_scores_batch(company_industries, records, key=('company_id', 'year'))
+
+    assert set(batch) == set(company_industries)
+    for key, industry in company_industries.items():
+        rows = [row for row in records if (row['company_id'], row['year']) == key]
+        assert_identical(calculate_esg_scores(industry, rows), batch[key])
+
+
+def test_single_field_tuple_key_matches_tuple_keys():
+    rng = random.Random(20240102)
+    company_industries, records = make_rows(rng, company_count=50)
+    by_company = {(company_id,): industry for (company_id, _), industry in company_industries.items()}
+
+    batch = calculate_esg_scores_batch(by_company, records, key=('company_id',))
+    scalar = calculate_esg_scores_batch({key[0]: industry for key, industry in by_company.items()}, records)
+
+    assert set(batch) == set(by_company)
+    for (company_id,), industry in by_company.items():
+        rows = [row for row in records if row['company_id'] == company_id]
+        assert_identical(calculate_esg_scores(industry, rows), batch[(company_id,)])
+        assert_identical(scalar[company_id], batch[(company_id,)])
+
+
+def test_nan_negative_and_missing_adjustments_count_as_zero():
+    rows = [
+        {'company_id': 'a', 'ESG_category': 'E', 'SASB_topic': '溫室氣體排放', 'adjustment_score': float('nan')},
+        {'company_id': 'a', 'ESG_category': 'E', 'SASB_topic': '溫室氣體排放', 'adjustment_score': -2},
+        {'company_id': 'a', 'ESG_category': 'E', 'SASB_topic': '溫室氣體排放', 'adjustment_score': None},
+        {'company_id': 'a', 'ESG_category': 'S', 'SASB_topic': '不存在的議題', 'adjustment_score': 4},
+    ]
+    expected = calculate_esg_scores('水泥工業', rows)
+    actual = calculate_esg_scores_batch({'a': '水泥工業'}, rows)['a']
+
+    assert_identical(expected, actual)
+    assert expected['E'] == 0.0
+    assert not math.isnan(expected['Total'])
+
+
+def test_companies_without_rows_and_unknown_rows():
+    rows = [{'company_id': 'other', 'ESG_category': 'E', 'SASB_topic': '溫室氣體排放', 'adjustment_score': 3}]
+    result = calculate_esg_scores_batch({'a': '水泥工業', 'b': '不存在的產業'}, rows)
+
+    for key in ('a', 'b'):
+        assert_identical(calculate_esg_scores('水泥工業', []), result[key])
+    assert 'other' not in result
+    assert calculate_esg_scores_batch({}, []) == {}
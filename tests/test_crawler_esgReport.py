@@ -0,0 +1,69 @@
+"""src/crawler_esgReport.py 的報告查詢：API 查無與連線失敗須分開處理"""
+
+import pytest
+
+from src import crawler_esgReport
+from src.crawler_esgReport import ReportLookupError, validate_report_exists
+from src.resilience import CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'data': self._data}
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    crawler_esgReport.clear_report_info_cache()
+    monkeypatch.setitem(crawler_esgReport.PATHS, 'REPORT_CATALOG', str(tmp_path))
+    yield
+    crawler_esgReport.clear_report_info_cache()
+
+
+def fake_api(monkeypatch, *results):
+    """依序回傳 results 中的回應；例外則直接拋出"""
+    calls = []
+
+    def request(method, url, **kwargs):
+        result = results[len(calls)]
+        calls.append(kwargs['json']['companyCode'])
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse(result)
+    monkeypatch.setattr(crawler_esgReport, '_twse_request', request)
+    return calls
+
+
+@pytest.mark.parametrize('error', [CircuitOpenError('twse 熔斷中'), ConnectionError('connection reset')])
+def test_transport_failure_raises_and_is_not_cached(monkeypatch, error):
+    item = {'code': '1102', 'shortName': '亞泥', 'sector': '水泥工業', 'twFirstReportDownloadId': 'abc'}
+    calls = fake_api(monkeypatch, error, [item])
+
+    with pytest.raises(ReportLookupError):
+        validate_report_exists(2024, '1102')
+
+    exists, report_info = validate_report_exists(2024, '1102')
+    assert exists and report_info['sector'] == '水泥工業'
+    assert calls == ['1102', '1102']
+
+
+def test_api_negative_is_cached(monkeypatch):
+    calls = fake_api(monkeypatch, [])
+
+    assert validate_report_exists(2024, '9999') == (False, None)
+    assert validate_report_exists(2024, '9999') == (False, None)
+    assert calls == ['9999']
+
+
+def test_download_reports_lookup_failure_as_error(monkeypatch):
+    fake_api(monkeypatch, CircuitOpenError('twse 熔斷中'))
+
+    ok, message = crawler_esgReport.download_esg_report(2024, '1102', save_dir='unused')
+    assert not ok
+    assert '查詢失敗' in message
@@ -0,0 +1,59 @@
+"""src/crawler_news.py 的 P1 → 新聞串流管線"""
+
+import threading
+
+from src import crawler_news
+from src.crawler_news import NewsSearchPipeline
+
+
+def fake_search(fail_topics=()):
+    calls = []
+
+    def search(item, year, company_code, sasb_keywords, label=''):
+        calls.append(item['sasb_topic'])
+        if item['sasb_topic'] in fail_topics:
+            raise RuntimeError('gnews 回應格式錯誤')
+        return {'topic': item['sasb_topic'], 'articles': [], 'error': None}
+    search.calls = calls
+    return search
+
+
+def test_submit_counts_every_item_across_threads(monkeypatch):
+    monkeypatch.setattr(crawler_news, '_search_news_for_item', fake_search())
+    pipeline = NewsSearchPipeline(2024, '1102').start()
+
+    def produce(worker):
+        for n in range(500):
+            pipeline.submit({'sasb_topic': f"{worker}-{n}"})
+    threads = [threading.Thread(target=produce, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pipeline.close()
+
+    assert pipeline.submitted == 8 * 500
+    assert len(pipeline._results) == 8 * 500
+
+
+def test_worker_survives_a_failing_item(monkeypatch):
+    search = fake_search(fail_topics={'B'})
+    monkeypatch.setattr(crawler_news, '_search_news_for_item', search)
+    pipeline = NewsSearchPipeline(2024, '1102').start()
+
+    for topic in ['A', 'B', 'C']:
+        pipeline.submit({'sasb_topic': topic})
+    pipeline.close()
+
+    assert search.calls == ['A', 'B', 'C']
+    assert sorted(result['topic'] for result in pipeline._results.values()) == ['A', 'C']
+
+
+def test_non_dict_items_are_ignored(monkeypatch):
+    monkeypatch.setattr(crawler_news, '_search_news_for_item', fake_search())
+    pipeline = NewsSearchPipeline(2024, '1102').start()
+
+    pipeline.submit('not an item')
+    pipeline.close()
+
+    assert pipeline.submitted == 0
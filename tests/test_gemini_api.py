@@ -0,0 +1,74 @@
+"""src/gemini_api.py 的 P1 提示詞與分段分析輔助函數"""
+
+import json
+import sys
+
+from src.gemini_api import ESGReportAnalyzer
+
+
+def make_analyzer(industry):
+    """不上傳 PDF、不建立 Client 的分析器（只測試純函數部分）"""
+    analyzer = object.__new__(ESGReportAnalyzer)
+    analyzer.industry = industry
+    return analyzer
+
+
+def test_sasb_map_contains_only_the_target_industry(monkeypatch):
+    # 不需 tiktoken：離線時初始化不可卡在下載編碼表
+    monkeypatch.setitem(sys.modules, 'tiktoken', None)
+    analyzer = make_analyzer('水泥')
+
+    matched = json.loads(analyzer._load_sasb_map())
+
+    assert matched['產業'] == '水泥工業' == analyzer.sasb_industry
+    assert '產業' not in analyzer.sasb_weights
+    assert set(analyzer.sasb_weights) == set(matched) - {'產業'}
+
+
+def test_unknown_industry_falls_back():
+    analyzer = make_analyzer('不存在的產業')
+
+    analyzer._load_sasb_map()
+
+    assert analyzer.sasb_industry == ESGReportAnalyzer.FALLBACK_INDUSTRY
+
+
+def chunked_analyzer(topics):
+    analyzer = make_analyzer('測試產業')
+    analyzer.sasb_weights = {topic: 1 for topic in topics}
+    return analyzer
+
+
+def test_topic_chunks_follow_weight_table_order():
+    analyzer = chunked_analyzer(['A', 'B', 'C', 'D', 'E'])
+
+    assert analyzer._topic_chunks(2) == [['A', 'B'], ['C', 'D'], ['E']]
+    assert analyzer._topic_chunks(0) == [['A'], ['B'], ['C'], ['D'], ['E']]
+
+
+def test_merge_orders_by_topic_then_chunk_position():
+    analyzer = chunked_analyzer(['A', 'B', 'C', 'D'])
+    chunks = [['A', 'B'], ['C', 'D']]
+    results = [
+        [{'sasb_topic': 'B', 'n': 1}, {'sasb_topic': 'A', 'n': 2}, {'sasb_topic': 'B', 'n': 3}],
+        [{'sasb_topic': 'D', 'n': 4}, {'sasb_topic': 'C', 'n': 5}],
+    ]
+
+    merged = analyzer._merge_chunk_results(chunks, results)
+
+    assert [item['n'] for item in merged] == [2, 1, 3, 5, 4]
+
+
+def test_merge_drops_topics_owned_by_other_chunks_and_keeps_unknown_ones():
+    analyzer = chunked_analyzer(['A', 'B'])
+    chunks = [['A'], ['B']]
+    results = [
+        [{'sasb_topic': 'B', 'n': 1}, {'sasb_topic': '權重表外', 'n': 2}, {'sasb_topic': 'A', 'n': 3}],
+        [{'sasb_topic': 'B', 'n': 4}, {'n': 5}, 'not a dict'],
+    ]
+
+    merged = analyzer._merge_chunk_results(chunks, results)
+
+    # B 由第二段負責，第一段的 B 捨棄；權重表以外的項目依分段順序附加在最後
+    assert merged[:2] == [{'sasb_topic': 'A', 'n': 3}, {'sasb_topic': 'B', 'n': 4}]
+    assert merged[2:] == [{'sasb_topic': '權重表外', 'n': 2}, {'n': 5}, 'not a dict']
@@ -0,0 +1,35 @@
+"""src/gemini_context_cache.py 的快取失敗處理"""
+
+import pytest
+
+from src.gemini_context_cache import should_retry_without_cache
+from src.resilience import CircuitOpenError, RetryableHTTPError
+
+
+class APIError(Exception):
+    """模擬 SDK 的錯誤（帶 code）"""
+
+    def __init__(self, code, message=''):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+@pytest.mark.parametrize('error', [
+    APIError(400, 'INVALID_ARGUMENT: cached content not found'),
+    APIError(403, 'PERMISSION_DENIED: cached content'),
+    APIError(404, 'NOT_FOUND'),
+])
+def test_cache_related_errors_retry_with_full_content(error):
+    assert should_retry_without_cache(error)
+
+
+@pytest.mark.parametrize('error', [
+    CircuitOpenError('gemini 熔斷中'),
+    RetryableHTTPError(503),
+    APIError(429, 'RESOURCE_EXHAUSTED'),
+    APIError(500, 'INTERNAL'),
+    TimeoutError('timed out'),
+    ConnectionError('Connection reset by peer'),
+])
+def test_overload_and_transport_errors_are_raised(error):
+    assert not should_retry_without_cache(error)
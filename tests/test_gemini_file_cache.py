@@ -0,0 +1,77 @@
+"""src/gemini_file_cache.py 以 FakeGenaiClient 檢查上傳檔案的沿用與重新上傳"""
+
+import pytest
+
+from src import gemini_file_cache
+from src.fake_backends import FakeGenaiClient
+from src.gemini_file_cache import get_or_upload_file
+
+PDF_CONTENT = b'%PDF-1.4 fake report content'
+
+
+@pytest.fixture(autouse=True)
+def cache_path(monkeypatch, tmp_path):
+    path = tmp_path / 'gemini_files.json'
+    monkeypatch.setattr(gemini_file_cache, 'CACHE_PATH', str(path))
+    return path
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / '2024_1102_a.pdf'
+    path.write_bytes(PDF_CONTENT)
+    return str(path)
+
+
+def upload(client, path):
+    return get_or_upload_file(client, path, "Report", poll_interval=0)
+
+
+def test_first_call_uploads_and_waits_until_active(pdf):
+    client = FakeGenaiClient(processing_polls=2)
+
+    file_ref = upload(client, pdf)
+
+    assert client.files.upload_count == 1
+    assert file_ref.state.name == "ACTIVE"
+
+
+def test_same_content_reuses_uploaded_file(pdf, tmp_path):
+    client = FakeGenaiClient(processing_polls=2)
+    other_name = tmp_path / '2024_1102_b.pdf'
+    other_name.write_bytes(PDF_CONTENT)
+
+    first = upload(client, pdf)
+    assert upload(client, pdf).name == first.name
+    # 檔名不同、內容相同也會沿用
+    assert upload(client, str(other_name)).name == first.name
+    assert client.files.upload_count == 1
+
+
+def test_server_side_expiry_triggers_reupload(pdf):
+    client = FakeGenaiClient(processing_polls=2)
+    first = upload(client, pdf)
+
+    client.files.expire(first.name)
+    second = upload(client, pdf)
+
+    assert client.files.upload_count == 2
+    assert second.name != first.name
+
+
+def test_file_close_to_expiry_is_not_reused(pdf):
+    client = FakeGenaiClient(processing_polls=0, ttl_seconds=gemini_file_cache.REUSE_MARGIN // 2)
+
+    upload(client, pdf)
+    upload(client, pdf)
+
+    assert client.files.upload_count == 2
+
+
+def test_use_cache_false_always_uploads(pdf):
+    client = FakeGenaiClient(processing_polls=0)
+
+    upload(client, pdf)
+    get_or_upload_file(client, pdf, "Report", poll_interval=0, use_cache=False)
+
+    assert client.files.upload_count == 2
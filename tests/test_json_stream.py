@@ -0,0 +1,92 @@
+"""src/json_stream.py 的增量 JSON 陣列解析"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.json_stream import JsonArrayStreamParser, iter_json_array, parse_json_array, stream_json_array
+
+ITEMS = [
+    {'sasb_topic': '溫室氣體排放', 'report_claim': '含括號 [ ] { } 與逗號, 的字串'},
+    {'sasb_topic': '能源管理', 'report_claim': '跳脫字元 \\ 與 "引號"', 'nested': {'list': [1, [2, 3]]}},
+    {'sasb_topic': '水資源管理', 'risk_score': 2},
+]
+TEXT = '```json\n' + json.dumps(ITEMS, ensure_ascii=False, indent=2) + '\n```'
+
+
+def feed_in_pieces(text, size):
+    parser = JsonArrayStreamParser()
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.extend(parser.feed(text[start:start + size]))
+    return parser, emitted
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64, len(TEXT)])
+def test_any_chunking_yields_the_same_items(size):
+    parser, emitted = feed_in_pieces(TEXT, size)
+
+    assert emitted == ITEMS == parser.items
+    assert parser.complete and not parser.truncated
+    assert parser.skipped == 0
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    parser = JsonArrayStreamParser()
+    first = json.dumps(ITEMS[0], ensure_ascii=False)
+
+    assert parser.feed('前言文字 [' + first[:-1]) == []
+    assert parser.feed(first[-1] + ', {"sasb') == [ITEMS[0]]
+    assert not parser.complete
+
+
+def test_truncated_response_keeps_completed_items():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    cut = text.index('水資源管理')
+
+    items, complete = parse_json_array(text[:cut])
+
+    assert items == ITEMS[:2]
+    assert not complete
+
+
+def test_scalars_and_malformed_elements():
+    parser = JsonArrayStreamParser()
+
+    parser.feed('[1, "a,b", true, {"bad": tru}, null, 2.5]')
+
+    assert parser.items == [1, 'a,b', True, None, 2.5]
+    assert parser.skipped == 1
+    assert parser.complete
+
+
+def test_content_after_the_top_level_array_is_ignored():
+    parser = JsonArrayStreamParser()
+
+    parser.feed('[{"a": 1}] [{"a": 2}]')
+
+    assert parser.items == [{'a': 1}]
+    assert parser.feed('[{"a": 3}]') == []
+
+
+def test_iter_json_array_stops_at_the_end_of_the_array():
+    chunks = iter(['[{"a": 1},', ' {"a": 2}]', 'never read'])
+
+    assert list(iter_json_array(chunks)) == [{'a': 1}, {'a': 2}]
+    assert next(chunks) == 'never read'
+
+
+def test_stream_json_array_calls_on_item_per_element():
+    usage = SimpleNamespace(prompt_token_count=10)
+    chunks = [SimpleNamespace(text=TEXT[i:i + 5], usage_metadata=None) for i in range(0, len(TEXT), 5)]
+    chunks.append(SimpleNamespace(text='', usage_metadata=usage))
+    client = SimpleNamespace(models=SimpleNamespace(generate_content_stream=lambda **kwargs: iter(chunks)))
+    seen = []
+
+    result = stream_json_array(client, 'model', 'contents', on_item=seen.append)
+
+    assert seen == ITEMS == result['items']
+    assert result['text'] == TEXT
+    assert result['complete'] and not result['cached']
+    assert result['usage_metadata'] is usage
@@ -0,0 +1,86 @@
+"""src/llm_response_cache.py 的快取鍵與容量淘汰"""
+
+import os
+
+import pytest
+
+from src import llm_response_cache
+from src.llm_response_cache import get_cached_response, make_response_key, store_response
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_response_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(llm_response_cache, 'RESPONSE_CACHE_ENABLED', True)
+    monkeypatch.setattr(llm_response_cache, '_cache_bytes', None)
+    return tmp_path
+
+
+def test_key_is_stable_and_ignores_model_prefix():
+    key = make_response_key('models/gemini-2.5-flash', 'system', ['pdf-hash', 'prompt'], {'temperature': 0})
+
+    assert key == make_response_key('gemini-2.5-flash', 'system', ['pdf-hash', 'prompt'], {'temperature': 0})
+    assert len(key) == 64
+
+
+@pytest.mark.parametrize('changed', [
+    dict(model='gemini-2.5-pro'),
+    dict(system_instruction='system v2'),
+    dict(contents=['pdf-hash', 'prompt v2']),
+    dict(contents=['prompt', 'pdf-hash']),
+    dict(config={'temperature': 0.5}),
+])
+def test_key_changes_with_every_input(changed):
+    base = dict(model='gemini-2.5-flash', system_instruction='system', contents=['pdf-hash', 'prompt'],
+                config={'temperature': 0})
+
+    assert make_response_key(**base) != make_response_key(**{**base, **changed})
+
+
+def test_key_changes_with_cache_version(monkeypatch):
+    key = make_response_key('gemini-2.5-flash', 'system', ['prompt'])
+    monkeypatch.setattr(llm_response_cache, 'CACHE_VERSION', llm_response_cache.CACHE_VERSION + 1)
+
+    assert make_response_key('gemini-2.5-flash', 'system', ['prompt']) != key
+
+
+def test_store_and_get_roundtrip():
+    store_response('k1', '[{"a": 1}]', model='m', stage='p1')
+
+    assert get_cached_response('k1') == '[{"a": 1}]'
+    assert get_cached_response('missing') is None
+
+
+def test_directory_is_scanned_only_when_over_the_limit(monkeypatch, cache_dir):
+    monkeypatch.setattr(llm_response_cache, 'MAX_CACHE_BYTES', 10_000)
+    listdir = os.listdir
+    scans = []
+
+    def counting_listdir(path):
+        if os.path.abspath(path) == str(cache_dir):
+            scans.append(path)
+        return listdir(path)
+    monkeypatch.setattr(os, 'listdir', counting_listdir)
+
+    for n in range(10):
+        store_response(f"k{n}", 'x' * 100)
+    # 第一次寫入掃描一次，之後只累加大小
+    assert len(scans) == 1
+
+    for n in range(10, 200):
+        store_response(f"k{n}", 'x' * 100)
+    total = sum(os.path.getsize(cache_dir / name) for name in listdir(cache_dir))
+    assert total <= 10_000
+    # 每次淘汰都騰出一成空間（約 5 筆），不會每次寫入都掃描
+    assert len(scans) <= 30
+    assert get_cached_response('k199') is not None
+    assert get_cached_response('k0') is None
+
+
+def test_overwriting_an_entry_does_not_inflate_the_size(monkeypatch, cache_dir):
+    monkeypatch.setattr(llm_response_cache, 'MAX_CACHE_BYTES', 10_000)
+
+    for _ in range(50):
+        store_response('same', 'x' * 100)
+
+    assert llm_response_cache._cache_bytes == os.path.getsize(cache_dir / 'same.json')
@@ -0,0 +1,42 @@
+"""src/llm_telemetry.py 的用量記錄與成本估算"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm_telemetry import MODEL_PRICING, estimate_cost, llm_call, summarize_llm_usage
+
+
+def test_thinking_tokens_are_billed_as_output():
+    usage = SimpleNamespace(prompt_token_count=1000, candidates_token_count=200, thoughts_token_count=800,
+                            cached_content_token_count=0, total_token_count=2000)
+
+    with llm_call('gemini', 'gemini-2.5-pro', stage='p2', company='test_thinking') as call:
+        call.record_gemini_usage(usage)
+
+    assert call.thoughts_tokens == 800
+    assert call.output_tokens == 1000
+    assert call.prompt_tokens + call.output_tokens == call.total_tokens
+
+    summary = summarize_llm_usage(company='test_thinking')
+    input_price, output_price, _ = MODEL_PRICING['gemini-2.5-pro']
+    assert summary['thoughts_tokens'] == 800
+    assert summary['cost_usd'] == pytest.approx((1000 * input_price + 1000 * output_price) / 1_000_000)
+
+
+def test_usage_without_thoughts_field():
+    usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=50, cached_content_token_count=None)
+
+    with llm_call('gemini', 'gemini-2.5-flash', stage='p1', company='test_no_thoughts') as call:
+        call.record_gemini_usage(usage)
+
+    assert (call.output_tokens, call.thoughts_tokens, call.total_tokens) == (50, 0, 150)
+
+
+def test_cached_input_uses_cached_price():
+    input_price, output_price, cached_price = MODEL_PRICING['gemini-2.5-flash']
+
+    cost = estimate_cost('models/gemini-2.5-flash', prompt_tokens=1000, output_tokens=10, cached_tokens=600)
+
+    assert cost == pytest.approx((400 * input_price + 600 * cached_price + 10 * output_price) / 1_000_000)
+    assert estimate_cost('unknown-model', 1000, 1000) == 0.0
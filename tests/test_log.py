@@ -0,0 +1,88 @@
+"""src/log.py 的逐項訊息取樣與 JSON 輸出"""
+
+import json
+import logging
+import threading
+
+import pytest
+
+from src.log import JsonFormatter, get_logger, sampled
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    logger = get_logger('tests.test_log')
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield logger, handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+
+
+def test_info_is_sampled_every_n(captured):
+    logger, records = captured
+    item_logger = sampled(logger, every=10)
+
+    for n in range(25):
+        item_logger.info(f"item {n}")
+
+    assert [record.getMessage() for record in records] == ['item 0', 'item 10', 'item 20']
+    assert all(record.sample_every == 10 for record in records)
+
+
+def test_warnings_are_never_sampled(captured):
+    logger, records = captured
+    item_logger = sampled(logger, every=10)
+
+    for n in range(5):
+        item_logger.warning(f"warning {n}")
+
+    assert len(records) == 5
+
+
+def test_debug_level_disables_sampling(captured):
+    logger, records = captured
+    logger.setLevel(logging.DEBUG)
+    item_logger = sampled(logger, every=10)
+
+    for n in range(5):
+        item_logger.info(f"item {n}")
+
+    assert len(records) == 5
+
+
+def test_sampling_counter_is_shared_across_threads(captured):
+    logger, records = captured
+    item_logger = sampled(logger, every=10)
+
+    def work():
+        for _ in range(250):
+            item_logger.info('item')
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(records) == 100
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord('greenwashing.test', logging.INFO, __file__, 1, '處理 %s', ('1102',), None)
+    record.esg_id = 42
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == '處理 1102'
+    assert entry['level'] == 'INFO'
+    assert entry['esg_id'] == 42
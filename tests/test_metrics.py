@@ -0,0 +1,88 @@
+"""src/metrics.py 的指標記錄與 Prometheus 文字格式輸出"""
+
+import threading
+
+from src import metrics
+from src.metrics import Counter, Gauge, Histogram, render_metrics
+from src.tracing import span
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name) and not line.startswith('#')]
+
+
+def test_counter_sums_every_thread():
+    counter = Counter('test_requests_total', '測試計數', ('result',))
+
+    def work():
+        for _ in range(1000):
+            counter.inc('hit')
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc('miss', amount=2)
+
+    assert counter.render() == [
+        '# HELP greenwashing_test_requests_total 測試計數',
+        '# TYPE greenwashing_test_requests_total counter',
+        'greenwashing_test_requests_total{result="hit"} 4000',
+        'greenwashing_test_requests_total{result="miss"} 2',
+    ]
+
+
+def test_unlabelled_gauge_renders_zero_before_first_use():
+    gauge = Gauge('test_in_progress', '測試量表')
+
+    assert gauge.render()[-1] == 'greenwashing_test_in_progress 0'
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.render()[-1] == 'greenwashing_test_in_progress 1'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', '測試直方圖', ('route',), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, '/api')
+
+    assert histogram.render()[2:] == [
+        'greenwashing_test_seconds_bucket{route="/api",le="0.1"} 2',
+        'greenwashing_test_seconds_bucket{route="/api",le="1"} 3',
+        'greenwashing_test_seconds_bucket{route="/api",le="+Inf"} 4',
+        'greenwashing_test_seconds_sum{route="/api"} 3.65',
+        'greenwashing_test_seconds_count{route="/api"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter('test_escape_total', '跳脫測試', ('path',))
+
+    counter.inc('a"b\\c\nd')
+
+    assert counter.render()[-1] == 'greenwashing_test_escape_total{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_render_metrics_includes_requests_and_spans():
+    metrics.observe_request('/api/test_render', 'GET', 200, 0.02)
+    with span('db.query', table='test_render_table'):
+        pass
+
+    text = render_metrics()
+
+    assert text.endswith('\n')
+    assert '# TYPE greenwashing_http_request_duration_seconds histogram' in text
+    assert ('greenwashing_http_request_duration_seconds_count'
+            '{route="/api/test_render",method="GET",status="200"} 1') in text
+    assert sample_lines(text, 'greenwashing_db_query_duration_seconds_count{operation="test_render_table"}')
+    assert sample_lines(text, 'greenwashing_news_queue_depth')
+
+
+def test_failing_callback_does_not_break_the_output(monkeypatch):
+    def broken():
+        raise RuntimeError('stats unavailable')
+    monkeypatch.setattr(metrics, '_METRICS', [metrics.CallbackMetric('test_broken', '故障', 'gauge', (), broken)])
+
+    assert render_metrics().splitlines()[-1] == '# greenwashing_test_broken 讀取失敗: stats unavailable'
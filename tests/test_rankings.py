@@ -0,0 +1,133 @@
+"""src/rankings.py 的排名彙總、定期重建與查詢"""
+
+import threading
+
+import pytest
+
+from src import rankings
+from src.rankings import RankingIndex
+
+
+def company(code, industry, total, year=2024):
+    return {'year': year, 'company_code': code, 'company_name': f"公司{code}", 'industry': industry,
+            'scores': {'E': total, 'S': total, 'G': total, 'Total': total}}
+
+
+ROWS = [
+    company('1101', '水泥工業', 60.0),
+    company('1102', '水泥工業', 40.0),
+    company('1103', '水泥工業', 20.0),
+    company('2330', '半導體業', 30.0),
+]
+
+
+class Database(list):
+    """取代資料庫的公司列表，記錄讀取次數"""
+
+    fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return list(self)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    db = Database(ROWS)
+    monkeypatch.setattr(rankings, '_fetch_company_scores', db.fetch)
+    return db
+
+
+@pytest.fixture(autouse=True)
+def refresh_interval(monkeypatch):
+    monkeypatch.setattr(rankings, 'REFRESH_SECONDS', 300)
+
+
+def test_rank_percentile_and_summary(database):
+    index = RankingIndex()
+
+    result = index.query(2024, company_code='1102', top=2)
+
+    assert result['industry'] == '水泥工業'
+    assert result['count'] == 3
+    assert result['mean']['Total'] == 40.0
+    assert result['percentiles'] == {'p25': 30.0, 'p50': 40.0, 'p75': 50.0}
+    assert [item['stockId'] for item in result['top']] == ['1101', '1102']
+    assert (result['company']['rank'], result['company']['percentile']) == (2, 66.7)
+
+
+def test_all_industries_group(database):
+    result = RankingIndex().query(2024, top=0)
+
+    assert result['count'] == 4
+    assert result['top'] == []
+    assert result['industries'] == {'水泥工業': {'count': 3, 'mean': 40.0}, '半導體業': {'count': 1, 'mean': 30.0}}
+
+
+def test_industry_that_does_not_match_the_company_is_rejected(database):
+    index = RankingIndex()
+
+    with pytest.raises(ValueError):
+        index.query(2024, industry='半導體業', company_code='1102')
+    assert index.query(2024, industry='水泥工業', company_code='1102')['company']['rank'] == 2
+
+
+def test_incremental_update_moves_the_company(database):
+    index = RankingIndex()
+    index.ensure_loaded()
+
+    index.update(2024, '1103', '公司1103', '半導體業', {'E': 90, 'S': 90, 'G': 90, 'Total': 90})
+
+    assert index.query(2024, industry='水泥工業')['count'] == 2
+    assert index.query(2024, company_code='1103')['company']['rank'] == 1
+
+
+def test_stale_index_is_rebuilt_from_the_database(monkeypatch, database):
+    index = RankingIndex()
+    index.ensure_loaded()
+    # 其他行程寫入的公司
+    database.append(company('1104', '水泥工業', 80.0))
+
+    assert index.query(2024, industry='水泥工業')['count'] == 3
+    monkeypatch.setattr(rankings, 'REFRESH_SECONDS', 0)
+    assert index.query(2024, industry='水泥工業')['count'] == 4
+    assert database.fetches == 2
+
+
+def test_failed_refresh_keeps_the_existing_index(monkeypatch, database):
+    index = RankingIndex()
+    index.ensure_loaded()
+    monkeypatch.setattr(rankings, 'REFRESH_SECONDS', 0)
+
+    def broken():
+        raise ConnectionError('db down')
+    monkeypatch.setattr(rankings, '_fetch_company_scores', broken)
+
+    assert index.query(2024, industry='水泥工業')['count'] == 3
+
+
+def test_updates_during_a_refresh_are_kept(monkeypatch, database):
+    index = RankingIndex()
+    index.ensure_loaded()
+    monkeypatch.setattr(rankings, 'REFRESH_SECONDS', 0)
+    reading = threading.Event()
+    written = threading.Event()
+
+    def slow_fetch():
+        rows = list(database)  # 讀取早於下面的寫入
+        reading.set()
+        written.wait(5)
+        return rows
+    monkeypatch.setattr(rankings, '_fetch_company_scores', slow_fetch)
+
+    refresher = threading.Thread(target=index.ensure_loaded)
+    refresher.start()
+    reading.wait(5)
+    # 重建期間：其他查詢不等待，沿用既有彙總
+    assert index.query(2024, industry='水泥工業')['count'] == 3
+    index.update(2024, '1105', '公司1105', '水泥工業', {'E': 10, 'S': 10, 'G': 10, 'Total': 10})
+    written.set()
+    refresher.join()
+
+    monkeypatch.setattr(rankings, 'REFRESH_SECONDS', 300)
+    assert index.query(2024, industry='水泥工業')['count'] == 4
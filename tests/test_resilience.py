@@ -0,0 +1,131 @@
+"""src/resilience.py 的熔斷與重試行為"""
+
+import pytest
+
+from src.resilience import CircuitOpenError, ProviderPolicy, RetryableHTTPError
+
+
+def make_policy(max_attempts=3, failure_threshold=1):
+    return ProviderPolicy('test', rate=1000.0, burst=1000, max_attempts=max_attempts, base_delay=0.0,
+                            max_delay=0.0, failure_threshold=failure_threshold, reset_timeout=60.0)
+
+
+def open_then_half_open(policy):
+    """以可重試錯誤打開熔斷，再把開啟時間往回調到冷卻結束"""
+    with pytest.raises(RetryableHTTPError):
+        policy.call(_fail(503))
+    assert policy.breaker.state == 'open'
+    policy.breaker._opened_at -= policy.breaker.reset_timeout
+    assert policy.breaker.state == 'half_open'
+
+
+def _fail(status, times=None):
+    calls = {'count': 0}
+
+    def fn():
+        calls['count'] += 1
+        if times is None or calls['count'] <= times:
+            raise RetryableHTTPError(status)
+        return 'ok'
+    fn.calls = calls
+    return fn
+
+
+def test_half_open_trial_retries_instead_of_rejecting_itself():
+    policy = make_policy()
+    open_then_half_open(policy)
+
+    flaky = _fail(503, times=1)
+    assert policy.call(flaky) == 'ok'
+    assert flaky.calls['count'] == 2
+    assert policy.breaker.state == 'closed'
+
+
+def test_failed_half_open_trial_reopens_and_does_not_lock_the_circuit():
+    policy = make_policy()
+    open_then_half_open(policy)
+
+    failing = _fail(503)
+    with pytest.raises(RetryableHTTPError):
+        policy.call(failing)
+    assert failing.calls['count'] == policy.retry.max_attempts
+    assert policy.breaker.state == 'open'
+    assert policy.breaker._trial_in_flight is False
+
+    # 冷卻結束後可再次試探並恢復
+    policy.breaker._opened_at -= policy.breaker.reset_timeout
+    assert policy.call(lambda: 'ok') == 'ok'
+    assert policy.breaker.state == 'closed'
+
+
+def test_open_circuit_rejects_without_calling():
+    policy = make_policy()
+    with pytest.raises(RetryableHTTPError):
+        policy.call(_fail(503))
+
+    never = _fail(503)
+    with pytest.raises(CircuitOpenError):
+        policy.call(never)
+    assert never.calls['count'] == 0
+
+
+def test_interrupted_trial_releases_the_trial_slot():
+    policy = make_policy()
+    open_then_half_open(policy)
+
+    def interrupted():
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(interrupted)
+    assert policy.breaker._trial_in_flight is False
+    assert policy.call(lambda: 'ok') == 'ok'
+
+
+class ClientError(Exception):
+    """模擬 SDK 的 4xx 錯誤（帶 code）"""
+
+    def __init__(self, code):
+        super().__init__(f"{code} INVALID_ARGUMENT")
+        self.code = code
+
+
+@pytest.mark.parametrize('error', [KeyError('items'), ValueError('Expecting value: line 1 column 1')])
+def test_non_http_errors_leave_a_half_open_breaker_unchanged(error):
+    policy = make_policy()
+    open_then_half_open(policy)
+
+    def broken():
+        raise error
+    with pytest.raises(type(error)):
+        policy.call(broken)
+
+    # 解析或程式錯誤不代表服務恢復：維持半開，下一個請求仍是試探
+    assert policy.breaker.state == 'half_open'
+    assert policy.breaker._trial_in_flight is False
+
+
+def test_non_http_errors_do_not_reset_the_failure_count():
+    policy = make_policy(max_attempts=1, failure_threshold=2)
+    with pytest.raises(RetryableHTTPError):
+        policy.call(_fail(503))
+
+    def broken():
+        raise KeyError('items')
+    with pytest.raises(KeyError):
+        policy.call(broken)
+    with pytest.raises(RetryableHTTPError):
+        policy.call(_fail(503))
+
+    assert policy.breaker.state == 'open'
+
+
+def test_http_4xx_counts_as_a_service_response():
+    policy = make_policy()
+    open_then_half_open(policy)
+
+    def rejected():
+        raise ClientError(400)
+    with pytest.raises(ClientError):
+        policy.call(rejected)
+
+    assert policy.breaker.state == 'closed'
@@ -0,0 +1,75 @@
+"""src/run_prompt2_gemini.py 依主題並行驗證後的合併"""
+
+import json
+
+import pytest
+
+from src import run_prompt2_gemini
+from src.run_prompt2_gemini import process_esg_news_verification
+
+# 不同主題交錯出現的 P1 項目
+CLAIMS = [
+    {'sasb_topic': topic, 'report_claim': f"claim-{n}", 'risk_score': 2}
+    for n, topic in enumerate(['A', 'B', 'A', 'C', 'B', 'A'])
+]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    def write(name, data):
+        path = tmp_path / name
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        return str(path)
+    return {
+        'input_json_path': write('2024_1102_p1.json', CLAIMS),
+        'news_json_path': write('2024_1102_news.json', [{'sasb_topic': 'A', 'title': 'news'},
+                                                        {'sasb_topic': 'B', 'title': 'news'}]),
+        'msci_json_path': write('msci_flag.json', {}),
+        'output_json_path': str(tmp_path / '2024_1102_p2.json'),
+    }
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(run_prompt2_gemini, 'get_genai_client', lambda: None)
+    monkeypatch.setattr(run_prompt2_gemini, 'get_cached_context', lambda *args, **kwargs: None)
+
+
+def fake_verify(fail_topics=()):
+    def verify(topic, claims, topic_news, company_key=None, cache_name=None, use_response_cache=True):
+        outcome = {'topic': topic, 'items': [], 'error': None, 'api_calls': 1, 'response_cached': False,
+                   'input_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0}
+        if topic in fail_topics:
+            outcome['error'] = 'API call failed: boom'
+        elif topic_news:
+            outcome['items'] = [dict(claim, consistency_status='一致') for claim in claims]
+        else:
+            outcome['items'] = [run_prompt2_gemini._fallback_result(claim, '無相關新聞證據', '一致')
+                                for claim in claims]
+        return outcome
+    return verify
+
+
+def read_output(paths):
+    with open(paths['output_json_path'], encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_results_are_merged_back_in_p1_order(monkeypatch, paths):
+    monkeypatch.setattr(run_prompt2_gemini, '_verify_topic', fake_verify())
+
+    result = process_esg_news_verification(max_workers=3, **paths)
+
+    assert result['success']
+    assert [item['report_claim'] for item in read_output(paths)] == [claim['report_claim'] for claim in CLAIMS]
+
+
+def test_failed_topic_keeps_its_positions(monkeypatch, paths):
+    monkeypatch.setattr(run_prompt2_gemini, '_verify_topic', fake_verify(fail_topics={'B'}))
+
+    result = process_esg_news_verification(max_workers=3, **paths)
+    output = read_output(paths)
+
+    assert result['failed_topics'] == ['B']
+    assert [item['report_claim'] for item in output] == [claim['report_claim'] for claim in CLAIMS]
+    assert [item['consistency_status'] for item in output] == ['一致', '未驗證', '一致', '一致', '未驗證', '一致']